@@ -1,8 +1,9 @@
 class Context(object):
-    pass
+    __slots__ = ()
 
 
 class RequestContext(Context):
+    __slots__ = ['caller', 'spider', 'scraper']
 
     def __init__(self, caller=None, spider=None, scraper=None):
         self.caller = caller
@@ -1,36 +1,46 @@
 import logging
 import asyncio
 from contextlib import suppress
-from typing import Coroutine, List, Optional
+from typing import Callable, Coroutine, List, Optional
 from araneid.core import Slotable
 from araneid.core.exception import DownloaderNotFound, InvalidDownloader, RequestException
 from araneid.core.downloader import Downloader
 from araneid.core.middlewaremanager import DownloaderMiddlewareManager
 from araneid.network.websocket import WebSocketRequest
 from araneid.network.socket import SocketRequest
+from araneid.network import dns
 from araneid.core.response import Response
 from araneid.core.request import Request
+from araneid.core.scheduler import Scheduler
 from araneid.core.pipeline import Pipeline
-from araneid.core.stream import Stream
+from araneid.core.stream import Stream, DispatchStream
+from araneid.core.inflight import InFlight, InFlightTasks
 from araneid.spider import Spider
 from araneid.core import signal
 from araneid.core import plugin as plugins
 from araneid.util._async import ensure_asyncfunction, ensure_asyncgenfunction
 from araneid.util import cast_exception_to
-from asyncio.locks import BoundedSemaphore, Event
+from asyncio.locks import BoundedSemaphore
 from asyncio import Task
 
 class DownloadManager(object):
     logger = None
+    # 请求最近一次下载的延迟(秒), 从调用下载器开始到收到请求响应或者下载失败, 在触发 ``response_downloaded`` 和 ``request_failed`` 信号之前写入 ``meta``
+    LATENCY_KEY = 'download_latency'
     __running__: List[Task]
     __downloadermiddlewaremanager__: DownloaderMiddlewareManager
     __MAX_DOWNLOADER_PROCESSES__:int
-    __IDLE_EVENT__: Event
+    __inflight__: InFlight
     __AVAILABLE_DOWNLOADER_PIPELINE_SEMAPHOR__: Optional[BoundedSemaphore]
     __channel_receivers__: List[Coroutine]
+    __complete_receivers__: List[Callable]
     __channel__: Stream
     __download_channel__: Stream
     __closed__: bool
+    __CHANNEL_BATCH_SIZE__: int
+    __CHANNEL_BATCH_WAIT__: float
+    __DIRECT_DISPATCH__: bool
+    __pipelines__: InFlightTasks
 
     @classmethod
     def from_settings(cls, settings):
@@ -40,20 +50,29 @@ class DownloadManager(object):
         self.logger = logging.getLogger(__name__)
         self.logger.debug("DownloaderManager init.")
         self.__MAX_DOWNLOADER_PROCESSES__ = settings.get('MAX_DOWNLOADER_PROCESSES', -1)
+        self.__CHANNEL_BATCH_SIZE__ = settings.get('CHANNEL_BATCH_SIZE', 100)
+        self.__CHANNEL_BATCH_WAIT__ = settings.get('CHANNEL_BATCH_WAIT', 0)
+        self.__DIRECT_DISPATCH__ = settings.get('ENGINE_DISPATCH', 'channel') == 'direct'
+        self.__pipelines__ = InFlightTasks()
         self.__closed__ = False
         self.__channel_receivers__ = []
+        self.__complete_receivers__ = []
     
     @classmethod
     async def create(cls, settings = None):
         instance = cls.from_settings(settings)
-        instance.__IDLE_EVENT__ = Event()
+        instance.__inflight__ = InFlight()
         if instance.__MAX_DOWNLOADER_PROCESSES__ > 0:
             instance.__AVAILABLE_DOWNLOADER_PIPELINE_SEMAPHOR__ = BoundedSemaphore(instance.__MAX_DOWNLOADER_PROCESSES__)
         else:
             instance.__AVAILABLE_DOWNLOADER_PIPELINE_SEMAPHOR__ = None
+        dns.set_dnscache(dns.DNSCache.from_settings(settings))
         instance.__downloader__ = await instance.__load_plugin(settings)
         instance.__channel__ = await Stream.create()
-        instance.__download_channel__ = await Stream.create()
+        if instance.__DIRECT_DISPATCH__:
+            instance.__download_channel__ = await DispatchStream.create(instance.__dispatch_download, name='downloadmanager')
+        else:
+            instance.__download_channel__ = await Stream.create(name='downloadmanager', settings=settings)
         instance.__downloadermiddlewaremanager__ = await DownloaderMiddlewareManager.create(settings)
         return instance
 
@@ -71,6 +90,12 @@ class DownloadManager(object):
                downloaders[name] = await downloader.create()
 
             self.logger.debug(f'Loaded downloader: {name}.')
+        # 使用其他下载器代替指定的下载器, 例如 {'Http': 'Replay'} 回放录制的请求响应
+        for name, override in settings.get('DOWNLOADER_OVERRIDES', {}).items():
+            if override not in downloaders:
+               raise DownloaderNotFound(f'Downloader {override} overriding {name} not found!')
+            downloaders[name] = downloaders[override]
+            self.logger.debug(f'Downloader {name} is overridden by {override}.')
         return downloaders 
    
     def __select_downloader(self, downloader=None):
@@ -84,11 +109,10 @@ class DownloadManager(object):
         raise DownloaderNotFound('Downloader '+downloader+' not found!')
     
     def idle(self):
-        return self.__channel__.idle()
+        return self.__inflight__.idle()
     
     async def wait_idle(self)-> None:
-        await self.__IDLE_EVENT__.wait()
-        self.__IDLE_EVENT__.clear()
+        await self.__inflight__.wait_idle()
 
     async def acquire_pipeline_semaphor(self):
         if not self.__AVAILABLE_DOWNLOADER_PIPELINE_SEMAPHOR__:
@@ -105,7 +129,18 @@ class DownloadManager(object):
         def __(fut):
             nonlocal request
             self.release_pipeline_semaphor()
-        await self.acquire_pipeline_semaphor()
+            for receiver in self.__complete_receivers__:
+                try:
+                    receiver(request)
+                except Exception as e:
+                    self.logger.exception(e)
+            self.__inflight__.decrement()
+        self.__inflight__.increment()
+        try:
+            await self.acquire_pipeline_semaphor()
+        except BaseException:
+            self.__inflight__.decrement()
+            raise
         pipeline = Pipeline(self.download(request,downloader))
         pipeline_name = 'downloader_'+str(request.uri)
         pipeline.set_name(pipeline_name)
@@ -126,8 +161,10 @@ class DownloadManager(object):
     
     async def complete_request(self, request, spider, scraper):
         scraper.complete_request(request)
-        if self.idle():
-           self.__IDLE_EVENT__.set()
+
+    async def __emit(self, reqOrResp):
+        self.__inflight__.increment()
+        await self.__channel__.write(reqOrResp)
     
     async def download(self, request, downloader=None):
         spider = None if not request.context else request.context.spider
@@ -135,9 +172,13 @@ class DownloadManager(object):
         try:
             downloadermw_ret = await self.__downloadermiddlewaremanager__.process_request(request, spider)
             if isinstance(downloadermw_ret, Response):
-                await self.__channel__.write(downloadermw_ret) 
+                await self.__emit(downloadermw_ret) 
             elif isinstance(downloadermw_ret, Request):
-                await self.__download(downloadermw_ret, downloadermw_ret.downloader)
+                if downloadermw_ret.meta.get(Scheduler.DELAY_KEY):
+                    # 被中间件暂缓的请求(例如熔断的域名)重新进入调度器, 在调度器的延迟队列中等待, 立即释放下载并发
+                    await self.__emit(downloadermw_ret)
+                else:
+                    await self.__download(downloadermw_ret, downloadermw_ret.downloader)
             else:
                 await self.complete_request(request, spider, scraper)
         except Exception as e:
@@ -150,52 +191,59 @@ class DownloadManager(object):
         scraper = None if not request.context else request.context.scraper
         download_handler = downloader.download
         async_download_handler = ensure_asyncfunction(download_handler)
+        loop = asyncio.get_event_loop()
+        started = None
         try:
             await signal.trigger(signal.request_reached_downloader, source=downloader, object=request, wait=False)
             self.logger.debug("Downloading {request}".format(request=request))
+            started = loop.time()
             resp_stream: Stream = await async_download_handler(request)
             await signal.trigger(signal.request_left_downloader,source=downloader, object=request, wait=False)
             async for download_ret in resp_stream.read():
                 if isinstance(download_ret, Request):
-                    await self.__channel__.write(download_ret)
+                    await self.__emit(download_ret)
                     continue
                 self.logger.debug("Downloaded {request}: {response}".format(request=request, response=download_ret))
+                request.meta[self.LATENCY_KEY] = loop.time() - started
                 await signal.trigger(signal.response_downloaded, source=downloader, object=download_ret, wait=False)
                 downloadermiddleware_ret = await self.__downloadermiddlewaremanager__.process_response(request, download_ret, spider)
                 if isinstance(downloadermiddleware_ret, Request) or isinstance(downloadermiddleware_ret, Response):
-                    await self.__channel__.write(downloadermiddleware_ret)
+                    await self.__emit(downloadermiddleware_ret)
             request.set_state(request.States.download)
             try:
                 close_ret = await self.process_close(request, spider, scraper)
                 if isinstance(close_ret, Request) :
-                    await self.__channel__.write(close_ret)
+                    await self.__emit(close_ret)
                     await self.complete_request(request, spider, scraper)
                 elif isinstance(close_ret, Response):
-                    await self.__channel__.write(close_ret)
+                    await self.__emit(close_ret)
                 else:
                     if isinstance(request, (WebSocketRequest, SocketRequest)):
                        await self.complete_request(request, spider ,scraper)
             except Exception as e:
                 downloadermiddleware_ret = await self.__downloadermiddlewaremanager__.process_exception(request, e, spider)
                 if isinstance(downloadermiddleware_ret, Request) or isinstance(downloadermiddleware_ret, Response):
-                    await self.__channel__.write(downloadermiddleware_ret)
+                    await self.__emit(downloadermiddleware_ret)
                 else:
                     await self.complete_request(request, spider, scraper)
         except Exception as e:
+            if started is not None:
+               request.meta[self.LATENCY_KEY] = loop.time() - started
+            await signal.trigger(signal.request_failed, source=downloader, object=request, wait=False)
             downloadermiddleware_ret = await self.__downloadermiddlewaremanager__.process_exception(request, e, spider)
             if isinstance(downloadermiddleware_ret, Request) or isinstance(downloadermiddleware_ret, Response):
-                await self.__channel__.write(downloadermiddleware_ret)
+                await self.__emit(downloadermiddleware_ret)
             else:
                 await self.complete_request(request, spider, scraper)
     
     async def __process_downloads(self):
-        downloading_pipelines = []
         async with self.__download_channel__.read() as reader:
               async for download_pipeline in reader:
-                    downloading_pipeline = asyncio.ensure_future(download_pipeline)
-                    downloading_pipelines.append(downloading_pipeline)
-                    downloading_pipelines = [ pipeline for pipeline in downloading_pipelines if not pipeline.done()]
-        await asyncio.gather(*downloading_pipelines)
+                    self.__pipelines__.add(download_pipeline)
+        await self.__pipelines__.wait()
+
+    def __dispatch_download(self, download_pipeline):
+        self.__pipelines__.add(download_pipeline)
 
 
     async def start(self):
@@ -211,28 +259,40 @@ class DownloadManager(object):
     def add_channel_receiver(self, receiver):
         self.__channel_receivers__.append(receiver)
 
+    def add_complete_receiver(self, receiver: Callable):
+        """添加请求下载完成的回调, 请求的下载流程结束(无论成功或者失败)后会以请求为参数同步调用该回调
+
+        Args:
+            receiver (Callable): 回调函数
+        """
+        self.__complete_receivers__.append(receiver)
+
     async def __process_channel(self):
         async with self.__channel__.read() as reader:
-            async for item in reader:
-                try:
-                    await asyncio.gather(*[receiver(item) for receiver in self.__channel_receivers__])
-                except Exception as e:
-                    self.logger.exception(e)
-                finally:
-                    if self.idle():
-                        self.__IDLE_EVENT__.set()
+            while True:
+                items = await reader.read_batch(self.__CHANNEL_BATCH_SIZE__, self.__CHANNEL_BATCH_WAIT__)
+                if not items:
+                    break
+                for item in items:
+                    try:
+                        await asyncio.gather(*[receiver(item) for receiver in self.__channel_receivers__])
+                    except Exception as e:
+                        self.logger.exception(e)
+                    finally:
+                        self.__inflight__.decrement()
 
     async def close(self):
         if self.__closed__:
             return
         self.__closed__ = True
-        self.__IDLE_EVENT__.set()
+        self.__inflight__.close()
         await self.__channel__.join()
         await self.__channel__.close()
         await self.__download_channel__.join()
         await self.__download_channel__.close()
         acloses = []
-        for d in self.__downloader__.values():
+        # 被代替的下载器和代替它的下载器是同一个实例, 只关闭一次
+        for d in {id(d): d for d in self.__downloader__.values()}.values():
             close = ensure_asyncfunction(d.close)
             acloses.append(close())
         try:
@@ -240,5 +300,6 @@ class DownloadManager(object):
                 await asyncio.gather(*acloses)
         except Exception as e:
             self.logger.exception(e)
+        await dns.get_dnscache().close()
         await self.__downloadermiddlewaremanager__.close()
         self.logger.debug('DownloaderManager being closed.')
@@ -0,0 +1,54 @@
+from abc import ABC, abstractclassmethod, abstractmethod
+from araneid.core.request import Request
+
+
+class DupeFilter(ABC):
+    """请求去重过滤器接口, 所有的去重过滤器都必须实现该接口
+
+    通过配置 ``DUPEFILTER`` 指定启用的去重过滤器插件名字, 启用后 :py:obj:`~araneid.scraper.Scraper` 在处理请求时会丢弃重复的请求,
+    ``meta`` 中设置了 ``dont_filter`` 的请求不会被过滤. 配置 ``DUPEFILTER_HEADERS`` 可以指定参与计算请求指纹的请求头.
+    """
+
+    def __init__(self, include_headers=None):
+        self.include_headers = include_headers
+
+    @abstractclassmethod
+    async def create(cls, settings=None):
+        raise NotImplementedError
+
+    def fingerprint(self, request: Request) -> bytes:
+        return request.get_fingerprint(self.include_headers)
+
+    def request_seen(self, request: Request) -> bool:
+        """检查请求是否重复, 并记录请求指纹
+
+        Args:
+            request (Request): 请求对象
+
+        Returns:
+            bool: 请求重复时返回 ``True``
+        """
+        return not self.add(self.fingerprint(request))
+
+    @abstractmethod
+    def add(self, fingerprint: bytes) -> bool:
+        """记录请求指纹
+
+        Args:
+            fingerprint (bytes): 请求指纹
+
+        Returns:
+            bool: 指纹之前没有被记录过时返回 ``True``
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def __contains__(self, fingerprint: bytes) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
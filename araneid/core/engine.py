@@ -3,7 +3,7 @@ import asyncio
 from asyncio.tasks import FIRST_COMPLETED
 from contextlib import suppress
 from inspect import iscoroutine
-from typing import List, AnyStr
+from typing import List, AnyStr, Optional
 from araneid.setting import settings as settings_loader  
 from araneid.core.signal import SignalManager, SignalManagerInvalidState
 from .request import Request
@@ -12,7 +12,9 @@ from .downloadmanager  import DownloadManager
 from .slot import Slot
 from .slotmanager import SlotManager
 from .schedulemanager import ScheduleManager
+from .throttle import Throttle
 from .flags import Idle
+from .exception import ConfigError
 from . import plugin
 from . import signal 
 
@@ -29,7 +31,7 @@ class Engine(object):
     引擎主要负责这些组件的协调工作, 以及组件和组件之前的通信.
 
     """
-    __slots__ = ['settings', 'logger', '__downloadmanager__', '__signalmanager__', '__slotmanager__', '__schedulemanager__', '__extensionmanager__', '__stop', '__running_tasks', '__idle_status', '__idle_events']
+    __slots__ = ['settings', 'logger', '__downloadmanager__', '__signalmanager__', '__slotmanager__', '__schedulemanager__', '__extensionmanager__', '__stop', '__running_tasks', '__idle_status', '__idle_events', '__dispatch']
 
     def __init__(self, settings: dict=None):
         # make sure logger of engine init after CliRunner
@@ -48,12 +50,18 @@ class Engine(object):
     async def create(cls, settings=None):
         settings = settings if settings is not None else settings_loader
         instance = cls.from_settings(settings=settings)
+        """请求分发模式: channel - 组件之间通过Stream中转, direct - 调度器直接将请求分发给下载器管理器, 响应直接返回Slot
+        """
+        instance.__dispatch = settings.get('ENGINE_DISPATCH', 'channel')
+        if instance.__dispatch not in ('channel', 'direct'):
+            raise ConfigError(f"Invalid ENGINE_DISPATCH: {instance.__dispatch}, expected 'channel' or 'direct'.")
         """初始化请求调度器管理器
         """
         instance.__schedulemanager__ = await ScheduleManager.create(instance.settings)
         """初始化下载器管理器
         """
         instance.__downloadmanager__ = await DownloadManager.create(instance.settings)
+        instance.__downloadmanager__.add_complete_receiver(instance.__schedulemanager__.release_request)
         """初始化信号管理器
         """
         instance.logger.debug("SignalManager init.")
@@ -87,6 +95,11 @@ class Engine(object):
         return engine
     
 
+    @property
+    def throttle(self) -> Optional[Throttle]:
+        """请求调度器的调度闸门, 没有启用时为 ``None`` (参考 :py:attr:`~araneid.core.schedulemanager.ScheduleManager.throttle` )"""
+        return self.__schedulemanager__.throttle
+
     def idle(self, flag: Idle=Idle.DOWNLOADERMANAGER | Idle.SIGNALMANAGER | Idle.SLOTMANAGER| Idle.SCHEDULEMANAGER) -> bool:
         """检测引擎的是否空闲
 
@@ -182,7 +195,10 @@ class Engine(object):
         """启动下载管理器
         """
         async def __receiver(reqOrRsp):
-            if isinstance(reqOrRsp, Response) and not reqOrRsp.in_state(reqOrRsp.States.schedule):
+            if isinstance(reqOrRsp, Response) and not reqOrRsp.in_state(reqOrRsp.States.schedule) and self.__dispatch == 'direct':
+               reqOrRsp.set_state(reqOrRsp.States.schedule)
+               await self.__slotmanager__.put_response(reqOrRsp)
+            elif isinstance(reqOrRsp, Response) and not reqOrRsp.in_state(reqOrRsp.States.schedule):
                await self.__schedulemanager__.add_response(reqOrRsp)
             elif isinstance(reqOrRsp, Request) and not reqOrRsp.in_state(reqOrRsp.States.schedule):
                await self.__schedulemanager__.add_request(reqOrRsp)
@@ -97,6 +97,17 @@ class HttpRequestProxyError(RequestException):
     def __str__(self):
         return 'HttpRequest {request} proxy failed ( exception: {exception}) ! '.format(request=self.__request__,  exception=self.__exception__)
 
+class StopDownload(Exception):
+    """在 ``bytes_received`` 信号处理器中抛出, 停止下载请求响应. ``fail`` 为 ``False`` 时已经接收的内容作为请求响应返回, 否则作为下载异常处理
+    """
+
+    def __init__(self, fail=True) -> None:
+        super().__init__()
+        self.fail = fail
+
+    def __str__(self):
+        return f'Download stopped by signal handler (fail: {self.fail})'
+
 class PluginError(Exception):
     pass
 
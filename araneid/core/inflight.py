@@ -0,0 +1,126 @@
+import asyncio
+from asyncio import Future
+from asyncio.locks import Event
+from typing import Awaitable, Iterator, Set
+
+
+class InFlight(object):
+    """在途计数器, 记录组件中还未处理完成的请求和请求响应的数量.
+
+    计数在请求和请求响应状态转换的时候增减, 只有在计数归零的时候才设置空闲事件, 因此 :py:meth:`idle` 和 :py:meth:`wait_idle` 的开销都是O(1)的.
+    计数器可以挂载到上级计数器 (例如Slot的计数器挂载到SlotManager的计数器), 计数的增减会同步到上级计数器.
+    """
+    __slots__ = ['__count', '__parent', '__closed', '__idle_event']
+
+    def __init__(self, parent=None):
+        self.__count = 0
+        self.__parent = None
+        self.__closed = False
+        self.__idle_event = Event()
+        self.__idle_event.set()
+        if parent is not None:
+           self.attach(parent)
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    def increment(self, n: int=1) -> None:
+        if self.__closed:
+           return
+        self.__count += n
+        self.__idle_event.clear()
+        if self.__parent is not None:
+           self.__parent.increment(n)
+
+    def decrement(self, n: int=1) -> None:
+        if self.__closed:
+           return
+        assert self.__count >= n, "Count cannot go below zero"
+        self.__count -= n
+        if self.__count == 0:
+           self.__idle_event.set()
+        if self.__parent is not None:
+           self.__parent.decrement(n)
+
+    def attach(self, parent: 'InFlight') -> None:
+        """挂载到上级计数器, 当前的计数会同步到上级计数器
+
+        Args:
+            parent (InFlight): 上级计数器
+        """
+        assert self.__parent is None, "InFlight has been attached"
+        self.__parent = parent
+        if self.__count:
+           parent.increment(self.__count)
+
+    def detach(self) -> None:
+        """从上级计数器卸载, 当前的计数会从上级计数器中扣除
+        """
+        parent, self.__parent = self.__parent, None
+        if parent is not None and self.__count:
+           parent.decrement(self.__count)
+
+    def idle(self) -> bool:
+        return self.__closed or self.__count == 0
+
+    async def wait_idle(self) -> None:
+        await self.__idle_event.wait()
+
+    def close(self) -> None:
+        """关闭计数器, 关闭后计数不再变化, 并唤醒所有等待空闲的协程
+        """
+        if self.__closed:
+           return
+        self.detach()
+        self.__closed = True
+        self.__idle_event.set()
+
+
+class InFlightTasks(object):
+    """在途任务集合, 记录组件中正在运行的任务(例如下载和解析的Pipeline).
+
+    任务完成时通过回调从集合中移除, 添加和移除的开销都是O(1)的, 代替每次添加任务时遍历列表过滤已完成的任务.
+    集合的大小由组件的并发信号量(例如 ``MAX_DOWNLOADER_PROCESSES`` )限制, 任务在获取信号量之后才会加入集合.
+    """
+    __slots__ = ['__tasks']
+
+    def __init__(self):
+        self.__tasks: Set[Future] = set()
+
+    def add(self, task: Awaitable) -> Future:
+        """添加任务, 协程会被包装成任务
+
+        Args:
+            task (Awaitable): 任务或者协程
+
+        Returns:
+            Future: 添加的任务
+        """
+        task = asyncio.ensure_future(task)
+        if not task.done():
+           self.__tasks.add(task)
+           task.add_done_callback(self.__tasks.discard)
+        return task
+
+    def __len__(self) -> int:
+        return len(self.__tasks)
+
+    def __iter__(self) -> Iterator[Future]:
+        return iter(list(self.__tasks))
+
+    def __contains__(self, task) -> bool:
+        return task in self.__tasks
+
+    async def wait(self, return_exceptions: bool=False) -> None:
+        """等待所有任务完成, 包括等待期间新添加的任务
+
+        Args:
+            return_exceptions (bool, optional): 为 ``False`` 时任务的异常会被抛出. 默认为: False
+        """
+        while self.__tasks:
+            await asyncio.gather(*self.__tasks, return_exceptions=return_exceptions)
+
+    def cancel(self) -> None:
+        for task in list(self.__tasks):
+            task.cancel()
@@ -0,0 +1,366 @@
+import io
+import os
+import pickle
+import struct
+import asyncio
+import logging
+from asyncio.locks import Event
+from araneid.core.request import Request
+from araneid.core.exception import NotConfigured
+from araneid.core.persistence import RequestPickler, RequestUnpickler
+from araneid.spider.spider import Spider
+from araneid.stats import Stats
+from araneid.util._async import CountdownLatch
+
+
+class JobRequestPickler(RequestPickler):
+    """任务目录请求序列化器, 爬虫和Scraper写入为 ``('spider', name)`` 和 ``('scraper',)`` 引用标记, 在新进程中读回时重新绑定,
+    解析器和请求初始化器按照路由名写入(参考 :py:obj:`~araneid.core.persistence.RequestPickler` ).
+
+    ``meta`` 中的上一个请求、同步计数器、状态等待事件等只在当前进程中有意义的对象写入为 ``('discard',)`` , 读回时为 ``None`` .
+    """
+    DISCARDED_TYPES = (Request, CountdownLatch, Event)
+
+    def reference(self, obj):
+        if isinstance(obj, Spider):
+           return ('spider', obj.name)
+        if obj is getattr(self.request.context, 'scraper', None):
+           return ('scraper',)
+        if isinstance(obj, self.DISCARDED_TYPES) or obj is self.request.slot:
+           return ('discard',)
+        return None
+
+
+class JobRequestUnpickler(RequestUnpickler):
+
+    def __init__(self, file, spider, scraper):
+        super().__init__(file)
+        self.__spider = spider
+        self.__scraper = scraper
+
+    def dereference(self, pid):
+        kind = pid[0]
+        if kind == 'spider':
+           return self.__spider
+        if kind == 'scraper':
+           return self.__scraper
+        if kind == 'discard':
+           return None
+        return super().dereference(pid)
+
+
+class JobDir(object):
+    """任务目录, 通过 ``JOBDIR`` 配置启用, 将待处理的请求、已见过的请求指纹以及爬虫统计信息持久化到本地目录, 进程被杀死后重新启动时从目录中恢复抓取.
+
+    所有变更以追加的方式写入 ``requests.log`` , 每条记录为长度前缀加上pickle序列化的数据:
+
+    * ``('request', fingerprint, spider, payload)`` : 进入 :py:obj:`~araneid.scraper.Scraper` 的请求
+    * ``('complete', fingerprint)`` : 完成的请求
+    * ``('seen', [fingerprint, ...])`` : 已完成请求的指纹, 仅由压缩生成
+    * ``('stats', spider, stats)`` : 爬虫统计信息
+
+    记录先写入缓冲区, 每 ``JOBDIR_FLUSH_COUNT`` 条(默认为: 1000)或者写入后 ``JOBDIR_FLUSH_INTERVAL`` 秒(默认为: 1)写入文件, 进程被杀死时最多丢失最近一秒的记录,
+    丢失的待处理请求在恢复抓取时由爬虫重新生成. 压缩和关闭任务目录时总是先写入缓冲区中的记录.
+
+    请求指纹和去重过滤器一样由 ``DUPEFILTER_HEADERS`` 指定的请求头参与计算. 已完成请求产生的无用记录超过 ``JOBDIR_COMPACT_INTERVAL`` 条时, 日志会被压缩为只包含待处理请求、已见指纹以及最新统计信息的新日志.
+
+    任务目录本身不过滤请求, 只有配置了 ``DUPEFILTER`` 时才会丢弃重复的请求: 恢复抓取时 :py:obj:`~araneid.scraper.Scraper` 用任务目录中已完成请求的指纹
+    初始化去重过滤器(参考 :py:meth:`seen_fingerprints` ), 上次运行已经完成的请求不会被重新抓取. 没有配置 ``DUPEFILTER`` 时只恢复待处理的请求, 爬虫重新生成的请求都会被抓取.
+    """
+    logger = None
+    LOG_NAME = 'requests.log'
+    RECORD_HEADER = struct.Struct('>I')
+    SEEN_BATCH_SIZE = 10000
+    BUFFER_SIZE = 1024*1024
+
+    def __init__(self, directory, compact_interval=100000, include_headers=None, flush_count=1000, flush_interval=1):
+        self.logger = logging.getLogger(__name__)
+        self.__directory = directory
+        self.__compact_interval = compact_interval
+        self.__flush_count = flush_count
+        self.__flush_interval = flush_interval
+        self.__unflushed = 0
+        self.__flush_timer = None
+        self.include_headers = include_headers
+        self.__seen = set()
+        self.__pending = {}
+        # 指纹相同的多个待处理请求, 第一个保存在 __pending 中
+        self.__duplicates = {}
+        self.__resuming = {}
+        self.__stats = {}
+        self.__spiders = {}
+        self.__garbage = 0
+        self.__log = None
+        self.__closed = False
+
+    @classmethod
+    def from_settings(cls, settings):
+        directory = settings.get('JOBDIR', None) if settings is not None else None
+        if not directory:
+           raise NotConfigured(f"{cls.__name__} must be enabled by JOBDIR setting.")
+        return cls(directory, compact_interval=settings.get('JOBDIR_COMPACT_INTERVAL', 100000), include_headers=settings.get('DUPEFILTER_HEADERS', None),
+                   flush_count=settings.get('JOBDIR_FLUSH_COUNT', 1000), flush_interval=settings.get('JOBDIR_FLUSH_INTERVAL', 1))
+
+    @classmethod
+    async def create(cls, settings=None):
+        instance = cls.from_settings(settings)
+        instance.open()
+        return instance
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    @property
+    def log_path(self):
+        return os.path.join(self.__directory, self.LOG_NAME)
+
+    def pending(self, spider=None):
+        if spider is None:
+           return len(self.__pending) + sum(len(entries) for entries in self.__duplicates.values())
+        return sum(1 for _, (_, _, spider_name) in self.__pending_entries() if spider_name == spider.name)
+
+    def seen(self, request):
+        return request.get_fingerprint(self.include_headers) in self.__seen
+
+    def seen_fingerprints(self):
+        """已完成的请求的指纹, 用于初始化去重过滤器
+
+        Returns:
+            Iterator[bytes]: 请求指纹
+        """
+        return (fingerprint for fingerprint in self.__seen if fingerprint not in self.__pending)
+
+    def __pending_entries(self):
+        yield from self.__pending.items()
+        for fingerprint, entries in self.__duplicates.items():
+            for entry in entries:
+                yield fingerprint, entry
+
+    def __add_pending(self, pending, duplicates, fingerprint, entry):
+        if fingerprint in pending:
+           duplicates.setdefault(fingerprint, []).append(entry)
+        else:
+           pending[fingerprint] = entry
+
+    def __pop_pending(self, fingerprint):
+        entries = self.__duplicates.get(fingerprint)
+        if entries:
+           entry = entries.pop()
+           if not entries:
+              del self.__duplicates[fingerprint]
+           return entry
+        return self.__pending.pop(fingerprint, None)
+
+    def open(self):
+        os.makedirs(self.__directory, exist_ok=True)
+        if os.path.exists(self.log_path):
+           self.__replay()
+        self.__log = open(self.log_path, 'ab', buffering=self.BUFFER_SIZE)
+        if self.__pending or self.__seen:
+           self.logger.info(f'Resume from job directory {self.__directory}: {self.pending()} pending requests, {len(self.__seen)} seen requests.')
+
+    def __read_record(self, log):
+        header = log.read(self.RECORD_HEADER.size)
+        if not header:
+           raise EOFError
+        if len(header) < self.RECORD_HEADER.size:
+           raise pickle.UnpicklingError('torn record header')
+        record_size, = self.RECORD_HEADER.unpack(header)
+        body = log.read(record_size)
+        if len(body) < record_size:
+           raise pickle.UnpicklingError('torn record body')
+        try:
+            record = pickle.loads(body)
+        except Exception as e:
+            raise pickle.UnpicklingError('corrupted record') from e
+        return record, self.RECORD_HEADER.size+record_size
+
+    def __replay(self):
+        with open(self.log_path, 'rb') as log:
+            while True:
+                offset = log.tell()
+                try:
+                    record, size = self.__read_record(log)
+                except EOFError:
+                    return
+                except Exception:
+                    break
+                kind = record[0]
+                if kind == 'request':
+                   _, fingerprint, spider_name, _ = record
+                   self.__seen.add(fingerprint)
+                   self.__add_pending(self.__pending, self.__duplicates, fingerprint, (offset, size, spider_name))
+                elif kind == 'complete':
+                   if self.__pop_pending(record[1]) is not None:
+                      self.__garbage += 2
+                elif kind == 'seen':
+                   self.__seen.update(record[1])
+                elif kind == 'stats':
+                   self.__stats[record[1]] = record[2]
+        self.logger.warning(f'Truncate torn record at offset {offset} of {self.log_path}.')
+        with open(self.log_path, 'r+b') as log:
+            log.truncate(offset)
+
+    def __append(self, record):
+        body = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        offset = self.__log.tell()
+        self.__log.write(self.RECORD_HEADER.pack(len(body)))
+        self.__log.write(body)
+        self.__unflushed += 1
+        if self.__unflushed >= self.__flush_count:
+           self.flush()
+        elif self.__flush_timer is None:
+           self.__schedule_flush()
+        return offset, self.RECORD_HEADER.size+len(body)
+
+    def __schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中时没有定时器, 立即写入文件
+            self.flush()
+            return
+        self.__flush_timer = loop.call_later(self.__flush_interval, self.flush)
+
+    def flush(self):
+        """将缓冲区中的记录写入文件"""
+        if self.__flush_timer is not None:
+           self.__flush_timer.cancel()
+           self.__flush_timer = None
+        self.__unflushed = 0
+        self.__log.flush()
+
+    def record_request(self, request):
+        """记录进入Scraper的请求, 从任务目录中恢复的请求不会被重复记录
+
+        Args:
+            request (Request): 请求对象
+        """
+        fingerprint = request.get_fingerprint(self.include_headers)
+        resuming = self.__resuming.get(fingerprint, 0)
+        if resuming:
+           if resuming > 1:
+              self.__resuming[fingerprint] = resuming - 1
+           else:
+              del self.__resuming[fingerprint]
+           return
+        self.__seen.add(fingerprint)
+        spider = request.context.spider if request.context else None
+        if self.__closed or not isinstance(spider, Spider):
+           return
+        try:
+            payload = io.BytesIO()
+            JobRequestPickler(payload).dump_request(request)
+        except Exception as e:
+            self.logger.warning(f'{request} can\'t be persisted into job directory {self.__directory}: {e}')
+            return
+        offset, size = self.__append(('request', fingerprint, spider.name, payload.getvalue()))
+        self.__add_pending(self.__pending, self.__duplicates, fingerprint, (offset, size, spider.name))
+
+    def complete_request(self, request):
+        """记录完成的请求
+
+        Args:
+            request (Request): 请求对象
+        """
+        if self.__closed:
+           return
+        fingerprint = request.get_fingerprint(self.include_headers)
+        if self.__pop_pending(fingerprint) is None:
+           return
+        self.__append(('complete', fingerprint))
+        self.__garbage += 2
+        if self.__garbage >= self.__compact_interval:
+           self.compact()
+
+    def pending_requests(self, spider, scraper):
+        """读回爬虫待处理的请求
+
+        Args:
+            spider (Spider): 爬虫实例
+            scraper (Scraper): 读回的请求所属的Scraper
+
+        Yields:
+            Request: 待处理的请求, 状态已被重置
+        """
+        self.flush()
+        pendings = sorted((offset, size, fingerprint) for fingerprint, (offset, size, spider_name) in self.__pending_entries() if spider_name == spider.name)
+        with open(self.log_path, 'rb') as log:
+            for offset, size, fingerprint in pendings:
+                log.seek(offset+self.RECORD_HEADER.size)
+                _, _, _, payload = pickle.loads(log.read(size-self.RECORD_HEADER.size))
+                try:
+                    request = JobRequestUnpickler(io.BytesIO(payload), spider, scraper).load()
+                except Exception as e:
+                    self.logger.warning(f'Failed to resume request {fingerprint.hex()} of spider {spider.name} from job directory {self.__directory}: {e}')
+                    continue
+                request.__waiters__ = None
+                request.clear_states()
+                request.set_completed(False)
+                self.__resuming[fingerprint] = self.__resuming.get(fingerprint, 0) + 1
+                yield request
+
+    def restore_stats(self, spider):
+        """恢复爬虫统计信息, 并在压缩以及关闭时保存该爬虫的统计信息
+
+        Args:
+            spider (Spider): 爬虫实例
+        """
+        self.__spiders[spider.name] = spider
+        stats = self.__stats.get(spider.name, None)
+        if stats is not None:
+           spider.stats.set_stats(Stats.from_dict(stats), spider=spider)
+
+    def __dump_stats(self):
+        records = []
+        for spider_name, spider in self.__spiders.items():
+            stats = dict(spider.stats.get_stats(spider).to_dict())
+            try:
+                pickle.dumps(stats)
+            except Exception as e:
+                self.logger.warning(f'Stats of spider {spider_name} can\'t be persisted into job directory {self.__directory}: {e}')
+                continue
+            self.__stats[spider_name] = stats
+            records.append(('stats', spider_name, stats))
+        return records
+
+    def compact(self):
+        """压缩任务日志, 只保留待处理请求、已见指纹以及最新统计信息"""
+        self.flush()
+        compact_path = self.log_path+'.compact'
+        pending, duplicates = {}, {}
+        with open(self.log_path, 'rb') as log, open(compact_path, 'wb') as compact_log:
+            def write(body):
+                offset = compact_log.tell()
+                compact_log.write(self.RECORD_HEADER.pack(len(body)))
+                compact_log.write(body)
+                return offset, self.RECORD_HEADER.size+len(body)
+            seen = [fingerprint for fingerprint in self.__seen if fingerprint not in self.__pending]
+            for start in range(0, len(seen), self.SEEN_BATCH_SIZE):
+                write(pickle.dumps(('seen', seen[start:start+self.SEEN_BATCH_SIZE]), protocol=pickle.HIGHEST_PROTOCOL))
+            for fingerprint, (offset, size, spider_name) in sorted(self.__pending_entries(), key=lambda item: item[1][0]):
+                log.seek(offset+self.RECORD_HEADER.size)
+                new_offset, _ = write(log.read(size-self.RECORD_HEADER.size))
+                self.__add_pending(pending, duplicates, fingerprint, (new_offset, size, spider_name))
+            for record in self.__dump_stats():
+                write(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+            compact_log.flush()
+            os.fsync(compact_log.fileno())
+        self.__log.close()
+        os.replace(compact_path, self.log_path)
+        self.__log = open(self.log_path, 'ab', buffering=self.BUFFER_SIZE)
+        self.__pending = pending
+        self.__duplicates = duplicates
+        self.__garbage = 0
+        self.logger.debug(f'Compacted job directory {self.__directory}: {self.pending()} pending requests, {len(self.__seen)} seen requests.')
+
+    def close(self):
+        if self.__closed:
+           return
+        self.__closed = True
+        for record in self.__dump_stats():
+            self.__append(record)
+        self.flush()
+        self.__log.close()
+        self.logger.debug(f'{self.__class__.__name__} {self.__directory} closed')
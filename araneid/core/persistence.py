@@ -0,0 +1,72 @@
+import pickle
+from araneid.core.request import Meta
+from araneid.core.context import RequestContext
+from araneid.spider.parser import Parser
+from araneid.spider.starter import Starter
+
+# 按值写入的类型, ``persistent_id`` 对每个对象都会被调用, 这些类型直接跳过
+VALUE_TYPES = frozenset([str, int, float, bool, bytes, type(None), tuple, list, dict, set, frozenset, Meta, RequestContext])
+
+
+class RequestPickler(pickle.Pickler):
+    """请求序列化器基类, 用于将请求持久化到磁盘(参考 :py:obj:`~araneid.scheduler.disk.DiskScheduler` 和 :py:obj:`~araneid.core.jobdir.JobDir` ).
+
+    请求以及可以序列化的对象按值写入, 只在当前进程中有意义的对象通过 ``persistent_id`` 写入为引用标记, 读回时由 :py:obj:`RequestUnpickler` 的 ``persistent_load`` 还原:
+
+    * 解析器和请求初始化器写入为 ``('parser' | 'starter', <Scraper的引用标记>, <路由名>)`` , 读回时通过Scraper的 :py:obj:`~araneid.spider.routermanager.RouterManager` 重新路由
+    * 其他对象的引用标记由子类的 :py:meth:`reference` 决定
+    """
+    def __init__(self, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.request = None
+
+    def dump_request(self, request):
+        self.request = request
+        try:
+            self.dump(request)
+        finally:
+            self.request = None
+            self.clear_memo()
+
+    def persistent_id(self, obj):
+        if type(obj) in VALUE_TYPES:
+           return None
+        if obj is self.request or isinstance(obj, type):
+           return None
+        if isinstance(obj, (Parser, Starter)):
+           context = self.request.context
+           spider = getattr(context, 'spider', None)
+           scraper = getattr(context, 'scraper', None)
+           if spider is not None and getattr(scraper, '__routemanager__', None) is not None:
+              kind = 'parser' if isinstance(obj, Parser) else 'starter'
+              return (kind, self.reference(scraper), f'{kind}.{spider.name}.{obj.name}')
+        return self.reference(obj)
+
+    def reference(self, obj):
+        """返回对象的引用标记, 返回 ``None`` 时对象按值写入
+
+        Args:
+            obj (Any): 请求引用的对象
+
+        Returns:
+            Optional[tuple]: 引用标记, 第一个元素为标记类型
+        """
+        return None
+
+
+class RequestUnpickler(pickle.Unpickler):
+    """请求反序列化器基类, 还原 :py:obj:`RequestPickler` 写入的引用标记, 子类通过 :py:meth:`dereference` 还原自己的引用标记"""
+
+    def persistent_load(self, pid):
+        kind = pid[0]
+        if kind in ('parser', 'starter'):
+           scraper = self.persistent_load(pid[1])
+           route = scraper.__routemanager__.parser_route if kind == 'parser' else scraper.__routemanager__.starter_route
+           target = route([pid[2]])
+           if target is None:
+              raise pickle.UnpicklingError(f'Route {pid[2]} not found while loading request.')
+           return target
+        return self.dereference(pid)
+
+    def dereference(self, pid):
+        raise pickle.UnpicklingError(f'Unsupported persistent id {pid!r}.')
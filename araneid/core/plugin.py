@@ -21,6 +21,7 @@ class PluginType(Enum):
     DOWNLOADMIDDLEWARE = 'araneid.downloadmiddleware'
     SPIDERMIDDLEWARE  = 'araneid.spidermiddleware'
     EXTENSION = 'araneid.extension'
+    DUPEFILTER = 'araneid.dupefilter'
     SETTING = 'araneid.setting'
     SCRIPT = 'araneid.script'
     RUNNER = 'araneid.runner'
@@ -114,7 +115,7 @@ def __load_entry_points(plugin_type: PluginType):
     return [ PluginEntry.from_entrypoint(entrypoint) for entrypoint in  eps]
 
 def __load_register_plugins(plugin_type: PluginType):
-    return list(filter(lambda plugin: plugin.group  == plugin_type, registered_plugins))
+    return list(filter(lambda plugin: plugin.group  == plugin_type.value, registered_plugins))
 
 def list_active_plugins(plugin_types: List[PluginType] = None):
     assert plugin_types is None or isinstance(plugin_types, list)
@@ -15,8 +15,11 @@ import logging
 from araneid import core as interface
 from araneid.state import State, States
 from .context import RequestContext
+from araneid.util.fingerprint import request_fingerprint
 
 class Meta:
+    __slots__ = ['name', '__meta__']
+
     def __init__(self, key=None, value=None, name=None) -> None:
         if name == None:
            self.name = f'{self.__class__.__name__}_{id(self)}'
@@ -83,7 +86,7 @@ class Request(interface.Slotable, State):
     Args:
         interface (interface.Slotable) 
     """
-    __slots__ = ['__downloader__', '__max_retries__', '__meta__', '__uri__', '__odata__', 'retries']
+    __slots__ = ['__downloader__', '__max_retries__', '__meta__', '__uri__', '__odata__', '__timeout__', '__state__', '__waiters__', '__fingerprint__', 'retries', 'priority']
     States = RequestStates
     logger = None
 
@@ -102,6 +105,11 @@ class Request(interface.Slotable, State):
     @property
     def uri(self):
         return self.__uri__
+
+    @uri.setter
+    def uri(self, uri):
+        self.__uri__ = uri
+        self.__fingerprint__ = None
     
     @property
     def url(self):
@@ -139,8 +147,32 @@ class Request(interface.Slotable, State):
     def timeout(self):
         return self.__timeout__
 
+    @property
+    def fingerprint(self) -> bytes:
+        """不包含请求头的请求指纹, 参考 :py:meth:`get_fingerprint`"""
+        return self.get_fingerprint()
+
+    def get_fingerprint(self, include_headers=None) -> bytes:
+        """计算请求指纹(参考 :py:func:`~araneid.util.fingerprint.request_fingerprint` ), 去重过滤器、任务目录、Http缓存等都通过该方法获取请求指纹.
+
+        指纹按照 ``include_headers`` 缓存, 修改请求地址、请求方法、请求体或者请求头之后重新计算.
+
+        Args:
+            include_headers (List[str], optional): 参与计算指纹的请求头名字, 不区分大小写. 默认为: None
+
+        Returns:
+            bytes: 请求指纹
+        """
+        key = tuple(include_headers) if include_headers else ()
+        if self.__fingerprint__ is None:
+           self.__fingerprint__ = {}
+        fingerprint = self.__fingerprint__.get(key, None)
+        if fingerprint is None:
+           fingerprint = self.__fingerprint__[key] = request_fingerprint(self, include_headers=key)
+        return fingerprint
+
 
-    def __init__(self, uri: str, max_retries: int=0, downloader=[], attach=None, meta=None, context=None, timeout=None):
+    def __init__(self, uri: str, max_retries: int=0, downloader=[], attach=None, meta=None, context=None, timeout=None, priority: int=0):
         """构造器
 
         Args:
@@ -151,6 +183,7 @@ class Request(interface.Slotable, State):
             meta ([type], optional): [description]. Defaults to None.
             context ([type], optional): [description]. Defaults to None.
             timeout ([type], optional): [description]. Defaults to None.
+            priority (int, optional): 请求优先级, 值越大越先被调度, 需要调度器支持 (例如 :py:obj:`~araneid.scheduler.priority.PriorityScheduler` ). Defaults to 0.
         """
         interface.Slotable.__init__(self)
         State.__init__(self)
@@ -164,15 +197,19 @@ class Request(interface.Slotable, State):
            self.__meta__.update(meta)
         self.__meta__ = Meta(name='default') if meta is None else meta
         self.__timeout__ = timeout
+        self.__fingerprint__ = None
         self.context = context
         if attach:
            self.__odata__['attach'] = attach
         self.retries = 0
+        self.priority = priority
     
     @classmethod
     def from_request(cls, request):
-        props ={name: getattr(request, name) for name in  dir(request) if not name.startswith('__')} 
-        return cls(**props)
+        props ={name: getattr(request, name) for name in  dir(request) if not name.startswith('__') and name != 'fingerprint'} 
+        instance = cls(**props)
+        instance.__fingerprint__ = dict(request.__fingerprint__) if request.__fingerprint__ else None
+        return instance
 
     def __str__(self):
         return 'Request<url={url}>'.format(url=self.url)
@@ -28,8 +28,8 @@ class Response(interface.Slotable, State):
         @class: Response
         @desc:  Abstract response class of downloader
     """
-    logger = None
-    __slots__ = ['__content__', '__request__', '__odata__', 'encoding']
+    logger = logging.getLogger(__name__)
+    __slots__ = ['__content__', '__request__', '__odata__', '__state__', '__waiters__', 'encoding']
     States = ResponseStates
 
     @property
@@ -40,7 +40,6 @@ class Response(interface.Slotable, State):
         return self.__request__
 
     def __init__(self, content=None, encoding='UTF-8'):
-        self.logger = logging.getLogger(__name__)
         interface.Slotable.__init__(self)
         State.__init__(self)
         self.__odata__ = {}
@@ -79,11 +78,24 @@ class Response(interface.Slotable, State):
         assert context is None or isinstance(context, RequestContext)
         self.__odata__['context'] = context
 
+    @property
+    def body(self):
+        """请求响应内容, 内容为memoryview或者文件(下载时通过 ``DOWNLOAD_BODY`` 指定)时读取为字节串"""
+        content = self.content
+        if isinstance(content, memoryview):
+           return content.tobytes()
+        if hasattr(content, 'read'):
+           content.seek(0)
+           body = content.read()
+           content.seek(0)
+           return body
+        return content
+
     @property
     def text(self):
         try:
             if type(self.content) is not str:
-                return str(self.content, self.encoding, 'ignore')
+                return str(self.body, self.encoding, 'ignore')
             else:
                 return self.content
         except Exception as e:
@@ -100,6 +112,8 @@ class Response(interface.Slotable, State):
             self.logger.debug(e)
     
     def clear(self):
+        if hasattr(self.__content__, 'close'):
+           self.__content__.close()
         self.__content__ = None
 
     def __str__(self):
@@ -3,22 +3,69 @@ from asyncio.tasks import Task
 import logging
 from contextlib import suppress
 from random import randint
-from asyncio.locks import Event
-from typing import Coroutine, List
+from typing import Callable, Coroutine, List, Optional, Union
 from araneid.util._async import itertools
-from araneid.core.stream import Stream
+from araneid.util._import import import_class
+from araneid.util.hashring import HashRing
+from araneid.util.fingerprint import url_host
+from araneid.core.stream import Stream, DispatchStream
+from araneid.core.inflight import InFlight
+from araneid.core.throttle import Throttle
+from araneid.network import dns
 from . import plugin as plugins
 from .exception import SchedulerRuntimeException, PluginError, NotConfigured, SchedulerError
 from .scheduler import Scheduler
+from .request import Request
+from .response import Response
+
+
+def request_host(item: Union[Request, Response]) -> Optional[str]:
+    """默认的调度器选择键, 返回请求(或请求响应对应的请求)地址中的域名
+
+    Args:
+        item (Union[Request, Response]): 请求或者请求响应
+
+    Returns:
+        Optional[str]: 域名, 没有域名时返回 ``None``
+    """
+    request = item.request if isinstance(item, Response) else item
+    if request is None:
+       return None
+    return url_host(str(request.uri))
+
 
 class ScheduleManager(object):
+    """调度管理器, 管理所有启用的调度器, 并为每个请求和请求响应选择一个调度器
+
+    通过配置 ``SCHEDULER_SELECTOR`` 指定选择调度器的策略:
+
+    * ``hash`` (默认): 一致性哈希, 按照 ``SCHEDULER_SELECTOR_KEY`` (默认按请求域名, 可以是函数或者函数的导入路径) 的返回值选择调度器,
+      同一个域名的请求和请求响应总是进入同一个调度器, 每个调度器负责互不相交的域名集合. ``SCHEDULER_HASH_REPLICAS`` 为每个调度器的虚拟节点数.
+    * ``random`` : 随机选择调度器.
+
+    选择键为 ``None`` 的请求随机选择调度器.
+
+    配置了 ``DOWNLOAD_DELAY`` 或者 ``CONCURRENT_REQUESTS_PER_DOMAIN`` 等配置时, 调度出的请求需要先经过 :py:obj:`~araneid.core.throttle.Throttle` 按域名限速,
+    请求下载完成后通过 :py:meth:`release_request` 归还域名的并发数.
+
+    ``DNS_PREFETCH`` 为 ``True`` 时, 请求进入调度器时在后台预先解析请求的域名(参考 :py:obj:`~araneid.network.dns.DNSCache` ).
+    """
     logger = None
-    __IDLE_EVENT__: Event 
+    __inflight__: InFlight
     __channel__: Stream
     __running_tasks__: List[Task]
     __channel_receivers__: List[Coroutine]
     __active_schedulers__:List[Scheduler]
     __closed__: bool
+    __CHANNEL_BATCH_SIZE__: int
+    __CHANNEL_BATCH_WAIT__: float
+    __DIRECT_DISPATCH__: bool
+    __SELECTOR__: str
+    __SELECTOR_KEY__: Callable
+    __HASH_REPLICAS__: int
+    __DNS_PREFETCH__: bool
+    __hashring__: Optional[HashRing]
+    __throttle__: Optional[Throttle]
 
     def __init__(self, settings = None):
         self.logger = logging.getLogger(__name__)
@@ -27,28 +74,54 @@ class ScheduleManager(object):
         self.__channel_receivers__ = []
         self.__active_schedulers__ = []
         self.__closed__ = False
+        settings = settings if settings is not None else {}
+        self.__CHANNEL_BATCH_SIZE__ = settings.get('CHANNEL_BATCH_SIZE', 100)
+        self.__CHANNEL_BATCH_WAIT__ = settings.get('CHANNEL_BATCH_WAIT', 0)
+        self.__DIRECT_DISPATCH__ = settings.get('ENGINE_DISPATCH', 'channel') == 'direct'
+        self.__SELECTOR__ = settings.get('SCHEDULER_SELECTOR', 'hash')
+        if self.__SELECTOR__ not in ('hash', 'random'):
+            raise SchedulerError(f"Unsupported scheduler selector {self.__SELECTOR__}, it only support hash, random.")
+        selector_key = settings.get('SCHEDULER_SELECTOR_KEY', request_host)
+        self.__SELECTOR_KEY__ = import_class(selector_key) if isinstance(selector_key, str) else selector_key
+        self.__HASH_REPLICAS__ = settings.get('SCHEDULER_HASH_REPLICAS', 160)
+        self.__DNS_PREFETCH__ = settings.get('DNS_PREFETCH', False)
+        self.__hashring__ = None
+        self.__throttle__ = None
  
     
     @classmethod
     async def create(cls, settings = None):
         instance = cls.from_settings(settings)
-        instance.__IDLE_EVENT__: Event = Event()
-        instance.__channel__ : Stream = await Stream.create()
+        instance.__inflight__: InFlight = InFlight()
+        if instance.__DIRECT_DISPATCH__:
+            instance.__channel__ : Stream = await DispatchStream.create(instance.__receive, name='schedulemanager')
+        else:
+            instance.__channel__ : Stream = await Stream.create(name='schedulemanager', settings=settings)
         await instance.__init_schedulers(settings=settings)
         if not instance.__active_schedulers__:
             raise SchedulerError("No schedulers found")
+        try:
+            instance.__throttle__ = await Throttle.create(settings)
+        except NotConfigured:
+            instance.__throttle__ = None
         return instance
     
     async def __init_schedulers(self, settings):
         schedulers = await self.__load_plugin(settings=settings)
         for name, scheduler in schedulers.items():
             self.__active_schedulers__.append(scheduler)
+        if self.__SELECTOR__ == 'hash' and len(schedulers) > 1:
+            self.__hashring__ = HashRing(list(schedulers.values()), names=list(schedulers.keys()), replicas=self.__HASH_REPLICAS__)
 
     async def __load_plugin(cls, settings):
         scheduler_plugins = plugins.load(plugins.PluginType.SCHEDULER)
         schedulers = dict()
+        enabled_schedulers = settings.get('SCHEDULERS', None) if settings is not None else None
         for plugin in scheduler_plugins:
             name = plugin.name
+            if enabled_schedulers is not None and name not in enabled_schedulers:
+                cls.logger.debug(f"Scheduler {name} is not enabled, skipped load.")
+                continue
             scheduler = plugin.load()
             try:
                 if hasattr(scheduler, 'from_settings'):
@@ -56,35 +129,53 @@ class ScheduleManager(object):
                 else:
                     schedulers[name] = await scheduler.create()
             except NotConfigured as e:
-                cls.logger.warning("Scheduler {name} is not configured, skipped load.")
+                cls.logger.debug(f"Scheduler {name} is not configured, skipped load.")
                 continue
             except Exception as e:
                 raise PluginError(f"Error occurred in while loading scheduler {name}!") from e
             cls.logger.debug(f'Loaded scheduler: {name}.')
         return schedulers
 
+    @property
+    def throttle(self) -> Optional[Throttle]:
+        return self.__throttle__
+
     def idle(self) -> bool:
-        is_idle = True 
-        for sched in self.__active_schedulers__:
-            is_idle &= sched.idle()
-        return is_idle
+        return self.__inflight__.idle()
     
     async def wait_idle(self)-> None:
-        await self.__IDLE_EVENT__.wait()
-        self.__IDLE_EVENT__.clear()
+        await self.__inflight__.wait_idle()
     
-    def __select__(self):
+    def __select__(self, item=None):
         sched_len = len(self.__active_schedulers__)
+        if sched_len == 1:
+            return self.__active_schedulers__[0]
+        if self.__hashring__ is not None and item is not None:
+            key = self.__SELECTOR_KEY__(item)
+            if key is not None:
+                return self.__hashring__.get(key)
         sched_index = randint(0, sched_len-1)
         return self.__active_schedulers__[sched_index]
     
     async def add_request(self, request):
-        scheduler = self.__select__()
-        await scheduler.add_request(request)
+        if self.__DNS_PREFETCH__:
+            dns.get_dnscache().prefetch(url_host(str(request.uri)))
+        scheduler = self.__select__(request)
+        self.__inflight__.increment()
+        try:
+            await scheduler.add_request(request)
+        except Exception:
+            self.__inflight__.decrement()
+            raise
 
     async def add_response(self, response):
-        scheduler = self.__select__()
-        await scheduler.add_response(response)
+        scheduler = self.__select__(response)
+        self.__inflight__.increment()
+        try:
+            await scheduler.add_response(response)
+        except Exception:
+            self.__inflight__.decrement()
+            raise
 
     @classmethod
     def from_settings(cls, settings):
@@ -94,15 +185,46 @@ class ScheduleManager(object):
         self.__channel_receivers__.append(receiver)
 
     async def __process_channel(self):
-         async with self.__channel__.read() as reader:
-            async for item in reader:
-                try:
-                    await asyncio.gather(*[receiver(item) for receiver in self.__channel_receivers__])
-                except Exception as e:
-                    self.logger.exception(e)
-                finally:
-                    if self.idle():
-                        self.__IDLE_EVENT__.set()
+        async with self.__channel__.read() as reader:
+            while True:
+                items = await reader.read_batch(self.__CHANNEL_BATCH_SIZE__, self.__CHANNEL_BATCH_WAIT__)
+                if not items:
+                    break
+                for item in items:
+                    await self.__receive(item)
+
+    async def __receive(self, item):
+        if self.__throttle__ is not None and isinstance(item, Request):
+            await self.__throttle__.put(item)
+            return
+        await self.__dispatch(item)
+
+    async def __process_throttle(self):
+        while True:
+            requests = await self.__throttle__.get_ready()
+            if not requests:
+                break
+            for request in requests:
+                await self.__dispatch(request)
+
+    def release_request(self, request: Request) -> None:
+        """请求下载完成, 归还请求所属域名的并发数
+
+        Args:
+            request (Request): 下载完成的请求
+        """
+        if self.__throttle__ is not None:
+            self.__throttle__.release(request)
+
+    async def __dispatch(self, item):
+        try:
+            await asyncio.gather(*[receiver(item) for receiver in self.__channel_receivers__])
+        except Exception as e:
+            self.logger.exception(e)
+            if isinstance(item, Request):
+                self.release_request(item)
+        finally:
+            self.__inflight__.decrement()
    
     async def __start_schedulers__(self):
         try:
@@ -115,8 +237,10 @@ class ScheduleManager(object):
         if self.__closed__:
            return
         self.__closed__ = True
-        self.__IDLE_EVENT__.set()
+        self.__inflight__.close()
         await self.__channel__.close()
+        if self.__throttle__ is not None:
+            await self.__throttle__.close()
         wait_scheduler_close = set()
         for scheduler in self.__active_schedulers__:
             wait_scheduler_close.add(scheduler.close())
@@ -137,6 +261,9 @@ class ScheduleManager(object):
         try:
             self.__running_tasks__.append(asyncio.create_task(self.__start_schedulers__()))
             self.__running_tasks__.append(asyncio.create_task(self.__process_channel()))
+            if self.__throttle__ is not None:
+                self.__running_tasks__.append(asyncio.create_task(self.__throttle__.run()))
+                self.__running_tasks__.append(asyncio.create_task(self.__process_throttle()))
             await asyncio.gather(*self.__running_tasks__)
         except Exception as e:
             self.logger.exception(e)
@@ -10,6 +10,7 @@
 @date:   2019.06.12
 """
 import asyncio
+from typing import Optional
 from inspect import iscoroutine, getmodule
 from abc import ABC, abstractclassmethod, abstractmethod
 from araneid.core.request import Request
@@ -22,6 +23,23 @@ class Scheduler(ABC):
        @desc:  scheduler interface that all schedulers must implement
     """
     __reqeusts = []
+    # 请求的调度延迟(秒), 调度器在请求入队时取出该值, 同一个请求再次进入调度器时不会重复延迟
+    DELAY_KEY = 'schedule_delay'
+
+    @classmethod
+    def pop_delay(cls, request: Request) -> Optional[float]:
+        """取出并删除请求的调度延迟
+
+        Args:
+            request (Request): 请求
+
+        Returns:
+            Optional[float]: 调度延迟(秒), 没有指定时返回 ``None``
+        """
+        delay = request.meta.get(cls.DELAY_KEY)
+        if delay is not None:
+           del request.meta[cls.DELAY_KEY]
+        return delay
 
     @abstractclassmethod
     async def create(cls, settings=None):
@@ -29,6 +29,7 @@ from araneid.state import State, States
 from araneid.core.stream import Stream
 from araneid.util._async import  ensure_asyncfunction
 from araneid.util import cast_exception_to
+from araneid.core.exception import StopDownload
 
 
 
@@ -62,6 +63,7 @@ class Signals(Signal):
     response_parsed = auto()       #: 请求响应被解析
     response_received = auto()     #: 请求响应开始收到响应
     response_ignored = auto()      #: 请求响应被忽略
+    request_failed = auto()        #: 请求下载失败(下载器抛出异常)
 
 def export_signals(signals: Signal, module):
     for signal in signals:
@@ -413,6 +415,8 @@ class SignalManager(State):
         async def guard_signal_handle(signal_handle, source, object)-> Any:
             try:
                res =  await asyncio.ensure_future(signal_handle(signal=signal_notify.signal, source=source, object=object))
+            except StopDownload as e:
+                res = e
             except Exception as e:
                 res = None
                 e = cast_exception_to(e, SignalHandleException(signal_handle=signal_handle, source=source, object=object, exception=e))
@@ -608,6 +612,17 @@ def set_signalmanager(_signalmanager):
 def get_signalmanager():
     return signalmanager
 
+def handled(signal: Signal) -> bool:
+    """判断信号是否注册了信号处理器, 用来在没有信号处理器的时候跳过代价较高的信号触发
+
+    Args:
+        signal (Signal): 信号
+
+    Returns:
+        bool: 注册了信号处理器时返回 ``True``
+    """
+    return bool(signalmanager.get_signal_handles(signal))
+
 
 signalmanager = SignalManager()   # SignalManager
 export_signals(Signals, sys.modules[__name__])
@@ -7,6 +7,8 @@ from asyncio.locks import Event
 from asyncio.futures import Future
 from araneid.core.flags import Idle
 from araneid.core.stream import Stream
+from araneid.core.inflight import InFlight
+from araneid.setting import settings as settings_loader
 from araneid.spider.spider import Spider
 from .request import Request
 from .response import Response
@@ -23,7 +25,7 @@ class Slot:
     :py:obj:`Scraper <araneid.scraper.Scraper>` 主要通过它与  :py:obj:`Engine <araneid.core.engine.Engine>` 进行一系列的通信。
     """
  
-    __slots__ = ['logger', '__scraper', '__engine', '__response_channel', '__request_channel', '__spider_request_channel', '__spider_response_channel', '__middleware_request_channel', '__middleware_response_channel', '__open', '__close', '__close_waiter', '__open_waiter', '__IDLE_EVENT', '__idle_status']
+    __slots__ = ['logger', '__scraper', '__engine', '__response_channel', '__request_channel', '__spider_request_channel', '__spider_response_channel', '__middleware_request_channel', '__middleware_response_channel', '__open', '__close', '__close_waiter', '__open_waiter', '__IDLE_EVENT', '__idle_status', '__inflight']
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -34,18 +36,26 @@ class Slot:
         self.__IDLE_EVENT: Event = Event()
     
     @classmethod
-    async def create(cls):
+    async def create(cls, settings=None):
+        settings = settings if settings is not None else settings_loader
         instance = cls()
-        instance.__spider_request_channel = await Stream.create(name='spider_request',confirm_ack=True) 
+        instance.__spider_request_channel = await Stream.create(name='spider_request',confirm_ack=True, settings=settings) 
         instance.__spider_response_channel = await Stream.create(name='spider_response',confirm_ack=True) 
-        instance.__middleware_request_channel = await Stream.create(name='middleware_request', confirm_ack=True)
+        instance.__middleware_request_channel = await Stream.create(name='middleware_request', confirm_ack=True, settings=settings)
         instance.__middleware_response_channel = await Stream.create(name='middleware_response', confirm_ack=True)
         instance.__request_channel = [instance.__spider_request_channel, instance.__middleware_request_channel]
         instance.__response_channel = [instance.__spider_response_channel, instance.__middleware_response_channel]
         instance.__close_waiter = Future()
         instance.__open_waiter = Future()
+        instance.__inflight = InFlight()
         return instance
 
+    @property
+    def inflight(self) -> InFlight:
+        """Slot中还未完成的请求和请求响应的在途计数器
+        """
+        return self.__inflight
+
 
     def bind(self, scraper = None, engine = None) -> None:
         """将 :py:obj:`Slot <Slot>` 与一个 :py:obj:`Scraper <araneid.scraper.Scraper>` 和  :py:obj:`Engine <araneid.core.engine.Engine>` 绑定，在通过它进行通信前必须先完成绑定
@@ -173,6 +183,8 @@ class Slot:
             request_channel = self.__middleware_request_channel
             qname = 'spidermiddleware'
         self.logger.debug('Put {qname} request to slot cache ({slot}): {request} '.format(qname=qname, slot=id(self), request=request))
+        if not request.in_state(request.States.slot):
+           self.__inflight.increment()
         request.set_state(request.States.slot)
         await request_channel.write(request)
         if request.slot is None:
@@ -226,6 +238,8 @@ class Slot:
         else:
             qname = 'spidermiddleware'
             response_channel = self.__middleware_response_channel
+        if not response.in_state(response.States.slot):
+           self.__inflight.increment()
         response.set_state(response.States.slot)
         await response_channel.write(response)
         self.logger.debug('Put {qname}  response  to slot cache ({slot}): {response} '.format(qname=qname, slot=id(self), response=response))
@@ -242,6 +256,8 @@ class Slot:
            return False
         request.complete()
         request.set_state(request.States.complete)
+        if request.in_state(request.States.slot):
+           self.__inflight.decrement()
         qname = ''
         if request.context and request.context.spider and isinstance(request.context.spider, Spider):
             qname = 'spider'
@@ -264,6 +280,8 @@ class Slot:
             return False
         response.complete()
         response.set_state(response.States.complete)
+        if response.in_state(response.States.slot):
+           self.__inflight.decrement()
         qname = ''
         if response.context and response.context.spider and isinstance(response.context.spider, Spider):
             qname = 'spider'
@@ -331,6 +349,7 @@ class Slot:
         self.__close = True
         self.__close_waiter.set_result(self.id())
         self.__IDLE_EVENT.set()
+        self.__inflight.close()
         await self.__middleware_request_channel.close()
         await self.__middleware_response_channel.close()
         await self.__spider_request_channel.close()
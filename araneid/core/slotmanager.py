@@ -2,10 +2,10 @@ import asyncio
 from asyncio.tasks import Task
 from contextlib import closing, suppress
 import logging
-from asyncio.locks import Event
 from multiprocessing.connection import wait
 from typing import Coroutine, Dict, Iterable, List
-from araneid.core.stream import Stream
+from araneid.core.stream import Stream, DispatchStream
+from araneid.core.inflight import InFlight, InFlightTasks
 from araneid.core.request import Request
 from araneid.core.response import Response
 from .exception import SlotError, SlotNotFound
@@ -13,9 +13,9 @@ from .slot import Slot
 
 
 class SlotManager(object):
-    __slots__ = ['logger', '__slots', '__channel__','__channel_receivers__', '__processing_slot_channel__','__closing_slot_channel__','__openning_slot_channel__', '__running_tasks__', '__IDLE_EVENT__', '__closed__']
+    __slots__ = ['logger', '__slots', '__channel__','__channel_receivers__', '__processing_slot_channel__','__closing_slot_channel__','__openning_slot_channel__', '__running_tasks__', '__inflight__', '__closed__', '__CHANNEL_BATCH_SIZE__', '__CHANNEL_BATCH_WAIT__', '__DIRECT_DISPATCH__']
     __slots :Dict[int, Slot]
-    __IDLE_EVENT__: Event
+    __inflight__: InFlight
     __channel__: Stream
     __channel_receivers__: List[Coroutine]
     __processing_slot_channel__: Stream
@@ -23,6 +23,9 @@ class SlotManager(object):
     __openning_slot_channel__: Stream
     __running_tasks__:List[Task]
     __closed__: bool
+    __CHANNEL_BATCH_SIZE__: int
+    __CHANNEL_BATCH_WAIT__: float
+    __DIRECT_DISPATCH__: bool
 
     def __init__(self, settings = None):
         self.logger = logging.getLogger(__name__)
@@ -31,12 +34,19 @@ class SlotManager(object):
         self.__running_tasks__ = []
         self.__channel_receivers__ = []
         self.__closed__ = False
+        settings = settings if settings is not None else {}
+        self.__CHANNEL_BATCH_SIZE__ = settings.get('CHANNEL_BATCH_SIZE', 100)
+        self.__CHANNEL_BATCH_WAIT__ = settings.get('CHANNEL_BATCH_WAIT', 0)
+        self.__DIRECT_DISPATCH__ = settings.get('ENGINE_DISPATCH', 'channel') == 'direct'
     
     @classmethod
     async def create(cls, settings = None):
         instance = cls.from_settings(settings=settings)
-        instance.__IDLE_EVENT__ = Event()
-        instance.__channel__ = await Stream.create()
+        instance.__inflight__ = InFlight()
+        if instance.__DIRECT_DISPATCH__:
+            instance.__channel__ = await DispatchStream.create(instance.__receive, name='slotmanager')
+        else:
+            instance.__channel__ = await Stream.create(name='slotmanager', settings=settings)
         instance.__processing_slot_channel__ = await Stream.create()
         instance.__closing_slot_channel__ = await Stream.create()
         instance.__openning_slot_channel__ = await Stream.create()
@@ -60,14 +70,12 @@ class SlotManager(object):
             @desc:  open and initiate request slots from registered crawlers
             @return: void
         """
-        openning_slots: List[Task] =  []
+        openning_slots = InFlightTasks()
         async with self.__openning_slot_channel__.read() as reader:
             async for slot in reader:
-                openning_slot: Task = asyncio.ensure_future(slot.set_open())
-                openning_slots.append(openning_slot)
-                openning_slots = [ openning_slot for openning_slot in openning_slots if not openning_slot.done()]
+                openning_slots.add(slot.set_open())
         try:
-            await asyncio.gather(*openning_slot)
+            await openning_slots.wait()
         except Exception as e:
             self.logger.exception(e)
 
@@ -75,23 +83,18 @@ class SlotManager(object):
       
 
     async def __process_slots(self):
-        processing_slots: List[Task] = []
+        processing_slots = InFlightTasks()
         async with self.__processing_slot_channel__.read() as reader:
             async for slot in reader:
-                processing_slot: Task = asyncio.ensure_future(self.__get_request(slot.id(), delay_complete=True))
-                processing_slots.append(processing_slot)
-                processing_slots = [ processing_slot for processing_slot in processing_slots if not processing_slot.done()]
+                processing_slots.add(self.__get_request(slot.id(), delay_complete=True))
         try:
-            await asyncio.gather(*processing_slots)
+            await processing_slots.wait()
         except Exception as e:
             self.logger.exception(e)
-        finally:
-            if self.idle():
-                self.__IDLE_EVENT__.set()
 
 
     async def __close_slots(self):
-        closing_slots: List[Task] = []
+        closing_slots = InFlightTasks()
 
         async def close(slot: Slot):
             await slot.wait_close()
@@ -99,15 +102,14 @@ class SlotManager(object):
              
         async with self.__closing_slot_channel__.read() as reader:
             async for slot in reader:
-                closing_slot: Task = asyncio.ensure_future(close(slot))
-                closing_slots.append(closing_slot)
-                closing_slots = [ closing_slot for closing_slot in closing_slots if not closing_slot.done()]
+                closing_slots.add(close(slot))
         with suppress(asyncio.CancelledError):
-            await asyncio.gather(*closing_slots)
+            await closing_slots.wait()
                
 
     async def add_slot(self, slot: Slot):
         self.__slots[slot.id()] = slot
+        slot.inflight.attach(self.__inflight__)
         await self.__openning_slot_channel__.write(slot)
         await self.__processing_slot_channel__.write(slot)
         await self.__closing_slot_channel__.write(slot)
@@ -194,15 +196,10 @@ class SlotManager(object):
         return [ t.result() for t in done]
  
     def idle(self)-> bool:
-        is_idle = True
-        for slot in self.__slots.values():
-            slot: Slot = slot
-            is_idle &= slot.idle()
-        return is_idle
+        return self.__inflight__.idle()
     
     async def wait_idle(self) -> None:
-        await self.__IDLE_EVENT__.wait()
-        self.__IDLE_EVENT__.clear()
+        await self.__inflight__.wait_idle()
         
 
     async def join(self):
@@ -219,14 +216,18 @@ class SlotManager(object):
 
     async def __process_channel(self):
         async with self.__channel__.read() as reader:
-            async for item in reader:
-                try:
-                    await asyncio.gather(*[receiver(item) for receiver in self.__channel_receivers__])
-                except Exception as e:
-                    self.logger.exception(e)
-                finally:
-                    if self.idle():
-                        self.__IDLE_EVENT__.set()
+            while True:
+                items = await reader.read_batch(self.__CHANNEL_BATCH_SIZE__, self.__CHANNEL_BATCH_WAIT__)
+                if not items:
+                    break
+                for item in items:
+                    await self.__receive(item)
+
+    async def __receive(self, item):
+        try:
+            await asyncio.gather(*[receiver(item) for receiver in self.__channel_receivers__])
+        except Exception as e:
+            self.logger.exception(e)
 
     async def start(self):
         self.logger.debug('SlotManager start')
@@ -247,7 +248,7 @@ class SlotManager(object):
         if self.__closed__:
            return
         self.__closed__ = True
-        self.__IDLE_EVENT__.set()
+        self.__inflight__.close()
         for slot_id, slot in list(self.__slots.items()):
             await slot.close()
         await self.__openning_slot_channel__.close()
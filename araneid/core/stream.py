@@ -1,6 +1,10 @@
 import logging
 import inspect
-from asyncio import Queue
+import asyncio
+from heapq import heappush, heappop
+from itertools import count
+from contextlib import suppress
+from asyncio import Queue, Event
 from enum import IntEnum 
 from araneid.util._async import ensure_asyncfunction, CountdownLatch
 
@@ -13,7 +17,7 @@ class Stream:
     class STREAM_END:
         pass
 
-    def __init__(self, name=None, confirm_ack=False) -> None:
+    def __init__(self, name=None, confirm_ack=False, maxsize=0, high_watermark=None, low_watermark=None) -> None:
         self.logger = logging.getLogger(__name__)
         if name:
            self._name = name
@@ -23,14 +27,53 @@ class Stream:
         self._confirm_ack = confirm_ack
         self._operators = []
         self._exception = None
+        assert maxsize >= 0, 'maxsize of stream must not be negative'
+        # maxsize是缓冲区的上限, 高水位默认等于maxsize, 超过maxsize时(例如来自全局配置)按照maxsize处理
+        high_watermark = maxsize if high_watermark is None else min(high_watermark, maxsize)
+        low_watermark = high_watermark // 2 if low_watermark is None else low_watermark
+        assert maxsize == 0 or 0 <= low_watermark < high_watermark, 'watermarks of stream must satisfy 0 <= low_watermark < high_watermark <= maxsize'
+        self._maxsize = maxsize
+        self._high_watermark = high_watermark
+        self._low_watermark = low_watermark
+        self._pending_writers = 0
+        self._waiting_readers = 0
     
     @classmethod
-    async def create(cls, name=None, confirm_ack=False):
-        instance = cls(name=name, confirm_ack=confirm_ack)
+    async def create(cls, name=None, confirm_ack=False, maxsize=None, high_watermark=None, low_watermark=None, settings=None):
+        """创建Stream, 当maxsize大于0时, Stream为有界Stream: 缓冲区达到高水位(不超过maxsize)时写入方会被挂起, 直到读取方将缓冲区消费到低水位
+
+        Args:
+            name (str, optional): Stream名字, 同时用于从配置中查找该Stream的配置. 默认为: None
+            confirm_ack (bool, optional): 是否需要手动确认. 默认为: False
+            maxsize (int, optional): 缓冲区大小, 0为无界. 默认为: 0
+            high_watermark (int, optional): 高水位, 大于maxsize时按照maxsize处理. 默认为: maxsize
+            low_watermark (int, optional): 低水位, 默认为: high_watermark 的一半
+            settings (dict, optional): 配置, 指定时从配置中读取 ``STREAM_MAXSIZE``, ``STREAM_HIGH_WATERMARK``, ``STREAM_LOW_WATERMARK`` 以及 ``STREAM_OPTIONS[name]``, 显式指定的参数优先于配置. 默认为: None
+
+        Returns:
+            Stream: Stream实例
+        """
+        options = cls.options_from_settings(settings, name=name) if settings is not None else {}
+        options.update((key, value) for key, value in (('maxsize', maxsize), ('high_watermark', high_watermark), ('low_watermark', low_watermark)) if value is not None)
+        instance = cls(name=name, confirm_ack=confirm_ack, **options)
         instance._buffer = Queue()
         instance._readers = CountdownLatch()
+        instance._writable = Event()
+        instance._writable.set()
+        instance._demand = Event()
         return instance
 
+    @classmethod
+    def options_from_settings(cls, settings, name=None):
+        options = {
+            'maxsize': settings.get('STREAM_MAXSIZE', 0),
+            'high_watermark': settings.get('STREAM_HIGH_WATERMARK', None),
+            'low_watermark': settings.get('STREAM_LOW_WATERMARK', None)
+        }
+        stream_options = settings.get('STREAM_OPTIONS', None) or {}
+        options.update(stream_options.get(name, {}))
+        return options
+
     
     async def set_exception(self, exception):
         assert isinstance(exception, Exception)
@@ -47,6 +90,12 @@ class Stream:
     def size(self):
         return self._buffer.qsize()
 
+    def is_bounded(self):
+        return self._maxsize > 0
+
+    def is_full(self):
+        return self.is_bounded() and not self._writable.is_set()
+
     async def __aenter__(self):
         #reader_name = '::'.join([str(inspect.stack()[1][1]).split('/')[-1],str(inspect.stack()[1][3])])
         self._readers.increment()
@@ -64,8 +113,9 @@ class Stream:
     async def __anext__(self):
         #reader_name = '::'.join([str(inspect.stack()[1][1]).split('/')[-1],str(inspect.stack()[1][3])])
         if not (self._closed and self._buffer.empty()):
-            data = await self._buffer.get()
+            data = await self._get()
             #self.logger.debug(f'Reader {reader_name} of Stream {self._name} read {data}')
+            self._release_writers()
             self._auto_ack(data)
             if isinstance(data, self.STREAM_END):
                #self.logger.debug(f'Reader {reader_name} of Stream {self._name} read STREAM_END')
@@ -74,7 +124,7 @@ class Stream:
                   raise self._exception
                else:
                   raise StopAsyncIteration
-            data = await self.__process_operators(data)
+            data = await self._process_operators(data)
             return data
         if self._exception:
            raise self._exception
@@ -86,11 +136,128 @@ class Stream:
         async with self.read() as reader:
             async for item in reader:
                 return item
+
+    async def read_batch(self, max_items=100, max_wait=0):
+        """批量读取Stream, 阻塞直到至少读取到一个数据, 然后读取缓冲区中已有的数据, 直到读取 ``max_items`` 个数据或者等待超过 ``max_wait`` 秒
+
+        Args:
+            max_items (int, optional): 单次读取的最大数据量. 默认为: 100
+            max_wait (float, optional): 读取到第一个数据后, 等待更多数据的最长时间(秒), 0为不等待. 默认为: 0
+
+        Raises:
+            Exception: Stream被设置的异常
+
+        Returns:
+            list: 读取到的数据, 当Stream结束时返回空列表
+        """
+        assert max_items > 0, 'max_items of read_batch must be positive'
+        batch = []
+        if self._closed and self._buffer.empty():
+           if self._exception:
+              raise self._exception
+           return batch
+        data = await self._get()
+        deadline = None
+        while True:
+            self._auto_ack(data)
+            if isinstance(data, self.STREAM_END):
+               await self._buffer.put(data)
+               if not batch and self._exception:
+                  raise self._exception
+               break
+            batch.append(data)
+            if len(batch) >= max_items:
+               break
+            if not self._buffer.empty():
+               data = self._buffer.get_nowait()
+               continue
+            if max_wait <= 0:
+               break
+            loop = asyncio.get_event_loop()
+            if deadline is None:
+               deadline = loop.time() + max_wait
+            try:
+                data = await self.__get_until(deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+        self._release_writers()
+        return [ await self._process_operators(data) for data in batch ]
+
+    async def __get_until(self, timeout):
+        # unlike asyncio.wait_for, never drop an item which is got right at the timeout
+        if timeout <= 0:
+           raise asyncio.TimeoutError
+        getter = asyncio.ensure_future(self._get())
+        try:
+            done, _ = await asyncio.wait({getter}, timeout=timeout)
+        except asyncio.CancelledError:
+            getter.cancel()
+            raise
+        if getter in done:
+           return getter.result()
+        getter.cancel()
+        with suppress(asyncio.CancelledError):
+            return await getter
+        raise asyncio.TimeoutError
     
+    async def _get(self):
+        if not self._buffer.empty():
+           return self._buffer.get_nowait()
+        self._waiting_readers += 1
+        self._demand.set()
+        try:
+            return await self._buffer.get()
+        finally:
+            self._waiting_readers -= 1
+
+    def has_demand(self):
+        """读取方是否需要更多数据: 缓冲区中的数据少于正在等待读取的读取方数量, 写入的数据会被立即读取"""
+        return self._closed or self._buffer.qsize() < self._waiting_readers
+
+    async def wait_demand(self):
+        """等待读取方需要更多数据, 参考 :py:meth:`has_demand` . 写入方可以在每次写入之前等待, 只在读取方空闲时才产生数据(拉取模式),
+        数据不会在缓冲区中积压, 例如优先级调度器只在下游需要请求时才从堆中取出优先级最高的请求.
+        """
+        while not self.has_demand():
+            self._demand.clear()
+            await self._demand.wait()
+
     async def write(self, data):
         if self._closed:
            return
+        if self.is_bounded():
+           await self._wait_writable()
+           if self._closed:
+              return
         await self._buffer.put(data)
+        if self.is_bounded() and self._buffer.qsize() >= self._high_watermark:
+           self._writable.clear()
+
+    async def write_many(self, datas):
+        if self._closed:
+           return
+        for data in datas:
+            if self.is_full():
+               await self._wait_writable()
+               if self._closed:
+                  return
+            self._buffer.put_nowait(data)
+            if self.is_bounded() and self._buffer.qsize() >= self._high_watermark:
+               self._writable.clear()
+
+    async def _wait_writable(self):
+        self._pending_writers += 1
+        try:
+            while not (self._writable.is_set() or self._closed):
+                await self._writable.wait()
+        finally:
+            self._pending_writers -= 1
+
+    def _release_writers(self):
+        if self._writable.is_set():
+           return
+        if self._closed or self._buffer.qsize() <= self._low_watermark:
+           self._writable.set()
     
     def map(self, map_func):
         map_func = ensure_asyncfunction(map_func)
@@ -111,18 +278,26 @@ class Stream:
         if self._buffer._unfinished_tasks < 1:
             return
         self._buffer.task_done()
+
+    def ack_many(self, stream_datas):
+        if self._closed:
+            return
+        if not self._confirm_ack:
+            return
+        for _ in range(min(len(stream_datas), self._buffer._unfinished_tasks)):
+            self._buffer.task_done()
     
     def idle(self):
         if self._closed:
             return True
-        return self._buffer._finished.is_set()
+        return self._buffer._finished.is_set() and self._pending_writers < 1
     
     async def join(self):
         if self._closed:
            return
         await self._buffer.join()
     
-    async def __process_operators(self, data):
+    async def _process_operators(self, data):
         for op_type, operator in self._operators:
             if op_type == Stream.Oprator.MAP:
                data = await operator(data)
@@ -147,11 +322,168 @@ class Stream:
            return
         await self._buffer.put(self.STREAM_END())
         self._closed = True
+        self._release_writers()
+        self._demand.set()
         #self.logger.debug(f'Stream {self._name} closed, wait for readers process.')
         await self._readers.wait()
         self._clear_buff()
         self._operators.clear()
         #self.logger.debug(f'Stream {self._name} closed.')
 
+class DispatchStream(Stream):
+    """直接分发的Stream, 写入的数据不进入缓冲区, 而是在写入方的协程中直接交给处理函数处理, 用于省去一次队列中转.
+       写入方会一直等待处理函数返回, 因此处理函数的阻塞会直接反压到写入方.
+    """
+
+    @classmethod
+    async def create(cls, handler, name=None):
+        """创建DispatchStream
+
+        Args:
+            handler (Callable): 数据处理函数, 每写入一条数据调用一次
+            name (str, optional): Stream名字. 默认为: None
+
+        Returns:
+            DispatchStream: DispatchStream实例
+        """
+        instance = await super().create(name=name)
+        instance._handler = ensure_asyncfunction(handler)
+        instance._dispatching = 0
+        return instance
+
+    def size(self):
+        return self._dispatching
+
+    async def write(self, data):
+        if self._closed:
+           return
+        self._dispatching += 1
+        try:
+            await self._handler(await self._process_operators(data))
+        finally:
+            self._dispatching -= 1
+
+    async def write_many(self, datas):
+        for data in datas:
+            await self.write(data)
+
+    def has_demand(self):
+        # 写入方一直等待处理函数返回, 写入本身就是拉取
+        return True
+
+    def idle(self):
+        if self._closed:
+            return True
+        return self._dispatching < 1
+
+
 class DelayStream(Stream):
-    pass
\ No newline at end of file
+    """延迟Stream, 写入的数据在指定的延迟之后才能被读取, 用于重试退避、按域名延迟以及定时重新抓取等场景.
+
+    延迟的数据按照到期时间保存在最小堆中, 整个Stream只使用一个事件循环定时器, 定时器触发时将所有到期的数据移入缓冲区,
+    然后按照堆顶数据的到期时间重新设置定时器, 因此大量延迟数据不会占用大量的协程或者定时器句柄. 到期时间相同的数据按照写入顺序读取.
+
+    延迟数据不受缓冲区大小的限制, 只有到期进入缓冲区后才参与水位控制. Stream关闭时, 还未到期的数据会被丢弃.
+    """
+    RELEASE_BATCH_SIZE = 10000
+
+    @classmethod
+    async def create(cls, name=None, confirm_ack=False, maxsize=None, high_watermark=None, low_watermark=None, settings=None, delay=0):
+        """创建DelayStream
+
+        Args:
+            delay (float, optional): 写入时没有指定延迟的数据的默认延迟(秒). 默认为: 0
+            其他参数参考 :py:meth:`Stream.create`
+
+        Returns:
+            DelayStream: DelayStream实例
+        """
+        instance = await super().create(name=name, confirm_ack=confirm_ack, maxsize=maxsize, high_watermark=high_watermark, low_watermark=low_watermark, settings=settings)
+        instance._delay = delay
+        instance._delayed = []
+        instance._sequence = count()
+        instance._timer = None
+        instance._timer_when = None
+        return instance
+
+    def size(self):
+        return self._buffer.qsize() + len(self._delayed)
+
+    def pending(self):
+        """还未到期的数据数量"""
+        return len(self._delayed)
+
+    def idle(self):
+        return super().idle() and not self._delayed
+
+    async def write(self, data, delay=None):
+        """写入数据, 数据在 ``delay`` 秒之后才能被读取
+
+        Args:
+            data (Any): 数据
+            delay (float, optional): 延迟(秒), 默认为创建时指定的默认延迟
+        """
+        delay = self._delay if delay is None else delay
+        if delay <= 0:
+           await super().write(data)
+           return
+        self.write_at(data, asyncio.get_event_loop().time() + delay)
+
+    async def write_many(self, datas, delay=None):
+        delay = self._delay if delay is None else delay
+        if delay <= 0:
+           await super().write_many(datas)
+           return
+        when = asyncio.get_event_loop().time() + delay
+        for data in datas:
+            self.write_at(data, when)
+
+    def write_at(self, data, when):
+        """写入数据, 数据在事件循环时间 ``when`` 之后才能被读取
+
+        Args:
+            data (Any): 数据
+            when (float): 到期时间, 参考 :py:meth:`asyncio.loop.time`
+        """
+        if self._closed:
+           return
+        heappush(self._delayed, (when, next(self._sequence), data))
+        if self._timer_when is None or when < self._timer_when:
+           self._schedule(when)
+
+    def _schedule(self, when):
+        if self._timer is not None:
+           self._timer.cancel()
+        self._timer_when = when
+        self._timer = asyncio.get_event_loop().call_at(when, self._release)
+
+    def _release(self):
+        self._timer = self._timer_when = None
+        if self._closed:
+           return
+        delayed = self._delayed
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        released = 0
+        while delayed and delayed[0][0] <= now and released < self.RELEASE_BATCH_SIZE:
+            self._buffer.put_nowait(heappop(delayed)[2])
+            released += 1
+        if self.is_bounded() and self._buffer.qsize() >= self._high_watermark:
+           self._writable.clear()
+        if not delayed:
+           return
+        if delayed[0][0] <= now:
+           # release the rest in the next loop iteration, so that the loop is not blocked by a large batch
+           self._timer_when = now
+           self._timer = loop.call_soon(self._release)
+        else:
+           self._schedule(delayed[0][0])
+
+    async def close(self):
+        if self._closed:
+           return
+        if self._timer is not None:
+           self._timer.cancel()
+        self._timer = self._timer_when = None
+        self._delayed.clear()
+        await super().close()
\ No newline at end of file
@@ -0,0 +1,294 @@
+import asyncio
+import logging
+from collections import deque
+from asyncio.locks import Event
+from typing import Dict, List, Optional
+from araneid.core.request import Request
+from araneid.core.stream import DelayStream
+from araneid.core.exception import NotConfigured
+from araneid.network import dns
+from araneid.util.fingerprint import url_host
+
+
+class TokenBucket(object):
+    """令牌桶, 令牌以 ``rate`` 个/秒的速度生成, 最多积累 ``capacity`` 个"""
+    __slots__ = ['rate', 'capacity', 'tokens', 'updated']
+
+    def __init__(self, rate: float, capacity: float=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = None
+
+    def refill(self, now: float) -> None:
+        if self.updated is not None and self.rate > 0:
+           self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, now: float) -> float:
+        """消费一个令牌
+
+        Args:
+            now (float): 当前时间
+
+        Returns:
+            float: 令牌不足时返回需要等待的时间(秒), 消费成功时返回 ``0``
+        """
+        if self.rate <= 0:
+           return 0
+        self.refill(now)
+        if self.tokens >= 1:
+           self.tokens -= 1
+           return 0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        if self.rate <= 0:
+           return True
+        self.refill(now)
+        return self.tokens >= self.capacity
+
+
+class DownloadSlot(object):
+    """一个域名(或者IP)的下载槽, 保存被暂缓调度的请求, 以及该域名的令牌桶和并发数"""
+    __slots__ = ['key', 'bucket', 'concurrency', 'active', 'requests', 'waiting']
+
+    def __init__(self, key: str, delay: float=0, concurrency: int=0, burst: float=1):
+        self.key = key
+        self.bucket = TokenBucket(1 / delay if delay > 0 else 0, capacity=max(1, burst))
+        self.concurrency = concurrency
+        self.active = 0
+        self.requests = deque()
+        self.waiting = False
+
+    def is_idle(self, now: float) -> bool:
+        return not self.requests and not self.active and not self.waiting and self.bucket.is_full(now)
+
+    def __repr__(self):
+        return f'DownloadSlot<key={self.key}, active={self.active}, parked={len(self.requests)}>'
+
+
+class Throttle(object):
+    """按域名(或者IP)限制请求下载速度和并发数的调度闸门, 在请求离开调度器的时候生效.
+
+    每个域名拥有一个 :py:obj:`DownloadSlot` , 请求先进入所属域名的队列, 只有当该域名的令牌桶有令牌并且并发数没有达到上限时才会被放行,
+    其他请求留在队列中, 不会占用下载器的并发数, 因此一个慢的域名不会阻塞其他域名的请求. 令牌不足的域名通过 :py:obj:`~araneid.core.stream.DelayStream`
+    在令牌生成后重新检查. 放行的请求下载完成后需要调用 :py:meth:`release` 归还并发数.
+
+    配置:
+
+    * ``DOWNLOAD_DELAY`` : 同一个域名两个请求之间的最小间隔(秒), 默认为: 0
+    * ``DOWNLOAD_BURST`` : 令牌桶容量, 即空闲域名可以连续放行的请求数, 默认为: 1
+    * ``CONCURRENT_REQUESTS_PER_DOMAIN`` : 每个域名的最大并发数, 0为不限制, 默认为: 0
+    * ``CONCURRENT_REQUESTS_PER_IP`` : 每个IP的最大并发数, 大于0时按照域名解析后的IP限制, 代替 ``CONCURRENT_REQUESTS_PER_DOMAIN`` , 默认为: 0.
+      域名在后台解析, 解析完成之前该域名的请求仍然按照域名限制, 不会阻塞其他域名的请求. 解析完成后该域名下载槽中暂缓的请求和已放行请求的并发数
+      合并到IP的下载槽中, 已放行的请求不会被收回, 因此合并后IP的并发数可能暂时超过限制, 直到这些请求归还并发数
+    * ``DOWNLOAD_SLOTS`` : 指定域名(或者IP)的配置, 例如 ``{'github.com': {'delay': 1, 'concurrency': 2, 'burst': 1}}``
+
+    以上配置都没有设置并且没有启用 ``AUTOTHROTTLE_ENABLED`` 时不启用. 运行时可以通过 :py:meth:`configure_slot` 调整域名的配置.
+    """
+    logger = None
+    SWEEP_INTERVAL = 10000
+
+    def __init__(self, delay: float=0, concurrency: int=0, burst: float=1, per_ip: bool=False, slots: Dict[str, dict]=None):
+        self.logger = logging.getLogger(__name__)
+        self.__delay = delay
+        self.__concurrency = concurrency
+        self.__burst = burst
+        self.__per_ip = per_ip
+        self.__slot_settings = dict(slots or {})
+        self.__slots: Dict[str, DownloadSlot] = {}
+        self.__active: Dict[int, DownloadSlot] = {}
+        self.__addresses: Dict[str, str] = {}
+        self.__resolving: Dict[str, asyncio.Future] = {}
+        self.__ready = deque()
+        self.__parked = 0
+        self.__puts = 0
+        self.__closed = False
+
+    @classmethod
+    def from_settings(cls, settings):
+        delay = settings.get('DOWNLOAD_DELAY', 0)
+        concurrency = settings.get('CONCURRENT_REQUESTS_PER_DOMAIN', 0)
+        ip_concurrency = settings.get('CONCURRENT_REQUESTS_PER_IP', 0)
+        slots = settings.get('DOWNLOAD_SLOTS', None)
+        if not (delay > 0 or concurrency > 0 or ip_concurrency > 0 or slots or settings.get('AUTOTHROTTLE_ENABLED', False)):
+           raise NotConfigured(f"{cls.__name__} is not enabled, none of DOWNLOAD_DELAY, CONCURRENT_REQUESTS_PER_DOMAIN, CONCURRENT_REQUESTS_PER_IP, DOWNLOAD_SLOTS is set.")
+        per_ip = ip_concurrency > 0
+        return cls(delay=delay, concurrency=ip_concurrency if per_ip else concurrency, burst=settings.get('DOWNLOAD_BURST', 1), per_ip=per_ip, slots=slots)
+
+    @classmethod
+    async def create(cls, settings=None):
+        instance = cls.from_settings(settings if settings is not None else {})
+        instance.__wakeups = await DelayStream.create(name='throttle_wakeup')
+        instance.__ready_event = Event()
+        return instance
+
+    def parked(self) -> int:
+        """被暂缓调度的请求数量"""
+        return self.__parked
+
+    def active(self) -> int:
+        """已放行但还没有归还并发数的请求数量"""
+        return len(self.__active)
+
+    def get_slot(self, key: str) -> Optional[DownloadSlot]:
+        return self.__slots.get(key)
+
+    def configure_slot(self, key: str, delay: Optional[float]=None, concurrency: Optional[int]=None) -> None:
+        """调整域名(或者IP)的下载间隔和并发数, 对已有的和之后创建的下载槽都生效
+
+        Args:
+            key (str): 域名(或者IP)
+            delay (Optional[float], optional): 下载间隔(秒), 为 ``None`` 时不调整. 默认为: None
+            concurrency (Optional[int], optional): 并发数, 0为不限制, 为 ``None`` 时不调整. 默认为: None
+        """
+        options = self.__slot_settings.setdefault(key, {})
+        slot = self.__slots.get(key)
+        if delay is not None:
+           options['delay'] = delay
+           if slot is not None:
+              slot.bucket.rate = 1 / delay if delay > 0 else 0
+        if concurrency is not None:
+           options['concurrency'] = concurrency
+           if slot is not None:
+              slot.concurrency = concurrency
+        if slot is not None and not self.__closed:
+           self.__pump(slot)
+
+    def __slot_key(self, request: Request) -> str:
+        host = url_host(str(request.uri)) or ''
+        if not self.__per_ip or not host:
+           return host
+        address = self.__addresses.get(host)
+        if address is None:
+           if host not in self.__resolving:
+              self.__resolving[host] = asyncio.ensure_future(self.__resolve(host))
+           return host
+        return address
+
+    async def __resolve(self, host: str) -> None:
+        try:
+            addresses = await dns.get_dnscache().resolve(host)
+            address = addresses[0]['host'] if addresses else host
+        except (OSError, UnicodeError):
+            address = host
+        finally:
+            self.__resolving.pop(host, None)
+        self.__addresses[host] = address
+        if address != host and not self.__closed:
+           self.__migrate(host, address)
+
+    def __migrate(self, host: str, address: str) -> None:
+        # 解析完成之前按照域名暂缓和放行的请求合并到IP的下载槽, 避免同一个IP同时按照域名和IP两个下载槽限制并发
+        slot = self.__slots.pop(host, None)
+        if slot is None:
+           return
+        target = self.__slots.get(address)
+        if target is None:
+           target = self.__slots[address] = self.__new_slot(address)
+        target.requests.extend(slot.requests)
+        slot.requests.clear()
+        if slot.active:
+           for request_id, active_slot in self.__active.items():
+               if active_slot is slot:
+                  self.__active[request_id] = target
+           target.active += slot.active
+           slot.active = 0
+        self.__pump(target)
+
+    def __new_slot(self, key: str) -> DownloadSlot:
+        options = self.__slot_settings.get(key, {})
+        return DownloadSlot(key, delay=options.get('delay', self.__delay), concurrency=options.get('concurrency', self.__concurrency), burst=options.get('burst', self.__burst))
+
+    async def put(self, request: Request) -> None:
+        """请求进入所属域名的队列, 满足条件时立即放行
+
+        Args:
+            request (Request): 请求
+        """
+        if self.__closed:
+           return
+        key = self.__slot_key(request)
+        slot = self.__slots.get(key)
+        if slot is None:
+           slot = self.__slots[key] = self.__new_slot(key)
+        slot.requests.append(request)
+        self.__parked += 1
+        self.__pump(slot)
+        self.__puts += 1
+        if self.__puts % self.SWEEP_INTERVAL == 0:
+           self.__sweep()
+
+    def release(self, request: Request) -> None:
+        """归还放行请求占用的并发数
+
+        Args:
+            request (Request): 放行的请求
+        """
+        slot = self.__active.pop(id(request), None)
+        if slot is None:
+           return
+        slot.active -= 1
+        if not self.__closed:
+           self.__pump(slot)
+
+    def __pump(self, slot: DownloadSlot) -> None:
+        if slot.waiting:
+           return
+        now = asyncio.get_event_loop().time()
+        while slot.requests and (slot.concurrency <= 0 or slot.active < slot.concurrency):
+            wait = slot.bucket.consume(now)
+            if wait > 0:
+               slot.waiting = True
+               self.__wakeups.write_at(slot, now + wait)
+               return
+            request = slot.requests.popleft()
+            self.__parked -= 1
+            slot.active += 1
+            self.__active[id(request)] = slot
+            self.__ready.append(request)
+            self.__ready_event.set()
+
+    def __sweep(self) -> None:
+        now = asyncio.get_event_loop().time()
+        for key in [key for key, slot in self.__slots.items() if slot.is_idle(now)]:
+            del self.__slots[key]
+
+    async def get_ready(self) -> List[Request]:
+        """获取放行的请求, 阻塞直到有请求被放行
+
+        Returns:
+            List[Request]: 放行的请求, 关闭后返回空列表
+        """
+        while not self.__ready:
+            if self.__closed:
+               return []
+            self.__ready_event.clear()
+            await self.__ready_event.wait()
+        ready = list(self.__ready)
+        self.__ready.clear()
+        return ready
+
+    async def run(self) -> None:
+        async with self.__wakeups.read() as wakeups:
+            async for slot in wakeups:
+                slot.waiting = False
+                self.__pump(slot)
+
+    async def close(self) -> None:
+        if self.__closed:
+           return
+        self.__closed = True
+        for resolving in list(self.__resolving.values()):
+            resolving.cancel()
+        self.__resolving.clear()
+        for slot in self.__slots.values():
+            slot.requests.clear()
+        self.__slots.clear()
+        self.__active.clear()
+        self.__parked = 0
+        self.__ready.clear()
+        self.__ready_event.set()
+        await self.__wakeups.close()
+        self.logger.debug(f'{self.__class__.__name__} closed')
@@ -0,0 +1,563 @@
+import ssl
+import sys
+import json
+import codecs
+import asyncio
+import logging
+from collections import deque
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+from araneid.core.downloader import Downloader
+from araneid.core.stream import Stream
+from araneid.downloader.aiohttp import Http, HttpConnectionClose, HttpResponseTooLarge, guess_encoding
+from araneid.network import dns, compression
+from araneid.network.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+class Http2NotSupported(Exception):
+    """源站不支持HTTP/2, 请求交给 :py:obj:`~araneid.downloader.aiohttp.Http` 下载器下载"""
+
+class Http2StreamReset(Exception):
+
+    def __init__(self, stream_id, error_code) -> None:
+        self.__stream_id__ = stream_id
+        self.__error_code__ = error_code
+
+    def __str__(self):
+        return 'HTTP/2 stream {stream_id} reset by server (error code: {error_code})'.format(stream_id=self.__stream_id__, error_code=self.__error_code__)
+
+
+def response_encoding(headers, sample: bytes) -> str:
+    """获取请求响应的编码, 和aiohttp相同, 响应头中没有指定编码时根据 ``sample`` 猜测编码"""
+    from aiohttp.helpers import parse_mimetype
+    mimetype = parse_mimetype(headers.get('Content-Type', '').lower())
+    encoding = mimetype.parameters.get('charset')
+    if encoding:
+       try:
+           codecs.lookup(encoding)
+           return encoding
+       except LookupError:
+           pass
+    if mimetype.type == 'application' and mimetype.subtype in ('json', 'rdap'):
+       return 'utf-8'
+    return guess_encoding(sample)
+
+
+class Http2Stream(object):
+    """一个请求对应的HTTP/2流"""
+    __slots__ = ['request', 'maxsize', 'warnsize', 'warned', 'status', 'headers', 'chunks', 'size', 'done']
+
+    def __init__(self, request: HttpRequest, maxsize: int=0, warnsize: int=0):
+        self.request = request
+        self.maxsize = maxsize
+        self.warnsize = warnsize
+        self.warned = False
+        self.status = None
+        self.headers = None
+        self.chunks = []
+        self.size = 0
+        self.done = None
+
+
+class Http2Connection(asyncio.Protocol):
+    """到一个源站(协议, 域名, 端口)的HTTP/2连接, 所有请求作为流复用该连接.
+
+    同时打开的流不超过 ``max_streams`` 和服务端 ``SETTINGS_MAX_CONCURRENT_STREAMS`` 中的较小值, 超出的请求等待其他流结束.
+    连接和流的接收窗口为 ``window_size`` , 收到数据后立即补充; 发送请求内容时等待服务端的流量控制窗口.
+    服务端发送 ``GOAWAY`` 后不再接受新的请求, 已经打开的流结束后关闭连接.
+    """
+
+    def __init__(self, max_streams: int=256, window_size: int=16*1024*1024):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        self.max_streams = max_streams
+        self.window_size = min(window_size, 2**31-1)
+        self.negotiated = False
+        self.__settled = False
+        self.__h2 = H2Connection(config=H2Configuration(client_side=True, header_encoding='utf-8'))
+        self.__transport = None
+        self.__streams: Dict[int, Http2Stream] = {}
+        self.__active = 0
+        self.__waiters = deque()
+        self.__window_updated = asyncio.Event()
+        self.__closed = False
+        self.__goaway = False
+
+    @property
+    def available(self) -> bool:
+        return self.negotiated and not self.__closed and not self.__goaway
+
+    def connection_made(self, transport):
+        from h2.settings import Settings, SettingCodes
+        self.__transport = transport
+        ssl_object = transport.get_extra_info('ssl_object')
+        if ssl_object is not None and ssl_object.selected_alpn_protocol() != 'h2':
+           return
+        self.negotiated = True
+        self.__h2.local_settings = Settings(client=True, initial_values={SettingCodes.ENABLE_PUSH: 0, SettingCodes.INITIAL_WINDOW_SIZE: self.window_size})
+        self.__h2.initiate_connection()
+        if self.window_size > 65535:
+           self.__h2.increment_flow_control_window(self.window_size - 65535)
+        self.__flush()
+
+    def connection_lost(self, exc):
+        self.__fail(exc or ConnectionResetError('HTTP/2 connection closed'))
+
+    def data_received(self, data: bytes):
+        from h2 import events
+        from h2.exceptions import ProtocolError
+        try:
+            received = self.__h2.receive_data(data)
+        except ProtocolError as e:
+            self.__flush()
+            self.__fail(e)
+            self.__transport.close()
+            return
+        for event in received:
+            if isinstance(event, events.DataReceived):
+               self.__data_received(event)
+            elif isinstance(event, events.ResponseReceived):
+               self.__response_received(event)
+            elif isinstance(event, events.StreamEnded):
+               stream = self.__streams.pop(event.stream_id, None)
+               if stream is not None and not stream.done.done():
+                  stream.done.set_result(None)
+            elif isinstance(event, events.StreamReset):
+               self.__finish(event.stream_id, Http2StreamReset(event.stream_id, event.error_code))
+            elif isinstance(event, events.WindowUpdated):
+               self.__window_updated.set()
+            elif isinstance(event, events.RemoteSettingsChanged):
+               self.__settled = True
+               self.__wakeup()
+            elif isinstance(event, events.ConnectionTerminated):
+               self.__terminated(event)
+        self.__flush()
+
+    def __response_received(self, event):
+        stream = self.__streams.get(event.stream_id)
+        if stream is None:
+           return
+        headers = []
+        for name, value in event.headers:
+            if name == ':status':
+               stream.status = int(value)
+            elif not name.startswith(':'):
+               headers.append((name, value))
+        stream.headers = headers
+        expected = next((value for name, value in headers if name == 'content-length'), None)
+        if stream.maxsize and expected and expected.isdigit() and int(expected) > stream.maxsize:
+           self.__cancel(event.stream_id, HttpResponseTooLarge(stream.request, int(expected), stream.maxsize))
+
+    def __data_received(self, event):
+        from h2.exceptions import StreamClosedError
+        try:
+            self.__h2.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        except StreamClosedError:
+            pass
+        stream = self.__streams.get(event.stream_id)
+        if stream is None:
+           return
+        stream.chunks.append(event.data)
+        stream.size += len(event.data)
+        if stream.maxsize and stream.size > stream.maxsize:
+           self.__cancel(event.stream_id, HttpResponseTooLarge(stream.request, stream.size, stream.maxsize))
+        elif stream.warnsize and not stream.warned and stream.size > stream.warnsize:
+           logger.warning(f'{stream.request} received response size ({stream.size} bytes) larger than download warn size ({stream.warnsize} bytes).')
+           stream.warned = True
+
+    def __terminated(self, event):
+        self.__goaway = True
+        # 服务端没有处理的流可以安全地重试
+        for stream_id in [stream_id for stream_id in self.__streams if stream_id > event.last_stream_id]:
+            self.__finish(stream_id, ConnectionResetError(f'HTTP/2 connection terminated by server (error code: {event.error_code})'))
+        self.__wakeup()
+        if not self.__streams:
+           self.close()
+
+    def __finish(self, stream_id: int, exception: BaseException) -> None:
+        stream = self.__streams.pop(stream_id, None)
+        if stream is not None and not stream.done.done():
+           stream.done.set_exception(exception)
+
+    def __reset(self, stream_id: int) -> Optional[Http2Stream]:
+        from h2.errors import ErrorCodes
+        from h2.exceptions import ProtocolError
+        try:
+            self.__h2.reset_stream(stream_id, ErrorCodes.CANCEL)
+        except ProtocolError:
+            pass
+        return self.__streams.pop(stream_id, None)
+
+    def __cancel(self, stream_id: int, exception: BaseException) -> None:
+        stream = self.__reset(stream_id)
+        if stream is not None and not stream.done.done():
+           stream.done.set_exception(exception)
+
+    def __fail(self, exception: BaseException) -> None:
+        self.__closed = True
+        for stream_id in list(self.__streams):
+            self.__finish(stream_id, exception)
+        while self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+               waiter.set_exception(exception)
+        self.__window_updated.set()
+
+    def __flush(self) -> None:
+        data = self.__h2.data_to_send()
+        if data and self.__transport is not None and not self.__transport.is_closing():
+           self.__transport.write(data)
+
+    def __limit(self) -> int:
+        # 收到服务端的第一个 ``SETTINGS`` 之前不知道服务端的并发流限制, 只打开一个流
+        if not self.__settled:
+           return 1
+        return max(1, min(self.max_streams, self.__h2.remote_settings.max_concurrent_streams))
+
+    def __wakeup(self) -> None:
+        free = self.__limit() - self.__active
+        while free > 0 and self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+               waiter.set_result(None)
+               free -= 1
+
+    async def __acquire(self) -> None:
+        while self.__active >= self.__limit():
+            waiter = asyncio.get_event_loop().create_future()
+            self.__waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                   self.__wakeup()
+                raise
+            if not self.available:
+               raise ConnectionResetError('HTTP/2 connection is not available')
+        self.__active += 1
+
+    def __release(self) -> None:
+        self.__active -= 1
+        self.__wakeup()
+
+    async def __send_body(self, stream_id: int, body: bytes) -> None:
+        offset = 0
+        while offset < len(body):
+            window = self.__h2.local_flow_control_window(stream_id)
+            if window <= 0:
+               self.__window_updated.clear()
+               await self.__window_updated.wait()
+               if self.__closed:
+                  raise ConnectionResetError('HTTP/2 connection closed')
+               continue
+            size = min(window, self.__h2.max_outbound_frame_size, len(body) - offset)
+            self.__h2.send_data(stream_id, body[offset:offset+size], end_stream=offset+size == len(body))
+            offset += size
+            self.__flush()
+
+    async def request(self, headers: List[Tuple[str, str]], body: Optional[bytes], stream: Http2Stream) -> Http2Stream:
+        """在新的流上发送请求, 等待请求响应接收完成
+
+        Args:
+            headers (List[Tuple[str, str]]): 请求头, 包括伪头
+            body (Optional[bytes]): 请求内容
+            stream (Http2Stream): 流
+
+        Returns:
+            Http2Stream: 接收完成的流
+        """
+        from h2.exceptions import NoAvailableStreamIDError
+        if not self.available:
+           raise ConnectionResetError('HTTP/2 connection is not available')
+        await self.__acquire()
+        stream_id = None
+        try:
+            try:
+                stream_id = self.__h2.get_next_available_stream_id()
+            except NoAvailableStreamIDError:
+                self.__goaway = True
+                raise ConnectionResetError('HTTP/2 connection ran out of stream ids')
+            stream.done = asyncio.get_event_loop().create_future()
+            self.__streams[stream_id] = stream
+            self.__h2.send_headers(stream_id, headers, end_stream=not body)
+            self.__flush()
+            if body:
+               await self.__send_body(stream_id, body)
+            await stream.done
+            return stream
+        finally:
+            if stream_id is not None and stream_id in self.__streams:
+               # 超时或者被取消
+               self.__reset(stream_id).done.cancel()
+               self.__flush()
+            self.__release()
+            if self.__goaway and not self.__streams:
+               self.close()
+
+    def close(self) -> None:
+        if self.__transport is None or self.__transport.is_closing():
+           return
+        from h2.exceptions import ProtocolError
+        if self.negotiated and not self.__closed:
+           try:
+               self.__h2.close_connection()
+               self.__flush()
+           except ProtocolError:
+               pass
+        self.__closed = True
+        self.__transport.close()
+
+
+class Http2(Downloader):
+    """基于 ``h2`` 的HTTP/2下载器, 请求指定 ``downloader='Http2'`` 时使用, 请求和返回的请求响应与 :py:obj:`~araneid.downloader.aiohttp.Http` 下载器相同.
+
+    每个源站(协议, 域名, 端口)只建立一个连接(参考 :py:obj:`Http2Connection` ), 所有请求作为流复用该连接. 配置:
+
+    * ``HTTP2_MAX_STREAMS`` : 每个连接同时打开的最大流数量, 实际不超过服务端的 ``SETTINGS_MAX_CONCURRENT_STREAMS`` , 默认为: 256
+    * ``HTTP2_WINDOW_SIZE`` : 连接和流的接收窗口大小(字节), 默认为: 16777216 (16M)
+    * ``HTTP2_PRIOR_KNOWLEDGE`` : 是否直接使用HTTP/2(h2c)下载 ``http://`` 的请求, 否则交给 ``Http`` 下载器, 默认为: False
+    * ``HTTP2_MAX_REDIRECTS`` : 最大重定向次数, 默认为: 10
+
+    ``https://`` 的请求通过TLS的ALPN协商协议, 不支持HTTP/2的源站以及使用代理的请求交给 ``Http`` 下载器下载, 重定向到不支持HTTP/2的源站时返回重定向的请求响应.
+    ``DOWNLOAD_MAXSIZE`` , ``DOWNLOAD_WARNSIZE`` , ``HTTP_DECOMPRESS_THRESHOLD`` 以及 ``HTTP_CONNECT_TIMEOUT`` (连接由多个请求共用, 不能通过请求的 ``meta`` 覆盖)和 ``Http`` 下载器相同, 请求响应内容总是字节串, 并且不触发 ``bytes_received`` 信号.
+    """
+    REDIRECT_STATUSES = frozenset([301, 302, 303, 307, 308])
+    # HTTP/2禁止的逐跳请求头
+    CONNECTION_HEADERS = frozenset(['connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade', 'host'])
+    USER_AGENT = 'Python/{0[0]}.{0[1]} araneid'.format(sys.version_info)
+    DECODE_CHUNK_SIZE = 65536
+
+    def __init__(self, max_streams: int=256, window_size: int=16*1024*1024, prior_knowledge: bool=False, max_redirects: int=10,
+                 maxsize: int=1024*1024*1024, warnsize: int=32*1024*1024, decompress_threshold: int=128*1024, connect_timeout: Optional[float]=10):
+        super().__init__()
+        self.max_streams = max_streams
+        self.window_size = window_size
+        self.prior_knowledge = prior_knowledge
+        self.max_redirects = max_redirects
+        self.maxsize = maxsize
+        self.warnsize = warnsize
+        self.decompress_threshold = decompress_threshold
+        self.connect_timeout = connect_timeout or None
+        self.fallback: Optional[Http] = None
+        self.cookie_jar = None
+        self.ssl_context = None
+        self.__connections: Dict[tuple, Http2Connection] = {}
+        self.__connecting: Dict[tuple, asyncio.Future] = {}
+        self.__http1_origins = set()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(max_streams=settings.get('HTTP2_MAX_STREAMS', 256),
+                   window_size=settings.get('HTTP2_WINDOW_SIZE', 16*1024*1024),
+                   prior_knowledge=settings.get('HTTP2_PRIOR_KNOWLEDGE', False),
+                   max_redirects=settings.get('HTTP2_MAX_REDIRECTS', 10),
+                   maxsize=settings.get('DOWNLOAD_MAXSIZE', 1024*1024*1024),
+                   warnsize=settings.get('DOWNLOAD_WARNSIZE', 32*1024*1024),
+                   decompress_threshold=settings.get('HTTP_DECOMPRESS_THRESHOLD', 128*1024),
+                   connect_timeout=settings.get('HTTP_CONNECT_TIMEOUT', 10))
+
+    @classmethod
+    async def create(cls, settings=None):
+        settings = settings if settings is not None else {}
+        instance = cls.from_settings(settings)
+        instance.fallback = await Http.create(settings=settings)
+        return instance
+
+    @staticmethod
+    def __origin(url: URL) -> tuple:
+        return (url.scheme, url.raw_host, url.port)
+
+    @staticmethod
+    def __new_ssl_context():
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        ssl_context.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3 | ssl.OP_NO_COMPRESSION
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        ssl_context.set_alpn_protocols(['h2', 'http/1.1'])
+        return ssl_context
+
+    async def __connect(self, origin: tuple) -> Http2Connection:
+        scheme, host, port = origin
+        if scheme == 'https':
+           if self.ssl_context is None:
+              self.ssl_context = self.__new_ssl_context()
+           ssl_context = self.ssl_context
+        elif scheme == 'http' and self.prior_knowledge:
+           ssl_context = None
+        else:
+           raise Http2NotSupported(f'{scheme}://{host}:{port} does not support HTTP/2')
+        loop = asyncio.get_event_loop()
+        error = None
+        for address in await dns.get_dnscache().resolve(host, port):
+            try:
+                _, connection = await asyncio.wait_for(loop.create_connection(lambda: Http2Connection(max_streams=self.max_streams, window_size=self.window_size), address['host'], port,
+                                                                              ssl=ssl_context, server_hostname=host if ssl_context else None), self.connect_timeout)
+            except asyncio.TimeoutError:
+                error = ConnectionError(f'Connection timeout to {scheme}://{host}:{port} ({address["host"]}) after {self.connect_timeout}s')
+                continue
+            except OSError as e:
+                error = e
+                continue
+            if not connection.negotiated:
+               connection.close()
+               raise Http2NotSupported(f'{scheme}://{host}:{port} does not support HTTP/2')
+            return connection
+        raise error or ConnectionError(f'Failed to connect to {scheme}://{host}:{port}')
+
+    async def __connection(self, origin: tuple) -> Http2Connection:
+        connection = self.__connections.get(origin)
+        if connection is not None and connection.available:
+           return connection
+        connecting = self.__connecting.get(origin)
+        if connecting is None:
+           connecting = self.__connecting[origin] = asyncio.ensure_future(self.__connect(origin))
+           def __(future):
+               self.__connecting.pop(origin, None)
+               if future.cancelled():
+                  return
+               if isinstance(future.exception(), Http2NotSupported):
+                  self.__http1_origins.add(origin)
+               elif future.exception() is None:
+                  self.__connections[origin] = future.result()
+           connecting.add_done_callback(__)
+        return await asyncio.shield(connecting)
+
+    @staticmethod
+    def __encode_body(request: HttpRequest) -> Tuple[Optional[bytes], Optional[str]]:
+        # 和aiohttp相同的请求内容编码
+        if request.json is not None:
+           return json.dumps(request.json).encode('utf-8'), 'application/json'
+        data = request.data
+        if data is None:
+           return None, None
+        if isinstance(data, (dict, list, tuple)):
+           return urlencode(data, doseq=True).encode('utf-8'), 'application/x-www-form-urlencoded'
+        if isinstance(data, str):
+           return data.encode('utf-8'), 'text/plain; charset=utf-8'
+        return bytes(data), 'application/octet-stream'
+
+    def __headers(self, url: URL, method: str, request: HttpRequest, body: Optional[bytes], content_type: Optional[str]) -> List[Tuple[str, str]]:
+        host = url.raw_host if ':' not in url.raw_host else f'[{url.raw_host}]'
+        authority = host if url.is_default_port() else f'{host}:{url.port}'
+        headers = [(':method', method), (':authority', authority), (':scheme', url.scheme), (':path', url.raw_path_qs or '/')]
+        names = set()
+        for name, value in (request.headers or {}).items():
+            name = name.lower()
+            if name in self.CONNECTION_HEADERS:
+               continue
+            names.add(name)
+            headers.append((name, value))
+        for name, value in (('accept', '*/*'), ('accept-encoding', compression.accept_encoding()), ('user-agent', self.USER_AGENT), ('content-type', content_type)):
+            if value is not None and name not in names:
+               headers.append((name, value))
+        if body is not None:
+           headers.append(('content-length', str(len(body))))
+        if 'cookie' not in names:
+           cookies = {name: morsel.value for name, morsel in self.cookie_jar.filter_cookies(url).items()}
+           cookies.update(request.cookies or {})
+           if cookies:
+              headers.append(('cookie', '; '.join(f'{name}={value}' for name, value in cookies.items())))
+        return headers
+
+    def __decode(self, request: HttpRequest, decoder: compression.ContentDecoder, body: bytes, maxsize: int) -> bytes:
+        decoded = []
+        size = 0
+        for start in range(0, len(body), self.DECODE_CHUNK_SIZE):
+            decoded.append(decoder.decompress(body[start:start+self.DECODE_CHUNK_SIZE]))
+            size += len(decoded[-1])
+            if maxsize and size > maxsize:
+               raise HttpResponseTooLarge(request, size, maxsize)
+        decoded.append(decoder.flush())
+        size += len(decoded[-1])
+        if maxsize and size > maxsize:
+           raise HttpResponseTooLarge(request, size, maxsize)
+        return b''.join(decoded)
+
+    async def __response(self, request: HttpRequest, url: URL, stream: Http2Stream, history: list) -> HttpResponse:
+        headers = CIMultiDict(stream.headers)
+        body = b''.join(stream.chunks)
+        decoder = compression.ContentDecoder.from_encoding(headers.get('Content-Encoding'))
+        if decoder is not None:
+           if self.decompress_threshold and len(body) > self.decompress_threshold:
+              body = await asyncio.get_event_loop().run_in_executor(None, self.__decode, request, decoder, body, stream.maxsize)
+           else:
+              body = self.__decode(request, decoder, body, stream.maxsize)
+           headers = compression.decoded_headers(headers)
+        cookies = SimpleCookie()
+        for set_cookie in headers.getall('Set-Cookie', ()):
+            cookies.load(set_cookie)
+        if cookies:
+           self.cookie_jar.update_cookies(cookies, url)
+        try:
+            reason = HTTPStatus(stream.status).phrase
+        except ValueError:
+            reason = ''
+        return HttpResponse.from_request(request=request, content=body, length=len(body), status=stream.status, headers=CIMultiDictProxy(headers), history=tuple(history),
+                                         encoding=response_encoding(headers, body[:self.DECODE_CHUNK_SIZE]), reason=reason, cookies={name: morsel.value for name, morsel in cookies.items()})
+
+    async def __fetch(self, request: HttpRequest) -> HttpResponse:
+        if self.cookie_jar is None:
+           from aiohttp import CookieJar
+           self.cookie_jar = CookieJar()
+        url = URL(str(request.uri))
+        method = request.method.upper()
+        body, content_type = self.__encode_body(request)
+        maxsize = request.meta.get('download_maxsize', self.maxsize)
+        warnsize = request.meta.get('download_warnsize', self.warnsize)
+        history = []
+        while True:
+            connection = await self.__connection(self.__origin(url))
+            stream = await connection.request(self.__headers(url, method, request, body, content_type), body, Http2Stream(request, maxsize=maxsize, warnsize=warnsize))
+            if stream.status is None:
+               raise ConnectionResetError(f'HTTP/2 stream of {request} ended without response headers')
+            location = next((value for name, value in stream.headers if name == 'location'), None)
+            if stream.status not in self.REDIRECT_STATUSES or not location:
+               return await self.__response(request, url, stream, history)
+            if len(history) >= self.max_redirects:
+               raise HttpConnectionClose(request, exception=f'Too many redirects ({len(history)})')
+            redirect = url.join(URL(location))
+            if self.__origin(redirect) in self.__http1_origins or (redirect.scheme == 'http' and not self.prior_knowledge):
+               logger.debug(f'{request} is redirected to {redirect} which does not support HTTP/2.')
+               return await self.__response(request, url, stream, history)
+            history.append(await self.__response(request, url, stream, []))
+            if (stream.status == 303 and method != 'HEAD') or (stream.status in (301, 302) and method == 'POST'):
+               method, body, content_type = 'GET', None, None
+            url = redirect
+
+    async def download(self, request: HttpRequest):
+        assert (isinstance(request, HttpRequest))
+        async def close(channel: Stream):
+            await channel.join()
+            await channel.close()
+        if request.proxy or self.__origin(URL(str(request.uri))) in self.__http1_origins:
+           return await self.fallback.download(request)
+        timeout = getattr(request.timeout, 'total', request.timeout)
+        try:
+            response = await asyncio.wait_for(self.__fetch(request), timeout) if timeout else await self.__fetch(request)
+        except Http2NotSupported:
+            return await self.fallback.download(request)
+        except asyncio.TimeoutError as e:
+            raise HttpConnectionClose(request, exception=f'Timeout {timeout}s (limited)') from e
+        except (HttpConnectionClose, HttpResponseTooLarge):
+            raise
+        except Exception as e:
+            raise HttpConnectionClose(request, exception=e) from e
+        channel = await Stream.create()
+        await channel.write(response)
+        asyncio.ensure_future(close(channel))
+        return channel
+
+    async def close(self):
+        for connecting in list(self.__connecting.values()):
+            connecting.cancel()
+        for connection in self.__connections.values():
+            connection.close()
+        self.__connections.clear()
+        if self.fallback is not None:
+           await self.fallback.close()
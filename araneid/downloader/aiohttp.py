@@ -1,11 +1,21 @@
+import ssl
+import random
 import logging
 import time
+import asyncio
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from tempfile import SpooledTemporaryFile
 from socket import AF_INET
 from asyncio import TimeoutError, ensure_future
+from typing import Callable, Dict, Hashable, Optional
 from urllib.parse import urlparse
+from multidict import CIMultiDictProxy
 from araneid.core import signal
 from araneid.core.downloader import Downloader
-from araneid.core.exception import DownloaderWarn, RequestException
+from araneid.core.exception import DownloaderWarn, RequestException, StopDownload
+from araneid.network import dns, compression
 from araneid.network.http import HttpRequest, HttpResponse
 from araneid.core.stream import Stream
 from araneid.core.exception import HttpRequestProxyError
@@ -19,63 +29,133 @@ class HttpConnectionClose(DownloaderWarn, RequestException):
     def __str__(self):
         return '{request} connection has been closed (exception: {exception})'.format(request=self.__request__, exception=self.__exception__)
 
-class Tracer:
+class HttpResponseTooLarge(DownloaderWarn, RequestException):
+    def __init__(self, request, size, maxsize) -> None:
+        self.__request__ = request
+        self.__size__ = size
+        self.__maxsize__ = maxsize
 
-    @classmethod
-    async def on_request_start(cls, session, trace_config_ctx, params):
-        http_req = f'HttpRequest<url={params.url}, method={params.method}, headers={params.headers}>'
-        trace_config_ctx.request = http_req
-        trace_config_ctx.start = time.time()
-        logger.debug(f"{http_req} start.")
+    def __str__(self):
+        return '{request} response size ({size} bytes) larger than download max size ({maxsize} bytes)'.format(request=self.__request__, size=self.__size__, maxsize=self.__maxsize__)
 
+def detect_encoding(response, sample: bytes) -> str:
+    """获取请求响应的编码, 响应头中没有指定编码时根据 ``sample`` 猜测编码
 
-    @classmethod
-    async def on_connection_create_start(cls, session, trace_config_ctx, params):
-        trace_config_ctx.connection_create_start = time.time()
-        logger.debug(f"{trace_config_ctx.request} connection create.")
+    Args:
+        response (ClientResponse): aiohttp的请求响应
+        sample (bytes): 用来猜测编码的请求响应内容
 
-    @classmethod
-    async def on_connection_create_end(cls, session, trace_config_ctx, params):
-        current = time.time()
-        trace_config_ctx.connection_create_end = current
-        connection_create_elapsed = current - trace_config_ctx.connection_create_start
-        logger.debug(f"{trace_config_ctx.request} connection created. (connection create cost: {connection_create_elapsed:.4} s).")
- 
-    @classmethod
-    async def on_dns_resolvehost_start(cls, session, trace_config_ctx, params):
-        trace_config_ctx.dns_resolvehost_start = time.time()
-        logger.debug(f"{trace_config_ctx.request} dns resolve start. (host:<{params.host}>).")
+    Returns:
+        str: 编码
+    """
+    try:
+        return response.get_encoding()
+    except RuntimeError:
+        # the body is streamed, so aiohttp can't guess the encoding by itself
+        pass
+    return guess_encoding(sample)
 
-    @classmethod
-    async def on_dns_resolvehost_end(cls, session, trace_config_ctx, params):
-        current = time.time()
-        trace_config_ctx.dns_resolvehost_end = current
-        dns_resolvehost_elapsed = current - trace_config_ctx.dns_resolvehost_start
-        logger.debug(f"{trace_config_ctx.request} dns resolve end. (host:<{params.host}>, dns resolve cost: {dns_resolvehost_elapsed:.4} s).")
+def guess_encoding(sample: bytes) -> str:
+    """根据请求响应内容猜测编码, 依次使用 ``cchardet`` , ``chardet`` 和 ``charset_normalizer``"""
+    try:
+        import cchardet as chardet
+    except ImportError:
+        try:
+            import chardet
+        except ImportError:
+            import charset_normalizer as chardet
+    return chardet.detect(sample)['encoding'] or 'utf-8'
 
-    @classmethod
-    async def on_response_chunk_received(cls, session, trace_config_ctx, params):
-        elapsed =  time.time() - trace_config_ctx.start 
-        logger.debug(f"{trace_config_ctx.request} response received. (cost: {elapsed:.4} s).")
+class TraceContext(object):
+    """被采样的请求的各阶段耗时(秒), 没有经过的阶段(例如复用连接时的 ``dns`` 和 ``connect`` )为 ``None``
 
-    @classmethod
-    async def on_request_exception(cls, session, trace_config_ctx, params):
-        http_req = trace_config_ctx.request
-        elapsed = time.time() - trace_config_ctx.start
-        logger.debug(f"{http_req}  end by exception (cost: {elapsed:.4} s).", exc_info=params.exception)
+    * ``queue`` : 等待连接池中的空闲连接
+    * ``dns`` : 解析域名
+    * ``connect`` : 建立连接, Https请求包括TLS握手(aiohttp没有单独的TLS握手事件)
+    * ``ttfb`` : 发送完请求头到接收到响应头
+    * ``body`` : 读取响应内容
+    * ``total`` : 整个请求
+    """
+    __slots__ = ['start', 'queue_start', 'dns_start', 'connect_start', 'headers_sent', 'queue', 'dns', 'connect', 'ttfb', 'body', 'total']
+    PHASES = ('queue', 'dns', 'connect', 'ttfb', 'body', 'total')
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
 
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queue_start = self.dns_start = self.connect_start = self.headers_sent = None
+        self.queue = self.dns = self.connect = self.ttfb = self.body = self.total = None
 
-    @classmethod
-    async def on_request_end(cls, session, trace_config_ctx, params):
-        http_req = trace_config_ctx.request
-        elapsed = time.time() - trace_config_ctx.start
-        logger.debug(f"{http_req} end (cost: {elapsed:.4} s).")
+    def timings(self) -> Dict[str, float]:
+        return {phase: getattr(self, phase) for phase in self.PHASES if getattr(self, phase) is not None}
 
+    def record(self, stats, spider=None) -> None:
+        """将各阶段耗时记录到统计的直方图中: ``trace/http/<阶段>/`` 下的 ``count`` , ``sum`` , ``max`` 以及每个区间的计数 ``le_<区间上限>``
+
+        Args:
+            stats (StatsCollector): 统计
+            spider (Spider, optional): 爬虫. 默认为: None
+        """
+        for phase, elapsed in self.timings().items():
+            bucket = bisect_left(self.BUCKETS, elapsed)
+            bucket = self.BUCKETS[bucket] if bucket < len(self.BUCKETS) else 'inf'
+            stats.inc_value(f'trace/http/{phase}/count', spider=spider, sep='/')
+            stats.inc_value(f'trace/http/{phase}/sum', elapsed, spider=spider, sep='/')
+            stats.max_value(f'trace/http/{phase}/max', elapsed, spider=spider, sep='/')
+            stats.inc_value(f'trace/http/{phase}/le_{bucket}', spider=spider, sep='/')
+
+
+class Tracer:
+    """aiohttp的请求跟踪事件处理器, 只在启用跟踪( ``HTTP_TRACE_ENABLED`` )时注册到会话上, 并且只处理被采样的请求(请求的 ``trace_request_ctx`` 为 :py:obj:`TraceContext` )
     """
-    @classmethod
-    async def on_request_headers_sent(cls, session, trace_config_ctx, params):
-        logger.debug("on_request_headers_sent")
-    """
+
+    @staticmethod
+    async def on_connection_queued_start(session, trace_config_ctx, params):
+        trace = trace_config_ctx.trace_request_ctx
+        if trace is not None:
+           trace.queue_start = time.perf_counter()
+
+    @staticmethod
+    async def on_connection_queued_end(session, trace_config_ctx, params):
+        trace = trace_config_ctx.trace_request_ctx
+        if trace is not None and trace.queue_start is not None:
+           trace.queue = time.perf_counter() - trace.queue_start
+
+    @staticmethod
+    async def on_dns_resolvehost_start(session, trace_config_ctx, params):
+        trace = trace_config_ctx.trace_request_ctx
+        if trace is not None:
+           trace.dns_start = time.perf_counter()
+
+    @staticmethod
+    async def on_dns_resolvehost_end(session, trace_config_ctx, params):
+        trace = trace_config_ctx.trace_request_ctx
+        if trace is not None and trace.dns_start is not None:
+           trace.dns = time.perf_counter() - trace.dns_start
+
+    @staticmethod
+    async def on_connection_create_start(session, trace_config_ctx, params):
+        trace = trace_config_ctx.trace_request_ctx
+        if trace is not None:
+           trace.connect_start = time.perf_counter()
+
+    @staticmethod
+    async def on_connection_create_end(session, trace_config_ctx, params):
+        trace = trace_config_ctx.trace_request_ctx
+        if trace is not None and trace.connect_start is not None:
+           # 连接器的DNS解析在建立连接的过程中
+           trace.connect = time.perf_counter() - trace.connect_start - (trace.dns or 0)
+
+    @staticmethod
+    async def on_request_headers_sent(session, trace_config_ctx, params):
+        trace = trace_config_ctx.trace_request_ctx
+        if trace is not None:
+           trace.headers_sent = time.perf_counter()
+
+    @staticmethod
+    async def on_request_end(session, trace_config_ctx, params):
+        trace = trace_config_ctx.trace_request_ctx
+        if trace is not None:
+           trace.ttfb = time.perf_counter() - (trace.headers_sent or trace.start)
 
     @classmethod
     def register(cls, trace_config):
@@ -90,30 +170,325 @@ class Tracer:
             signal_handles.append(signal_handle)
         return trace_config
 
+class ConnectorOptions(namedtuple('ConnectorOptions', ['limit', 'limit_per_host', 'keepalive_timeout', 'tcp_nodelay', 'dns_cache_ttl', 'ssl_context_reuse', 'force_close'])):
+    """Http下载器的连接器配置
+
+    * ``HTTP_CONNECTOR_LIMIT`` : 最大连接数, 0为不限制, 默认为: 100
+    * ``HTTP_CONNECTOR_LIMIT_PER_HOST`` : 每个地址(域名, 端口)的最大连接数, 0为不限制, 默认为: 0
+    * ``HTTP_CONNECTOR_KEEPALIVE_TIMEOUT`` : 空闲连接保持的时间(秒), 默认为: 15
+    * ``HTTP_CONNECTOR_TCP_NODELAY`` : 是否设置TCP_NODELAY, 默认为: True
+    * ``HTTP_CONNECTOR_DNS_CACHE_TTL`` : 连接器自己的DNS缓存时间(秒), 0为不缓存, ``None`` 为永久缓存, 默认为: 10. 连接器缓存没有命中时使用所有下载器共用的 :py:obj:`~araneid.network.dns.DNSCache`
+    * ``HTTP_CONNECTOR_SSL_CONTEXT_REUSE`` : 是否所有的连接共用一个SSL上下文, 默认为: True
+    * ``HTTP_CONNECTOR_FORCE_CLOSE`` : 是否在每个请求完成后关闭连接, 默认为: False
+    """
+    SETTINGS = OrderedDict([
+        ('limit', ('HTTP_CONNECTOR_LIMIT', 100)),
+        ('limit_per_host', ('HTTP_CONNECTOR_LIMIT_PER_HOST', 0)),
+        ('keepalive_timeout', ('HTTP_CONNECTOR_KEEPALIVE_TIMEOUT', 15)),
+        ('tcp_nodelay', ('HTTP_CONNECTOR_TCP_NODELAY', True)),
+        ('dns_cache_ttl', ('HTTP_CONNECTOR_DNS_CACHE_TTL', 10)),
+        ('ssl_context_reuse', ('HTTP_CONNECTOR_SSL_CONTEXT_REUSE', True)),
+        ('force_close', ('HTTP_CONNECTOR_FORCE_CLOSE', False)),
+    ])
+
+    @classmethod
+    def from_settings(cls, settings, base: 'ConnectorOptions'=None) -> 'ConnectorOptions':
+        """读取连接器配置
+
+        Args:
+            settings (dict): 配置
+            base (ConnectorOptions, optional): 没有配置的选项使用的值, 为 ``None`` 时使用默认值. 默认为: None
+
+        Returns:
+            ConnectorOptions: 连接器配置
+        """
+        return cls(*[settings.get(key, default if base is None else getattr(base, name)) for name, (key, default) in cls.SETTINGS.items()])
+
+    def connector_kwargs(self) -> dict:
+        kwargs = {'limit': self.limit, 'limit_per_host': self.limit_per_host, 'force_close': self.force_close, 'use_dns_cache': self.dns_cache_ttl != 0}
+        if self.dns_cache_ttl != 0:
+           kwargs['ttl_dns_cache'] = self.dns_cache_ttl
+        if not self.force_close:
+           kwargs['keepalive_timeout'] = self.keepalive_timeout
+        return kwargs
+
+
+def delayed_connector(Connector):
+    """创建不设置TCP_NODELAY的连接器(aiohttp在建立连接时总是设置TCP_NODELAY)"""
+    from aiohttp.tcp_helpers import tcp_nodelay
+    class DelayedConnector(Connector):
+
+        async def _wrap_create_connection(self, *args, **kwargs):
+            transport, proto = await super()._wrap_create_connection(*args, **kwargs)
+            tcp_nodelay(transport, False)
+            return transport, proto
+    return DelayedConnector
+
+
+def keepalive_proxy_connector(ProxyConnector):
+    """创建复用Http代理连接的ProxyConnector
+
+    aiohttp为了兼容keep-alive实现有问题的Http代理, 在每个经过Http代理的明文请求完成之后关闭连接, 导致到代理的连接无法复用.
+    """
+    class KeepAliveProxyConnector(ProxyConnector):
+
+        async def _create_proxy_connection(self, req, traces, timeout):
+            transport, proto = await super()._create_proxy_connection(req, traces, timeout)
+            if not req.is_ssl():
+               proto._should_close = False
+            return transport, proto
+    return KeepAliveProxyConnector
+
+
+class PooledSession(object):
+    __slots__ = ['session', 'active', 'last_used']
+
+    def __init__(self, session):
+        self.session = session
+        self.active = 0
+        self.last_used = time.monotonic()
+
+
+class SessionPool(object):
+    """按照代理地址(以及连接器配置)缓存会话的LRU会话池, 同一个代理的请求复用同一个会话(以及其中的连接池), 代替每个请求新建并关闭会话.
+
+    会话池最多保存 ``max_size`` 个会话, 超出时关闭最久没有使用的空闲会话; 空闲超过 ``idle_timeout`` 秒的会话在下一次获取会话时关闭.
+    正在被请求使用的会话不会被关闭.
+    """
+
+    def __init__(self, factory: Callable, max_size: int=64, idle_timeout: float=60):
+        self.__factory = factory
+        self.__max_size = max_size
+        self.__idle_timeout = idle_timeout
+        self.__sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self.__sessions)
+
+    def __contains__(self, key):
+        return key in self.__sessions
+
+    async def acquire(self, key: Hashable) -> PooledSession:
+        """获取代理对应的会话, 使用完成后需要调用 :py:meth:`release` 归还
+
+        Args:
+            key (Hashable): 代理地址, :py:obj:`Http` 中为代理地址和连接器配置
+
+        Returns:
+            PooledSession: 会话
+        """
+        pooled = self.__sessions.get(key)
+        if pooled is None or pooled.session.closed:
+           pooled = self.__sessions[key] = PooledSession(self.__factory(key))
+        else:
+           self.__sessions.move_to_end(key)
+        pooled.active += 1
+        pooled.last_used = time.monotonic()
+        await self.__evict(pooled.last_used)
+        return pooled
+
+    def release(self, pooled: PooledSession) -> None:
+        pooled.active -= 1
+        pooled.last_used = time.monotonic()
+
+    async def __evict(self, now: float) -> None:
+        overflow = len(self.__sessions) - self.__max_size
+        evicted = []
+        for key, pooled in self.__sessions.items():
+            if pooled.active:
+               continue
+            if overflow > 0:
+               overflow -= 1
+            elif now - pooled.last_used < self.__idle_timeout:
+               break
+            evicted.append(key)
+        if not evicted:
+           return
+        closes = [self.__sessions.pop(key).session.close() for key in evicted]
+        await asyncio.gather(*closes, return_exceptions=True)
+
+    async def close(self) -> None:
+        closes = [pooled.session.close() for pooled in self.__sessions.values()]
+        self.__sessions.clear()
+        await asyncio.gather(*closes, return_exceptions=True)
+
+
 class Http(Downloader):
+    """基于aiohttp的Http下载器
 
-    def __init__(self):
+    连接器通过 :py:obj:`ConnectorOptions` 中的配置调整, 爬虫的 ``custom_settings`` 中的连接器配置会覆盖全局配置, 配置不同的爬虫使用各自的会话.
+
+    使用代理的请求从 :py:obj:`SessionPool` 中获取代理和连接器配置对应的会话, 配置:
+
+    * ``HTTP_PROXY_POOL_SIZE`` : 最多缓存的代理会话数量, 0为不缓存(每个请求新建会话), 默认为: 64
+    * ``HTTP_PROXY_POOL_IDLE_TIMEOUT`` : 代理会话空闲多久(秒)后关闭, 默认为: 60
+    * ``HTTP_PROXY_POOL_CONNECTIONS`` : 每个代理会话的最大连接数, 0为不限制, 默认为: 100
+    * ``HTTP_PROXY_KEEPALIVE`` : 是否复用到Http代理的连接(aiohttp默认在每个经过Http代理的响应之后关闭连接), 代理不支持keep-alive时设置为 ``False`` , 默认为: True
+
+    请求响应按块读取, 每读取一块触发一次 ``bytes_received`` 信号, 信号处理器可以抛出 :py:obj:`~araneid.core.exception.StopDownload` 停止下载. 配置:
+
+    * ``HTTP_CHUNK_SIZE`` : 每次读取的字节数, 默认为: 65536
+    * ``DOWNLOAD_MAXSIZE`` : 请求响应的最大字节数, 超过时停止下载并抛出 :py:obj:`HttpResponseTooLarge` , 0为不限制, 默认为: 1073741824 (1G)
+    * ``DOWNLOAD_WARNSIZE`` : 请求响应超过该字节数时输出警告, 0为不警告, 默认为: 33554432 (32M)
+    * ``DOWNLOAD_BODY`` : 请求响应内容的类型, ``bytes`` , ``memoryview`` (避免拼接内容时的复制) 或者 ``file`` (超过 ``DOWNLOAD_SPOOL_SIZE`` 的内容写入临时文件), 默认为: bytes
+    * ``DOWNLOAD_SPOOL_SIZE`` : ``DOWNLOAD_BODY`` 为 ``file`` 时在内存中保存的最大字节数, 默认为: 1048576 (1M)
+    * ``HTTP_DECOMPRESS_THRESHOLD`` : 压缩的请求响应超过该字节数后在线程池( ``MAX_ASYNCIO_WORKERS`` 配置的默认线程池)中解码, 避免阻塞事件循环, 0为总是在事件循环中解码, 默认为: 131072 (128K).
+      在线程池中解码时每累积 ``DECODE_BATCH_SIZE`` (1M)字节的压缩内容解码一次, 避免每一块内容都切换一次线程
+
+    请求响应内容由下载器解码(参考 :py:obj:`~araneid.network.compression` ), 支持gzip, deflate以及安装了 ``brotli`` 和 ``zstandard`` 时的br和zstd, ``DOWNLOAD_MAXSIZE`` 等限制作用于解码后的内容.
+    解码后的请求响应的响应头中不再包含 ``Content-Encoding`` 和 ``Content-Length`` .
+
+    以上除了 ``HTTP_CHUNK_SIZE`` 和 ``DOWNLOAD_SPOOL_SIZE`` 都可以通过请求的 ``meta`` 中的 ``download_maxsize`` , ``download_warnsize`` 以及 ``download_body`` 覆盖.
+
+    请求跟踪默认关闭, 关闭时不注册任何aiohttp跟踪事件. 启用后被采样的请求的各阶段耗时(参考 :py:obj:`TraceContext` )记录到爬虫统计的直方图中. 配置:
+
+    * ``HTTP_TRACE_ENABLED`` : 是否启用请求跟踪, 默认为: False
+    * ``HTTP_TRACE_SAMPLE_RATE`` : 请求的采样比例, 可以通过请求的 ``meta`` 中的 ``trace_sample_rate`` 覆盖, 默认为: 1.0
+
+    请求的超时分为总超时, 连接超时和读取超时, 任意一个超时都会抛出 :py:obj:`HttpConnectionClose` . 配置:
+
+    * ``HttpRequest.timeout`` : 整个请求(包括等待空闲连接, 建立连接和读取请求响应)的超时时间(秒), 默认为: 30
+    * ``HTTP_CONNECT_TIMEOUT`` : 建立连接(TCP连接和TLS握手)的超时时间(秒), 不包括等待连接池中的空闲连接, 可以通过请求的 ``meta`` 中的 ``download_connect_timeout`` 覆盖, 0为不限制, 默认为: 10
+    * ``HTTP_READ_TIMEOUT`` : 两次从连接读取数据之间的最长间隔(秒), 可以通过请求的 ``meta`` 中的 ``download_read_timeout`` 覆盖, 0为不限制, 默认为: 0
+    """
+    BODY_TYPES = ('bytes', 'memoryview', 'file')
+    DECODE_BATCH_SIZE = 1024*1024
+
+    def __init__(self, connector_options: ConnectorOptions=None, proxy_pool_size: int=64, proxy_idle_timeout: float=60, proxy_connections: int=100, proxy_keepalive: bool=True,
+                 chunk_size: int=65536, maxsize: int=1024*1024*1024, warnsize: int=32*1024*1024, body: str='bytes', spool_size: int=1024*1024,
+                 trace_enabled: bool=False, trace_sample_rate: float=1.0, decompress_threshold: int=128*1024, connect_timeout: Optional[float]=10, read_timeout: Optional[float]=None):
         global logger
         super().__init__()
         logger = logging.getLogger(__name__)
+        assert body in self.BODY_TYPES, f'DOWNLOAD_BODY must be one of {self.BODY_TYPES}'
+        self.chunk_size = chunk_size
+        self.maxsize = maxsize
+        self.warnsize = warnsize
+        self.body = body
+        self.spool_size = spool_size
+        self.decompress_threshold = decompress_threshold
+        self.trace_enabled = trace_enabled
+        self.trace_sample_rate = trace_sample_rate
+        self.connect_timeout = connect_timeout or None
+        self.read_timeout = read_timeout or None
         self.session = None
+        self.ssl_context = None
+        self.connector_options = connector_options if connector_options is not None else ConnectorOptions.from_settings({})
+        self.__sessions = {}
+        self.__spider_options = weakref.WeakKeyDictionary()
+        self.proxy_pool = None
+        self.proxy_pool_size = proxy_pool_size
+        self.proxy_idle_timeout = proxy_idle_timeout
+        self.proxy_connections = proxy_connections
+        self.proxy_keepalive = proxy_keepalive
     
     def __init_session__(self):
         import aiohttp
         from aiohttp import client_exceptions
         from aiohttp_proxy import ProxyConnector 
         self.ProxyConnector = ProxyConnector
+        if self.proxy_keepalive:
+           self.ProxyConnector = keepalive_proxy_connector(ProxyConnector)
         self.TCPConnector = aiohttp.TCPConnector
         self.ClientSession = aiohttp.ClientSession
+        self.TraceConfig = aiohttp.TraceConfig
+        self.ClientTimeout = aiohttp.ClientTimeout
         self.client_exceptions = client_exceptions
-        self.dns_resolver = aiohttp.AsyncResolver()
-        tracer_config = aiohttp.TraceConfig()
+        self.dns_resolver = dns.get_dnscache()
+        self.ssl_context = self.__new_ssl_context()
+        self.session = self.get_session(self.connector_options)
+        if self.proxy_pool_size > 0:
+           self.proxy_pool = SessionPool(lambda key: self.__new_proxy_session(*key), max_size=self.proxy_pool_size, idle_timeout=self.proxy_idle_timeout)
+
+    @staticmethod
+    def __new_ssl_context():
+        # same as the unverified context used by aiohttp for ssl=False
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        ssl_context.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3 | ssl.OP_NO_COMPRESSION
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        ssl_context.set_default_verify_paths()
+        return ssl_context
+
+    def get_options(self, spider=None) -> ConnectorOptions:
+        """获取爬虫的连接器配置
+
+        Args:
+            spider (Spider, optional): 爬虫. 默认为: None
+
+        Returns:
+            ConnectorOptions: 爬虫的 ``custom_settings`` 覆盖全局配置后的连接器配置
+        """
+        custom_settings = getattr(spider, 'custom_settings', None)
+        if not custom_settings:
+           return self.connector_options
+        options = self.__spider_options.get(spider)
+        if options is None:
+           options = self.__spider_options[spider] = ConnectorOptions.from_settings(custom_settings, base=self.connector_options)
+        return options
+
+    def get_session(self, options: ConnectorOptions):
+        """获取连接器配置对应的会话, 配置相同的爬虫共用一个会话
+
+        Args:
+            options (ConnectorOptions): 连接器配置
+
+        Returns:
+            ClientSession: 会话
+        """
+        session = self.__sessions.get(options)
+        if session is None or session.closed:
+           Connector = self.TCPConnector if options.tcp_nodelay else delayed_connector(self.TCPConnector)
+           # fix aiohttp use ipv6 automatically if target host support it, but host not support ipv6 route 
+           connector = Connector(resolver=self.dns_resolver, family=AF_INET, **options.connector_kwargs())
+           session = self.__sessions[options] = self.__new_session(connector)
+        return session
+
+    def __new_proxy_session(self, proxy: str, options: ConnectorOptions):
+        ProxyConnector = self.ProxyConnector if options.tcp_nodelay else delayed_connector(self.ProxyConnector)
         # fix aiohttp use ipv6 automatically if target host support it, but host not support ipv6 route 
-        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(resolver= self.dns_resolver, family=AF_INET), trace_configs=[Tracer.register(tracer_config)],trust_env=True)
+        connector = ProxyConnector.from_url(proxy, verify_ssl=False, resolver=self.dns_resolver, family=AF_INET, **{**options.connector_kwargs(), 'limit': self.proxy_connections})
+        return self.__new_session(connector)
+
+    def __new_session(self, connector):
+        # 关闭aiohttp的解码, 由 __read 按块解码
+        return self.ClientSession(connector=connector, trace_configs=self.__trace_configs(), trust_env=True,
+                                  auto_decompress=False, headers={'Accept-Encoding': compression.accept_encoding()})
+
+    def __trace_configs(self):
+        if not self.trace_enabled:
+           return None
+        return [Tracer.register(self.TraceConfig())]
+
+    def __trace(self, request: HttpRequest) -> Optional[TraceContext]:
+        if not self.trace_enabled:
+           return None
+        sample_rate = request.meta.get('trace_sample_rate', self.trace_sample_rate)
+        if sample_rate < 1 and random.random() >= sample_rate:
+           return None
+        return TraceContext()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(connector_options=ConnectorOptions.from_settings(settings),
+                   proxy_pool_size=settings.get('HTTP_PROXY_POOL_SIZE', 64),
+                   proxy_idle_timeout=settings.get('HTTP_PROXY_POOL_IDLE_TIMEOUT', 60),
+                   proxy_connections=settings.get('HTTP_PROXY_POOL_CONNECTIONS', 100),
+                   proxy_keepalive=settings.get('HTTP_PROXY_KEEPALIVE', True),
+                   chunk_size=settings.get('HTTP_CHUNK_SIZE', 65536),
+                   maxsize=settings.get('DOWNLOAD_MAXSIZE', 1024*1024*1024),
+                   warnsize=settings.get('DOWNLOAD_WARNSIZE', 32*1024*1024),
+                   body=settings.get('DOWNLOAD_BODY', 'bytes'),
+                   spool_size=settings.get('DOWNLOAD_SPOOL_SIZE', 1024*1024),
+                   trace_enabled=settings.get('HTTP_TRACE_ENABLED', False),
+                   trace_sample_rate=settings.get('HTTP_TRACE_SAMPLE_RATE', 1.0),
+                   decompress_threshold=settings.get('HTTP_DECOMPRESS_THRESHOLD', 128*1024),
+                   connect_timeout=settings.get('HTTP_CONNECT_TIMEOUT', 10),
+                   read_timeout=settings.get('HTTP_READ_TIMEOUT', 0))
     
     @classmethod
     async def create(cls, settings=None):
-        instance = cls()
+        instance = cls.from_settings(settings if settings is not None else {})
         return instance
 
     
@@ -123,6 +498,136 @@ class Http(Downloader):
             cookies_dict[key] = morsel.value
         return cookies_dict
 
+    async def __bytes_received(self, request, chunk: bytes):
+        waiter = await signal.trigger(signal.bytes_received, source=self, object={ 'request':request, 'bytes': chunk}, wait=True)
+        results = await waiter if waiter is not None else None
+        for result in results or []:
+            if isinstance(result, StopDownload):
+               return result
+        return None
+
+    @staticmethod
+    def __abort(response) -> None:
+        # aiohttp已经读取完整个响应内容时会把连接放回连接池, 此时需要丢弃缓存的内容以恢复连接的读取, 否则复用该连接的请求会一直等待
+        if response.content.is_eof():
+           response.content.read_nowait()
+        response.close()
+
+    @staticmethod
+    def __decode_batch(decoder: compression.ContentDecoder, chunks: list, final: bool, limit: int) -> bytes:
+        # 在线程池中执行, 解码的内容超过limit字节后停止解码, 由调用方抛出HttpResponseTooLarge
+        decoded = []
+        size = 0
+        for chunk in chunks:
+            decoded.append(decoder.decompress(chunk))
+            size += len(decoded[-1])
+            if limit and size > limit:
+               return b''.join(decoded)
+        if final:
+           decoded.append(decoder.flush())
+        return b''.join(decoded)
+
+    async def __iter_chunks(self, response, decoder: Optional[compression.ContentDecoder], maxsize: int):
+        """按块读取并解码请求响应内容, 压缩的内容超过 ``decompress_threshold`` 字节后按 ``DECODE_BATCH_SIZE`` 字节一批在线程池中解码"""
+        chunks = response.content.iter_chunked(self.chunk_size)
+        if decoder is None:
+           async for chunk in chunks:
+               yield chunk
+           return
+        loop = asyncio.get_event_loop()
+        threshold = self.decompress_threshold
+        offload = bool(threshold and response.content_length and response.content_length > threshold)
+        received = 0
+        decoded = 0
+        batch = []
+        batch_size = 0
+        async for chunk in chunks:
+            received += len(chunk)
+            offload = offload or bool(threshold and received > threshold)
+            if not offload:
+               chunk = decoder.decompress(chunk)
+            else:
+               batch.append(chunk)
+               batch_size += len(chunk)
+               if batch_size < self.DECODE_BATCH_SIZE:
+                  continue
+               chunk = await loop.run_in_executor(None, self.__decode_batch, decoder, batch, False, maxsize and maxsize - decoded)
+               batch = []
+               batch_size = 0
+            if chunk:
+               decoded += len(chunk)
+               yield chunk
+        if offload:
+           chunk = await loop.run_in_executor(None, self.__decode_batch, decoder, batch, True, maxsize and maxsize - decoded)
+        else:
+           chunk = decoder.flush()
+        if chunk:
+           yield chunk
+
+    async def __read(self, request: HttpRequest, response):
+        """按块读取请求响应内容
+
+        Returns:
+            Tuple[Union[bytes, memoryview, SpooledTemporaryFile], int, str, bool]: 请求响应内容, 字节数, 编码以及内容是否经过了解码
+        """
+        meta = request.meta
+        maxsize = meta.get('download_maxsize', self.maxsize)
+        warnsize = meta.get('download_warnsize', self.warnsize)
+        body_type = meta.get('download_body', self.body)
+        expected = response.content_length
+        if maxsize and expected and expected > maxsize:
+           self.__abort(response)
+           raise HttpResponseTooLarge(request, expected, maxsize)
+        warned = False
+        if warnsize and expected and expected > warnsize:
+           logger.warning(f'{request} expected response size ({expected} bytes) larger than download warn size ({warnsize} bytes).')
+           warned = True
+        if body_type == 'file':
+           body = SpooledTemporaryFile(max_size=self.spool_size)
+        elif body_type == 'memoryview':
+           body = bytearray()
+        else:
+           body = []
+        write = body.append if body_type == 'bytes' else body.write if body_type == 'file' else body.extend
+        decoder = compression.ContentDecoder.from_encoding(response.headers.get('Content-Encoding'))
+        notify = signal.handled(signal.bytes_received)
+        sample = b''
+        size = 0
+        try:
+            async for chunk in self.__iter_chunks(response, decoder, maxsize):
+                size += len(chunk)
+                if maxsize and size > maxsize:
+                   self.__abort(response)
+                   raise HttpResponseTooLarge(request, size, maxsize)
+                if warnsize and not warned and size > warnsize:
+                   logger.warning(f'{request} received response size ({size} bytes) larger than download warn size ({warnsize} bytes).')
+                   warned = True
+                if not sample:
+                   sample = chunk
+                write(chunk)
+                if not notify:
+                   continue
+                stopped = await self.__bytes_received(request, chunk)
+                if stopped is None:
+                   continue
+                self.__abort(response)
+                if stopped.fail:
+                   raise stopped
+                logger.debug(f'{request} download stopped after {size} bytes received.')
+                break
+        except BaseException:
+            if body_type == 'file':
+               body.close()
+            raise
+        encoding = detect_encoding(response, sample)
+        if body_type == 'file':
+           body.seek(0)
+        elif body_type == 'memoryview':
+           body = memoryview(body)
+        else:
+           body = b''.join(body)
+        return body, size, encoding, decoder is not None
+
     async def download(self, request: HttpRequest):
         assert (isinstance(request, HttpRequest))
         async def close(channel: Stream):
@@ -133,37 +638,72 @@ class Http(Downloader):
            self.__init_session__()
         proxy = None if not request.proxy else request.proxy.get('http', None)
         timeout = request.timeout
+        connect_timeout = request.meta.get('download_connect_timeout', self.connect_timeout) or None
+        read_timeout = request.meta.get('download_read_timeout', self.read_timeout) or None
+        client_timeout = self.ClientTimeout(total=timeout, sock_connect=connect_timeout, sock_read=read_timeout)
+        options = self.get_options(request.context.spider if request.context else None)
+        ssl_context = self.ssl_context if options.ssl_context_reuse else False
+        pooled = None
         if not proxy:
-           connector = None
-           session = self.session
+           session = self.get_session(options)
+        elif self.proxy_pool is not None:
+           pooled = await self.proxy_pool.acquire((proxy, options))
+           session = pooled.session
         else:
-           # fix aiohttp use ipv6 automatically if target host support it, but host not support ipv6 route 
-           connector = self.ProxyConnector.from_url(proxy, verify_ssl=False, resolver=self.dns_resolver, family=AF_INET)
-           session = self.ClientSession(connector=connector, trust_env=True)
+           session = self.__new_proxy_session(proxy, options)
+        trace = self.__trace(request)
         try:
             req_start = time.time()
-            logger.debug(f'{request}  -> {{ URL: {request.uri}, Method: {request.method}, Timeout: {request.timeout}, Headers: {request.headers}, Cookies: {request.cookies}, Data: {request.data}, Json: {request.json} }}')
-            async with session.request(url=request.uri, method=request.method, data=request.data, json=request.json, headers=request.headers, timeout=timeout, cookies=request.cookies, ssl=False) as response:
-                resp_content = await response.read()
-                await signal.trigger(signal.bytes_received, source=self, object={ 'request':request, 'bytes': resp_content}, wait=False)
+            if logger.isEnabledFor(logging.DEBUG):
+               logger.debug(f'{request}  -> {{ URL: {request.uri}, Method: {request.method}, Timeout: {request.timeout}, Headers: {request.headers}, Cookies: {request.cookies}, Data: {request.data}, Json: {request.json} }}')
+            async with session.request(url=request.uri, method=request.method, data=request.data, json=request.json, headers=request.headers, timeout=client_timeout, cookies=request.cookies, ssl=ssl_context, trace_request_ctx=trace) as response:
+                if trace is not None:
+                   body_start = time.perf_counter()
+                resp_content, resp_length, resp_encoding, resp_decoded = await self.__read(request, response)
+                if trace is not None:
+                   trace.total = time.perf_counter()
+                   trace.body = trace.total - body_start
+                   trace.total -= trace.start
+                   self.__record_trace(request, trace)
                 cookies = self.__simple_cookie_to_dict(response.cookies)
-                resp = HttpResponse.from_request(request=request, content=resp_content, status=response.status, headers=response.headers, history=response.history, encoding=response.get_encoding(), reason=response.reason, cookies=cookies)
+                resp = HttpResponse.from_request(request=request, content=resp_content, length=resp_length, status=response.status, headers=CIMultiDictProxy(compression.decoded_headers(response.headers)) if resp_decoded else response.headers, history=response.history, encoding=resp_encoding, reason=response.reason, cookies=cookies)
                 await channel.write(resp)
         except TimeoutError as e:
             req_elapsed = time.time() - req_start
+            if isinstance(e, self.client_exceptions.ServerTimeoutError):
+               # 连接超时或者读取超时
+               raise HttpConnectionClose(request, exception=f'{e} after {req_elapsed:.2f}s (connect timeout: {connect_timeout}s, read timeout: {read_timeout}s)') from e
             raise HttpConnectionClose(request, exception=f'Timeout {req_elapsed}s > {timeout}s (limited)') from e
+        except (StopDownload, HttpResponseTooLarge):
+            raise
         except Exception as e:
             logger.exception(e)
             raise HttpConnectionClose(request, exception=e) from e
         finally:
-            if connector:
+            if pooled is not None:
+               self.proxy_pool.release(pooled)
+            elif proxy:
                await session.close()
         ensure_future(close(channel))
         return channel
 
+    @staticmethod
+    def __record_trace(request: HttpRequest, trace: TraceContext) -> None:
+        spider = request.context.spider if request.context else None
+        stats = getattr(spider, 'stats', None)
+        if stats is not None:
+           trace.record(stats, spider=spider)
+        if logger.isEnabledFor(logging.DEBUG):
+           logger.debug(f'{request} timings: {trace.timings()}')
+
     async def close(self):
+        if self.proxy_pool is not None:
+            await self.proxy_pool.close()
+            self.proxy_pool = None
         if not self.session:
             return
-        await self.session.close()
+        sessions = list(self.__sessions.values())
+        self.__sessions.clear()
+        await asyncio.gather(*[session.close() for session in sessions], return_exceptions=True)
         self.session = None
 
@@ -5,6 +5,7 @@ from araneid.core.exception import DownloaderWarn, RequestException
 from araneid.core.downloader import Downloader
 from araneid.network.socket import SocketRequest, SocketResponse
 from araneid.core.stream import Stream
+from araneid.network import dns
 from collections.abc import Callable
 from araneid.util._async import ensure_asyncfunction
 
@@ -201,12 +202,21 @@ class Socket(Downloader):
         return instance
 
         
+    async def __open_connection(self, host, port):
+        addresses = await dns.get_dnscache().resolve(host, port)
+        for index, address in enumerate(addresses):
+            try:
+                return await asyncio.open_connection(host=address['host'], port=address['port'], family=address['family'])
+            except OSError:
+                if index == len(addresses) - 1:
+                   raise
+
     async def download(self, request: SocketRequest):
         assert (isinstance(request, SocketRequest))
         socket_host, socket_port = request.url.split(':')
         socket = None
         try:
-            socket_reader, socket_writer = await asyncio.open_connection(host=socket_host, port=socket_port)
+            socket_reader, socket_writer = await self.__open_connection(socket_host, int(socket_port))
             socket = await SocketConnection.create(request, socket_reader=socket_reader, socket_writer=socket_writer)
             asyncio.ensure_future(socket.start())
         except ConnectionError as e:
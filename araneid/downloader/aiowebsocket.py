@@ -5,6 +5,7 @@ from asyncio.locks import Event
 from araneid.core.downloader import Downloader
 from araneid.core.exception import DownloaderWarn, RequestException
 from araneid.core.stream import Stream
+from araneid.network import dns
 from araneid.network.websocket import WebSocketRequest, WebSocketResponse
 from collections.abc import Callable
 from araneid.util._async import ensure_asyncfunction
@@ -209,7 +210,7 @@ class WebSocket(Downloader):
     def __init_session__(self):
         global WSMessage, WSMsgType, ClientError
         import aiohttp
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(resolver=dns.get_dnscache()))
         WSMsgType = aiohttp.WSMsgType
         WSMessage = aiohttp.WSMessage
         ClientError = aiohttp.ClientError
@@ -0,0 +1,262 @@
+import os
+import json
+import mmap
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple, Union
+from multidict import CIMultiDict, CIMultiDictProxy
+from araneid.core.downloader import Downloader
+from araneid.core.exception import DownloaderWarn, RequestException
+from araneid.core.stream import Stream
+from araneid.downloader.aiohttp import Http
+from araneid.network.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayMissing(DownloaderWarn, RequestException):
+    """请求没有被录制到存档中"""
+
+    def __init__(self, request, directory) -> None:
+        self.__request__ = request
+        self.__directory__ = directory
+
+    def __str__(self):
+        return f'{self.__request__} is not recorded in archive {self.__directory__}'
+
+
+class ArchiveRecord(object):
+    """存档中一个请求响应的元数据, 内容保存在存档的 ``bodies`` 文件中 ``offset`` 开始的 ``length`` 个字节, ``elapsed`` 为录制时的下载耗时(秒)"""
+    __slots__ = ['url', 'status', 'headers', 'encoding', 'reason', 'cookies', 'elapsed', 'digest', 'offset', 'length']
+
+    def __init__(self, url, status, headers, encoding='utf-8', reason='', cookies=None, elapsed=0, digest='', offset=0, length=0):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.encoding = encoding
+        self.reason = reason
+        self.cookies = cookies or {}
+        self.elapsed = elapsed
+        self.digest = digest
+        self.offset = offset
+        self.length = length
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'ArchiveRecord<url={self.url}, status={self.status}, length={self.length}>'
+
+
+class ResponseArchive(object):
+    """请求响应存档, 按照请求指纹保存请求响应, 由目录中的两个文件组成:
+
+    * ``bodies`` : 依次追加的请求响应内容, 相同的内容只保存一次, 回放时通过内存映射读取
+    * ``index.jsonl`` : 每行一个请求响应的 :py:obj:`ArchiveRecord` 和请求指纹, 同一个指纹以最后一行为准
+
+    两个文件都只追加写入, 录制中断时只丢失还没有写入磁盘的记录, 读取索引时忽略内容不完整的记录.
+    :py:meth:`add` 可以在多个线程中调用.
+    """
+    INDEX = 'index.jsonl'
+    BODIES = 'bodies'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.__records: Dict[str, ArchiveRecord] = {}
+        self.__digests: Dict[str, Tuple[int, int]] = {}
+        self.__index_file = None
+        self.__bodies_file = None
+        self.__mmap = None
+        self.__size = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__records)
+
+    def __contains__(self, key):
+        return key in self.__records
+
+    def open(self, writable: bool=False) -> 'ResponseArchive':
+        """读取存档的索引
+
+        Args:
+            writable (bool, optional): 是否追加录制请求响应. 默认为: False
+
+        Returns:
+            ResponseArchive: 存档
+        """
+        index_path = os.path.join(self.directory, self.INDEX)
+        bodies_path = os.path.join(self.directory, self.BODIES)
+        size = os.path.getsize(bodies_path) if os.path.exists(bodies_path) else 0
+        if os.path.exists(index_path):
+           with open(index_path, 'r', encoding='utf-8') as f:
+               for line in f:
+                   try:
+                       record = json.loads(line)
+                       key = record.pop('key')
+                       record = ArchiveRecord(**record)
+                   except (ValueError, TypeError, KeyError):
+                       continue
+                   if record.offset + record.length > size:
+                      continue
+                   self.__records[key] = record
+                   self.__digests[record.digest] = (record.offset, record.length)
+        if writable:
+           os.makedirs(self.directory, exist_ok=True)
+           self.__bodies_file = open(bodies_path, 'ab')
+           self.__index_file = open(index_path, 'a', encoding='utf-8')
+           self.__size = self.__bodies_file.tell()
+        return self
+
+    def get(self, key: str) -> Optional[ArchiveRecord]:
+        return self.__records.get(key)
+
+    def body(self, record: ArchiveRecord, view: bool=False) -> Union[bytes, memoryview]:
+        """读取请求响应内容
+
+        Args:
+            record (ArchiveRecord): 请求响应
+            view (bool, optional): 是否返回内存映射的切片(不复制). 默认为: False
+
+        Returns:
+            Union[bytes, memoryview]: 请求响应内容
+        """
+        if not record.length:
+           return memoryview(b'') if view else b''
+        end = record.offset + record.length
+        if self.__mmap is None or end > len(self.__mmap):
+           # 第一次读取或者存档在回放时追加了内容
+           self.__remap()
+        data = memoryview(self.__mmap)[record.offset:end]
+        return data if view else data.tobytes()
+
+    def __remap(self) -> None:
+        with self.__lock:
+            if self.__bodies_file is not None:
+               self.__bodies_file.flush()
+        with open(os.path.join(self.directory, self.BODIES), 'rb') as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def add(self, key: str, response: HttpResponse, elapsed: float=0) -> ArchiveRecord:
+        """录制请求响应
+
+        Args:
+            key (str): 请求指纹
+            response (HttpResponse): 请求响应
+            elapsed (float, optional): 下载耗时(秒). 默认为: 0
+
+        Returns:
+            ArchiveRecord: 录制的请求响应
+        """
+        body = response.body or b''
+        digest = hashlib.sha1(body).hexdigest()
+        headers = [[str(name), str(value)] for name, value in (response.headers or {}).items()]
+        with self.__lock:
+            assert self.__bodies_file is not None, 'Archive is not opened for writing'
+            position = self.__digests.get(digest)
+            if position is None:
+               self.__bodies_file.write(body)
+               position = self.__digests[digest] = (self.__size, len(body))
+               self.__size += len(body)
+            record = ArchiveRecord(str(response.request.url), response.status, headers, encoding=response.encoding, reason=str(response.reason or ''), cookies=dict(response.cookies or {}),
+                                   elapsed=round(elapsed, 6), digest=digest, offset=position[0], length=position[1])
+            self.__index_file.write(json.dumps({'key': key, **record.to_dict()}, ensure_ascii=False) + '\n')
+            self.__records[key] = record
+        return record
+
+    def flush(self) -> None:
+        with self.__lock:
+            if self.__bodies_file is not None:
+               self.__bodies_file.flush()
+               self.__index_file.flush()
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__bodies_file is not None:
+               self.__bodies_file.close()
+               self.__index_file.close()
+               self.__bodies_file = None
+               self.__index_file = None
+        if self.__mmap is not None:
+           try:
+               self.__mmap.close()
+           except BufferError:
+               # 回放的请求响应仍然引用内存映射, 由垃圾回收关闭
+               pass
+           self.__mmap = None
+
+
+class Replay(Downloader):
+    """回放 :py:obj:`~araneid.extension.downloadermiddleware.record.RecordMiddleware` 录制的请求响应的下载器, 不访问网络, 用于可重复的离线性能测试.
+
+    请求按照请求指纹( :py:attr:`~araneid.core.request.Request.fingerprint` )从 :py:obj:`ResponseArchive` 中查找录制的请求响应. 配置:
+
+    * ``REPLAY_ARCHIVE`` : 存档目录, 默认为: ``.replay``
+    * ``REPLAY_LATENCY_FACTOR`` : 按照录制时的下载耗时乘以该系数延迟返回请求响应, 模拟真实的网络延迟, 0为立即返回, 默认为: 0
+    * ``REPLAY_MISSING`` : 存档中没有的请求的处理方式, ``fail`` 抛出 :py:obj:`ReplayMissing` , ``download`` 交给 ``Http`` 下载器下载, 默认为: fail
+    * ``DOWNLOAD_BODY`` : 为 ``memoryview`` 时请求响应内容是存档的内存映射的切片(不复制), 否则为字节串, 默认为: bytes
+
+    指定 ``downloader='Replay'`` 的请求使用该下载器, 也可以通过 ``DOWNLOADER_OVERRIDES = {'Http': 'Replay'}`` 让使用 ``Http`` 下载器的请求都使用该下载器.
+    """
+    MISSING = ('fail', 'download')
+
+    def __init__(self, archive: str='.replay', latency_factor: float=0, missing: str='fail', body: str='bytes'):
+        super().__init__()
+        assert missing in self.MISSING, f'REPLAY_MISSING must be one of {self.MISSING}'
+        self.directory = archive
+        self.latency_factor = latency_factor
+        self.missing = missing
+        self.body = body
+        self.archive: Optional[ResponseArchive] = None
+        self.fallback: Optional[Http] = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(archive=settings.get('REPLAY_ARCHIVE', '.replay'),
+                   latency_factor=settings.get('REPLAY_LATENCY_FACTOR', 0),
+                   missing=settings.get('REPLAY_MISSING', 'fail'),
+                   body=settings.get('DOWNLOAD_BODY', 'bytes'))
+
+    @classmethod
+    async def create(cls, settings=None):
+        settings = settings if settings is not None else {}
+        instance = cls.from_settings(settings)
+        if instance.missing == 'download':
+           instance.fallback = await Http.create(settings=settings)
+        return instance
+
+    def __response(self, request: HttpRequest, record: ArchiveRecord) -> HttpResponse:
+        content = self.archive.body(record, view=self.body == 'memoryview')
+        return HttpResponse.from_request(request=request, content=content, length=record.length, status=record.status, headers=CIMultiDictProxy(CIMultiDict(record.headers)),
+                                         encoding=record.encoding, reason=record.reason, cookies=dict(record.cookies))
+
+    async def download(self, request: HttpRequest):
+        assert (isinstance(request, HttpRequest))
+        async def close(channel: Stream):
+            await channel.join()
+            await channel.close()
+        if self.archive is None:
+           # 第一次下载时读取存档, 没有使用回放下载器时不读取
+           self.archive = ResponseArchive(self.directory).open()
+           logger.debug(f'Loaded {len(self.archive)} responses from archive {self.directory}')
+        record = self.archive.get(request.fingerprint.hex())
+        if record is None:
+           if self.fallback is not None:
+              return await self.fallback.download(request)
+           raise ReplayMissing(request, self.directory)
+        if self.latency_factor > 0 and record.elapsed > 0:
+           await asyncio.sleep(record.elapsed * self.latency_factor)
+        channel = await Stream.create()
+        await channel.write(self.__response(request, record))
+        asyncio.ensure_future(close(channel))
+        return channel
+
+    async def close(self):
+        if self.archive is not None:
+           self.archive.close()
+           self.archive = None
+        if self.fallback is not None:
+           await self.fallback.close()
+           self.fallback = None
@@ -0,0 +1,123 @@
+import math
+import logging
+from araneid.core.dupefilter import DupeFilter
+
+
+class BloomFilter(object):
+    """布隆过滤器, 使用请求指纹的前16个字节通过双重哈希生成 ``k`` 个比特位置"""
+    __slots__ = ['capacity', 'error_rate', 'count', '__bits', '__size', '__hashes']
+
+    def __init__(self, capacity, error_rate):
+        assert capacity > 0 and 0 < error_rate < 1
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+        self.__size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.__hashes = max(1, int(round(self.__size / capacity * math.log(2))))
+        self.__bits = bytearray((self.__size + 7) // 8)
+
+    def __positions(self, fingerprint):
+        h1 = int.from_bytes(fingerprint[:8], 'big')
+        h2 = int.from_bytes(fingerprint[8:16], 'big') | 1
+        size = self.__size
+        return [(h1 + i * h2) % size for i in range(self.__hashes)]
+
+    def add(self, fingerprint: bytes) -> bool:
+        bits = self.__bits
+        added = False
+        for position in self.__positions(fingerprint):
+            index = position >> 3
+            mask = 1 << (position & 7)
+            byte = bits[index]
+            if not byte & mask:
+               bits[index] = byte | mask
+               added = True
+        if added:
+           self.count += 1
+        return added
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        bits = self.__bits
+        for position in self.__positions(fingerprint):
+            if not bits[position >> 3] & (1 << (position & 7)):
+               return False
+        return True
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def nbytes(self):
+        return len(self.__bits)
+
+
+class ScalableBloomFilter(object):
+    """可扩展布隆过滤器, 当前布隆过滤器达到容量后, 新建一个容量翻倍、误判率乘以 ``ratio`` 的布隆过滤器, 总的误判率不超过 ``error_rate`` """
+    __slots__ = ['__filters', '__capacity', '__error_rate', '__ratio', '__growth']
+
+    def __init__(self, capacity=1000000, error_rate=0.001, ratio=0.9, growth=2):
+        self.__capacity = capacity
+        self.__error_rate = error_rate
+        self.__ratio = ratio
+        self.__growth = growth
+        self.__filters = []
+
+    def __new_filter(self):
+        index = len(self.__filters)
+        capacity = self.__capacity * (self.__growth ** index)
+        error_rate = self.__error_rate * (1 - self.__ratio) * (self.__ratio ** index)
+        bloom_filter = BloomFilter(capacity, error_rate)
+        self.__filters.append(bloom_filter)
+        return bloom_filter
+
+    def add(self, fingerprint: bytes) -> bool:
+        filters = self.__filters
+        for bloom_filter in filters[:-1]:
+            if fingerprint in bloom_filter:
+               return False
+        if filters and not filters[-1].is_full():
+           return filters[-1].add(fingerprint)
+        if filters and fingerprint in filters[-1]:
+           return False
+        return self.__new_filter().add(fingerprint)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        return any(fingerprint in bloom_filter for bloom_filter in reversed(self.__filters))
+
+    def __len__(self):
+        return sum(bloom_filter.count for bloom_filter in self.__filters)
+
+    def nbytes(self):
+        return sum(bloom_filter.nbytes() for bloom_filter in self.__filters)
+
+
+class BloomDupeFilter(DupeFilter):
+    """布隆去重过滤器, 使用 :py:obj:`ScalableBloomFilter` 记录请求指纹, 内存占用只和请求数量以及误判率有关.
+
+    不重复的请求会以 ``DUPEFILTER_BLOOM_ERROR_RATE`` 的概率被误判为重复请求而被丢弃. ``DUPEFILTER_BLOOM_CAPACITY`` 为第一个布隆过滤器的容量.
+    """
+    logger = None
+
+    def __init__(self, capacity=1000000, error_rate=0.001, include_headers=None):
+        super().__init__(include_headers=include_headers)
+        self.logger = logging.getLogger(__name__)
+        self.__filter = ScalableBloomFilter(capacity=capacity, error_rate=error_rate)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(capacity=settings.get('DUPEFILTER_BLOOM_CAPACITY', 1000000), error_rate=settings.get('DUPEFILTER_BLOOM_ERROR_RATE', 0.001), include_headers=settings.get('DUPEFILTER_HEADERS', None))
+
+    @classmethod
+    async def create(cls, settings=None):
+        return cls.from_settings(settings if settings is not None else {})
+
+    def add(self, fingerprint: bytes) -> bool:
+        return self.__filter.add(fingerprint)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        return fingerprint in self.__filter
+
+    def __len__(self):
+        return len(self.__filter)
+
+    def close(self):
+        self.logger.debug(f'{self.__class__.__name__} closed ({len(self.__filter)} fingerprints, {self.__filter.nbytes()} bytes)')
@@ -0,0 +1,106 @@
+import logging
+from array import array
+from araneid.core.dupefilter import DupeFilter
+
+
+class DigestSet(object):
+    """8字节摘要的开放寻址哈希集合, 摘要保存在 ``array('Q')`` 中, 每个摘要只占用8字节(加上空槽), 远小于 ``set`` 中保存 ``bytes`` 对象的开销.
+
+    摘要 ``0`` 被用作空槽标记, 因此会被映射为 ``1`` .
+    """
+    __slots__ = ['__table', '__mask', '__size']
+    MAX_LOAD_FACTOR = 0.7
+
+    def __init__(self, capacity=1024):
+        slots = 8
+        while slots * self.MAX_LOAD_FACTOR < capacity:
+            slots <<= 1
+        self.__table = array('Q', bytes(8 * slots))
+        self.__mask = slots - 1
+        self.__size = 0
+
+    @staticmethod
+    def digest(fingerprint: bytes) -> int:
+        return int.from_bytes(fingerprint[:8], 'big') or 1
+
+    def __resize(self):
+        table = self.__table
+        slots = len(table) << 1
+        self.__table = array('Q', bytes(8 * slots))
+        self.__mask = slots - 1
+        for digest in table:
+            if digest:
+               self.__insert(digest)
+
+    def __insert(self, digest):
+        table = self.__table
+        mask = self.__mask
+        index = digest & mask
+        while True:
+            current = table[index]
+            if current == 0:
+               table[index] = digest
+               return True
+            if current == digest:
+               return False
+            index = (index + 1) & mask
+
+    def add(self, fingerprint: bytes) -> bool:
+        if (self.__size + 1) > len(self.__table) * self.MAX_LOAD_FACTOR:
+           self.__resize()
+        added = self.__insert(self.digest(fingerprint))
+        if added:
+           self.__size += 1
+        return added
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        digest = self.digest(fingerprint)
+        table = self.__table
+        mask = self.__mask
+        index = digest & mask
+        while True:
+            current = table[index]
+            if current == 0:
+               return False
+            if current == digest:
+               return True
+            index = (index + 1) & mask
+
+    def __len__(self):
+        return self.__size
+
+    def nbytes(self):
+        return self.__table.itemsize * len(self.__table)
+
+
+class ExactDupeFilter(DupeFilter):
+    """精确去重过滤器, 使用 :py:obj:`DigestSet` 保存请求指纹的前8个字节.
+
+    两个不同请求的指纹前8个字节相同的概率约为 ``n^2/2^65`` , 一亿个请求时约为 ``3*10^-4`` .
+    """
+    logger = None
+
+    def __init__(self, capacity=1024, include_headers=None):
+        super().__init__(include_headers=include_headers)
+        self.logger = logging.getLogger(__name__)
+        self.__digests = DigestSet(capacity)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(capacity=settings.get('DUPEFILTER_CAPACITY', 1024), include_headers=settings.get('DUPEFILTER_HEADERS', None))
+
+    @classmethod
+    async def create(cls, settings=None):
+        return cls.from_settings(settings if settings is not None else {})
+
+    def add(self, fingerprint: bytes) -> bool:
+        return self.__digests.add(fingerprint)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        return fingerprint in self.__digests
+
+    def __len__(self):
+        return len(self.__digests)
+
+    def close(self):
+        self.logger.debug(f'{self.__class__.__name__} closed ({len(self.__digests)} fingerprints, {self.__digests.nbytes()} bytes)')
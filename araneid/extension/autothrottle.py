@@ -0,0 +1,168 @@
+import math
+import asyncio
+import logging
+from typing import Dict, Optional
+from araneid.core import signal
+from araneid.core.engine import Engine
+from araneid.core.downloadmanager import DownloadManager
+from araneid.core.exception import NotConfigured
+from araneid.core.request import Request
+from araneid.core.response import Response
+from araneid.util.fingerprint import url_host
+
+
+class HostTarget(object):
+    """一个域名的延迟和错误率的指数加权移动平均值, 以及根据它们计算出的下载间隔和并发数"""
+    __slots__ = ['latency', 'baseline', 'error_rate', 'delay', 'concurrency', 'samples', 'decreased_at']
+
+    def __init__(self, delay: float, concurrency: float):
+        self.latency = 0.0
+        self.baseline = math.inf
+        self.error_rate = 0.0
+        self.delay = delay
+        self.concurrency = concurrency
+        self.samples = 0
+        self.decreased_at = -math.inf
+
+    def to_dict(self) -> dict:
+        return {'delay': self.delay, 'concurrency': int(self.concurrency), 'latency': self.latency, 'error_rate': self.error_rate}
+
+
+class AutoThrottle(object):
+    """根据域名的下载延迟和错误率自动调整 :py:obj:`~araneid.core.throttle.Throttle` 中域名的下载间隔和并发数的扩展.
+
+    监听 ``response_downloaded`` 以及 ``request_failed`` 信号, 按域名维护下载延迟和错误率的指数加权移动平均值. 下载延迟由 :py:obj:`~araneid.core.downloadmanager.DownloadManager`
+    在调用下载器前后同步计时并写入 ``meta['download_latency']`` , 不包括请求排队和信号分发的时间:
+
+    * 并发数按照加性增、乘性减调整: 下载成功并且延迟没有超过 ``AUTOTHROTTLE_LATENCY_TOLERANCE`` 倍的历史最低延迟时, 每个并发窗口增加1, 最多为 ``AUTOTHROTTLE_MAX_CONCURRENCY`` ;
+      错误率超过 ``AUTOTHROTTLE_ERROR_RATE`` 或者延迟超过容忍范围时, 每个延迟周期最多减半一次, 最少为1.
+    * 下载间隔的目标值为 ``延迟/并发数`` , 限制在 ``AUTOTHROTTLE_MIN_DELAY`` 和 ``AUTOTHROTTLE_MAX_DELAY`` 之间, 间隔增大时立即生效, 减小时每次只减小一半.
+
+    状态码为5xx或者429的请求响应以及下载异常都被计为错误, 错误的请求不参与延迟的计算. 每个域名当前的目标值会写入爬虫的统计信息 ``autothrottle/<域名>`` (分隔符为 ``/`` ).
+
+    需要配置 ``AUTOTHROTTLE_ENABLED = True`` 启用, 其他配置: ``AUTOTHROTTLE_START_DELAY`` (默认为: 1), ``AUTOTHROTTLE_TARGET_CONCURRENCY`` (初始并发数, 默认为: 1), ``AUTOTHROTTLE_EWMA_ALPHA`` (默认为: 0.3).
+    按照IP限速( ``CONCURRENT_REQUESTS_PER_IP`` )时不生效.
+    """
+    logger = None
+    ERROR_STATUS = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, start_delay=1.0, target_concurrency=1.0, min_delay=0.0, max_delay=60.0, max_concurrency=16, alpha=0.3, error_rate=0.2, latency_tolerance=2.0):
+        self.logger = logging.getLogger(__name__)
+        self.start_delay = start_delay
+        self.target_concurrency = target_concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self.alpha = alpha
+        self.error_rate = error_rate
+        self.latency_tolerance = latency_tolerance
+        self.__targets: Dict[str, HostTarget] = {}
+        self.__throttle = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        if not settings.get('AUTOTHROTTLE_ENABLED', False):
+           raise NotConfigured(f'{cls.__name__} must be enabled explicitly by AUTOTHROTTLE_ENABLED setting.')
+        if settings.get('CONCURRENT_REQUESTS_PER_IP', 0) > 0:
+           raise NotConfigured(f'{cls.__name__} does not support CONCURRENT_REQUESTS_PER_IP.')
+        return cls(start_delay=settings.get('AUTOTHROTTLE_START_DELAY', 1.0),
+                   target_concurrency=settings.get('AUTOTHROTTLE_TARGET_CONCURRENCY', 1.0),
+                   min_delay=settings.get('AUTOTHROTTLE_MIN_DELAY', 0.0),
+                   max_delay=settings.get('AUTOTHROTTLE_MAX_DELAY', 60.0),
+                   max_concurrency=settings.get('AUTOTHROTTLE_MAX_CONCURRENCY', 16),
+                   alpha=settings.get('AUTOTHROTTLE_EWMA_ALPHA', 0.3),
+                   error_rate=settings.get('AUTOTHROTTLE_ERROR_RATE', 0.2),
+                   latency_tolerance=settings.get('AUTOTHROTTLE_LATENCY_TOLERANCE', 2.0))
+
+    @classmethod
+    async def create(cls, settings=None):
+        instance = cls.from_settings(settings if settings is not None else {})
+        signal.register(signal.request_scheduled, instance.__on_request_scheduled)
+        signal.register(signal.response_downloaded, instance.__on_response_downloaded)
+        signal.register(signal.request_failed, instance.__on_request_failed)
+        return instance
+
+    def order(self):
+        return 0
+
+    def bind(self, throttle) -> None:
+        """绑定需要调整的 :py:obj:`~araneid.core.throttle.Throttle` , 没有绑定时在第一个请求被调度时绑定引擎的 :py:attr:`~araneid.core.engine.Engine.throttle`
+
+        Args:
+            throttle (Throttle): 调度闸门
+        """
+        self.__throttle = throttle
+
+    def targets(self) -> Dict[str, dict]:
+        """每个域名当前的目标值"""
+        return {host: target.to_dict() for host, target in self.__targets.items()}
+
+    def get_target(self, host: str) -> Optional[HostTarget]:
+        return self.__targets.get(host)
+
+    def __on_request_scheduled(self, signal, source, request):
+        if self.__throttle is None and isinstance(source, Engine):
+           self.bind(source.throttle)
+
+    def __on_response_downloaded(self, signal, source, response):
+        request = response.request if isinstance(response, Response) else None
+        if request is None:
+           return
+        self.__complete(request, error=getattr(response, 'status', None) in self.ERROR_STATUS)
+
+    def __on_request_failed(self, signal, source, request):
+        self.__complete(request, error=True)
+
+    def __complete(self, request: Request, error: bool) -> None:
+        latency = request.meta.get(DownloadManager.LATENCY_KEY)
+        if latency is None:
+           return
+        host = url_host(str(request.uri))
+        if not host:
+           return
+        target = self.adjust(host, latency, error)
+        spider = request.context.spider if request.context else None
+        stats = getattr(spider, 'stats', None)
+        if stats is not None:
+           stats.set_value(f'autothrottle/{host}', target.to_dict(), spider=spider, sep='/')
+
+    def adjust(self, host: str, latency: float, error: bool=False, now: Optional[float]=None) -> HostTarget:
+        """根据一次下载的结果调整域名的目标值
+
+        Args:
+            host (str): 域名
+            latency (float): 下载延迟(秒)
+            error (bool, optional): 是否下载失败. 默认为: False
+            now (Optional[float], optional): 当前时间, 默认为事件循环的当前时间
+
+        Returns:
+            HostTarget: 调整后的目标值
+        """
+        now = asyncio.get_event_loop().time() if now is None else now
+        target = self.__targets.get(host)
+        if target is None:
+           target = self.__targets[host] = HostTarget(self.start_delay, max(1.0, self.target_concurrency))
+        alpha = self.alpha
+        target.error_rate = alpha * (1.0 if error else 0.0) + (1 - alpha) * target.error_rate
+        if not error:
+           target.latency = latency if target.samples == 0 else alpha * latency + (1 - alpha) * target.latency
+           target.samples += 1
+           target.baseline = min(target.baseline, target.latency)
+        congested = error and target.error_rate > self.error_rate or target.samples > 0 and target.latency > self.latency_tolerance * target.baseline
+        if congested:
+           if now - target.decreased_at >= target.latency:
+              target.concurrency = max(1.0, math.floor(target.concurrency / 2))
+              target.decreased_at = now
+        elif not error:
+           target.concurrency = min(float(self.max_concurrency), target.concurrency + 1 / target.concurrency)
+        target_delay = min(self.max_delay, max(self.min_delay, target.latency / int(target.concurrency)))
+        if congested:
+           target.delay = min(self.max_delay, max(target.delay, target_delay))
+        else:
+           target.delay = max(target_delay, (target.delay + target_delay) / 2)
+        if self.__throttle is not None:
+           self.__throttle.configure_slot(host, delay=target.delay, concurrency=int(target.concurrency))
+        return target
+
+    def close(self):
+        self.logger.debug(f'{self.__class__.__name__} closed')
@@ -0,0 +1,189 @@
+import time
+import random
+import logging
+from typing import Dict, Optional, Tuple, Type
+from araneid.core.exception import DownloaderWarn, NotConfigured, RequestException
+from araneid.core.request import Request
+from araneid.core.scheduler import Scheduler
+from araneid.network.http import HttpResponse
+from araneid.util._import import import_class
+from araneid.util.fingerprint import url_host
+
+
+class CircuitOpen(DownloaderWarn, RequestException):
+    """域名的熔断器打开时快速失败的请求"""
+
+    def __init__(self, request, host: str, retry_after: float) -> None:
+        self.__request__ = request
+        self.__host__ = host
+        self.__retry_after__ = retry_after
+
+    def __str__(self):
+        return f'{self.__request__} rejected, circuit of {self.__host__} is open (retry after {self.__retry_after__:.2f}s)'
+
+
+class CircuitState(object):
+    """一个域名的熔断器状态"""
+    __slots__ = ['state', 'failures', 'opened_at', 'open_timeout', 'probe', 'probe_at']
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, open_timeout: float):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_timeout = open_timeout
+        self.probe = None
+        self.probe_at = 0.0
+
+    def __repr__(self):
+        return f'CircuitState<state={self.state}, failures={self.failures}, open_timeout={self.open_timeout}>'
+
+
+class CircuitBreakerMiddleware(object):
+    """按域名熔断持续失败的请求, 避免失效的域名的请求占用下载并发, 保护其他域名的吞吐量.
+
+    * 同一个域名连续 ``CIRCUIT_BREAKER_FAILURES`` 次(默认为: 5)下载失败后打开熔断器. 抛出 ``CIRCUIT_BREAKER_EXCEPTIONS`` 中的异常(默认和 ``RETRY_EXCEPTIONS`` 相同),
+      或者响应状态码在 ``CIRCUIT_BREAKER_HTTP_CODES`` 中(默认为: [502, 503, 504, 522, 524])时计为失败, 其他请求响应重置连续失败次数.
+    * 熔断器打开 ``CIRCUIT_BREAKER_OPEN_TIMEOUT`` 秒(默认为: 30)后进入半开状态, 放行一个探测请求. 探测成功后关闭熔断器,
+      失败后重新打开熔断器, 打开时间加倍, 最多为 ``CIRCUIT_BREAKER_MAX_OPEN_TIMEOUT`` 秒(默认为: 300).
+    * 熔断期间的请求按 ``CIRCUIT_BREAKER_MODE`` 处理(默认为: park):
+
+      * ``park`` : 通过 ``meta['schedule_delay']`` 重新进入调度器, 在调度器的延迟队列中等待到熔断器半开, 等待期间不占用下载并发.
+        请求累计等待超过 ``CIRCUIT_BREAKER_MAX_PARK_TIME`` 秒(默认为: 600)后抛出 :py:obj:`CircuitOpen` , 避免一直失效的域名的请求永远等待
+      * ``fail`` : 抛出 :py:obj:`CircuitOpen` 快速失败, 交给请求的 ``errback`` 处理
+
+    * 熔断情况记录在统计的 ``circuitbreaker/opened`` , ``circuitbreaker/closed`` , ``circuitbreaker/parked`` 和 ``circuitbreaker/rejected`` 中.
+
+    需要通过 ``CIRCUIT_BREAKER_ENABLED`` 启用(默认为: False). 熔断器在重试之前处理请求响应和异常, 每次重试都计为一次失败.
+    """
+    MODES = ('park', 'fail')
+    DEFAULT_HTTP_CODES = [502, 503, 504, 522, 524]
+    DEFAULT_EXCEPTIONS = ['araneid.downloader.aiohttp.HttpConnectionClose', 'asyncio.TimeoutError', 'builtins.ConnectionError']
+
+    def __init__(self, failures: int=5, open_timeout: float=30, max_open_timeout: float=300, mode: str='park', max_park_time: float=600, http_codes=None, exceptions: Tuple[Type[BaseException], ...]=()):
+        assert mode in self.MODES, f'CIRCUIT_BREAKER_MODE must be one of {self.MODES}'
+        self.logger = logging.getLogger(__name__)
+        self.failures = max(1, failures)
+        self.open_timeout = open_timeout
+        self.max_open_timeout = max(open_timeout, max_open_timeout)
+        self.mode = mode
+        self.max_park_time = max_park_time
+        self.http_codes = frozenset(self.DEFAULT_HTTP_CODES if http_codes is None else http_codes)
+        self.exceptions = tuple(exceptions)
+        # 只保存有失败记录的域名
+        self.__circuits: Dict[str, CircuitState] = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        if not settings.get('CIRCUIT_BREAKER_ENABLED', False):
+           raise NotConfigured(f'{cls.__name__} must be enabled explicitly by CIRCUIT_BREAKER_ENABLED setting.')
+        exceptions = settings.get('CIRCUIT_BREAKER_EXCEPTIONS', settings.get('RETRY_EXCEPTIONS', cls.DEFAULT_EXCEPTIONS))
+        return cls(failures=settings.get('CIRCUIT_BREAKER_FAILURES', 5),
+                   open_timeout=settings.get('CIRCUIT_BREAKER_OPEN_TIMEOUT', 30),
+                   max_open_timeout=settings.get('CIRCUIT_BREAKER_MAX_OPEN_TIMEOUT', 300),
+                   mode=settings.get('CIRCUIT_BREAKER_MODE', 'park'),
+                   max_park_time=settings.get('CIRCUIT_BREAKER_MAX_PARK_TIME', 600),
+                   http_codes=settings.get('CIRCUIT_BREAKER_HTTP_CODES', cls.DEFAULT_HTTP_CODES),
+                   exceptions=[import_class(exception) if isinstance(exception, str) else exception for exception in exceptions])
+
+    @classmethod
+    async def create(cls, settings=None):
+        return cls.from_settings(settings if settings is not None else {})
+
+    def order(self):
+        # 在重试之前记录失败
+        return -10
+
+    def get_circuit(self, host: str) -> Optional[CircuitState]:
+        return self.__circuits.get(host)
+
+    def __stats(self, spider, name: str) -> None:
+        stats = getattr(spider, 'stats', None)
+        if stats is not None:
+           stats.inc_value(f'circuitbreaker/{name}', spider=spider, sep='/')
+
+    def __open(self, host: str, circuit: CircuitState, now: float, spider) -> None:
+        if circuit.state == CircuitState.HALF_OPEN:
+           circuit.open_timeout = min(self.max_open_timeout, circuit.open_timeout * 2)
+        circuit.state = CircuitState.OPEN
+        circuit.opened_at = now
+        circuit.probe = None
+        self.__stats(spider, 'opened')
+        self.logger.warning(f'Circuit of {host} is open for {circuit.open_timeout}s after {circuit.failures} consecutive failures.')
+
+    def __success(self, host: str, request: Request, spider) -> None:
+        circuit = self.__circuits.get(host)
+        if circuit is None:
+           return
+        if circuit.state == CircuitState.CLOSED:
+           del self.__circuits[host]
+        elif circuit.state == CircuitState.HALF_OPEN and circuit.probe == id(request):
+           del self.__circuits[host]
+           self.__stats(spider, 'closed')
+           self.logger.info(f'Circuit of {host} is closed, probe {request} succeeded.')
+
+    def __failure(self, host: str, request: Request, spider) -> None:
+        now = time.monotonic()
+        circuit = self.__circuits.get(host)
+        if circuit is None:
+           circuit = self.__circuits[host] = CircuitState(self.open_timeout)
+        circuit.failures += 1
+        if circuit.state == CircuitState.CLOSED and circuit.failures >= self.failures:
+           self.__open(host, circuit, now, spider)
+        elif circuit.state == CircuitState.HALF_OPEN and circuit.probe == id(request):
+           self.__open(host, circuit, now, spider)
+
+    def __retry_after(self, circuit: CircuitState, request: Request, now: float) -> float:
+        """熔断器放行请求时返回 ``0`` , 否则返回请求需要等待的时间(秒)"""
+        if circuit.state == CircuitState.OPEN:
+           remaining = circuit.opened_at + circuit.open_timeout - now
+           if remaining > 0:
+              return remaining
+           circuit.state = CircuitState.HALF_OPEN
+        # 半开状态只放行一个探测请求, 探测请求没有结果(例如被其他中间件丢弃)超过打开时间后放行新的探测请求
+        if circuit.probe is None or circuit.probe == id(request) or now - circuit.probe_at >= circuit.open_timeout:
+           circuit.probe = id(request)
+           circuit.probe_at = now
+           return 0
+        # 等待探测结果, 等待时间随探测时间增长
+        return min(circuit.open_timeout, 1 + now - circuit.probe_at)
+
+    def process_request(self, request, spider):
+        host = url_host(str(request.uri))
+        circuit = self.__circuits.get(host) if host else None
+        retry_after = 0 if circuit is None or circuit.state == CircuitState.CLOSED else self.__retry_after(circuit, request, time.monotonic())
+        parked_at = request.meta.get('circuit_parked_at', None)
+        if not retry_after:
+           if parked_at is not None:
+              del request.meta['circuit_parked_at']
+           return request
+        if parked_at is None and self.mode == 'park':
+           parked_at = request.meta['circuit_parked_at'] = time.time()
+        budget = 0 if self.mode == 'fail' else parked_at + self.max_park_time - time.time()
+        if budget <= 0:
+           self.__stats(spider, 'rejected')
+           raise CircuitOpen(request, host, retry_after)
+        # 暂缓的请求重新进入调度器和下载器, 等待时间不超过剩余的最长等待时间
+        request.reset_state(request.States.schedule)
+        request.reset_state(request.States.download)
+        request.meta[Scheduler.DELAY_KEY] = min(budget, retry_after + random.uniform(0, min(1, retry_after)))
+        self.__stats(spider, 'parked')
+        return request
+
+    def process_response(self, response, request, spider):
+        host = url_host(str(request.uri))
+        if not host:
+           return response
+        if isinstance(response, HttpResponse) and response.status in self.http_codes:
+           self.__failure(host, request, spider)
+        else:
+           self.__success(host, request, spider)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        host = url_host(str(request.uri))
+        if host and not isinstance(exception, CircuitOpen) and isinstance(exception, self.exceptions):
+           self.__failure(host, request, spider)
+        return None
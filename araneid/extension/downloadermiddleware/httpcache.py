@@ -0,0 +1,402 @@
+import os
+import time
+import pickle
+import sqlite3
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from multidict import CIMultiDict
+from araneid.core.exception import NotConfigured
+from araneid.network.http import HttpRequest, HttpResponse
+from araneid.util._import import import_class
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """解析 ``Cache-Control`` 头, 指令名转换为小写, 没有值的指令的值为 ``None``
+
+    Args:
+        value (Optional[str]): ``Cache-Control`` 头的值
+
+    Returns:
+        Dict[str, Optional[str]]: 指令
+    """
+    directives = {}
+    for directive in (value or '').split(','):
+        name, _, argument = directive.strip().partition('=')
+        if name:
+           directives[name.lower()] = argument.strip().strip('"') if argument else None
+    return directives
+
+def parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+       return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+def parse_seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class CacheEntry(object):
+    """缓存的请求响应, ``time`` 为响应被下载(或者重新验证)的时间"""
+    __slots__ = ['url', 'status', 'headers', 'body', 'encoding', 'reason', 'cookies', 'time']
+
+    def __init__(self, url, status, headers, body, encoding='utf-8', reason='', cookies=None, time=None):
+        self.url = url
+        self.status = status
+        self.headers = CIMultiDict(headers or {})
+        self.body = body
+        self.encoding = encoding
+        self.reason = reason
+        self.cookies = cookies or {}
+        self.time = time
+
+    @classmethod
+    def from_response(cls, response: HttpResponse, now: float) -> 'CacheEntry':
+        return cls(response.request.url, response.status, response.headers, response.body, encoding=response.encoding, reason=response.reason, cookies=response.cookies, time=now)
+
+    def to_response(self, request: HttpRequest) -> HttpResponse:
+        return HttpResponse.from_request(request=request, status=self.status, content=self.body, headers=CIMultiDict(self.headers), encoding=self.encoding, reason=self.reason, cookies=dict(self.cookies))
+
+    def __getstate__(self):
+        return {'url': self.url, 'status': self.status, 'headers': list(self.headers.items()), 'body': self.body, 'encoding': self.encoding, 'reason': self.reason, 'cookies': self.cookies, 'time': self.time}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+class CacheStorage(object):
+    """缓存存储, 按照请求指纹保存 :py:obj:`CacheEntry` , 超过 ``expiration`` 秒的缓存视为不存在(0为永不过期).
+
+    :py:obj:`HttpCacheMiddleware` 在默认线程池中调用 :py:meth:`retrieve` 和 :py:meth:`store` , 实现需要是线程安全的.
+    """
+
+    def __init__(self, directory: str, expiration: float=0):
+        self.directory = directory
+        self.expiration = expiration
+
+    def open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+    def expired(self, entry: CacheEntry, now: float) -> bool:
+        return self.expiration > 0 and now - entry.time > self.expiration
+
+    def retrieve(self, key: str, now: float) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    def store(self, key: str, entry: CacheEntry) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class FilesystemCacheStorage(CacheStorage):
+    """每个缓存保存为 ``<目录>/<指纹前两位>/<指纹>`` 文件, 先写入临时文件再替换, 进程中断不会留下不完整的缓存"""
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def retrieve(self, key: str, now: float) -> Optional[CacheEntry]:
+        try:
+            with open(self.__path(key), 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return None if self.expired(entry, now) else entry
+
+    def store(self, key: str, entry: CacheEntry) -> None:
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+
+class SqliteCacheStorage(CacheStorage):
+    """所有缓存保存在 ``<目录>/httpcache.sqlite`` 数据库中, 写入每 ``COMMIT_INTERVAL`` 条或者每 ``COMMIT_DELAY`` 秒提交一次, 关闭时提交剩余的写入"""
+    connection = None
+    COMMIT_INTERVAL = 100
+    COMMIT_DELAY = 1.0
+
+    def __init__(self, directory: str, expiration: float=0):
+        super().__init__(directory, expiration=expiration)
+        self.__lock = threading.Lock()
+        self.__uncommitted = 0
+        self.__committed_at = 0.0
+
+    def open(self) -> None:
+        super().open()
+        self.connection = sqlite3.connect(os.path.join(self.directory, 'httpcache.sqlite'), check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS httpcache (key TEXT PRIMARY KEY, time REAL, entry BLOB)')
+        if self.expiration > 0:
+           self.connection.execute('DELETE FROM httpcache WHERE time < ?', (time.time() - self.expiration,))
+        self.connection.commit()
+        self.__committed_at = time.monotonic()
+
+    def retrieve(self, key: str, now: float) -> Optional[CacheEntry]:
+        with self.__lock:
+            if self.connection is None:
+               return None
+            row = self.connection.execute('SELECT entry FROM httpcache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+           return None
+        try:
+            entry = pickle.loads(row[0])
+        except (EOFError, pickle.UnpicklingError):
+            return None
+        return None if self.expired(entry, now) else entry
+
+    def store(self, key: str, entry: CacheEntry) -> None:
+        data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.__lock:
+            if self.connection is None:
+               return
+            self.connection.execute('REPLACE INTO httpcache (key, time, entry) VALUES (?, ?, ?)', (key, entry.time, data))
+            self.__uncommitted += 1
+            now = time.monotonic()
+            if self.__uncommitted >= self.COMMIT_INTERVAL or now - self.__committed_at >= self.COMMIT_DELAY:
+               self.connection.commit()
+               self.__uncommitted = 0
+               self.__committed_at = now
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.connection is not None:
+               self.connection.commit()
+               self.connection.close()
+               self.connection = None
+
+
+class DummyPolicy(object):
+    """缓存所有请求响应(状态码在 ``HTTPCACHE_IGNORE_HTTP_CODES`` 中的除外), 缓存不会过期也不会重新验证, 只受 ``HTTPCACHE_EXPIRATION_SECS`` 限制"""
+
+    def __init__(self, ignore_http_codes=None):
+        self.ignore_http_codes = frozenset(ignore_http_codes or [])
+
+    def should_cache_request(self, request: HttpRequest) -> bool:
+        return True
+
+    def should_cache_response(self, response: HttpResponse, request: HttpRequest) -> bool:
+        return response.status not in self.ignore_http_codes
+
+    def is_fresh(self, entry: CacheEntry, request: HttpRequest, now: float) -> bool:
+        return True
+
+    def validators(self, entry: CacheEntry) -> Dict[str, str]:
+        return {}
+
+    def allow_stale(self, entry: CacheEntry) -> bool:
+        return True
+
+
+class RFC9111Policy(DummyPolicy):
+    """按照 RFC 9111 的规则使用缓存:
+
+    * 只缓存 ``GET`` 和 ``HEAD`` 请求, 请求或者请求响应的 ``Cache-Control`` 为 ``no-store`` 时不缓存.
+    * 新鲜度由 ``Cache-Control: max-age`` ( ``s-maxage`` ), ``Expires`` 决定, 都没有时使用 ``Last-Modified`` 距离下载时间的10%作为启发式新鲜度.
+    * 请求的 ``Cache-Control: no-cache`` 、 ``max-age`` 限制使用的缓存; 请求响应的 ``no-cache`` 要求每次重新验证.
+    * 缓存不新鲜时通过 ``If-None-Match`` ( ``ETag`` )和 ``If-Modified-Since`` ( ``Last-Modified`` )发送条件请求, 服务器返回304时使用缓存.
+    * 重新验证失败时使用不新鲜的缓存, 请求响应的 ``Cache-Control`` 为 ``must-revalidate`` 或者 ``no-cache`` 时除外.
+    """
+    CACHEABLE_METHODS = frozenset(['GET', 'HEAD'])
+    HEURISTIC_STATUS = frozenset([200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501])
+
+    def should_cache_request(self, request: HttpRequest) -> bool:
+        if str(request.method).upper() not in self.CACHEABLE_METHODS:
+           return False
+        return 'no-store' not in parse_cache_control((request.headers or {}).get('Cache-Control'))
+
+    def should_cache_response(self, response: HttpResponse, request: HttpRequest) -> bool:
+        if response.status == 304 or not super().should_cache_response(response, request):
+           return False
+        headers = response.headers or {}
+        cache_control = parse_cache_control(headers.get('Cache-Control'))
+        if 'no-store' in cache_control:
+           return False
+        if 'max-age' in cache_control or 's-maxage' in cache_control or 'Expires' in headers:
+           return True
+        return response.status in self.HEURISTIC_STATUS and ('Last-Modified' in headers or 'ETag' in headers)
+
+    def freshness_lifetime(self, entry: CacheEntry) -> float:
+        headers = entry.headers
+        cache_control = parse_cache_control(headers.get('Cache-Control'))
+        if 'no-cache' in cache_control:
+           return 0
+        for directive in ('s-maxage', 'max-age'):
+            lifetime = parse_seconds(cache_control.get(directive))
+            if lifetime is not None:
+               return lifetime
+        date = parse_http_date(headers.get('Date')) or entry.time
+        expires = parse_http_date(headers.get('Expires'))
+        if 'Expires' in headers:
+           return max(0, expires - date) if expires is not None else 0
+        last_modified = parse_http_date(headers.get('Last-Modified'))
+        if last_modified is not None and last_modified < date:
+           return (date - last_modified) / 10
+        return 0
+
+    def current_age(self, entry: CacheEntry, now: float) -> float:
+        age = parse_seconds(entry.headers.get('Age')) or 0
+        return age + max(0, now - entry.time)
+
+    def is_fresh(self, entry: CacheEntry, request: HttpRequest, now: float) -> bool:
+        request_cache_control = parse_cache_control((request.headers or {}).get('Cache-Control'))
+        if 'no-cache' in request_cache_control:
+           return False
+        lifetime = self.freshness_lifetime(entry)
+        max_age = parse_seconds(request_cache_control.get('max-age'))
+        if max_age is not None:
+           lifetime = min(lifetime, max_age)
+        return self.current_age(entry, now) < lifetime
+
+    def validators(self, entry: CacheEntry) -> Dict[str, str]:
+        validators = {}
+        if 'ETag' in entry.headers:
+           validators['If-None-Match'] = entry.headers['ETag']
+        if 'Last-Modified' in entry.headers:
+           validators['If-Modified-Since'] = entry.headers['Last-Modified']
+        elif 'ETag' not in entry.headers and 'Date' in entry.headers:
+           validators['If-Modified-Since'] = entry.headers['Date']
+        return validators
+
+    def allow_stale(self, entry: CacheEntry) -> bool:
+        cache_control = parse_cache_control(entry.headers.get('Cache-Control'))
+        return not ('must-revalidate' in cache_control or 'proxy-revalidate' in cache_control or 'no-cache' in cache_control)
+
+
+class HttpCacheMiddleware(object):
+    """缓存Http请求响应的下载中间件, 命中缓存的请求在 ``process_request`` 中直接返回缓存的请求响应, 不经过下载器.
+
+    缓存按照请求指纹( :py:meth:`~araneid.core.request.Request.get_fingerprint` )保存, 配置:
+
+    * ``HTTPCACHE_ENABLED`` : 是否启用, 默认为: False
+    * ``HTTPCACHE_DIR`` : 缓存目录, 默认为: ``.httpcache``
+    * ``HTTPCACHE_STORAGE`` : 缓存存储, ``filesystem`` ( :py:obj:`FilesystemCacheStorage` ), ``sqlite`` ( :py:obj:`SqliteCacheStorage` )或者类路径, 默认为: ``filesystem``
+    * ``HTTPCACHE_POLICY`` : 缓存策略, ``dummy`` ( :py:obj:`DummyPolicy` ), ``rfc9111`` ( :py:obj:`RFC9111Policy` )或者类路径, 默认为: ``dummy``
+    * ``HTTPCACHE_EXPIRATION_SECS`` : 缓存过期时间(秒), 0为永不过期, 默认为: 0
+    * ``HTTPCACHE_IGNORE_HTTP_CODES`` : 不缓存的状态码, 默认为: []
+    * ``HTTPCACHE_HEADERS`` : 参与计算缓存指纹的请求头, 默认为: None
+
+    缓存的读取和写入在默认线程池( ``MAX_ASYNCIO_WORKERS`` 配置的线程池)中执行, 不阻塞事件循环. 需要写入或者重新验证的缓存保存在请求的 ``meta['_httpcache']`` 中,
+    重新验证时添加的条件请求头( ``If-None-Match`` / ``If-Modified-Since`` )在请求响应或者下载异常之后还原, 不会跟随重试的请求, 也不会改变请求指纹.
+
+    请求的 ``meta['dont_cache']`` 为真时不使用缓存. 缓存的使用情况写入爬虫的统计信息 ``httpcache/<hit|miss|store|revalidate|stale>`` (分隔符为 ``/`` ).
+    """
+    logger = None
+    STORAGES = {'filesystem': FilesystemCacheStorage, 'sqlite': SqliteCacheStorage}
+    POLICIES = {'dummy': DummyPolicy, 'rfc9111': RFC9111Policy}
+    META_KEY = '_httpcache'
+    UNCHANGED = object()
+    UNUPDATABLE_HEADERS = frozenset(['content-length', 'content-encoding', 'transfer-encoding', 'content-range'])
+
+    def __init__(self, storage: CacheStorage, policy: DummyPolicy, include_headers=None):
+        self.logger = logging.getLogger(__name__)
+        self.storage = storage
+        self.policy = policy
+        self.include_headers = include_headers
+
+    @classmethod
+    def from_settings(cls, settings):
+        if not settings.get('HTTPCACHE_ENABLED', False):
+           raise NotConfigured(f'{cls.__name__} must be enabled explicitly by HTTPCACHE_ENABLED setting.')
+        storage = settings.get('HTTPCACHE_STORAGE', 'filesystem')
+        policy = settings.get('HTTPCACHE_POLICY', 'dummy')
+        Storage = cls.STORAGES[storage] if storage in cls.STORAGES else import_class(storage)
+        Policy = cls.POLICIES[policy] if policy in cls.POLICIES else import_class(policy)
+        return cls(Storage(settings.get('HTTPCACHE_DIR', '.httpcache'), expiration=settings.get('HTTPCACHE_EXPIRATION_SECS', 0)),
+                   Policy(ignore_http_codes=settings.get('HTTPCACHE_IGNORE_HTTP_CODES', [])),
+                   include_headers=settings.get('HTTPCACHE_HEADERS', None))
+
+    @classmethod
+    async def create(cls, settings=None):
+        instance = cls.from_settings(settings if settings is not None else {})
+        instance.storage.open()
+        return instance
+
+    def order(self):
+        # 在重试之后处理下载异常, 重试次数用完之后才使用过期的缓存
+        return 100
+
+    def __key(self, request: HttpRequest) -> str:
+        return request.get_fingerprint(self.include_headers).hex()
+
+    def __stats(self, spider, name: str) -> None:
+        stats = getattr(spider, 'stats', None)
+        if stats is not None:
+           stats.inc_value(f'httpcache/{name}', spider=spider, sep='/')
+
+    async def process_request(self, request, spider):
+        if not isinstance(request, HttpRequest) or request.meta.get('dont_cache', False) or not self.policy.should_cache_request(request):
+           return request
+        # 重试的请求不经过本中间件的 process_response 重新进入, 先还原上一次添加的条件请求头
+        self.__pop_pending(request)
+        now = time.time()
+        key = self.__key(request)
+        entry = await asyncio.get_event_loop().run_in_executor(None, self.storage.retrieve, key, now)
+        headers = self.UNCHANGED
+        if entry is None:
+           self.__stats(spider, 'miss')
+        elif self.policy.is_fresh(entry, request, now):
+           self.__stats(spider, 'hit')
+           return entry.to_response(request)
+        else:
+           validators = self.policy.validators(entry)
+           if validators:
+              # 条件请求头写入请求头的副本, 原始请求头在请求响应或者下载异常之后还原
+              headers = request.headers
+              request.headers = {**(headers or {}), **validators}
+        request.meta[self.META_KEY] = (key, entry, headers)
+        return request
+
+    def __pop_pending(self, request) -> Optional[tuple]:
+        pending = request.meta.get(self.META_KEY)
+        if pending is None:
+           return None
+        del request.meta[self.META_KEY]
+        key, entry, headers = pending
+        if headers is not self.UNCHANGED:
+           request.headers = headers
+        return key, entry
+
+    async def process_response(self, response, request, spider):
+        pending = self.__pop_pending(request)
+        if pending is None or not isinstance(response, HttpResponse):
+           return response
+        key, entry = pending
+        now = time.time()
+        loop = asyncio.get_event_loop()
+        if response.status == 304 and entry is not None:
+           entry.headers.update((name, value) for name, value in (response.headers or {}).items() if name.lower() not in self.UNUPDATABLE_HEADERS)
+           entry.time = now
+           await loop.run_in_executor(None, self.storage.store, key, entry)
+           self.__stats(spider, 'revalidate')
+           return entry.to_response(request)
+        if self.policy.should_cache_response(response, request):
+           await loop.run_in_executor(None, self.storage.store, key, CacheEntry.from_response(response, now))
+           self.__stats(spider, 'store')
+        return response
+
+    def process_exception(self, request, exception, spider):
+        pending = self.__pop_pending(request)
+        if pending is None or pending[1] is None or not self.policy.allow_stale(pending[1]):
+           return None
+        self.logger.debug(f'{request} revalidation failed, served from stale cache.')
+        self.__stats(spider, 'stale')
+        return pending[1].to_response(request)
+
+    def close(self):
+        self.storage.close()
+        self.logger.debug(f'{self.__class__.__name__} closed')
@@ -0,0 +1,70 @@
+import time
+import asyncio
+import logging
+from araneid.core.exception import NotConfigured
+from araneid.downloader.replay import ResponseArchive
+from araneid.network.http import HttpRequest, HttpResponse
+
+
+class RecordMiddleware(object):
+    """录制下载器返回的Http请求响应(状态码, 响应头, 内容和下载耗时)到 :py:obj:`~araneid.downloader.replay.ResponseArchive` ,
+    之后可以通过 :py:obj:`~araneid.downloader.replay.Replay` 下载器离线回放. 配置:
+
+    * ``REPLAY_RECORD`` : 是否录制, 默认为: False
+    * ``REPLAY_ARCHIVE`` : 存档目录, 已经存在的存档会被追加, 默认为: ``.replay``
+
+    录制在其他下载中间件之前处理请求响应, 保存的是下载器返回的原始请求响应(包括重试之前的失败响应), 命中缓存的请求不会被录制.
+    请求开始下载的时间保存在请求的 ``meta['_record']`` 中, 存档的写入在默认线程池中执行, 不影响其他请求的下载耗时.
+    录制情况写入爬虫的统计信息 ``replay/recorded`` (分隔符为 ``/`` ).
+    """
+    META_KEY = '_record'
+
+    def __init__(self, archive: ResponseArchive):
+        self.logger = logging.getLogger(__name__)
+        self.archive = archive
+
+    @classmethod
+    def from_settings(cls, settings):
+        if not settings.get('REPLAY_RECORD', False):
+           raise NotConfigured(f'{cls.__name__} must be enabled explicitly by REPLAY_RECORD setting.')
+        return cls(ResponseArchive(settings.get('REPLAY_ARCHIVE', '.replay')))
+
+    @classmethod
+    async def create(cls, settings=None):
+        instance = cls.from_settings(settings if settings is not None else {})
+        instance.archive.open(writable=True)
+        return instance
+
+    def order(self):
+        # 在熔断和重试之前处理请求响应
+        return -20
+
+    def process_request(self, request, spider):
+        if isinstance(request, HttpRequest):
+           request.meta[self.META_KEY] = time.perf_counter()
+        return request
+
+    def __pop_started(self, request):
+        started = request.meta.get(self.META_KEY)
+        if started is not None:
+           del request.meta[self.META_KEY]
+        return started
+
+    async def process_response(self, response, request, spider):
+        started = self.__pop_started(request)
+        if started is None or not isinstance(response, HttpResponse):
+           return response
+        elapsed = time.perf_counter() - started
+        await asyncio.get_event_loop().run_in_executor(None, self.archive.add, request.fingerprint.hex(), response, elapsed)
+        stats = getattr(spider, 'stats', None)
+        if stats is not None:
+           stats.inc_value('replay/recorded', spider=spider, sep='/')
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self.__pop_started(request)
+        return None
+
+    def close(self):
+        self.archive.close()
+        self.logger.debug(f'{self.__class__.__name__} closed, {len(self.archive)} responses in archive {self.archive.directory}')
@@ -0,0 +1,88 @@
+import random
+import logging
+from typing import Optional, Tuple, Type
+from araneid.core.exception import NotConfigured
+from araneid.core.request import Request
+from araneid.core.scheduler import Scheduler
+from araneid.network.http import HttpResponse
+from araneid.util._import import import_class
+
+
+class RetryMiddleware(object):
+    """重试下载失败的请求, 最多重试 ``Request.max_retries`` 次, ``meta`` 中设置了 ``dont_retry`` 的请求不会被重试.
+
+    * 响应状态码在 ``RETRY_HTTP_CODES`` 中(默认为: [500, 502, 503, 504, 522, 524, 408, 429]), 或者下载时抛出了 ``RETRY_EXCEPTIONS`` 中的异常时重试请求.
+    * 第n次重试的延迟为 ``min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2**(n-1))`` 秒(默认为: 1, 60), 再随机减少最多 ``RETRY_BACKOFF_JITTER`` 比例(默认为: 0.5)的延迟, 避免大量请求同时重试.
+    * 重试的请求通过 ``meta['schedule_delay']`` (参考 :py:attr:`~araneid.core.scheduler.Scheduler.DELAY_KEY` )重新进入调度器, 在调度器的延迟队列中等待, 等待期间不占用下载并发和节流的并发.
+    * 重试情况记录在统计的 ``retry/count`` , ``retry/reason/<原因>`` 和 ``retry/max_reached`` 中.
+
+    通过 ``RETRY_ENABLED`` 禁用(默认为: True).
+    """
+    DEFAULT_HTTP_CODES = [500, 502, 503, 504, 522, 524, 408, 429]
+    DEFAULT_EXCEPTIONS = ['araneid.downloader.aiohttp.HttpConnectionClose', 'asyncio.TimeoutError', 'builtins.ConnectionError']
+
+    def __init__(self, http_codes=None, exceptions: Tuple[Type[BaseException], ...]=(), backoff_base: float=1, backoff_max: float=60, backoff_jitter: float=0.5):
+        self.logger = logging.getLogger(__name__)
+        self.http_codes = frozenset(self.DEFAULT_HTTP_CODES if http_codes is None else http_codes)
+        self.exceptions = tuple(exceptions)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.backoff_jitter = backoff_jitter
+
+    @classmethod
+    def from_settings(cls, settings):
+        if not settings.get('RETRY_ENABLED', True):
+           raise NotConfigured(f'{cls.__name__} is disabled by RETRY_ENABLED setting.')
+        exceptions = settings.get('RETRY_EXCEPTIONS', cls.DEFAULT_EXCEPTIONS)
+        return cls(http_codes=settings.get('RETRY_HTTP_CODES', cls.DEFAULT_HTTP_CODES),
+                   exceptions=[import_class(exception) if isinstance(exception, str) else exception for exception in exceptions],
+                   backoff_base=settings.get('RETRY_BACKOFF_BASE', 1),
+                   backoff_max=settings.get('RETRY_BACKOFF_MAX', 60),
+                   backoff_jitter=settings.get('RETRY_BACKOFF_JITTER', 0.5))
+
+    @classmethod
+    async def create(cls, settings=None):
+        return cls.from_settings(settings if settings is not None else {})
+
+    def order(self):
+        return 0
+
+    def backoff(self, retries: int) -> float:
+        """第 ``retries`` 次重试的延迟(秒)"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** max(retries-1, 0))
+        return delay - random.uniform(0, delay * self.backoff_jitter)
+
+    def __stats(self, spider, name: str) -> None:
+        stats = getattr(spider, 'stats', None)
+        if stats is not None:
+           stats.inc_value(f'retry/{name}', spider=spider, sep='/')
+
+    def __retry(self, request: Request, reason: str, spider) -> Optional[Request]:
+        if request.meta.get('dont_retry', False):
+           return None
+        if request.retries >= request.max_retries:
+           if request.max_retries > 0:
+              self.logger.warning(f'Gave up retrying {request} (failed {request.retries+1} times): {reason}')
+              self.__stats(spider, 'max_reached')
+           return None
+        request.retries += 1
+        delay = self.backoff(request.retries)
+        # 重新进入调度器和下载器
+        request.reset_state(request.States.schedule)
+        request.reset_state(request.States.download)
+        request.meta[Scheduler.DELAY_KEY] = delay
+        self.__stats(spider, 'count')
+        self.__stats(spider, f'reason/{reason}')
+        self.logger.debug(f'Retrying {request} in {delay:.2f}s (retried {request.retries}/{request.max_retries} times): {reason}')
+        return request
+
+    def process_response(self, response, request, spider):
+        if not isinstance(response, HttpResponse) or response.status not in self.http_codes:
+           return response
+        retry = self.__retry(request, str(response.status), spider)
+        return retry if retry is not None else response
+
+    def process_exception(self, request, exception, spider):
+        if not isinstance(exception, self.exceptions):
+           return None
+        return self.__retry(request, exception.__class__.__name__, spider)
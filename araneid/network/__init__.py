@@ -1,4 +1,4 @@
 # import compatiable
 
 
-__all__ = ['http', 'socket', 'websocket']
+__all__ = ['http', 'socket', 'websocket', 'dns', 'compression']
@@ -0,0 +1,131 @@
+import zlib
+from typing import Callable, Dict, List, Optional
+from multidict import CIMultiDict
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class ZlibDecoder(object):
+    """gzip和deflate解码器, deflate兼容没有zlib头的原始deflate数据"""
+    __slots__ = ['__obj', '__deflate']
+
+    def __init__(self, encoding: str):
+        self.__deflate = encoding == 'deflate'
+        self.__obj = zlib.decompressobj(wbits=zlib.MAX_WBITS if self.__deflate else 16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.__deflate:
+           self.__deflate = False
+           try:
+               return self.__obj.decompress(data)
+           except zlib.error:
+               self.__obj = zlib.decompressobj(wbits=-zlib.MAX_WBITS)
+        return self.__obj.decompress(data)
+
+    def flush(self) -> bytes:
+        return self.__obj.flush()
+
+
+class BrotliDecoder(object):
+    """br解码器, 兼容 ``brotli`` , ``brotlipy`` 和 ``brotlicffi``"""
+    __slots__ = ['__obj']
+
+    def __init__(self, encoding: str='br'):
+        self.__obj = brotli.Decompressor()
+
+    def decompress(self, data: bytes) -> bytes:
+        if hasattr(self.__obj, 'decompress'):
+           return self.__obj.decompress(data)
+        return self.__obj.process(data)
+
+    def flush(self) -> bytes:
+        if hasattr(self.__obj, 'flush'):
+           return self.__obj.flush()
+        return b''
+
+
+class ZstdDecoder(object):
+    """zstd解码器, 支持多个连续的zstd帧"""
+    __slots__ = ['__obj']
+
+    def __init__(self, encoding: str='zstd'):
+        self.__obj = zstandard.ZstdDecompressor().decompressobj(read_across_frames=True)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self.__obj.decompress(data)
+
+    def flush(self) -> bytes:
+        return self.__obj.flush()
+
+
+DECODERS: Dict[str, Callable] = {'gzip': ZlibDecoder, 'x-gzip': ZlibDecoder, 'deflate': ZlibDecoder}
+if brotli is not None:
+   DECODERS['br'] = BrotliDecoder
+if zstandard is not None:
+   DECODERS['zstd'] = ZstdDecoder
+
+
+def accept_encoding() -> str:
+    """可以解码的内容编码, 作为请求头 ``Accept-Encoding`` 的值"""
+    return ', '.join(encoding for encoding in ('gzip', 'deflate', 'br', 'zstd') if encoding in DECODERS)
+
+
+def decoded_headers(headers) -> CIMultiDict:
+    """解码后的请求响应的响应头, 去掉 ``Content-Encoding`` 和 ``Content-Length`` , 避免缓存、记录或者回放时把解码后的内容当作压缩的内容
+
+    Args:
+        headers (Mapping): 原响应头
+
+    Returns:
+        CIMultiDict: 去掉编码相关响应头的副本
+    """
+    headers = CIMultiDict(headers)
+    for name in ('Content-Encoding', 'Content-Length'):
+        headers.popall(name, None)
+    return headers
+
+
+class ContentDecoder(object):
+    """按块解码请求响应内容, 按照 ``Content-Encoding`` 的相反顺序依次解码"""
+    __slots__ = ['__decoders']
+
+    def __init__(self, decoders: List):
+        self.__decoders = decoders
+
+    @classmethod
+    def from_encoding(cls, content_encoding: Optional[str]) -> Optional['ContentDecoder']:
+        """创建内容编码对应的解码器
+
+        Args:
+            content_encoding (Optional[str]): ``Content-Encoding`` 响应头的值
+
+        Returns:
+            Optional[ContentDecoder]: 没有编码或者包含不支持的编码时返回 ``None`` (不解码)
+        """
+        encodings = [encoding.strip().lower() for encoding in (content_encoding or '').split(',')]
+        encodings = [encoding for encoding in encodings if encoding and encoding != 'identity']
+        if not encodings or any(encoding not in DECODERS for encoding in encodings):
+           return None
+        return cls([DECODERS[encoding](encoding) for encoding in reversed(encodings)])
+
+    def decompress(self, data: bytes) -> bytes:
+        for decoder in self.__decoders:
+            data = decoder.decompress(data)
+        return data
+
+    def flush(self) -> bytes:
+        data = b''
+        for decoder in self.__decoders:
+            data = decoder.decompress(data) + decoder.flush() if data else decoder.flush()
+        return data
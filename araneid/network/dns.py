@@ -0,0 +1,201 @@
+import copy
+import socket
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DNSCache(object):
+    """所有下载器共用的DNS缓存, 实现了aiohttp的解析器接口( ``resolve(host, port, family)`` ), 可以直接作为连接器的 ``resolver`` 使用.
+
+    * 解析成功的结果缓存 ``DNSCACHE_TTL`` 秒(默认为: 300, 0为不缓存), 解析失败的结果缓存 ``DNSCACHE_NEGATIVE_TTL`` 秒(默认为: 10, 0为不缓存).
+    * 同一个域名同时只有一个解析请求, 其他请求等待该请求的结果.
+    * 最多缓存 ``DNSCACHE_SIZE`` 个域名(默认为: 10000), 超过时淘汰最久没有使用的域名.
+    * ``DNS_PREFETCH`` 为 ``True`` 时, 请求进入调度器时通过 :py:meth:`prefetch` 预先解析请求的域名(默认为: False).
+
+    解析使用aiohttp的 ``AsyncResolver`` (aiodns不可用时使用 ``ThreadedResolver`` ), 命中情况可以通过 :py:meth:`stats` 获取.
+    """
+    MAX_PREFETCHES = 64
+
+    def __init__(self, ttl: float=300, negative_ttl: float=10, max_size: int=10000, resolver=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.__resolver = resolver
+        self.__loop = None
+        self.__entries: Dict[Tuple[str, int], tuple] = OrderedDict()
+        self.__lookups: Dict[Tuple[str, int], asyncio.Task] = {}
+        self.__prefetches = 0
+        self.__stats = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'coalesced': 0, 'prefetches': 0, 'errors': 0}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(ttl=settings.get('DNSCACHE_TTL', 300),
+                   negative_ttl=settings.get('DNSCACHE_NEGATIVE_TTL', 10),
+                   max_size=settings.get('DNSCACHE_SIZE', 10000))
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def stats(self) -> Dict[str, int]:
+        """缓存命中情况: ``hits`` (命中), ``misses`` (未命中, 发起了解析), ``negative_hits`` (命中解析失败的缓存), ``coalesced`` (等待同一个域名正在进行的解析),
+        ``prefetches`` (预解析), ``errors`` (解析失败)"""
+        return {**self.__stats, 'size': len(self.__entries)}
+
+    def __bind_loop(self):
+        loop = asyncio.get_event_loop()
+        if self.__loop is not loop:
+           # 切换了事件循环(例如测试), 丢弃和之前事件循环绑定的解析器和正在进行的解析
+           self.__loop = loop
+           self.__lookups.clear()
+           self.__prefetches = 0
+           if getattr(self.__resolver, '_loop', loop) is not loop:
+              self.__resolver = None
+        if self.__resolver is None:
+           self.__resolver = self.__new_resolver()
+
+    @staticmethod
+    def __new_resolver():
+        from aiohttp import AsyncResolver, ThreadedResolver
+        try:
+            return AsyncResolver()
+        except (ImportError, RuntimeError):
+            return ThreadedResolver()
+
+    def __get(self, key: Tuple[str, int], now: float):
+        entry = self.__entries.get(key)
+        if entry is None:
+           return None
+        expires, _ = entry
+        if expires <= now:
+           del self.__entries[key]
+           return None
+        self.__entries.move_to_end(key)
+        return entry
+
+    def __put(self, key: Tuple[str, int], ttl: float, result, now: float) -> None:
+        if ttl <= 0:
+           return
+        self.__entries[key] = (now + ttl, result)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    async def __lookup(self, key: Tuple[str, int]):
+        host, family = key
+        try:
+            addresses = await self.__resolver.resolve(host, 0, family=family)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.__stats['errors'] += 1
+            self.__put(key, self.negative_ttl, e, self.__loop.time())
+            raise
+        else:
+            self.__put(key, self.ttl, addresses, self.__loop.time())
+            return addresses
+        finally:
+            self.__lookups.pop(key, None)
+
+    def __start_lookup(self, key: Tuple[str, int]) -> asyncio.Task:
+        lookup = self.__lookups[key] = asyncio.ensure_future(self.__lookup(key))
+        # 所有等待者都被取消时避免 "exception was never retrieved"
+        lookup.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return lookup
+
+    async def resolve(self, host: str, port: int=0, family: int=socket.AF_INET) -> List[dict]:
+        """解析域名
+
+        Args:
+            host (str): 域名
+            port (int, optional): 端口. 默认为: 0
+            family (int, optional): 地址族. 默认为: socket.AF_INET
+
+        Raises:
+            OSError: 解析失败
+
+        Returns:
+            List[dict]: 解析结果, 格式和aiohttp的解析器相同( ``hostname`` , ``host`` , ``port`` , ``family`` , ``proto`` , ``flags`` )
+        """
+        if is_ip_address(host):
+           return [{'hostname': host, 'host': host, 'port': port, 'family': family, 'proto': 0, 'flags': socket.AI_NUMERICHOST}]
+        self.__bind_loop()
+        key = (host, family)
+        entry = self.__get(key, self.__loop.time())
+        if entry is not None:
+           result = entry[1]
+           if isinstance(result, Exception):
+              self.__stats['negative_hits'] += 1
+              raise copy.copy(result)
+           self.__stats['hits'] += 1
+        else:
+           lookup = self.__lookups.get(key)
+           if lookup is None:
+              self.__stats['misses'] += 1
+              lookup = self.__start_lookup(key)
+           else:
+              self.__stats['coalesced'] += 1
+           result = await asyncio.shield(lookup)
+        return [{**address, 'port': port} for address in result]
+
+    def prefetch(self, host: Optional[str], family: int=socket.AF_INET) -> None:
+        """在后台预先解析域名, 域名已经缓存、正在解析或者预解析数量超过 ``MAX_PREFETCHES`` 时忽略
+
+        Args:
+            host (Optional[str]): 域名
+            family (int, optional): 地址族. 默认为: socket.AF_INET
+        """
+        if not host or is_ip_address(host):
+           return
+        self.__bind_loop()
+        key = (host, family)
+        if key in self.__lookups or self.__prefetches >= self.MAX_PREFETCHES or self.__get(key, self.__loop.time()) is not None:
+           return
+        self.__stats['prefetches'] += 1
+        self.__prefetches += 1
+        lookup = self.__start_lookup(key)
+        loop = self.__loop
+        def __(task):
+            if self.__loop is loop:
+               self.__prefetches -= 1
+        lookup.add_done_callback(__)
+
+    def clear(self) -> None:
+        self.__entries.clear()
+
+    async def close(self) -> None:
+        for lookup in list(self.__lookups.values()):
+            lookup.cancel()
+        self.__lookups.clear()
+        self.__entries.clear()
+        resolver, self.__resolver = self.__resolver, None
+        if resolver is not None and self.__loop is asyncio.get_event_loop():
+           await resolver.close()
+        logger.debug(f'{self.__class__.__name__} closed, stats: {self.stats()}')
+
+
+def is_ip_address(host: str) -> bool:
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except (OSError, ValueError):
+            continue
+    return False
+
+
+dnscache: Optional[DNSCache] = None
+
+def set_dnscache(_dnscache: DNSCache) -> None:
+    global dnscache
+    dnscache = _dnscache
+
+def get_dnscache() -> DNSCache:
+    """获取共用的DNS缓存, 没有设置时使用默认配置创建"""
+    global dnscache
+    if dnscache is None:
+       dnscache = DNSCache()
+    return dnscache
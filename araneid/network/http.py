@@ -15,7 +15,7 @@ class HttpHeaderException(Exception):
 
 
 class HttpRequest(Request):
-    __slots__ = ['__uri__', '__method__', '__data__', '__json__', '__files__', '__callbacks__', '__callback__', '__errback__', '__proxy__', '__cookies__', '__headers__', '__timeout__', '__proxy__']
+    __slots__ = ['__method__', '__data__', '__json__', '__files__', '__callbacks__', '__callback__', '__errback__', '__proxy__', '__cookies__', '__headers__']
 
 
     @property
@@ -26,14 +26,29 @@ class HttpRequest(Request):
     def method(self):
         return self.__method__
 
+    @method.setter
+    def method(self, method):
+        self.__method__ = method
+        self.__fingerprint__ = None
+
     @property
     def data(self):
         return self.__data__
 
+    @data.setter
+    def data(self, data):
+        self.__data__ = data
+        self.__fingerprint__ = None
+
     @property
     def json(self):
         return self.__json__
 
+    @json.setter
+    def json(self, json):
+        self.__json__ = json
+        self.__fingerprint__ = None
+
     @property
     def files(self):
         return self.__files__
@@ -73,6 +88,11 @@ class HttpRequest(Request):
             else:
                 str_headers[header_key] = header_value
         return str_headers
+
+    @headers.setter
+    def headers(self, headers):
+        self.__headers__ = headers
+        self.__fingerprint__ = None
     
     
     @property
@@ -81,6 +101,7 @@ class HttpRequest(Request):
 
     def set_header(self, key, value):
         self.__headers__[key] = value
+        self.__fingerprint__ = None
     
     def set_proxy(self, proxy):
         self.__proxy__ = proxy
@@ -92,7 +113,8 @@ class HttpRequest(Request):
         meta = kwargs.get('meta', None)
         context = kwargs.get('context', None)
         timeout = kwargs.get('timeout', 30)
-        super().__init__(url, downloader=downloader, attach= attach, max_retries=max_retries, meta=meta, context=context, timeout=timeout)
+        priority = kwargs.get('priority', 0)
+        super().__init__(url, downloader=downloader, attach= attach, max_retries=max_retries, meta=meta, context=context, timeout=timeout, priority=priority)
         self.__method__ = method
         self.__callbacks__ = kwargs.get('callbacks', None)
         self.__callback__ = kwargs.get('callback', None)
@@ -113,7 +135,7 @@ class HttpRequest(Request):
 
 class HttpResponse(Response):
 
-    __slots__ = ['__headers__', '__reason__', '__ok__', '__status__', '__length__', '__cookies__', '__history__','encoding']
+    __slots__ = ['__headers__', '__reason__', '__ok__', '__status__', '__length__', '__cookies__', '__history__']
 
     @property
     def headers(self):
@@ -138,6 +160,10 @@ class HttpResponse(Response):
     def length(self):
         return self.__length__
 
+    @property
+    def history(self):
+        return self.__history__
+
     @property
     def cookies(self):
         if not self.__cookies__:
@@ -150,7 +176,7 @@ class HttpResponse(Response):
         super().__init__(content=content)
         self.encoding = kwargs.get('encoding', 'UTF_8')
         self.__status__ = status
-        self.__length__ =  0 if content is None else len(content)
+        self.__length__ =  kwargs['length'] if 'length' in kwargs else 0 if content is None else len(content)
         self.__cookies__ = kwargs.get('cookies', {})
         self.__history__ = kwargs.get('history', [])
         self.__headers__ = kwargs.get('headers', {})
@@ -160,19 +186,19 @@ class HttpResponse(Response):
 
     def xpath(self, expr):
         if self.content:
-            selector = VolatileSelector(self.content)
+            selector = VolatileSelector(self.body)
             return selector.xpath(expr)
         return None
 
     def re(self, expr, encoding='UTF-8'):
         if self.content:
-            selector = VolatileSelector(self.content, encoding=encoding)
+            selector = VolatileSelector(self.body, encoding=encoding)
             return selector.re(expr)
         return None
 
     def css(self, expr):
         if self.content:
-            selector = VolatileSelector(self.content)
+            selector = VolatileSelector(self.body)
             return selector.css(expr)
         return None
     
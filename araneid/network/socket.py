@@ -9,7 +9,7 @@ from araneid.core.response import Response
 
 class SocketRequest(Request):
     connection = None
-    __slots__ = ['__callbacks__', '__callback__', '__errback__', '__closeback__','__on_open__', '__on_ping__', '__ping_interval__', '__proxy__', '__proxies__', '__timeout__']
+    __slots__ = ['__callbacks__', '__callback__', '__errback__', '__closeback__','__on_open__', '__on_ping__', '__ping_interval__', '__proxy__', '__proxies__']
 
     @property
     def callbacks(self):
@@ -46,7 +46,8 @@ class SocketRequest(Request):
         attach = kwargs.get('attach', None)
         meta = kwargs.get('meta', None)
         context = kwargs.get('context', None)
-        super().__init__(url, downloader=downloader, attach=attach, max_retries=max_retries, meta=meta, context=context)
+        priority = kwargs.get('priority', 0)
+        super().__init__(url, downloader=downloader, attach=attach, max_retries=max_retries, meta=meta, context=context, priority=priority)
         self.__timeout__ = kwargs.get('timeout', None)
         self.__proxy__ = kwargs.get('proxy', None) if kwargs.get('proxy', None)  else kwargs.get('proxies', None)
         self.__callbacks__ = kwargs.get('callbacks', None)
@@ -70,7 +71,7 @@ class SocketRequest(Request):
 
 
 class SocketResponse(Response):
-    __slots__ = ['__length__',  '__request__']
+    __slots__ = ['__length__']
 
     def __init__(self, content, **kwargs):
         super().__init__(content=content, **kwargs)
@@ -66,7 +66,8 @@ class WebSocketRequest(Request):
         max_retries = kwargs.get('max_retries', 3)
         attach = kwargs.get('attach', None)
         meta = kwargs.get('meta', None)
-        super().__init__(url, downloader=downloader, attach=attach, max_retries=max_retries, meta=meta)
+        priority = kwargs.get('priority', 0)
+        super().__init__(url, downloader=downloader, attach=attach, max_retries=max_retries, meta=meta, priority=priority)
         self.__timeout__ = kwargs.get('timeout', None)
         self.__headers__ = kwargs.get('headers', {})
         self.__proxy__ = kwargs.get('proxy', None) if kwargs.get('proxy', None)  else kwargs.get('proxies', None)
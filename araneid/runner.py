@@ -142,7 +142,7 @@ class AsyncRunner(BaseRunner):
         set_signalmanager(signalmanager)
         engine = await Engine.create(settings=instance.__settings)
         scraper =  await Scraper.create(instance.__settings)
-        slot = await Slot.create()
+        slot = await Slot.create(instance.__settings)
         scraper.bind(slot)
         await engine.add_slot(slot)
         instance.engine = engine
@@ -220,7 +220,7 @@ class AsyncCronRunner(BaseRunner):
         set_signalmanager(signalmanager)
         engine = await Engine.create(settings=self.settings)
         scraper =  await Scraper.create(self.settings)
-        slot = await Slot.create()
+        slot = await Slot.create(self.settings)
         scraper.bind(slot)
         await engine.add_slot(slot)
         scraper.add_spider(spider_inst)
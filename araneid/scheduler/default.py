@@ -14,7 +14,7 @@ from contextlib import suppress
 from araneid.core.scheduler import Scheduler
 from araneid.core.request import Request
 from araneid.core.response import Response
-from araneid.core.stream import Stream
+from araneid.core.stream import Stream, DelayStream
 import logging
 import asyncio
 
@@ -22,7 +22,7 @@ import asyncio
 class DefaultScheduler(Scheduler):
     """
       @class: DefaultScheduler
-      @desc:  Default scheduler used by engine
+      @desc:  Default scheduler used by engine, a request with ``meta['schedule_delay']`` (seconds) is scheduled after the delay, the delay is removed from meta once applied
     """
     logger = None
 
@@ -33,9 +33,13 @@ class DefaultScheduler(Scheduler):
       self.__running_tasks = set()
     
     @classmethod
-    async def create(cls):
-       instance = cls()
-       instance.__request_channel = await Stream.create()
+    def from_settings(cls, settings):
+       return cls()
+
+    @classmethod
+    async def create(cls, settings=None):
+       instance = cls.from_settings(settings)
+       instance.__request_channel = await DelayStream.create(name='scheduler_request', settings=settings)
        instance.__response_channel = await Stream.create()
        return instance
  
@@ -51,7 +55,7 @@ class DefaultScheduler(Scheduler):
     """
     async def add_request(self, request):
         assert isinstance(request, Request)
-        await self.__request_channel.write(request)
+        await self.__request_channel.write(request, delay=self.pop_delay(request))
         self.logger.debug('Put request to scheduler: '+str(request))
 
     async def add_response(self, response):
@@ -88,8 +92,7 @@ class DefaultScheduler(Scheduler):
                 resp_task = asyncio.ensure_future(self.get_response())
               if req_task.done():
                 req_task = asyncio.ensure_future(self.get_request())
-              for item in schedule_done:
-                 await schedule_channel.write(item.result())
+              await schedule_channel.write_many([item.result() for item in schedule_done])
         finally:
            await self.close()
     
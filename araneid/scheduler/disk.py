@@ -0,0 +1,381 @@
+import io
+import os
+import shutil
+import logging
+import asyncio
+import tempfile
+import threading
+from collections import deque
+from types import FunctionType
+from asyncio.locks import Event
+from contextlib import suppress
+from araneid.core.scheduler import Scheduler
+from araneid.core.request import Request
+from araneid.core.response import Response
+from araneid.core.slot import Slot
+from araneid.core.stream import Stream, DelayStream
+from araneid.core.exception import NotConfigured
+from araneid.core.persistence import RequestPickler, RequestUnpickler
+from araneid.spider.spider import Spider
+from araneid.util._async import CountdownLatch
+
+
+class References(object):
+    """磁盘记录中不能序列化的对象的引用表, 例如 :py:obj:`~araneid.spider.spider.Spider`, :py:obj:`~araneid.scraper.Scraper` 以及 ``meta`` 中的上一个请求.
+
+    这类对象的数量远小于请求数量, 按照 ``id`` 计数保存, 记录被读回时释放. 记录在线程池中读回, 引用计数的修改需要加锁.
+    """
+    __slots__ = ['__objects', '__lock']
+
+    def __init__(self):
+        self.__objects = {}
+        self.__lock = threading.Lock()
+
+    def hold(self, obj):
+        key = id(obj)
+        with self.__lock:
+            reference = self.__objects.get(key)
+            if reference is None:
+               self.__objects[key] = [obj, 1]
+            else:
+               reference[1] += 1
+        return key
+
+    def release(self, key):
+        with self.__lock:
+            reference = self.__objects[key]
+            reference[1] -= 1
+            if reference[1] <= 0:
+               del self.__objects[key]
+        return reference[0]
+
+    def clear(self):
+        self.__objects.clear()
+
+    def __len__(self):
+        return len(self.__objects)
+
+
+class DiskRequestPickler(RequestPickler):
+    """磁盘调度器的请求序列化器, 爬虫、Scraper、Slot、其他请求以及同步原语等只在当前进程中有意义的对象写入 :py:obj:`References` , 其他对象按值写入.
+
+    请求中有其他不能序列化的对象时(例如 ``meta`` 中的自定义对象), 该请求的所有非基础类型对象都写入 :py:obj:`References` .
+    """
+    # asyncio 的同步原语在新版本 Python 中可以按值序列化, 读回后不再是同一个对象, 必须按引用保存
+    REFERENCE_TYPES = (Spider, Slot, Request, CountdownLatch, asyncio.Future, asyncio.Queue) + tuple(getattr(asyncio.locks, name) for name in asyncio.locks.__all__)
+
+    def __init__(self, references):
+        self.__buffer = io.BytesIO()
+        super().__init__(self.__buffer)
+        self.__references = references
+        self.__held = []
+        self.__strict = True
+
+    def dumps_request(self, request) -> bytes:
+        """序列化请求
+
+        Args:
+            request (Request): 请求对象
+
+        Returns:
+            bytes: 序列化后的请求
+        """
+        self.__buffer.seek(0)
+        self.__buffer.truncate()
+        self.__held.clear()
+        try:
+            self.dump_request(request)
+        except Exception:
+            for key in self.__held:
+                self.__references.release(key)
+            self.__held.clear()
+            if not self.__strict:
+               raise
+            self.__strict = False
+            try:
+                return self.dumps_request(request)
+            finally:
+                self.__strict = True
+        return self.__buffer.getvalue()
+
+    def reference(self, obj):
+        if self.__strict and not (isinstance(obj, self.REFERENCE_TYPES) or obj is getattr(self.request.context, 'scraper', None) or self.__local_function(obj)):
+           return None
+        key = self.__references.hold(obj)
+        self.__held.append(key)
+        return ('reference', key)
+
+    @staticmethod
+    def __local_function(obj):
+        # lambda以及函数内定义的函数不能按照名字序列化
+        return isinstance(obj, FunctionType) and '<' in obj.__qualname__
+
+
+class DiskRequestUnpickler(RequestUnpickler):
+
+    def __init__(self, file, references):
+        super().__init__(file)
+        self.__references = references
+
+    def dereference(self, pid):
+        if pid[0] == 'reference':
+           return self.__references.release(pid[1])
+        return super().dereference(pid)
+
+
+class DiskScheduler(Scheduler):
+    """磁盘溢出调度器, 按照先进先出的顺序调度请求, 适用于内存放不下的大规模抓取队列.
+
+    内存中只保留最多 ``SCHEDULER_MEMORY_SIZE`` 个请求, 超出的请求被序列化后顺序追加到 ``SCHEDULER_DISK_DIR`` 目录下的分段日志文件中,
+    每个分段最多保存 ``SCHEDULER_SEGMENT_SIZE`` 个请求. 内存中的请求被调度完后, 再按顺序从最旧的分段中读回, 读完的分段文件会被删除.
+    分段文件的写入以及请求的读回都按照 ``SCHEDULER_DISK_BATCH_SIZE`` 个请求一批在线程池中执行, 不阻塞事件循环.
+
+    请求的回调解析器按照 ``parser.<spider>.<parser>`` 路由名写入磁盘, 读回时通过 :py:obj:`~araneid.spider.routermanager.RouterManager` 重新路由,
+    爬虫、Scraper等不能序列化的对象只在内存中保留引用(参考 :py:obj:`DiskRequestPickler` ), 其他对象按值写入磁盘. 从磁盘读回的请求是原请求的副本.
+
+    调度器只在下游(调度管理器的Stream)需要请求时才取出请求(参考 :py:meth:`~araneid.core.stream.Stream.wait_demand` ), 下载并发饱和时积压的请求留在调度器中溢出到磁盘,
+    而不是积压在调度管理器的内存中.
+    ``meta['schedule_delay']`` 指定了调度延迟的请求(例如重试退避)在内存中的 :py:obj:`~araneid.core.stream.DelayStream` 中等待, 到期后再进入队列.
+
+    该调度器默认不启用, 需要通过配置 ``SCHEDULERS = ['DiskScheduler']`` 单独启用.
+    """
+    logger = None
+
+    def __init__(self, memory_size=10000, segment_size=100000, directory=None, batch_size=1000):
+        self.logger = logging.getLogger(__name__)
+        self.__closed = False
+        self.__running_tasks = set()
+        self.__memory_size = memory_size
+        self.__segment_size = segment_size
+        self.__batch_size = batch_size
+        self.__temporary = directory is None
+        self.__directory = tempfile.mkdtemp(prefix='araneid-scheduler-') if directory is None else directory
+        os.makedirs(self.__directory, exist_ok=True)
+        self.__requests = deque()
+        self.__references = References()
+        self.__spilled = 0
+        self.__segments = deque()
+        self.__segment_index = 0
+        self.__writer = None
+        self.__writer_count = 0
+        self.__pickler = DiskRequestPickler(self.__references)
+        self.__reader = None
+        self.__unpickler = None
+        self.__reader_path = None
+        self.__demand = None
+        self.__delay_task = None
+        # 已经序列化但还没有写入分段文件的请求
+        self.__buffer = []
+        self.__io = None
+        self.__io_lock = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        enabled_schedulers = settings.get('SCHEDULERS', None) if settings is not None else None
+        if not enabled_schedulers:
+           raise NotConfigured(f"{cls.__name__} must be enabled explicitly by SCHEDULERS setting.")
+        memory_size = settings.get('SCHEDULER_MEMORY_SIZE', 10000)
+        segment_size = settings.get('SCHEDULER_SEGMENT_SIZE', 100000)
+        batch_size = settings.get('SCHEDULER_DISK_BATCH_SIZE', 1000)
+        if memory_size <= 0 or segment_size <= 0 or batch_size <= 0:
+           raise NotConfigured(f"SCHEDULER_MEMORY_SIZE, SCHEDULER_SEGMENT_SIZE and SCHEDULER_DISK_BATCH_SIZE of {cls.__name__} must be positive.")
+        return cls(memory_size=memory_size, segment_size=segment_size, directory=settings.get('SCHEDULER_DISK_DIR', None), batch_size=batch_size)
+
+    @classmethod
+    async def create(cls, settings=None):
+        instance = cls.from_settings(settings)
+        instance.__request_ready = Event()
+        instance.__io_lock = asyncio.Lock()
+        instance.__response_channel = await Stream.create()
+        instance.__delay_channel = await DelayStream.create(name='disk_scheduler_delay')
+        return instance
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    def idle(self):
+        return not self.__requests and not self.__spilled and self.__response_channel.idle() and self.__delay_channel.idle()
+
+    def size(self):
+        return len(self.__requests) + self.__spilled
+
+    def spilled(self):
+        return self.__spilled
+
+    def __segment_path(self, index):
+        return os.path.join(self.__directory, f'segment-{index:08d}.log')
+
+    def __seal_segment(self):
+        self.__writer.close()
+        self.__writer = None
+        self.__segments.append(self.__segment_path(self.__segment_index))
+        self.__segment_index += 1
+        self.__writer_count = 0
+
+    def __write(self, records, seal=False):
+        # 在线程池中执行
+        if not records:
+           if seal and self.__writer is not None:
+              self.__seal_segment()
+           return
+        if self.__writer is None:
+           self.__writer = open(self.__segment_path(self.__segment_index), 'wb', buffering=1 << 20)
+        self.__writer.write(b''.join(records))
+        self.__writer_count += len(records)
+        if seal or self.__writer_count >= self.__segment_size:
+           self.__seal_segment()
+
+    def __read(self, count):
+        # 在线程池中执行, 从最旧的分段中读回最多 count 个请求
+        requests = []
+        while len(requests) < count and (self.__reader is not None or self.__segments):
+            if self.__reader is None:
+               self.__reader_path = self.__segments.popleft()
+               self.__reader = open(self.__reader_path, 'rb', buffering=1 << 20)
+               self.__unpickler = DiskRequestUnpickler(self.__reader, self.__references)
+            try:
+                requests.append(self.__unpickler.load())
+            except EOFError:
+                self.__reader.close()
+                os.remove(self.__reader_path)
+                self.__reader = self.__unpickler = self.__reader_path = None
+        return requests
+
+    async def __run_io(self, function, *args):
+        # 调用方持有 __io_lock, 同一时间只有一个分段读写任务, 调度器关闭时等待正在执行的任务结束后再关闭文件
+        self.__io = asyncio.get_event_loop().run_in_executor(None, function, *args)
+        return await asyncio.shield(self.__io)
+
+    async def __spill(self, request):
+        self.__buffer.append(self.__pickler.dumps_request(request))
+        self.__spilled += 1
+        if len(self.__buffer) >= self.__batch_size:
+           async with self.__io_lock:
+               if self.__closed or not self.__buffer:
+                  return
+               records, self.__buffer = self.__buffer, []
+               await self.__run_io(self.__write, records)
+
+    async def __load(self):
+        async with self.__io_lock:
+            if self.__closed:
+               return
+            if self.__reader is None and not self.__segments:
+               # 分段文件都已经读完, 先把缓冲中的请求写入分段再读回, 保证先进先出的顺序
+               records, self.__buffer = self.__buffer, []
+               await self.__run_io(self.__write, records, True)
+            requests = await self.__run_io(self.__read, min(self.__batch_size, self.__memory_size - len(self.__requests)))
+            self.__spilled -= len(requests)
+            self.__requests.extend(requests)
+
+    async def add_request(self, request):
+        assert isinstance(request, Request)
+        if self.__closed:
+           return
+        delay = self.pop_delay(request)
+        if delay:
+           await self.__delay_channel.write(request, delay=delay)
+           return
+        await self.__push(request)
+
+    async def __release_delayed(self):
+        async with self.__delay_channel.read() as delay_reader:
+            async for request in delay_reader:
+                if self.__closed:
+                   break
+                await self.__push(request)
+
+    async def __push(self, request):
+        if self.__spilled or len(self.__requests) >= self.__memory_size:
+           await self.__spill(request)
+        else:
+           self.__requests.append(request)
+        self.__request_ready.set()
+        self.logger.debug('Put request to scheduler: %s', request)
+
+    async def add_response(self, response):
+        assert isinstance(response, Response)
+        await self.__response_channel.write(response)
+        self.logger.debug('Put response to scheduler: %s', response)
+
+    async def get_response(self):
+        async with self.__response_channel.read() as response_reader:
+            async for resp in response_reader:
+                self.logger.debug('Get response from scheduler: %s', resp)
+                return resp
+
+    async def get_request(self):
+        while not self.__requests:
+            if self.__closed:
+               return None
+            if self.__spilled:
+               await self.__load()
+               continue
+            self.__request_ready.clear()
+            await self.__request_ready.wait()
+        request = self.__requests.popleft()
+        self.logger.debug('Get request from scheduler: %s', request)
+        return request
+
+    async def __pull_request(self, schedule_channel: Stream):
+        if not schedule_channel.has_demand():
+           self.__demand = asyncio.ensure_future(schedule_channel.wait_demand())
+           try:
+               await self.__demand
+           except asyncio.CancelledError:
+               if not self.__closed:
+                  raise
+               return None
+           finally:
+               self.__demand = None
+        return await self.get_request()
+
+    async def run(self, schedule_channel: Stream):
+        try:
+            resp_task = asyncio.ensure_future(self.get_response())
+            req_task = asyncio.ensure_future(self.__pull_request(schedule_channel))
+            self.__delay_task = asyncio.ensure_future(self.__release_delayed())
+            while not self.__closed:
+                self.__running_tasks = {resp_task, req_task}
+                schedule_done, __ = await asyncio.wait(self.__running_tasks, return_when=asyncio.FIRST_COMPLETED)
+                [t.result() for t in schedule_done]
+                if resp_task.done():
+                   resp_task = asyncio.ensure_future(self.get_response())
+                if req_task.done():
+                   req_task = asyncio.ensure_future(self.__pull_request(schedule_channel))
+                await schedule_channel.write_many([item.result() for item in schedule_done if item.result() is not None])
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.__closed:
+           return
+        self.__closed = True
+        self.__request_ready.set()
+        if self.__demand is not None:
+           self.__demand.cancel()
+        self.__requests.clear()
+        self.__buffer.clear()
+        if self.__io is not None:
+           with suppress(Exception):
+               await self.__io
+        for stream in (self.__writer, self.__reader):
+            if stream is not None:
+               stream.close()
+        self.__writer = self.__reader = self.__unpickler = None
+        self.__spilled = 0
+        self.__references.clear()
+        if self.__temporary:
+           shutil.rmtree(self.__directory, ignore_errors=True)
+        else:
+           for segment in [self.__reader_path, self.__segment_path(self.__segment_index), *self.__segments]:
+               if segment is not None:
+                  with suppress(FileNotFoundError):
+                      os.remove(segment)
+        self.__segments.clear()
+        await self.__response_channel.close()
+        await self.__delay_channel.close()
+        with suppress(asyncio.CancelledError):
+            await asyncio.gather(*self.__running_tasks, *filter(None, [self.__delay_task]))
+        self.logger.debug(f'{self.__class__.__name__} closed')
@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import logging
+import asyncio
+from asyncio.locks import Event
+from contextlib import suppress
+from araneid.core.scheduler import Scheduler
+from araneid.core.request import Request
+from araneid.core.response import Response
+from araneid.core.stream import Stream, DelayStream
+from araneid.core.exception import NotConfigured
+
+
+class PriorityScheduler(Scheduler):
+    """优先级调度器, 按照请求的 :py:attr:`~araneid.core.request.Request.priority` 从高到低调度请求, 优先级相同的请求按照先进先出的顺序调度.
+
+    请求保存在二叉堆中, 入队和出队的时间复杂度都是O(log n). 调度器只在下游(调度管理器的Stream)需要请求时才从堆中取出请求(参考 :py:meth:`~araneid.core.stream.Stream.wait_demand` ),
+    下载并发饱和时请求留在堆中, 后加入的高优先级请求仍然先被调度.
+    ``meta['schedule_delay']`` 指定了调度延迟的请求(例如重试退避)先在 :py:obj:`~araneid.core.stream.DelayStream` 中等待, 到期后再进入堆中.
+
+    :py:obj:`~araneid.core.schedulemanager.ScheduleManager` 启用多个调度器时按照域名的一致性哈希分配请求, 优先级只在同一个调度器的请求之间生效,
+    因此该调度器默认不启用, 需要通过配置 ``SCHEDULERS = ['PriorityScheduler']`` 单独启用.
+    """
+    logger = None
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.__closed = False
+        self.__running_tasks = set()
+        self.__requests = []
+        self.__sequence = itertools.count()
+        self.__demand = None
+        self.__delay_task = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        enabled_schedulers = settings.get('SCHEDULERS', None) if settings is not None else None
+        if not enabled_schedulers:
+           raise NotConfigured(f"{cls.__name__} must be enabled explicitly by SCHEDULERS setting.")
+        return cls()
+
+    @classmethod
+    async def create(cls, settings=None):
+        instance = cls.from_settings(settings)
+        instance.__request_ready = Event()
+        instance.__response_channel = await Stream.create()
+        instance.__delay_channel = await DelayStream.create(name='priority_scheduler_delay')
+        return instance
+
+    def idle(self):
+        return not self.__requests and self.__response_channel.idle() and self.__delay_channel.idle()
+
+    def size(self):
+        return len(self.__requests)
+
+    async def add_request(self, request):
+        assert isinstance(request, Request)
+        if self.__closed:
+           return
+        delay = self.pop_delay(request)
+        if delay:
+           await self.__delay_channel.write(request, delay=delay)
+           return
+        self.__push(request)
+
+    async def __release_delayed(self):
+        async with self.__delay_channel.read() as delay_reader:
+            async for request in delay_reader:
+                if self.__closed:
+                   break
+                self.__push(request)
+
+    def __push(self, request):
+        heapq.heappush(self.__requests, (-request.priority, next(self.__sequence), request))
+        self.__request_ready.set()
+        self.logger.debug('Put request to scheduler: %s', request)
+
+    async def add_response(self, response):
+        assert isinstance(response, Response)
+        await self.__response_channel.write(response)
+        self.logger.debug('Put response to scheduler: %s', response)
+
+    async def get_response(self):
+        async with self.__response_channel.read() as response_reader:
+            async for resp in response_reader:
+                self.logger.debug('Get response from scheduler: %s', resp)
+                return resp
+
+    async def get_request(self):
+        while not self.__requests:
+            if self.__closed:
+               return None
+            self.__request_ready.clear()
+            await self.__request_ready.wait()
+        _, _, request = heapq.heappop(self.__requests)
+        self.logger.debug('Get request from scheduler: %s', request)
+        return request
+
+    async def __pull_request(self, schedule_channel: Stream):
+        if not schedule_channel.has_demand():
+           self.__demand = asyncio.ensure_future(schedule_channel.wait_demand())
+           try:
+               await self.__demand
+           except asyncio.CancelledError:
+               if not self.__closed:
+                  raise
+               return None
+           finally:
+               self.__demand = None
+        return await self.get_request()
+
+    async def run(self, schedule_channel: Stream):
+        try:
+            resp_task = asyncio.ensure_future(self.get_response())
+            req_task = asyncio.ensure_future(self.__pull_request(schedule_channel))
+            self.__delay_task = asyncio.ensure_future(self.__release_delayed())
+            while not self.__closed:
+                self.__running_tasks = {resp_task, req_task}
+                schedule_done, __ = await asyncio.wait(self.__running_tasks, return_when=asyncio.FIRST_COMPLETED)
+                [t.result() for t in schedule_done]
+                if resp_task.done():
+                   resp_task = asyncio.ensure_future(self.get_response())
+                if req_task.done():
+                   req_task = asyncio.ensure_future(self.__pull_request(schedule_channel))
+                await schedule_channel.write_many([item.result() for item in schedule_done if item.result() is not None])
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.__closed:
+           return
+        self.__closed = True
+        self.__request_ready.set()
+        if self.__demand is not None:
+           self.__demand.cancel()
+        self.__requests.clear()
+        await self.__response_channel.close()
+        await self.__delay_channel.close()
+        with suppress(asyncio.CancelledError):
+            await asyncio.gather(*self.__running_tasks, *filter(None, [self.__delay_task]))
+        self.logger.debug(f'{self.__class__.__name__} closed')
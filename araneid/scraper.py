@@ -10,20 +10,24 @@ from .core.request import Request
 from .core.middlewaremanager import SpiderMiddlewareManager
 from .core.extension import ExtensionManager
 from .core.pipeline import Pipeline
+from .core.inflight import InFlightTasks
 from .core import signal 
 from .core.stream import Stream
 from .util._async import CountdownLatch
 from .core.context import Context, RequestContext
 from .state import SpiderState
 from .util._async import ensure_asyncgen 
-from .core.exception import StarterNotFound, SpiderException, ParseException, StartException
+from .core.exception import StarterNotFound, SpiderException, ParseException, StartException, NotConfigured, PluginError
 from .core.slot import Slot, ReadFlag
+from .core.jobdir import JobDir
+from .core.dupefilter import DupeFilter
+from .core import plugin as plugins
 from .spider import Parser, Starter, Spider
 from .spider.routermanager import RouterManager
 from .spider.statsmanager import StatsManager
 from .stats import StatsCollector
 from .core.flags import Idle
-from .setting import settings as settings_loader
+from .setting import Setting, settings as settings_loader
 
 class RequestGraph:
 
@@ -49,6 +53,8 @@ class Scraper(object):
     __running_tasks__: List[Task]
     __spidermiddlewaremanager__: SpiderMiddlewareManager
     __routemanager__:RouterManager
+    __jobdir__: Optional[JobDir]
+    __dupefilter__: Optional[DupeFilter]
     __MAX_PIPELINES__:int
     __AVAILABLE_PIPELINES_SEMAPHOR__: Optional[BoundedSemaphore]
     __SPIDERMIDDLEWAREMANAGER_CLOSE__: Event
@@ -64,6 +70,8 @@ class Scraper(object):
         self.__running_tasks__ = []
         self.__closed__ = False
         self.__request_graph = RequestGraph()
+        self.__jobdir__ = None
+        self.__dupefilter__ = None
         self.settings = settings
     
     @classmethod
@@ -93,7 +101,41 @@ class Scraper(object):
         instance.__extensions__ = await ExtensionManager.create(settings)
         instance.__routemanager__ = RouterManager.from_settings(settings)
         instance.__SPIDERS_STATUS__ = StatsCollector.from_settings(settings)
+        instance.__jobdir__ = await JobDir.create(settings) if settings.get('JOBDIR', None) else None
+        instance.__dupefilter__ = await instance.__load_dupefilter(settings)
+        if instance.__jobdir__ is not None and instance.__dupefilter__ is not None:
+           # 上次运行已经完成的请求不再抓取
+           for fingerprint in instance.__jobdir__.seen_fingerprints():
+               instance.__dupefilter__.add(fingerprint)
         return instance
+
+    async def __load_dupefilter(self, settings) -> Optional[DupeFilter]:
+        """加载配置 ``DUPEFILTER`` 指定的去重过滤器插件, 没有配置时不启用请求去重
+
+        Args:
+            settings (dict): 配置
+
+        Returns:
+            Optional[DupeFilter]: 去重过滤器实例
+        
+        :meta private:
+        """
+        enabled_dupefilter = settings.get('DUPEFILTER', None)
+        if not enabled_dupefilter:
+           return None
+        for plugin in plugins.load(plugins.PluginType.DUPEFILTER):
+            if plugin.name != enabled_dupefilter:
+               continue
+            try:
+                dupefilter = await plugin.load().create(settings=settings)
+            except NotConfigured:
+                self.logger.debug(f"DupeFilter {plugin.name} is not configured, skipped load.")
+                return None
+            except Exception as e:
+                raise PluginError(f"Error occurred in while loading dupefilter {plugin.name}!") from e
+            self.logger.debug(f'Loaded dupefilter: {plugin.name}.')
+            return dupefilter
+        raise PluginError(f"DupeFilter {enabled_dupefilter} not found!")
     
     def __set_spider_state(self, spider: Spider, state: SpiderState.States)->None:
         """设置爬虫实例的状态
@@ -174,7 +216,7 @@ class Scraper(object):
 
 
     def add_spider(self, spider: Spider):
-        """为Scraper添加管理的一个爬虫实例
+        """为Scraper添加管理的一个爬虫实例, 爬虫的 ``settings`` 为被爬虫的 ``custom_settings`` 覆盖后的全局配置
 
         Args:
             spider (Spider): 爬虫实例
@@ -182,11 +224,19 @@ class Scraper(object):
         """
         assert isinstance(spider, Spider), '{spider} is not an instance of Spider.'.format(spider=spider)
 
-        spider.settings = self.settings
+        custom_settings = spider.custom_settings
+        if not custom_settings:
+           spider.settings = self.settings
+        elif isinstance(self.settings, Setting):
+           spider.settings = self.settings.override(custom_settings)
+        else:
+           spider.settings = {**self.settings, **custom_settings}
         self.__SPIDERS_STATUS__.set_value(f'{id(spider)}.state', SpiderState())
         self.__SPIDERS_STATUS__.set_value(f'{id(spider)}.parser_alive_counter', CountdownLatch())
         self.__SPIDERS_STATUS__.set_value(f'{id(spider)}.request_alive_counter', CountdownLatch())
         spider.stats = StatsManager.from_crawler(spider)
+        if self.__jobdir__ is not None:
+           self.__jobdir__.restore_stats(spider)
         for starter in spider.get_starters():
             self.__routemanager__.add_starter_route(spider.name+'.'+starter.name, starter)
         for parser in spider.get_parsers():
@@ -231,6 +281,8 @@ class Scraper(object):
                if request.in_state(state):
                   continue
                request.set_state(state)
+        if request_completed and self.__jobdir__ is not None:
+           self.__jobdir__.complete_request(request)
         if spider is not None and request_completed:
            request_alive_counter: CountdownLatch = self.__SPIDERS_STATUS__.get_value(f'{id(spider)}.request_alive_counter')
            if request_alive_counter and request_alive_counter.count > 0:
@@ -238,6 +290,23 @@ class Scraper(object):
            if spider.is_sync():
               self.__update_request_sync_state(request, incre=False)
     
+    def __drop_request(self, request: Request):
+        """丢弃请求, 将请求的状态置为完成, 并更新同步爬虫的请求状态
+
+        Args:
+            request (Request): 被丢弃的请求
+
+        :meta private:
+        """
+        request.complete()
+        for state in request.States:
+            if request.in_state(state):
+               continue
+            request.set_state(state)
+        spider = request.context.spider if request.context else None
+        if self.is_sync(request, spider):
+           self.__update_request_sync_state(request, incre=False)
+
     def __prepare_request_sync_state(self, request: Request):
         request_seeds_counter = CountdownLatch()
         request.meta['seeds'] = request_seeds_counter
@@ -335,6 +404,13 @@ class Scraper(object):
            request.context.scraper = self
         if request.in_state(request.States.start):
            request = request.from_request(request)
+        if self.__dupefilter__ is not None and not request.meta['dont_filter'] and self.__dupefilter__.request_seen(request):
+           self.logger.debug(f'{request} is ignored (filtered by {self.__dupefilter__.__class__.__name__})!')
+           self.__drop_request(request)
+           await signal.trigger(signal=signal.request_dropped, source=self, object=request, wait=False)
+           return
+        if self.__jobdir__ is not None:
+           self.__jobdir__.record_request(request)
         request.set_state(request.States.start)
         if request.context and request.context.spider and isinstance(request.context.spider, Spider):
            spider = request.context.spider
@@ -647,32 +723,49 @@ class Scraper(object):
         :meta private:
         """
         async def __process():
-            running_parsers: List[Pipeline] = [] 
+            running_parsers = InFlightTasks()
             while not self.__slot.is_close():
                   response = await self.__slot.get_response(delay_complete=True, spider=True)
                   if not isinstance(response, Response):
                     continue
                   parser_pipeline: Pipeline = await self.__create_parser_pipeline(response, spider)
-                  running_parsers.append(parser_pipeline)
-                  running_parsers = [ parser  for parser in running_parsers if not parser.done()]
-            await asyncio.gather(*running_parsers)
+                  running_parsers.add(parser_pipeline)
+            await running_parsers.wait()
         await asyncio.gather(__process())
     
     async def __start_spidermiddleware_parsers(self):
         """处理爬虫中间件中的请求响应的解析
         """
         async def __process():
-            running_parsers: List[Pipeline] = [] 
+            running_parsers = InFlightTasks()
             while not self.__slot.is_close():
                   response = await self.__slot.get_response(delay_complete=True, spider=False)
                   if not isinstance(response, Response):
                     continue
                   parser_pipeline: Pipeline = await self.__create_parser_pipeline(response, None)
-                  running_parsers.append(parser_pipeline)
-                  running_parsers = [ parser  for parser in running_parsers if not parser.done()]
-            await asyncio.gather(*running_parsers)
+                  running_parsers.add(parser_pipeline)
+            await running_parsers.wait()
         await asyncio.gather(__process())
          
+    async def __resume_requests(self, spider: Spider) -> None:
+        """从任务目录中恢复爬虫上次运行时未完成的请求
+
+        Args:
+            spider (Spider): 需要恢复请求的爬虫
+
+        :meta private:
+        """
+        if self.__jobdir__ is None:
+           return
+        resumed = 0
+        for request in self.__jobdir__.pending_requests(spider, self):
+            if self.__closed__:
+               break
+            await self.process_request(request)
+            resumed += 1
+        if resumed:
+           self.logger.info(f'Resumed {resumed} requests of Spider {spider.name} from job directory {self.__jobdir__.directory}.')
+
     async def __start_spider_starter(self, spider: Spider) -> None:
         """处理爬虫的请求初始化器, 通过路由找到对应的请求初始化器，并调用请求初始化器
 
@@ -687,6 +780,7 @@ class Scraper(object):
         if not starter:
             raise StarterNotFound('Stater '+str(starter_route_rule)+' not found ')
         try:
+            await self.__resume_requests(spider)
             await self.__process_start_requests(starter,spider)
         except Exception as e:
             raise e
@@ -829,6 +923,10 @@ class Scraper(object):
         await self.__spidermiddlewaremanager__.close()
         await self.__extensions__.close()
         await self.__slot.close()
+        if self.__jobdir__ is not None:
+           self.__jobdir__.close()
+        if self.__dupefilter__ is not None:
+           self.__dupefilter__.close()
         self.logger.debug('scraper_close_1')
         await self.wait_close_spider()
         self.logger.debug('scraper_close_2')
@@ -6,6 +6,7 @@ from datetime import datetime
 from argparse import ArgumentParser 
 from os.path import basename
 from araneid.logger import config_log
+from araneid.setting import settings
 from araneid.core.exception import InvalidCrawler, SpiderNotFound, StarterNotFound
 from araneid.runner import SpiderArgsSupport
 from araneid.spider.spider import Spider, Starter
@@ -25,6 +26,8 @@ def araneid_run_exec(parsed_args, unused_args):
     log_level = parsed_args.loglevel
     script_args = unused_args
     script_format = parsed_args.format
+    # job directory settings
+    job_dir = parsed_args.jobdir
     script_args.insert(0, spider_script)
     sys.argv = script_args
     if not os.path.exists(spider_script):
@@ -35,6 +38,8 @@ def araneid_run_exec(parsed_args, unused_args):
        parser.error('you haven\'t sufficent privilege to access '+spider_script)
     if not spider_spider:
         spider_spider = os.path.splitext(basename(spider_script))[0]
+    if job_dir:
+        settings.set('JOBDIR', os.path.abspath(os.path.expanduser(job_dir)))
 
     if not script_format:
         script_format = auto_detect_script_format(spider_script)
@@ -88,6 +93,7 @@ parser.add_argument('--package_require', required=False)
 parser.add_argument('--spider', required=False, default=None, help='name of crawler to be run. if none is specified, crawler name conincided with script name, without extension suffix,  will be used')
 parser.add_argument('--starter', required=False, default="default", help='name of starter to be run. if none is specified, start_requests starter will be run')
 parser.add_argument('--crontab', type=str, help='crontab format string')
+parser.add_argument('--jobdir', type=str, default=None, help='directory to persist pending requests, seen requests and stats of the crawl, the crawl resumes from it when restarted with the same directory')
 # deprecated arguments
 parser.add_argument('--interval', type=int, action=DeprecateAction, help='interval time for run, deprecated')
 parser.add_argument('--logfile', default='', type=str, action=DeprecateAction, help='log file')
@@ -58,6 +58,23 @@ class Setting:
     def get(self, key, default=None):
         return self._settings.get(key, default)
 
+    def set(self, key, value):
+        self._settings[key] = value
+
+    def override(self, overrides: dict) -> 'Setting':
+        """返回被 ``overrides`` 覆盖后的新配置, 原配置不变
+
+        Args:
+            overrides (dict): 覆盖的配置
+
+        Returns:
+            Setting: 新配置
+        """
+        setting = Setting()
+        setting._modules = dict(self._modules)
+        setting._settings = {**self._settings, **overrides}
+        return setting
+
         
     
     def __str__(self) -> str:
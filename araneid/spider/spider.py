@@ -20,8 +20,12 @@ class Spider(Crawler):
         2. 异步处理模式
 
            爬虫处理的时候, 所有的请求进行异步处理, 不会有同步锁来保证请求的同步处理.
+
+    爬虫的 ``custom_settings`` 中的配置会覆盖全局配置, :py:meth:`~araneid.scraper.Scraper.add_spider` 将合并后的配置设置为爬虫的 ``settings`` ,
+    下载器等按爬虫区分配置的组件直接读取 ``custom_settings`` (例如 :py:obj:`~araneid.downloader.aiohttp.Http` 的连接器配置).
     """
     logger = None
+    custom_settings = None
 
     def __init__(self, starter='default', **kwargs):
         self.logger = logging.getLogger(__name__)
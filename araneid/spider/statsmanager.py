@@ -59,10 +59,17 @@ class StatsManager:
     def get_stats(self, spider=None):
         if spider:
            spider_stats = self._spider_stats.get(f'spider_{id(spider)}', default={})
-           stats = StatsCollector.from_dict(spider_stats)
+           stats = Stats.from_dict(spider_stats)
         else:
            stats = self._stats
         return stats
+
+    def set_stats(self, stats, spider=None):
+        assert isinstance(stats, Stats)
+        if spider:
+           self._spider_stats[f'spider_{id(spider)}'] = stats.to_dict()
+        else:
+           self._stats = stats
     
     def get_value(self, key, default=None, spider=None, sep='.'):
         if spider:
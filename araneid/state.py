@@ -15,41 +15,68 @@ class SpiderStates(States):
 
 
 class State(object):
+    """状态混入类, 所有状态以位图的形式保存在一个整数 ``__state__`` 中, 只有在调用 :py:meth:`wait_state` 或 :py:meth:`get_state` 的时候才会创建对应状态的等待事件.
+
+    带有 ``__slots__`` 的子类需要在 ``__slots__`` 中声明 ``__state__`` 和 ``__waiters__``.
+    """
+    __slots__ = ()
+
     def __init__(self) -> None:
-        self.__states__ = {}
-        for state in  self.States:
-            self.__states__[state] = Event()
+        self.__state__ = 0
+        self.__waiters__ = None
+
+    @property
+    def states(self) -> States:
+        return self.States(self.__state__)
 
     def in_state(self, state: States):
-        assert state in self.States 
-        state: Event = self.__states__.get(state)
-        return state.is_set()
+        assert isinstance(state, self.States)
+        return self.__state__ & state._value_ == state._value_
 
     def get_state(self, state: States) -> Event:
-        assert state in  self.States
-        return self.__states__.get(state)
+        assert isinstance(state, self.States)
+        return self.__waiter(state)
     
     async def wait_state(self, state: States) -> None:
-        assert state in self.States
-        state: Event = self.__states__.get(state)
-        await state.wait()
+        assert isinstance(state, self.States)
+        if self.in_state(state):
+           return
+        await self.__waiter(state).wait()
     
     def set_state(self, state: States):
-        assert state in self.States 
-        state: Event =  self.__states__.get(state)
-        if not state.is_set():
-           state.set()
+        assert isinstance(state, self.States)
+        self.__state__ |= state._value_
+        if self.__waiters__:
+           self.__sync_waiters()
     
     def reset_state(self, state:States):
-        assert state in self.States
-        state: Event = self.__states__.get(state)
-        if state.is_set():
-           state.clear()
+        assert isinstance(state, self.States)
+        self.__state__ &= ~state._value_
+        if self.__waiters__:
+           self.__sync_waiters()
     
     def clear_states(self):
-        for state  in self.__states__.values():
-            state :Event = state
-            state.clear()
+        self.__state__ = 0
+        if self.__waiters__:
+           self.__sync_waiters()
+
+    def __waiter(self, state: States) -> Event:
+        if self.__waiters__ is None:
+           self.__waiters__ = {}
+        waiter = self.__waiters__.get(state)
+        if waiter is None:
+           waiter = Event()
+           if self.in_state(state):
+              waiter.set()
+           self.__waiters__[state] = waiter
+        return waiter
+
+    def __sync_waiters(self):
+        for state, waiter in self.__waiters__.items():
+            if self.in_state(state):
+               waiter.set()
+            else:
+               waiter.clear()
 
 class SpiderState(State):
     States = SpiderStates
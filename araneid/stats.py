@@ -14,6 +14,9 @@ class Stats:
         stats = cls()
         stats._stats__ = d
         return stats
+
+    def to_dict(self):
+        return self._stats__
     
     def get(self, key, sep='.', default=None):
         return self.__getitem__(key, sep=sep, default=default)
@@ -0,0 +1,100 @@
+import re
+import json
+import string
+import hashlib
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote
+
+DEFAULT_PORTS = {'http': 80, 'https': 443, 'ws': 80, 'wss': 443}
+NETLOC_PATTERN = re.compile(r'[^:/?#]+://([^/?#]*)')
+PERCENT_ESCAPE_PATTERN = re.compile(r'%([0-9A-Fa-f]{2})')
+# 不是百分号编码开头的 ``%``
+PERCENT_PATTERN = re.compile(r'%(?![0-9A-Fa-f]{2})')
+UNRESERVED_CHARACTERS = frozenset(string.ascii_letters + string.digits + '-._~')
+
+
+def url_host(url: str) -> Optional[str]:
+    """获取URL中的域名(小写), 和 ``urlsplit(url).hostname`` 相同, 但是只解析一次相同的网络地址
+
+    Args:
+        url (str): URL
+
+    Returns:
+        Optional[str]: 域名, 没有域名时返回 ``None``
+    """
+    matched = NETLOC_PATTERN.match(url)
+    if matched is None:
+       return None
+    return netloc_host(matched.group(1))
+
+
+@lru_cache(maxsize=65536)
+def netloc_host(netloc: str) -> Optional[str]:
+    return urlsplit('//'+netloc).hostname
+
+
+def _normalize_escape(matched) -> str:
+    character = chr(int(matched.group(1), 16))
+    return character if character in UNRESERVED_CHARACTERS else '%' + matched.group(1).upper()
+
+
+def canonicalize_url(url: str) -> str:
+    """规范化URL, 协议和域名转换为小写, 去掉默认端口和片段, 统一路径的百分号编码, 并按照参数名排序查询参数
+
+    路径中只有非保留字符(字母, 数字以及 ``-._~`` )的百分号编码会被解码, 其他百分号编码只统一为大写, 例如 ``/a%2Fb`` 和 ``/a/b`` 是不同的URL.
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: 规范化后的URL
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+       netloc = f'{netloc}:{port}'
+    if parts.username is not None:
+       userinfo = parts.username if parts.password is None else f'{parts.username}:{parts.password}'
+       netloc = f'{userinfo}@{netloc}'
+    path = quote(PERCENT_PATTERN.sub('%25', parts.path), safe="/:@!$&'()*+,;=-._~%")
+    path = PERCENT_ESCAPE_PATTERN.sub(_normalize_escape, path) or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def request_fingerprint(request, include_headers=None) -> bytes:
+    """计算请求指纹, 指纹由请求类型、请求方法、规范化后的请求地址、请求体以及指定的请求头决定
+
+    Args:
+        request (Request): 请求对象
+        include_headers (List[str], optional): 参与计算指纹的请求头名字, 不区分大小写. 默认为: None
+
+    Returns:
+        bytes: 请求指纹(sha1摘要)
+    """
+    fingerprint = hashlib.sha1()
+    fingerprint.update(request.__class__.__name__.encode('utf-8'))
+    fingerprint.update(b'\x00')
+    fingerprint.update(str(getattr(request, 'method', '') or '').upper().encode('utf-8'))
+    fingerprint.update(b'\x00')
+    fingerprint.update(canonicalize_url(str(request.uri)).encode('utf-8'))
+    fingerprint.update(b'\x00')
+    data = getattr(request, 'data', None)
+    if data is None and getattr(request, 'json', None) is not None:
+       data = json.dumps(request.json, sort_keys=True, default=str)
+    if data is not None:
+       if isinstance(data, dict):
+          data = urlencode(sorted((str(key), str(value)) for key, value in data.items()))
+       fingerprint.update(hashlib.sha1(data if isinstance(data, (bytes, bytearray)) else str(data).encode('utf-8')).digest())
+    if include_headers:
+       headers = {str(key).lower(): value for key, value in (getattr(request, 'headers', None) or {}).items()}
+       for header in sorted(set(str(header).lower() for header in include_headers)):
+           if header in headers:
+              fingerprint.update(f'\x00{header}:{headers[header]}'.encode('utf-8'))
+    return fingerprint.digest()
@@ -0,0 +1,71 @@
+import hashlib
+from bisect import bisect
+from typing import Any, Hashable, List
+
+
+def hash_key(key: str) -> int:
+    """计算字符串在哈希环上的位置 (md5摘要的前8个字节)"""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing(object):
+    """一致性哈希环, 每个节点在环上有 ``replicas`` 个虚拟节点, 键映射到环上顺时针方向的第一个虚拟节点.
+
+    节点增减时只有相邻区间的键会被重新映射. 最近查询过的键的映射结果会被缓存, 缓存超过 ``cache_size`` 时清空.
+    """
+    __slots__ = ['__replicas', '__nodes', '__positions', '__owners', '__cache', '__cache_size']
+
+    def __init__(self, nodes: List[Any]=None, names: List[str]=None, replicas: int=160, cache_size: int=65536):
+        assert replicas > 0
+        self.__replicas = replicas
+        self.__nodes = {}
+        self.__positions = []
+        self.__owners = []
+        self.__cache = {}
+        self.__cache_size = cache_size
+        for index, node in enumerate(nodes or []):
+            self.add(node, names[index] if names else str(index))
+
+    def __rebuild(self):
+        ring = sorted((hash_key(f'{name}#{replica}'), name) for name in self.__nodes for replica in range(self.__replicas))
+        self.__positions = [position for position, _ in ring]
+        self.__owners = [self.__nodes[name] for _, name in ring]
+        self.__cache.clear()
+
+    def add(self, node: Any, name: str) -> None:
+        """添加节点
+
+        Args:
+            node (Any): 节点
+            name (str): 节点名字, 决定节点在环上的位置, 同名节点会被替换
+        """
+        self.__nodes[name] = node
+        self.__rebuild()
+
+    def remove(self, name: str) -> None:
+        self.__nodes.pop(name, None)
+        self.__rebuild()
+
+    def get(self, key: Hashable) -> Any:
+        """获取键映射到的节点
+
+        Args:
+            key (Hashable): 键, 非字符串的键会被转换为字符串
+
+        Returns:
+            Any: 节点
+        """
+        node = self.__cache.get(key)
+        if node is not None:
+           return node
+        if not self.__owners:
+           raise KeyError(f'Hash ring is empty, no node found for key {key}.')
+        index = bisect(self.__positions, hash_key(key if isinstance(key, str) else str(key)))
+        node = self.__owners[index if index < len(self.__owners) else 0]
+        if len(self.__cache) >= self.__cache_size:
+           self.__cache.clear()
+        self.__cache[key] = node
+        return node
+
+    def __len__(self):
+        return len(self.__nodes)
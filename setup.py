@@ -3,6 +3,8 @@ from setuptools import setup, find_packages
 core_plugin = {
     'araneid.downloader': [
         'Http=araneid.downloader.aiohttp:Http',
+        'Http2=araneid.downloader.aioh2:Http2',
+        'Replay=araneid.downloader.replay:Replay',
         'Socket=araneid.downloader.aiosocket:Socket',
         'WebSocket=araneid.downloader.aiowebsocket:WebSocket',
     ],
@@ -10,7 +12,22 @@ core_plugin = {
         'LocalRouter=araneid.spider.routes.LocalSpiderRouter:LocalSpiderRouter'
     ],
     'araneid.scheduler': [
-        'DefaultScheduler=araneid.scheduler.default:DefaultScheduler'
+        'DefaultScheduler=araneid.scheduler.default:DefaultScheduler',
+        'PriorityScheduler=araneid.scheduler.priority:PriorityScheduler',
+        'DiskScheduler=araneid.scheduler.disk:DiskScheduler'
+    ],
+    'araneid.dupefilter': [
+        'ExactDupeFilter=araneid.dupefilter.exact:ExactDupeFilter',
+        'BloomDupeFilter=araneid.dupefilter.bloom:BloomDupeFilter',
+    ],
+    'araneid.downloadmiddleware': [
+        'HttpCache=araneid.extension.downloadermiddleware.httpcache:HttpCacheMiddleware',
+        'Retry=araneid.extension.downloadermiddleware.retry:RetryMiddleware',
+        'CircuitBreaker=araneid.extension.downloadermiddleware.circuitbreaker:CircuitBreakerMiddleware',
+        'Record=araneid.extension.downloadermiddleware.record:RecordMiddleware',
+    ],
+    'araneid.extension': [
+        'AutoThrottle=araneid.extension.autothrottle:AutoThrottle',
     ],
     'araneid.script': [
         'start=araneid.scripts.start:parser',
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from araneid.core import signal
+from araneid.core.engine import Engine
+from araneid.core.downloadmanager import DownloadManager
+from araneid.core.exception import NotConfigured
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.core.throttle import Throttle
+from araneid.extension.autothrottle import AutoThrottle
+from araneid.network.http import HttpRequest, HttpResponse
+
+
+def test_autothrottle_not_configured():
+    with pytest.raises(NotConfigured):
+        AutoThrottle.from_settings({})
+    with pytest.raises(NotConfigured):
+        AutoThrottle.from_settings({'AUTOTHROTTLE_ENABLED': True, 'CONCURRENT_REQUESTS_PER_IP': 2})
+
+@pytest.mark.asyncio
+async def test_autothrottle_increase():
+    autothrottle = AutoThrottle.from_settings({'AUTOTHROTTLE_ENABLED': True, 'AUTOTHROTTLE_MAX_CONCURRENCY': 4})
+    for num in range(20):
+        target = autothrottle.adjust('fast.github.com', 0.1, now=num)
+    assert int(target.concurrency) == 4
+    assert target.latency == pytest.approx(0.1)
+    assert target.delay == pytest.approx(0.025, abs=1e-3)
+    assert autothrottle.targets()['fast.github.com']['concurrency'] == 4
+
+@pytest.mark.asyncio
+async def test_autothrottle_decrease():
+    autothrottle = AutoThrottle.from_settings({'AUTOTHROTTLE_ENABLED': True, 'AUTOTHROTTLE_TARGET_CONCURRENCY': 8, 'AUTOTHROTTLE_START_DELAY': 0})
+    autothrottle.adjust('slow.github.com', 0.1, now=0)
+    target = autothrottle.adjust('slow.github.com', 1, now=1)
+    assert int(target.concurrency) == 4
+    assert target.delay >= target.latency / 4
+    # at most one decrease per latency window
+    target = autothrottle.adjust('slow.github.com', 1, now=1.1)
+    assert int(target.concurrency) == 4
+    for num in range(10):
+        target = autothrottle.adjust('slow.github.com', 0.1, error=True, now=10+num)
+    assert int(target.concurrency) == 1
+    assert target.error_rate > 0.2
+
+@pytest.mark.asyncio
+async def test_autothrottle_configure_throttle():
+    throttle = await Throttle.create(settings={'AUTOTHROTTLE_ENABLED': True})
+    autothrottle = AutoThrottle.from_settings({'AUTOTHROTTLE_ENABLED': True, 'AUTOTHROTTLE_START_DELAY': 0.5})
+    autothrottle.bind(throttle)
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE')
+    await throttle.put(request)
+    assert throttle.get_slot('github.com').bucket.rate == 0
+    target = autothrottle.adjust('github.com', 0.2, now=0)
+    slot = throttle.get_slot('github.com')
+    assert slot.bucket.rate == pytest.approx(1 / target.delay)
+    assert slot.concurrency == int(target.concurrency)
+    await throttle.close()
+
+@pytest.mark.asyncio
+async def test_autothrottle_signals():
+    signalmanager = await SignalManager.create()
+    set_signalmanager(signalmanager)
+    running = asyncio.ensure_future(signalmanager.start())
+    engine = await Engine.create(settings={'AUTOTHROTTLE_ENABLED': True})
+    autothrottle = await AutoThrottle.create({'AUTOTHROTTLE_ENABLED': True, 'AUTOTHROTTLE_START_DELAY': 0.5})
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE')
+    request.bind(await Slot.create({}))
+    # the throttle is bound through the engine which schedules the request
+    await (await signal.trigger(signal.request_scheduled, source=engine, object=request))
+    # requests without a download latency (e.g. cached responses) are ignored
+    response = HttpResponse.from_request(request=request, status=200, content=b'')
+    await (await signal.trigger(signal.response_downloaded, source=None, object=response))
+    assert autothrottle.get_target('github.com') is None
+    # the latency is measured by the download manager, not by the time the signal is handled
+    request.meta[DownloadManager.LATENCY_KEY] = 0.05
+    await asyncio.sleep(0.1)
+    await (await signal.trigger(signal.response_downloaded, source=None, object=response))
+    target = autothrottle.get_target('github.com')
+    assert target.samples == 1 and target.latency == pytest.approx(0.05)
+    assert engine.throttle.get_slot('github.com') is None
+    await engine.throttle.put(HttpRequest(url='https://github.com/'))
+    assert engine.throttle.get_slot('github.com').bucket.rate == pytest.approx(1 / target.delay)
+    await engine.throttle.close()
+    await signalmanager.close()
+    running.cancel()
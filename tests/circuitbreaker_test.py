@@ -0,0 +1,134 @@
+import pytest
+import pytest_asyncio
+from araneid.core.exception import NotConfigured
+from araneid.core.scheduler import Scheduler
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import HttpConnectionClose
+from araneid.extension.downloadermiddleware import circuitbreaker
+from araneid.extension.downloadermiddleware.circuitbreaker import CircuitBreakerMiddleware, CircuitOpen, CircuitState
+from araneid.network.http import HttpRequest, HttpResponse
+
+
+class Stats(object):
+
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1, spider=None, sep='.'):
+        self.values[key] = self.values.get(key, 0) + count
+
+class Spider(object):
+
+    def __init__(self):
+        self.stats = Stats()
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuitbreaker, 'time', clock)
+    return clock
+
+@pytest_asyncio.fixture
+async def slot():
+    return await Slot.create({})
+
+def create_request(slot, url='https://github.com/WALL-EEEEEEE', **kwargs):
+    request = HttpRequest(url=url, **kwargs)
+    request.bind(slot)
+    return request
+
+def fail(breaker, request, spider):
+    breaker.process_request(request, spider)
+    assert breaker.process_exception(request, HttpConnectionClose(request), spider) is None
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_not_enabled():
+    with pytest.raises(NotConfigured):
+        await CircuitBreakerMiddleware.create({})
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_park(slot, clock):
+    breaker = await CircuitBreakerMiddleware.create({'CIRCUIT_BREAKER_ENABLED': True, 'CIRCUIT_BREAKER_FAILURES': 3, 'CIRCUIT_BREAKER_OPEN_TIMEOUT': 10})
+    spider = Spider()
+    for _ in range(2):
+        fail(breaker, create_request(slot), spider)
+    # a success resets consecutive failures
+    ok = create_request(slot)
+    assert breaker.process_response(HttpResponse.from_request(request=ok, status=200, content=b'', headers={}), ok, spider) is not None
+    assert breaker.get_circuit('github.com') is None
+    for _ in range(3):
+        fail(breaker, create_request(slot), spider)
+    assert breaker.get_circuit('github.com').state == CircuitState.OPEN
+    # requests of the open host are parked, other hosts are not affected
+    parked = create_request(slot)
+    parked.set_state(parked.States.schedule)
+    assert breaker.process_request(parked, spider) is parked
+    assert 10 <= parked.meta[Scheduler.DELAY_KEY] <= 11 and not parked.in_state(parked.States.schedule)
+    other = create_request(slot, url='https://pypi.org/')
+    assert breaker.process_request(other, spider) is other and other.meta.get(Scheduler.DELAY_KEY) is None
+    # one probe is let through after the open timeout
+    clock.now += 10
+    probe = create_request(slot)
+    assert breaker.process_request(probe, spider) is probe and probe.meta.get(Scheduler.DELAY_KEY) is None
+    assert breaker.get_circuit('github.com').state == CircuitState.HALF_OPEN
+    waiting = create_request(slot)
+    assert breaker.process_request(waiting, spider) is waiting and waiting.meta[Scheduler.DELAY_KEY] >= 1
+    response = HttpResponse.from_request(request=probe, status=200, content=b'', headers={})
+    assert breaker.process_response(response, probe, spider) is response
+    assert breaker.get_circuit('github.com') is None
+    assert spider.stats.values == {'circuitbreaker/opened': 1, 'circuitbreaker/parked': 2, 'circuitbreaker/closed': 1}
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_max_park_time(slot, clock):
+    breaker = await CircuitBreakerMiddleware.create({'CIRCUIT_BREAKER_ENABLED': True, 'CIRCUIT_BREAKER_FAILURES': 1, 'CIRCUIT_BREAKER_OPEN_TIMEOUT': 10,
+                                                     'CIRCUIT_BREAKER_MAX_PARK_TIME': 25})
+    spider = Spider()
+    fail(breaker, create_request(slot), spider)
+    parked = create_request(slot)
+    assert breaker.process_request(parked, spider) is parked
+    # the host keeps failing, the parked request gives up after CIRCUIT_BREAKER_MAX_PARK_TIME
+    clock.now += 10
+    fail(breaker, create_request(slot), spider)
+    clock.now += 10
+    assert breaker.process_request(parked, spider) is parked and parked.meta[Scheduler.DELAY_KEY] > 0
+    clock.now += 5
+    with pytest.raises(CircuitOpen):
+        breaker.process_request(parked, spider)
+    assert spider.stats.values == {'circuitbreaker/opened': 2, 'circuitbreaker/parked': 2, 'circuitbreaker/rejected': 1}
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fail(slot, clock):
+    breaker = await CircuitBreakerMiddleware.create({'CIRCUIT_BREAKER_ENABLED': True, 'CIRCUIT_BREAKER_FAILURES': 2, 'CIRCUIT_BREAKER_OPEN_TIMEOUT': 10,
+                                                     'CIRCUIT_BREAKER_MAX_OPEN_TIMEOUT': 15, 'CIRCUIT_BREAKER_MODE': 'fail'})
+    spider = Spider()
+    for _ in range(2):
+        request = create_request(slot)
+        breaker.process_request(request, spider)
+        response = HttpResponse.from_request(request=request, status=503, content=b'', headers={})
+        assert breaker.process_response(response, request, spider) is response
+    request = create_request(slot)
+    with pytest.raises(CircuitOpen) as excinfo:
+        breaker.process_request(request, spider)
+    # the rejection is not counted as a failure
+    assert breaker.process_exception(request, excinfo.value, spider) is None and breaker.get_circuit('github.com').failures == 2
+    # a failed probe opens the circuit again for a longer time
+    clock.now += 10
+    fail(breaker, create_request(slot), spider)
+    assert breaker.get_circuit('github.com').state == CircuitState.OPEN and breaker.get_circuit('github.com').open_timeout == 15
+    clock.now += 10
+    with pytest.raises(CircuitOpen):
+        breaker.process_request(create_request(slot), spider)
+    clock.now += 5
+    assert breaker.process_request(request, spider) is request
+    assert spider.stats.values == {'circuitbreaker/opened': 2, 'circuitbreaker/rejected': 2}
@@ -0,0 +1,37 @@
+import gzip
+import zlib
+import pytest
+from araneid.network import compression
+from araneid.network.compression import ContentDecoder
+
+
+BODY = b'araneid ' * 4096
+
+def decode(decoder, data, chunk_size=1000):
+    return b''.join(decoder.decompress(data[start:start+chunk_size]) for start in range(0, len(data), chunk_size)) + decoder.flush()
+
+def test_content_decoder_zlib():
+    assert decode(ContentDecoder.from_encoding('gzip'), gzip.compress(BODY)) == BODY
+    assert decode(ContentDecoder.from_encoding('deflate'), zlib.compress(BODY)) == BODY
+    raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    assert decode(ContentDecoder.from_encoding('Deflate'), raw.compress(BODY) + raw.flush()) == BODY
+    # encodings are decoded in reverse order
+    assert decode(ContentDecoder.from_encoding('deflate, gzip'), gzip.compress(zlib.compress(BODY))) == BODY
+
+def test_content_decoder_unsupported():
+    assert ContentDecoder.from_encoding(None) is None
+    assert ContentDecoder.from_encoding('identity') is None
+    assert ContentDecoder.from_encoding('gzip, compress') is None
+    assert 'gzip, deflate' in compression.accept_encoding()
+
+def test_content_decoder_optional():
+    if compression.brotli is not None:
+       assert decode(ContentDecoder.from_encoding('br'), compression.brotli.compress(BODY)) == BODY
+       assert 'br' in compression.accept_encoding()
+    if compression.zstandard is not None:
+       # multiple frames
+       data = compression.zstandard.compress(BODY) + compression.zstandard.compress(BODY)
+       assert decode(ContentDecoder.from_encoding('zstd'), data) == BODY * 2
+       assert 'zstd' in compression.accept_encoding()
+    if compression.brotli is None and compression.zstandard is None:
+       pytest.skip('brotli and zstandard are not installed')
@@ -0,0 +1,156 @@
+import os
+import asyncio
+import pytest
+from types import SimpleNamespace
+from araneid.core.exception import NotConfigured
+from araneid.core.context import RequestContext
+from araneid.core.request import Meta
+from araneid.core.schedulemanager import ScheduleManager
+from araneid.core.stream import Stream
+from araneid.network.http import HttpRequest
+from araneid.scheduler.disk import DiskScheduler
+from araneid.spider import Spider, parser
+from araneid.spider.routermanager import RouterManager
+
+
+settings = {'SCHEDULERS': ['DiskScheduler'], 'SCHEDULER_MEMORY_SIZE': 2, 'SCHEDULER_SEGMENT_SIZE': 3, 'SCHEDULER_DISK_BATCH_SIZE': 1}
+
+async def timeout(coroutine, wait=1):
+    return await asyncio.wait_for(asyncio.ensure_future(coroutine), timeout=wait)
+
+@pytest.mark.asyncio
+async def test_disk_scheduler_not_configured():
+    with pytest.raises(NotConfigured):
+        await DiskScheduler.create(settings={})
+
+@pytest.mark.asyncio
+async def test_disk_scheduler_spill_order():
+    scheduler = await DiskScheduler.create(settings=settings)
+    requests = [HttpRequest(url=f'https://github.com/WALL-EEEEEEE?num={num}', priority=num, meta=Meta('num', num)) for num in range(10)]
+    for request in requests:
+        await scheduler.add_request(request)
+    assert scheduler.size() == 10 and scheduler.spilled() == 8
+    assert len(os.listdir(scheduler.directory)) == 3
+    scheduled = [await timeout(scheduler.get_request()) for _ in requests]
+    assert [request.url for request in scheduled] == [request.url for request in requests]
+    assert [request.priority for request in scheduled] == list(range(10))
+    assert [request.meta['num'] for request in scheduled] == list(range(10))
+    assert scheduler.idle()
+    directory = scheduler.directory
+    await scheduler.close()
+    assert not os.path.exists(directory)
+
+@pytest.mark.asyncio
+async def test_disk_scheduler_batch():
+    scheduler = await DiskScheduler.create(settings={**settings, 'SCHEDULER_MEMORY_SIZE': 5, 'SCHEDULER_DISK_BATCH_SIZE': 4})
+    requests = [HttpRequest(url=f'https://github.com/WALL-EEEEEEE?num={num}') for num in range(16)]
+    for request in requests[:8]:
+        await scheduler.add_request(request)
+    # 不足一批的请求缓冲在内存中, 不写入分段文件
+    assert scheduler.spilled() == 3 and not os.listdir(scheduler.directory)
+    for request in requests[8:]:
+        await scheduler.add_request(request)
+    assert scheduler.spilled() == 11 and os.listdir(scheduler.directory)
+    scheduled = [await timeout(scheduler.get_request()) for _ in range(6)]
+    # 每次最多读回一批请求
+    assert scheduler.size() == 10 and scheduler.spilled() == 7
+    scheduled += [await timeout(scheduler.get_request()) for _ in range(10)]
+    assert [request.url for request in scheduled] == [request.url for request in requests]
+    assert scheduler.idle()
+    await scheduler.close()
+
+class disk_spider(Spider):
+    name = 'disk_spider'
+
+    def start_requests(self):
+        pass
+
+    @parser(name='parse_disk')
+    def parse(self, response):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_disk_scheduler_route_parser():
+    spider = Spider.create(disk_spider)
+    parser = spider.parse
+    routemanager = RouterManager.from_settings({})
+    routemanager.add_parser_route(spider.name+'.'+parser.name, parser)
+    scraper = SimpleNamespace(__routemanager__=routemanager)
+    scheduler = await DiskScheduler.create(settings={**settings, 'SCHEDULER_MEMORY_SIZE': 1})
+    requests = [HttpRequest(url=f'https://github.com/WALL-EEEEEEE?num={num}', callback=parser, context=RequestContext(parser, spider, scraper)) for num in range(3)]
+    for request in requests:
+        await scheduler.add_request(request)
+    scheduled = [await timeout(scheduler.get_request()) for _ in requests]
+    assert scheduled[0] is requests[0]
+    for request in scheduled[1:]:
+        assert request.callback is parser
+        assert request.context.caller is parser and request.context.spider is spider and request.context.scraper is scraper
+    await scheduler.close()
+
+@pytest.mark.asyncio
+async def test_disk_scheduler_slow_consumer():
+    manager = await ScheduleManager.create(settings=settings)
+    scheduler = manager.__active_schedulers__[0]
+    dispatched = []
+    consumable = asyncio.Event()
+    async def receiver(request):
+        # 下载并发饱和
+        await consumable.wait()
+        dispatched.append(request.url)
+    manager.add_channel_receiver(receiver)
+    running = asyncio.ensure_future(manager.start())
+    requests = [HttpRequest(url=f'https://github.com/WALL-EEEEEEE?num={num}') for num in range(20)]
+    for request in requests:
+        await manager.add_request(request)
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+    # 只有一个请求离开调度器, 其余的请求溢出到磁盘而不是积压在调度管理器中
+    assert scheduler.size() == 19 and scheduler.spilled() >= 17
+    consumable.set()
+    await timeout(manager.wait_idle())
+    assert dispatched == [request.url for request in requests]
+    await manager.close()
+    await timeout(running)
+
+@pytest.mark.asyncio
+async def test_disk_scheduler_reference():
+    scheduler = await DiskScheduler.create(settings={**settings, 'SCHEDULER_MEMORY_SIZE': 1})
+    previous = HttpRequest(url='https://github.com/WALL-EEEEEEE?num=0')
+    callback = lambda response: None
+    requests = [previous,
+                HttpRequest(url='https://github.com/WALL-EEEEEEE?num=1', meta=Meta('previous', previous)),
+                HttpRequest(url='https://github.com/WALL-EEEEEEE?num=2', meta=Meta('values', {'num': 2})),
+                # 不能序列化的对象
+                HttpRequest(url='https://github.com/WALL-EEEEEEE?num=3', meta=Meta('callback', callback)),
+                HttpRequest(url='https://github.com/WALL-EEEEEEE?num=4', meta=Meta('lock', asyncio.Lock())),
+                HttpRequest(url='https://github.com/WALL-EEEEEEE?num=5', meta=Meta('semaphore', asyncio.Semaphore())),
+                HttpRequest(url='https://github.com/WALL-EEEEEEE?num=6', meta=Meta('condition', asyncio.Condition()))]
+    for request in requests:
+        await scheduler.add_request(request)
+    assert scheduler.spilled() == 6
+    scheduled = [await timeout(scheduler.get_request()) for _ in requests]
+    assert [request.url for request in scheduled] == [request.url for request in requests]
+    assert scheduled[1].meta['previous'] is previous
+    assert scheduled[2].meta['values'] == {'num': 2} and scheduled[2].meta['values'] is not requests[2].meta['values']
+    assert scheduled[3].meta['callback'] is callback
+    assert scheduled[4].meta['lock'] is requests[4].meta['lock']
+    assert scheduled[5].meta['semaphore'] is requests[5].meta['semaphore']
+    assert scheduled[6].meta['condition'] is requests[6].meta['condition']
+    await scheduler.close()
+
+@pytest.mark.asyncio
+async def test_disk_scheduler_delay():
+    scheduler = await DiskScheduler.create(settings=settings)
+    schedule_channel = await Stream.create()
+    running = asyncio.ensure_future(scheduler.run(schedule_channel))
+    delayed = HttpRequest(url='https://github.com/WALL-EEEEEEE?num=0', meta=Meta(DiskScheduler.DELAY_KEY, 0.1))
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE?num=1')
+    await scheduler.add_request(delayed)
+    await scheduler.add_request(request)
+    assert not scheduler.idle() and scheduler.size() == 1
+    assert await timeout(schedule_channel.get()) is request
+    assert await timeout(schedule_channel.get()) is delayed
+    assert delayed.meta.get(DiskScheduler.DELAY_KEY) is None
+    await scheduler.close()
+    await timeout(running)
@@ -0,0 +1,82 @@
+import socket
+import pytest
+import asyncio
+from araneid.network.dns import DNSCache
+
+
+class FakeResolver(object):
+
+    def __init__(self, fail=False):
+        self.lookups = []
+        self.fail = fail
+        self.closed = False
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        self.lookups.append(host)
+        await asyncio.sleep(0.01)
+        if self.fail:
+           raise OSError(-2, f'Name or service not known: {host}')
+        return [{'hostname': host, 'host': '10.0.0.1', 'port': port, 'family': family, 'proto': 0, 'flags': 0}]
+
+    async def close(self):
+        self.closed = True
+
+@pytest.mark.asyncio
+async def test_dnscache_coalesce():
+    resolver = FakeResolver()
+    cache = DNSCache(resolver=resolver)
+    results = await asyncio.gather(*[cache.resolve('github.com', 443) for _ in range(500)])
+    assert resolver.lookups == ['github.com']
+    assert all(result[0]['host'] == '10.0.0.1' and result[0]['port'] == 443 for result in results)
+    assert (await cache.resolve('github.com', 80))[0]['port'] == 80
+    assert resolver.lookups == ['github.com']
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 499 and stats['hits'] == 1 and stats['size'] == 1
+    assert (await cache.resolve('127.0.0.1', 80))[0]['host'] == '127.0.0.1' and resolver.lookups == ['github.com']
+    await cache.close()
+    assert resolver.closed
+
+@pytest.mark.asyncio
+async def test_dnscache_ttl():
+    resolver = FakeResolver()
+    cache = DNSCache(ttl=0.05, max_size=2, resolver=resolver)
+    await cache.resolve('github.com')
+    await cache.resolve('github.com')
+    await asyncio.sleep(0.06)
+    await cache.resolve('github.com')
+    assert resolver.lookups == ['github.com', 'github.com']
+    # least recently used hosts are evicted
+    cache.ttl = 60
+    for host in ('a.github.com', 'b.github.com', 'c.github.com'):
+        await cache.resolve(host)
+    assert len(cache) == 2
+    await cache.resolve('a.github.com')
+    assert resolver.lookups[-1] == 'a.github.com' and len(resolver.lookups) == 6
+
+@pytest.mark.asyncio
+async def test_dnscache_negative():
+    resolver = FakeResolver(fail=True)
+    cache = DNSCache(negative_ttl=60, resolver=resolver)
+    for _ in range(3):
+        with pytest.raises(OSError):
+            await cache.resolve('missing.github.com')
+    assert resolver.lookups == ['missing.github.com']
+    assert cache.stats()['negative_hits'] == 2 and cache.stats()['errors'] == 1
+    cache = DNSCache(negative_ttl=0, resolver=resolver)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            await cache.resolve('missing.github.com')
+    assert len(resolver.lookups) == 3
+
+@pytest.mark.asyncio
+async def test_dnscache_prefetch():
+    resolver = FakeResolver()
+    cache = DNSCache(resolver=resolver)
+    cache.prefetch('github.com')
+    cache.prefetch('github.com')
+    cache.prefetch('127.0.0.1')
+    cache.prefetch(None)
+    await cache.resolve('github.com')
+    assert resolver.lookups == ['github.com']
+    stats = cache.stats()
+    assert stats['prefetches'] == 1 and stats['coalesced'] == 1 and stats['misses'] == 0
@@ -0,0 +1,92 @@
+import pytest
+from araneid.core.jobdir import JobDir
+from araneid.core.request import Meta
+from araneid.network.http import HttpRequest
+from araneid.util.fingerprint import canonicalize_url, request_fingerprint
+from araneid.dupefilter.exact import ExactDupeFilter, DigestSet
+from araneid.dupefilter.bloom import BloomDupeFilter, ScalableBloomFilter
+
+
+def test_canonicalize_url():
+    assert canonicalize_url('HTTP://GitHub.com:80/a%7Eb?b=2&a=1#top') == 'http://github.com/a~b?a=1&b=2'
+    assert canonicalize_url('https://github.com:8443') == 'https://github.com:8443/'
+    assert canonicalize_url('https://github.com/?a=&a=1') == canonicalize_url('https://github.com/?a=1&a=')
+    # 保留字符的百分号编码不会被解码
+    assert canonicalize_url('https://github.com/a%2Fb') == 'https://github.com/a%2Fb' != canonicalize_url('https://github.com/a/b')
+    assert canonicalize_url('https://github.com/a%3fb%23c') == 'https://github.com/a%3Fb%23c'
+    assert canonicalize_url('https://github.com/a%2fb') == canonicalize_url('https://github.com/a%2Fb')
+    assert canonicalize_url('https://github.com/a b/%zz') == canonicalize_url('https://github.com/a%20b/%25zz') == 'https://github.com/a%20b/%25zz'
+
+def test_request_fingerprint():
+    request = HttpRequest(url='https://github.com/?b=2&a=1')
+    assert request.fingerprint is request.fingerprint
+    assert request.fingerprint == HttpRequest(url='https://GITHUB.com/?a=1&b=2#readme').fingerprint
+    assert request.fingerprint != HttpRequest(url='https://github.com/?b=2&a=1', method='POST').fingerprint
+    assert HttpRequest(url='https://github.com/', method='POST', data={'a': 1, 'b': 2}).fingerprint == HttpRequest(url='https://github.com/', method='POST', data={'b': 2, 'a': 1}).fingerprint
+    assert HttpRequest(url='https://github.com/', json={'a': 1}).fingerprint != HttpRequest(url='https://github.com/', json={'a': 2}).fingerprint
+    headers_fingerprint = request_fingerprint(HttpRequest(url='https://github.com/', headers={'Accept-Language': 'en'}), include_headers=['accept-language'])
+    assert headers_fingerprint != request_fingerprint(HttpRequest(url='https://github.com/', headers={'Accept-Language': 'zh'}), include_headers=['accept-language'])
+    assert HttpRequest.from_request(request).fingerprint == request.fingerprint
+
+def test_digest_set():
+    digests = DigestSet(capacity=4)
+    fingerprints = [HttpRequest(url=f'https://github.com/?num={num}').fingerprint for num in range(1000)]
+    assert all(digests.add(fingerprint) for fingerprint in fingerprints)
+    assert not any(digests.add(fingerprint) for fingerprint in fingerprints)
+    assert len(digests) == 1000 and all(fingerprint in digests for fingerprint in fingerprints)
+    assert HttpRequest(url='https://github.com/?num=1000').fingerprint not in digests
+
+def test_scalable_bloom_filter():
+    bloom_filter = ScalableBloomFilter(capacity=100, error_rate=0.001)
+    fingerprints = [HttpRequest(url=f'https://github.com/?num={num}').fingerprint for num in range(1000)]
+    added = sum(bloom_filter.add(fingerprint) for fingerprint in fingerprints)
+    assert added >= 995 and len(bloom_filter) == added
+    assert all(fingerprint in bloom_filter for fingerprint in fingerprints)
+    false_positives = sum(HttpRequest(url=f'https://github.com/?other={num}').fingerprint in bloom_filter for num in range(10000))
+    assert false_positives <= 30
+
+@pytest.mark.parametrize('dupefilter_cls', [ExactDupeFilter, BloomDupeFilter])
+@pytest.mark.asyncio
+async def test_dupefilter_request_seen(dupefilter_cls):
+    dupefilter = await dupefilter_cls.create(settings={'DUPEFILTER_BLOOM_CAPACITY': 1000})
+    assert not dupefilter.request_seen(HttpRequest(url='https://github.com/?a=1&b=2'))
+    assert dupefilter.request_seen(HttpRequest(url='https://github.com/?b=2&a=1', meta=Meta('dont_filter', True)))
+    assert not dupefilter.request_seen(HttpRequest(url='https://github.com/?a=1&b=2', method='POST'))
+    assert len(dupefilter) == 2
+    dupefilter.close()
+
+@pytest.mark.asyncio
+async def test_dupefilter_include_headers():
+    dupefilter = await ExactDupeFilter.create(settings={'DUPEFILTER_HEADERS': ['Accept-Language']})
+    assert not dupefilter.request_seen(HttpRequest(url='https://github.com/', headers={'Accept-Language': 'en'}))
+    assert not dupefilter.request_seen(HttpRequest(url='https://github.com/', headers={'Accept-Language': 'zh'}))
+    assert dupefilter.request_seen(HttpRequest(url='https://github.com/', headers={'accept-language': 'zh'}))
+
+def test_request_fingerprint_invalidate():
+    request = HttpRequest(url='https://github.com/', headers={'Accept-Language': 'en'})
+    fingerprint, headers_fingerprint = request.fingerprint, request.get_fingerprint(['Accept-Language'])
+    assert headers_fingerprint != fingerprint and headers_fingerprint is request.get_fingerprint(['Accept-Language'])
+    request.set_header('Accept-Language', 'zh')
+    assert request.fingerprint == fingerprint and request.get_fingerprint(['Accept-Language']) != headers_fingerprint
+    request.method = 'POST'
+    assert request.fingerprint != fingerprint
+    request.method = 'GET'
+    request.data = {'a': 1}
+    assert request.fingerprint != fingerprint
+    request.data = None
+    request.json = {'a': 1}
+    assert request.fingerprint != fingerprint
+    request.json = None
+    request.uri = 'https://github.com/WALL-EEEEEEE'
+    assert request.fingerprint == HttpRequest(url='https://github.com/WALL-EEEEEEE').fingerprint
+
+@pytest.mark.asyncio
+async def test_dupefilter_jobdir_fingerprint(tmp_path):
+    settings = {'JOBDIR': str(tmp_path), 'DUPEFILTER_HEADERS': ['Accept-Language']}
+    dupefilter = await ExactDupeFilter.create(settings=settings)
+    jobdir = await JobDir.create(settings)
+    request = HttpRequest(url='https://github.com/', headers={'Accept-Language': 'en'})
+    jobdir.record_request(request)
+    assert dupefilter.fingerprint(request) in jobdir.seen_fingerprints()
+    assert not jobdir.seen(HttpRequest(url='https://github.com/', headers={'Accept-Language': 'zh'}))
+    jobdir.close()
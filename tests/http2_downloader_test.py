@@ -0,0 +1,187 @@
+import json
+import gzip
+import asyncio
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import HttpConnectionClose, HttpResponseTooLarge
+from araneid.downloader.aioh2 import Http2
+from araneid.network.http import HttpRequest, HttpResponse
+
+h2 = pytest.importorskip('h2')
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import DataReceived, RequestReceived, StreamEnded, WindowUpdated
+from h2.settings import Settings, SettingCodes
+
+
+BODY = 'araneid '.encode('utf-8') * 32 * 1024
+
+class H2Server(asyncio.Protocol):
+    """h2实现的HTTP/2服务端(h2c), ``handler(method, path, headers, body)`` 返回 ``(status, headers, body)``"""
+
+    def __init__(self, handler, stats, max_streams=100):
+        self.handler = handler
+        self.stats = stats
+        self.max_streams = max_streams
+        self.conn = H2Connection(config=H2Configuration(client_side=False, header_encoding='utf-8'))
+        self.requests = {}
+        self.window_updated = asyncio.Event()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.stats['connections'] += 1
+        self.conn.local_settings = Settings(client=False, initial_values={SettingCodes.MAX_CONCURRENT_STREAMS: self.max_streams})
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def connection_lost(self, exc):
+        self.window_updated.set()
+
+    def data_received(self, data):
+        for event in self.conn.receive_data(data):
+            if isinstance(event, RequestReceived):
+               self.requests[event.stream_id] = (dict(event.headers), [])
+            elif isinstance(event, DataReceived):
+               self.requests[event.stream_id][1].append(event.data)
+               self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, StreamEnded):
+               asyncio.ensure_future(self.respond(event.stream_id, *self.requests.pop(event.stream_id)))
+            elif isinstance(event, WindowUpdated):
+               self.window_updated.set()
+        self.transport.write(self.conn.data_to_send())
+
+    async def respond(self, stream_id, headers, chunks):
+        self.stats['active'] += 1
+        self.stats['max_active'] = max(self.stats['max_active'], self.stats['active'])
+        try:
+            status, response_headers, body = await self.handler(headers[':method'], headers[':path'], headers, b''.join(chunks))
+        finally:
+            self.stats['active'] -= 1
+        self.conn.send_headers(stream_id, [(':status', str(status)), ('content-length', str(len(body))), *response_headers], end_stream=not body)
+        offset = 0
+        while offset < len(body):
+            window = min(self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size)
+            if window <= 0:
+               self.window_updated.clear()
+               await self.window_updated.wait()
+               if self.transport.is_closing():
+                  return
+               continue
+            size = min(window, len(body) - offset)
+            self.conn.send_data(stream_id, body[offset:offset+size], end_stream=offset+size == len(body))
+            offset += size
+            self.transport.write(self.conn.data_to_send())
+        self.transport.write(self.conn.data_to_send())
+
+async def handle(method, path, headers, body):
+    if path.startswith('/sized'):
+       return 200, [('content-type', 'text/plain; charset=utf-8')], BODY
+    if path == '/gzip':
+       return 200, [('content-type', 'text/plain; charset=utf-8'), ('content-encoding', 'gzip')], gzip.compress(BODY)
+    if path == '/redirect':
+       return 302, [('location', '/echo')], b''
+    if path == '/cookie':
+       return 200, [('set-cookie', 'session=araneid; Path=/')], b''
+    if path.startswith('/sleep'):
+       await asyncio.sleep(float(path.split('=')[-1]))
+       return 200, [], b'araneid'
+    if path == '/echo':
+       return 200, [('content-type', 'application/json')], json.dumps({'method': method, 'cookie': headers.get('cookie'), 'body': body.decode()}).encode()
+    return 404, [], b''
+
+async def start_h2_server(handler=handle, max_streams=100):
+    stats = {'connections': 0, 'active': 0, 'max_active': 0}
+    server = await asyncio.get_event_loop().create_server(lambda: H2Server(handler, stats, max_streams=max_streams), '127.0.0.1', 0)
+    return server, f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}', stats
+
+async def fetch(downloader, url, **kwargs):
+    request = HttpRequest(url=url, downloader='Http2', **kwargs)
+    request.bind(await Slot.create({}))
+    channel = await downloader.download(request)
+    async with channel.read() as reader:
+        async for response in reader:
+            return response
+
+@pytest_asyncio.fixture
+async def h2_server():
+    server, url, stats = await start_h2_server(max_streams=50)
+    yield url, stats
+    server.close()
+
+@pytest.mark.asyncio
+async def test_http2_download(h2_server):
+    url, stats = h2_server
+    downloader = await Http2.create(settings={'HTTP2_PRIOR_KNOWLEDGE': True})
+    response = await fetch(downloader, url+'/sized')
+    assert isinstance(response, HttpResponse) and response.status == 200 and response.reason == 'OK'
+    assert response.body == BODY and response.length == len(BODY) and response.encoding == 'utf-8'
+    assert response.headers['Content-Type'] == 'text/plain; charset=utf-8' and response.history == ()
+    response = await fetch(downloader, url+'/gzip')
+    assert response.body == BODY and 'Content-Encoding' not in response.headers and 'Content-Length' not in response.headers
+    response = await fetch(downloader, url+'/echo', method='POST', data={'name': 'araneid'})
+    assert response.status == 200 and json.loads(response.body) == {'method': 'POST', 'cookie': None, 'body': 'name=araneid'}
+    # redirects are followed, cookies are kept
+    # cookies of ip addresses are not kept by the cookie jar, the same as Http
+    url = url.replace('127.0.0.1', 'localhost')
+    assert (await fetch(downloader, url+'/cookie')).cookies == {'session': 'araneid'}
+    response = await fetch(downloader, url+'/redirect', cookies={'user': 'wall-e'})
+    assert response.status == 200 and [history.status for history in response.history] == [302]
+    assert json.loads(response.body)['cookie'] == 'session=araneid; user=wall-e'
+    assert stats['connections'] == 2
+    await downloader.close()
+
+@pytest.mark.asyncio
+async def test_http2_multiplex(h2_server):
+    url, stats = h2_server
+    downloader = await Http2.create(settings={'HTTP2_PRIOR_KNOWLEDGE': True})
+    responses = await asyncio.gather(*[fetch(downloader, url+f'/sleep?num={num}&delay=0.05') for num in range(200)])
+    assert all(response.body == b'araneid' for response in responses)
+    # a single connection, limited by the server's SETTINGS_MAX_CONCURRENT_STREAMS
+    assert stats['connections'] == 1 and 25 <= stats['max_active'] <= 50
+    await downloader.close()
+
+@pytest.mark.asyncio
+async def test_http2_flow_control(h2_server):
+    url, _ = h2_server
+    downloader = await Http2.create(settings={'HTTP2_PRIOR_KNOWLEDGE': True, 'HTTP2_WINDOW_SIZE': 65535})
+    responses = await asyncio.gather(*[fetch(downloader, url+f'/sized?num={num}') for num in range(10)])
+    assert all(response.body == BODY for response in responses)
+    data = 'araneid' * 100000
+    response = await fetch(downloader, url+'/echo', method='POST', data=data)
+    assert json.loads(response.body)['body'] == data
+    await downloader.close()
+
+@pytest.mark.asyncio
+async def test_http2_failure(h2_server):
+    url, _ = h2_server
+    downloader = await Http2.create(settings={'HTTP2_PRIOR_KNOWLEDGE': True, 'DOWNLOAD_MAXSIZE': len(BODY)//2})
+    with pytest.raises(HttpResponseTooLarge):
+        await fetch(downloader, url+'/sized')
+    with pytest.raises(HttpResponseTooLarge):
+        await fetch(downloader, url+'/gzip')
+    with pytest.raises(HttpConnectionClose):
+        await fetch(downloader, url+'/sleep?delay=1', timeout=0.1)
+    # the connection is still usable after streams are reset
+    assert (await fetch(downloader, url+'/sleep?delay=0')).body == b'araneid'
+    await downloader.close()
+
+@pytest.mark.asyncio
+async def test_http2_fallback():
+    signalmanager = await SignalManager.create()
+    set_signalmanager(signalmanager)
+    async def sized(request):
+        return web.Response(body=BODY, content_type='text/plain', charset='utf-8')
+    app = web.Application()
+    app.router.add_get('/sized', sized)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    downloader = await Http2.create(settings={})
+    response = await fetch(downloader, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/sized')
+    assert response.status == 200 and response.body == BODY
+    await downloader.close()
+    await runner.cleanup()
@@ -0,0 +1,272 @@
+import asyncio
+import gzip
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from araneid.core import signal
+from araneid.core.context import RequestContext
+from araneid.core.exception import StopDownload
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import ConnectorOptions, Http, HttpConnectionClose, HttpResponseTooLarge, SessionPool, TraceContext
+from araneid.network import compression
+from araneid.network.http import HttpRequest
+from araneid.scraper import Scraper
+from araneid.spider import Spider
+from araneid.stats import StatsCollector
+
+
+class FakeSession(object):
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+@pytest.mark.asyncio
+async def test_session_pool_reuse():
+    pool = SessionPool(FakeSession, max_size=2)
+    first = await pool.acquire('http://proxy1:8080')
+    pool.release(first)
+    second = await pool.acquire('http://proxy1:8080')
+    assert second.session is first.session and len(pool) == 1
+    pool.release(second)
+    second.session.closed = True
+    third = await pool.acquire('http://proxy1:8080')
+    assert third.session is not first.session
+    pool.release(third)
+    await pool.close()
+    assert third.session.closed and len(pool) == 0
+
+@pytest.mark.asyncio
+async def test_session_pool_lru_eviction():
+    pool = SessionPool(FakeSession, max_size=2)
+    sessions = {}
+    for proxy in ('http://proxy1:8080', 'http://proxy2:8080'):
+        sessions[proxy] = await pool.acquire(proxy)
+    pool.release(sessions['http://proxy2:8080'])
+    # proxy1 is the least recently used, but still in use
+    sessions['http://proxy3:8080'] = await pool.acquire('http://proxy3:8080')
+    assert 'http://proxy1:8080' in pool and 'http://proxy2:8080' not in pool
+    assert sessions['http://proxy2:8080'].session.closed and not sessions['http://proxy1:8080'].session.closed
+    pool.release(sessions['http://proxy1:8080'])
+    pool.release(sessions['http://proxy3:8080'])
+    await pool.close()
+
+@pytest.mark.asyncio
+async def test_session_pool_idle_eviction():
+    pool = SessionPool(FakeSession, max_size=4, idle_timeout=0)
+    idle = await pool.acquire('http://proxy1:8080')
+    pool.release(idle)
+    active = await pool.acquire('http://proxy2:8080')
+    assert idle.session.closed and 'http://proxy1:8080' not in pool
+    assert not active.session.closed
+    pool.release(active)
+    await pool.close()
+
+def test_connector_options():
+    options = ConnectorOptions.from_settings({'HTTP_CONNECTOR_LIMIT': 500, 'HTTP_CONNECTOR_DNS_CACHE_TTL': 0})
+    assert options.limit == 500 and options.limit_per_host == 0 and options.tcp_nodelay
+    kwargs = options.connector_kwargs()
+    assert kwargs['limit'] == 500 and not kwargs['use_dns_cache'] and kwargs['keepalive_timeout'] == 15
+    overridden = ConnectorOptions.from_settings({'HTTP_CONNECTOR_FORCE_CLOSE': True}, base=options)
+    assert overridden.limit == 500 and overridden.force_close
+    assert 'keepalive_timeout' not in overridden.connector_kwargs()
+
+class connector_spider(Spider):
+    name = 'connector_spider'
+    custom_settings = {'HTTP_CONNECTOR_LIMIT_PER_HOST': 1}
+
+    def start_requests(self):
+        pass
+
+class default_spider(Spider):
+    name = 'default_spider'
+
+    def start_requests(self):
+        pass
+
+@pytest.mark.asyncio
+async def test_http_connector_settings():
+    settings = {'HTTP_CONNECTOR_LIMIT': 20, 'HTTP_CONNECTOR_LIMIT_PER_HOST': 4, 'HTTP_CONNECTOR_TCP_NODELAY': False}
+    downloader = await Http.create(settings=settings)
+    downloader.__init_session__()
+    connector = downloader.session.connector
+    assert connector.limit == 20 and connector.limit_per_host == 4
+    scraper = await Scraper.create(settings)
+    default, custom = Spider.create(default_spider), Spider.create(connector_spider)
+    scraper.add_spider(default)
+    scraper.add_spider(custom)
+    # custom_settings survive the global settings set by the scraper
+    assert default.settings is settings and custom.settings['HTTP_CONNECTOR_LIMIT_PER_HOST'] == 1 and custom.settings['HTTP_CONNECTOR_LIMIT'] == 20
+    assert downloader.get_options(default) is downloader.connector_options
+    options = downloader.get_options(custom)
+    session = downloader.get_session(options)
+    assert session is not downloader.session
+    assert session.connector.limit == 20 and session.connector.limit_per_host == 1
+    # proxied sessions are pooled by proxy and connector options
+    proxied = await downloader.proxy_pool.acquire(('http://127.0.0.1:8080', options))
+    default_proxied = await downloader.proxy_pool.acquire(('http://127.0.0.1:8080', downloader.connector_options))
+    assert proxied.session is not default_proxied.session
+    assert proxied.session.connector.limit_per_host == 1 and default_proxied.session.connector.limit_per_host == 4
+    downloader.proxy_pool.release(proxied)
+    downloader.proxy_pool.release(default_proxied)
+    await downloader.close()
+    assert session.closed and proxied.session.closed
+
+BODY = 'araneid '.encode('utf-8') * 32 * 1024
+
+async def start_server():
+    async def sized(request):
+        return web.Response(body=BODY, content_type='text/plain', charset='utf-8')
+    async def chunked(request):
+        response = web.StreamResponse()
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for start in range(0, len(BODY), 8192):
+            await response.write(BODY[start:start+8192])
+        await response.write_eof()
+        return response
+    async def stalled(request):
+        response = web.StreamResponse()
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        await response.write(BODY[:8192])
+        await asyncio.sleep(float(request.query['delay']))
+        await response.write(BODY[8192:])
+        await response.write_eof()
+        return response
+    async def compressed(request):
+        encoding = request.query['encoding']
+        assert encoding in request.headers['Accept-Encoding']
+        body = gzip.compress(BODY) if encoding == 'gzip' else compression.brotli.compress(BODY) if encoding == 'br' else compression.zstandard.compress(BODY)
+        return web.Response(body=body, content_type='text/plain', charset='utf-8', headers={'Content-Encoding': encoding})
+    app = web.Application()
+    app.router.add_get('/sized', sized)
+    app.router.add_get('/compressed', compressed)
+    app.router.add_get('/chunked', chunked)
+    app.router.add_get('/stalled', stalled)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+async def fetch(downloader, url, context=None, **meta):
+    request = HttpRequest(url=url, context=context)
+    request.bind(await Slot.create({}))
+    for key, value in meta.items():
+        request.meta[key] = value
+    channel = await downloader.download(request)
+    async with channel.read() as reader:
+        async for response in reader:
+            return response
+
+@pytest_asyncio.fixture
+async def http_server():
+    signalmanager = await SignalManager.create()
+    set_signalmanager(signalmanager)
+    running = asyncio.ensure_future(signalmanager.start())
+    runner, url = await start_server()
+    yield url
+    await runner.cleanup()
+    await signalmanager.close()
+    await running
+
+@pytest.mark.asyncio
+async def test_http_download_body(http_server):
+    downloader = await Http.create(settings={'HTTP_CHUNK_SIZE': 4096})
+    response = await fetch(downloader, http_server+'/chunked')
+    assert response.content == BODY and response.length == len(BODY) and response.encoding == 'ascii'
+    response = await fetch(downloader, http_server+'/sized', download_body='memoryview')
+    assert isinstance(response.content, memoryview) and response.body == BODY and response.text == BODY.decode()
+    response = await fetch(downloader, http_server+'/sized', download_body='file')
+    assert response.content.read() == BODY and response.body == BODY and response.length == len(BODY)
+    response.clear()
+    await downloader.close()
+
+@pytest.mark.asyncio
+async def test_http_download_maxsize(http_server):
+    downloader = await Http.create(settings={'DOWNLOAD_MAXSIZE': len(BODY)//2, 'HTTP_CHUNK_SIZE': 4096})
+    with pytest.raises(HttpResponseTooLarge):
+        await fetch(downloader, http_server+'/sized')
+    with pytest.raises(HttpResponseTooLarge):
+        await fetch(downloader, http_server+'/chunked')
+    response = await fetch(downloader, http_server+'/chunked', download_maxsize=0)
+    assert response.length == len(BODY)
+    await downloader.close()
+
+@pytest.mark.asyncio
+async def test_http_read_timeout(http_server):
+    downloader = await Http.create(settings={'HTTP_READ_TIMEOUT': 0.2})
+    with pytest.raises(HttpConnectionClose, match='Timeout on reading data'):
+        await fetch(downloader, http_server+'/stalled?delay=1')
+    response = await fetch(downloader, http_server+'/stalled?delay=0.5', download_read_timeout=1)
+    assert response.body == BODY
+    await downloader.close()
+    downloader = await Http.create(settings={})
+    assert downloader.connect_timeout == 10 and downloader.read_timeout is None
+    response = await fetch(downloader, http_server+'/stalled?delay=0.3')
+    assert response.body == BODY
+    await downloader.close()
+
+@pytest.mark.asyncio
+async def test_http_stop_download(http_server):
+    received = []
+    async def stop(signal, source, object):
+        received.append(len(object['bytes']))
+        if len(received) == 2:
+           raise StopDownload(fail=object['request'].meta.get('fail'))
+    signal.register(signal.bytes_received, stop)
+    downloader = await Http.create(settings={'HTTP_CHUNK_SIZE': 4096})
+    response = await fetch(downloader, http_server+'/chunked', fail=False)
+    assert len(received) == 2 and response.length == sum(received) < len(BODY)
+    received.clear()
+    with pytest.raises(StopDownload):
+        await fetch(downloader, http_server+'/chunked', fail=True)
+    await downloader.close()
+
+@pytest.mark.asyncio
+async def test_http_trace(http_server):
+    downloader = await Http.create(settings={})
+    downloader.__init_session__()
+    assert not downloader.session._trace_configs
+    await downloader.close()
+    downloader = await Http.create(settings={'HTTP_TRACE_ENABLED': True, 'HTTP_TRACE_SAMPLE_RATE': 0})
+    spider = Spider.create(default_spider)
+    spider.stats = StatsCollector({})
+    context = RequestContext(spider=spider)
+    for _ in range(2):
+        await fetch(downloader, http_server+'/sized', context=context, trace_sample_rate=1)
+    await fetch(downloader, http_server+'/sized', context=context)
+    timings = spider.stats.get_value('trace/http', spider=spider, sep='/')
+    # the connection is reused by the second request
+    assert timings['total']['count'] == timings['ttfb']['count'] == timings['body']['count'] == 2 and timings['connect']['count'] == 1
+    assert sum(value for key, value in timings['total'].items() if key.startswith('le_')) == 2
+    assert 0 < timings['body']['sum'] <= timings['total']['sum'] and timings['total']['max'] <= timings['total']['sum']
+    await downloader.close()
+
+def test_trace_context_record():
+    stats = StatsCollector({})
+    trace = TraceContext()
+    trace.dns, trace.total = 0.003, 20
+    trace.record(stats)
+    assert trace.timings() == {'dns': 0.003, 'total': 20}
+    assert stats.get_value('trace/http/dns/le_0.005', sep='/') == 1 and stats.get_value('trace/http/total/le_inf', sep='/') == 1
+    assert stats.get_value('trace/http/connect', sep='/') is None
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br', 'zstd'])
+@pytest.mark.asyncio
+async def test_http_decompress(http_server, encoding):
+    if encoding not in compression.DECODERS:
+       pytest.skip(f'{encoding} is not supported')
+    for threshold in (0, 1024):
+        downloader = await Http.create(settings={'HTTP_CHUNK_SIZE': 4096, 'HTTP_DECOMPRESS_THRESHOLD': threshold})
+        response = await fetch(downloader, http_server+f'/compressed?encoding={encoding}')
+        assert response.body == BODY and response.length == len(BODY)
+        assert 'Content-Encoding' not in response.headers and 'Content-Length' not in response.headers
+        with pytest.raises(HttpResponseTooLarge):
+            await fetch(downloader, http_server+f'/compressed?encoding={encoding}', download_maxsize=len(BODY)//2)
+        await downloader.close()
@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from email.utils import formatdate
+from araneid.core.exception import NotConfigured
+from araneid.core.slot import Slot
+from araneid.extension.downloadermiddleware.httpcache import HttpCacheMiddleware, RFC9111Policy, CacheEntry
+from araneid.network.http import HttpRequest, HttpResponse
+
+
+@pytest_asyncio.fixture
+async def slot():
+    return await Slot.create({})
+
+def create_request(slot, url, **kwargs):
+    request = HttpRequest(url=url, **kwargs)
+    request.bind(slot)
+    return request
+
+def create_response(request, status=200, body=b'araneid', headers=None):
+    return HttpResponse.from_request(request=request, status=status, content=body, headers=headers or {}, encoding='utf-8')
+
+async def create_cache(tmp_path, **settings):
+    return await HttpCacheMiddleware.create({'HTTPCACHE_ENABLED': True, 'HTTPCACHE_DIR': str(tmp_path), **settings})
+
+@pytest.mark.asyncio
+async def test_httpcache_not_enabled():
+    with pytest.raises(NotConfigured):
+        await HttpCacheMiddleware.create({})
+
+@pytest.mark.parametrize('storage', ['filesystem', 'sqlite'])
+@pytest.mark.asyncio
+async def test_httpcache_dummy_policy(tmp_path, slot, storage):
+    cache = await create_cache(tmp_path, HTTPCACHE_STORAGE=storage, HTTPCACHE_IGNORE_HTTP_CODES=[500])
+    request = create_request(slot, 'https://github.com/WALL-EEEEEEE?tab=repositories')
+    assert await cache.process_request(request, None) is request
+    assert (await cache.process_response(create_response(request, headers={'Content-Type': 'text/html'}), request, None)).body == b'araneid'
+    failed = create_request(slot, 'https://github.com/WALL-EEEEEEE?tab=stars')
+    await cache.process_request(failed, None)
+    await cache.process_response(create_response(failed, status=500), failed, None)
+    cache.close()
+    # cache survives reopening and bypasses the downloader
+    cache = await create_cache(tmp_path, HTTPCACHE_STORAGE=storage)
+    same = create_request(slot, 'https://github.com/WALL-EEEEEEE?tab=repositories')
+    cached = await cache.process_request(same, None)
+    assert isinstance(cached, HttpResponse) and cached.request is same
+    assert cached.status == 200 and cached.body == b'araneid' and cached.headers['content-type'] == 'text/html'
+    assert (await cache.process_request(create_request(slot, 'https://github.com/WALL-EEEEEEE?tab=stars'), None)).__class__ is HttpRequest
+    dont_cache = create_request(slot, 'https://github.com/WALL-EEEEEEE?tab=repositories')
+    dont_cache.meta['dont_cache'] = True
+    assert await cache.process_request(dont_cache, None) is dont_cache
+    cache.close()
+
+@pytest.mark.asyncio
+async def test_httpcache_expiration(tmp_path, slot):
+    cache = await create_cache(tmp_path, HTTPCACHE_EXPIRATION_SECS=60)
+    request = create_request(slot, 'https://github.com/WALL-EEEEEEE')
+    await cache.process_request(request, None)
+    await cache.process_response(create_response(request), request, None)
+    assert isinstance(await cache.process_request(create_request(slot, 'https://github.com/WALL-EEEEEEE'), None), HttpResponse)
+    cache.storage.expiration = 0.000001
+    assert isinstance(await cache.process_request(create_request(slot, 'https://github.com/WALL-EEEEEEE'), None), HttpRequest)
+    cache.close()
+
+@pytest.mark.asyncio
+async def test_httpcache_rfc9111_policy(tmp_path, slot):
+    cache = await create_cache(tmp_path, HTTPCACHE_POLICY='rfc9111')
+    fresh = create_request(slot, 'https://github.com/fresh')
+    await cache.process_request(fresh, None)
+    await cache.process_response(create_response(fresh, headers={'Cache-Control': 'max-age=3600'}), fresh, None)
+    assert isinstance(await cache.process_request(create_request(slot, 'https://github.com/fresh'), None), HttpResponse)
+    no_cache = create_request(slot, 'https://github.com/fresh', headers={'Cache-Control': 'no-cache'})
+    assert await cache.process_request(no_cache, None) is no_cache
+    # no-store and uncacheable methods are never stored
+    no_store = create_request(slot, 'https://github.com/no-store')
+    await cache.process_request(no_store, None)
+    await cache.process_response(create_response(no_store, headers={'Cache-Control': 'no-store'}), no_store, None)
+    assert isinstance(await cache.process_request(create_request(slot, 'https://github.com/no-store'), None), HttpRequest)
+    post = create_request(slot, 'https://github.com/fresh', method='POST')
+    assert await cache.process_request(post, None) is post
+    # stale responses are revalidated by conditional requests
+    etag = create_request(slot, 'https://github.com/etag')
+    await cache.process_request(etag, None)
+    await cache.process_response(create_response(etag, headers={'ETag': '"v1"', 'Cache-Control': 'max-age=0', 'Date': formatdate(usegmt=True)}), etag, None)
+    revalidate = create_request(slot, 'https://github.com/etag')
+    assert await cache.process_request(revalidate, None) is revalidate and revalidate.headers['If-None-Match'] == '"v1"'
+    revalidated = await cache.process_response(create_response(revalidate, status=304, body=b'', headers={'ETag': '"v1"', 'Cache-Control': 'max-age=3600'}), revalidate, None)
+    assert revalidated.status == 200 and revalidated.body == b'araneid'
+    assert isinstance(await cache.process_request(create_request(slot, 'https://github.com/etag'), None), HttpResponse)
+    cache.close()
+
+@pytest.mark.asyncio
+async def test_httpcache_stale_if_error(tmp_path, slot):
+    cache = await create_cache(tmp_path, HTTPCACHE_POLICY='rfc9111')
+    for path, cache_control in (('stale', 'max-age=0'), ('must-revalidate', 'max-age=0, must-revalidate')):
+        request = create_request(slot, f'https://github.com/{path}')
+        await cache.process_request(request, None)
+        await cache.process_response(create_response(request, headers={'ETag': '"v1"', 'Cache-Control': cache_control}), request, None)
+    stale = create_request(slot, 'https://github.com/stale')
+    await cache.process_request(stale, None)
+    assert cache.process_exception(stale, TimeoutError(), None).body == b'araneid'
+    must_revalidate = create_request(slot, 'https://github.com/must-revalidate')
+    await cache.process_request(must_revalidate, None)
+    assert cache.process_exception(must_revalidate, TimeoutError(), None) is None
+    cache.close()
+
+@pytest.mark.asyncio
+async def test_httpcache_revalidation_headers(tmp_path, slot):
+    include_headers = ['Accept', 'If-None-Match', 'If-Modified-Since']
+    cache = await create_cache(tmp_path, HTTPCACHE_POLICY='rfc9111', HTTPCACHE_HEADERS=include_headers)
+    request = create_request(slot, 'https://github.com/etag', headers={'Accept': 'text/html'})
+    await cache.process_request(request, None)
+    await cache.process_response(create_response(request, headers={'ETag': '"v1"', 'Cache-Control': 'max-age=0'}), request, None)
+    revalidate = create_request(slot, 'https://github.com/etag', headers={'Accept': 'text/html'})
+    fingerprint = revalidate.get_fingerprint(include_headers)
+    await cache.process_request(revalidate, None)
+    assert revalidate.headers == {'Accept': 'text/html', 'If-None-Match': '"v1"'}
+    # retried requests re-enter process_request without process_response, the cache key must not change
+    await cache.process_request(revalidate, None)
+    assert revalidate.meta[HttpCacheMiddleware.META_KEY][1] is not None and revalidate.headers['If-None-Match'] == '"v1"'
+    assert (await cache.process_response(create_response(revalidate, status=304, body=b''), revalidate, None)).body == b'araneid'
+    assert revalidate.headers == {'Accept': 'text/html'} and revalidate.get_fingerprint(include_headers) == fingerprint
+    failed = create_request(slot, 'https://github.com/etag', headers={'Accept': 'text/html'})
+    await cache.process_request(failed, None)
+    assert cache.process_exception(failed, TimeoutError(), None).body == b'araneid'
+    assert failed.headers == {'Accept': 'text/html'}
+    cache.close()
+
+def test_rfc9111_freshness_lifetime():
+    policy = RFC9111Policy()
+    now = 1700000000.0
+    def entry(**headers):
+        return CacheEntry('https://github.com', 200, headers, b'', time=now)
+    assert policy.freshness_lifetime(entry(**{'Cache-Control': 'max-age=60, s-maxage=120'})) == 120
+    assert policy.freshness_lifetime(entry(Date=formatdate(now, usegmt=True), Expires=formatdate(now+30, usegmt=True))) == 30
+    assert policy.freshness_lifetime(entry(Date=formatdate(now, usegmt=True), Expires='0')) == 0
+    assert policy.freshness_lifetime(entry(**{'Date': formatdate(now, usegmt=True), 'Last-Modified': formatdate(now-1000, usegmt=True)})) == 100
+    assert policy.is_fresh(entry(**{'Cache-Control': 'max-age=60', 'Age': '30'}), HttpRequest(url='https://github.com'), now+10)
+    assert not policy.is_fresh(entry(**{'Cache-Control': 'max-age=60', 'Age': '30'}), HttpRequest(url='https://github.com'), now+40)
+
+@pytest.mark.parametrize('storage', ['filesystem', 'sqlite'])
+@pytest.mark.asyncio
+async def test_httpcache_concurrent_revalidation(tmp_path, slot, storage):
+    cache = await create_cache(tmp_path, HTTPCACHE_STORAGE=storage, HTTPCACHE_POLICY='rfc9111')
+    requests = [create_request(slot, f'https://github.com/etag?num={num}') for num in range(200)]
+    for request in requests:
+        await cache.process_request(request, None)
+    await asyncio.gather(*[cache.process_response(create_response(request, headers={'ETag': '"v1"', 'Cache-Control': 'max-age=0'}), request, None) for request in requests])
+    revalidates = [create_request(slot, f'https://github.com/etag?num={num}') for num in range(200)]
+    # revalidation contexts are kept on the requests, however many are in flight
+    await asyncio.gather(*[cache.process_request(request, None) for request in revalidates])
+    assert all(request.meta[HttpCacheMiddleware.META_KEY][1] is not None for request in revalidates)
+    revalidated = await asyncio.gather(*[cache.process_response(create_response(request, status=304, body=b''), request, None) for request in revalidates])
+    assert all(response.status == 200 and response.body == b'araneid' for response in revalidated)
+    assert all(request.meta.get(HttpCacheMiddleware.META_KEY) is None for request in revalidates)
+    cache.close()
+    # uncommitted stores are committed on close
+    cache = await create_cache(tmp_path, HTTPCACHE_STORAGE=storage, HTTPCACHE_POLICY='rfc9111')
+    assert (await cache.process_request(create_request(slot, 'https://github.com/etag?num=199'), None)).meta[HttpCacheMiddleware.META_KEY][1] is not None
+    cache.close()
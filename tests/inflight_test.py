@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from araneid.core.inflight import InFlight, InFlightTasks
+
+
+async def timeout(coroutine, wait=1):
+    return await asyncio.wait_for(asyncio.ensure_future(coroutine), timeout=wait)
+
+@pytest.mark.asyncio
+async def test_inflight_count():
+    inflight = InFlight()
+    assert inflight.idle()
+    inflight.increment()
+    inflight.increment(2)
+    assert not inflight.idle() and inflight.count == 3
+    inflight.decrement(3)
+    assert inflight.idle()
+    with pytest.raises(AssertionError):
+        inflight.decrement()
+
+@pytest.mark.asyncio
+async def test_inflight_wait_idle():
+    inflight = InFlight()
+    await timeout(inflight.wait_idle())
+    inflight.increment()
+    with pytest.raises(asyncio.TimeoutError):
+        await timeout(inflight.wait_idle(), wait=0.1)
+    waiter = asyncio.ensure_future(inflight.wait_idle())
+    await asyncio.sleep(0)
+    inflight.decrement()
+    await timeout(waiter)
+
+@pytest.mark.asyncio
+async def test_inflight_attach_detach():
+    parent = InFlight()
+    first, second = InFlight(), InFlight(parent)
+    first.increment(2)
+    first.attach(parent)
+    second.increment()
+    assert parent.count == 3
+    first.decrement()
+    assert parent.count == 2
+    first.detach()
+    assert parent.count == 1
+    second.close()
+    assert parent.idle() and second.idle()
+    second.increment()
+    assert parent.idle() and second.idle()
+
+@pytest.mark.asyncio
+async def test_inflight_tasks():
+    tasks = InFlightTasks()
+    event = asyncio.Event()
+    running = [tasks.add(event.wait()) for _ in range(3)]
+    assert len(tasks) == 3 and running[0] in tasks
+    event.set()
+    await timeout(asyncio.gather(*running))
+    await asyncio.sleep(0)
+    assert len(tasks) == 0
+    async def spawn():
+        tasks.add(asyncio.sleep(0.01))
+    tasks.add(spawn())
+    await timeout(tasks.wait())
+    assert len(tasks) == 0
+    tasks.add(asyncio.sleep(1))
+    tasks.cancel()
+    await timeout(tasks.wait(return_exceptions=True))
+    assert len(tasks) == 0
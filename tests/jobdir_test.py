@@ -0,0 +1,146 @@
+import os
+import asyncio
+import pytest
+from types import SimpleNamespace
+from araneid.core.context import RequestContext
+from araneid.core.jobdir import JobDir
+from araneid.core.request import Meta
+from araneid.network.http import HttpRequest
+from araneid.spider import Spider, parser
+from araneid.spider.routermanager import RouterManager
+from araneid.spider.statsmanager import StatsManager
+
+
+class jobdir_spider(Spider):
+    name = 'jobdir_spider'
+
+    def start_requests(self):
+        pass
+
+    @parser(name='parse_job')
+    def parse(self, response):
+        pass
+
+
+def create_spider():
+    spider = Spider.create(jobdir_spider)
+    spider.stats = StatsManager.from_settings({})
+    routemanager = RouterManager.from_settings({})
+    for spider_parser in spider.get_parsers():
+        routemanager.add_parser_route(spider.name+'.'+spider_parser.name, spider_parser)
+    scraper = SimpleNamespace(__routemanager__=routemanager)
+    return spider, scraper
+
+def create_request(num, spider, scraper):
+    return HttpRequest(url=f'https://github.com/WALL-EEEEEEE?num={num}', callback=spider.parse, meta=Meta('num', num), context=RequestContext(spider.parse, spider, scraper))
+
+@pytest.mark.asyncio
+async def test_jobdir_resume(tmp_path):
+    settings = {'JOBDIR': str(tmp_path), 'JOBDIR_FLUSH_INTERVAL': 0.01}
+    spider, scraper = create_spider()
+    jobdir = await JobDir.create(settings)
+    requests = [create_request(num, spider, scraper) for num in range(3)]
+    for request in requests:
+        jobdir.record_request(request)
+    jobdir.complete_request(requests[0])
+    await asyncio.sleep(0.05)
+    # process killed without closing the job directory
+    resumed_spider, resumed_scraper = create_spider()
+    resumed_jobdir = await JobDir.create(settings)
+    assert resumed_jobdir.pending(resumed_spider) == 2
+    assert resumed_jobdir.seen(requests[0])
+    assert list(resumed_jobdir.seen_fingerprints()) == [requests[0].fingerprint]
+    resumed = list(resumed_jobdir.pending_requests(resumed_spider, resumed_scraper))
+    assert [request.url for request in resumed] == [request.url for request in requests[1:]]
+    for request in resumed:
+        assert request.meta['num'] in (1, 2)
+        assert request.callback is resumed_spider.parse
+        assert request.context.spider is resumed_spider and request.context.scraper is resumed_scraper
+        assert not request.is_completed() and not request.in_state(request.States.start)
+        resumed_jobdir.record_request(request)
+    assert resumed_jobdir.pending() == 2
+    resumed_jobdir.close()
+
+@pytest.mark.asyncio
+async def test_jobdir_duplicate_requests(tmp_path):
+    settings = {'JOBDIR': str(tmp_path)}
+    spider, scraper = create_spider()
+    jobdir = await JobDir.create(settings)
+    requests = [create_request(num, spider, scraper) for num in (0, 1, 0)]
+    # the job directory doesn't filter requests itself, duplicates are persisted as well
+    for request in requests:
+        jobdir.record_request(request)
+    assert jobdir.pending() == 3
+    jobdir.complete_request(requests[0])
+    jobdir.flush()
+    resumed_spider, resumed_scraper = create_spider()
+    resumed_jobdir = await JobDir.create(settings)
+    assert resumed_jobdir.pending() == 2
+    assert list(resumed_jobdir.seen_fingerprints()) == []
+    resumed = list(resumed_jobdir.pending_requests(resumed_spider, resumed_scraper))
+    assert [request.meta['num'] for request in resumed] == [0, 1]
+    for request in resumed:
+        resumed_jobdir.record_request(request)
+    assert resumed_jobdir.pending() == 2
+    resumed_jobdir.complete_request(resumed[0])
+    assert list(resumed_jobdir.seen_fingerprints()) == [requests[0].fingerprint]
+    resumed_jobdir.close()
+
+@pytest.mark.asyncio
+async def test_jobdir_flush(tmp_path):
+    settings = {'JOBDIR': str(tmp_path), 'JOBDIR_FLUSH_COUNT': 3, 'JOBDIR_FLUSH_INTERVAL': 60}
+    spider, scraper = create_spider()
+    jobdir = await JobDir.create(settings)
+    requests = [create_request(num, spider, scraper) for num in range(4)]
+    # 记录先写入缓冲区, 达到 JOBDIR_FLUSH_COUNT 条后写入文件
+    for request in requests[:2]:
+        jobdir.record_request(request)
+    assert os.path.getsize(jobdir.log_path) == 0
+    jobdir.record_request(requests[2])
+    log_size = os.path.getsize(jobdir.log_path)
+    assert log_size > 0
+    jobdir.record_request(requests[3])
+    assert os.path.getsize(jobdir.log_path) == log_size
+    jobdir.close()
+    assert (await JobDir.create(settings)).pending() == 4
+
+@pytest.mark.asyncio
+async def test_jobdir_compact(tmp_path):
+    settings = {'JOBDIR': str(tmp_path), 'JOBDIR_COMPACT_INTERVAL': 4}
+    spider, scraper = create_spider()
+    jobdir = await JobDir.create(settings)
+    jobdir.restore_stats(spider)
+    requests = [create_request(num, spider, scraper) for num in range(5)]
+    for request in requests:
+        jobdir.record_request(request)
+    spider.stats.set_value('downloaded', 2, spider=spider)
+    jobdir.flush()
+    log_size = os.path.getsize(jobdir.log_path)
+    jobdir.complete_request(requests[0])
+    jobdir.complete_request(requests[1])
+    assert os.path.getsize(jobdir.log_path) < log_size
+    assert jobdir.pending() == 3
+    resumed_spider, resumed_scraper = create_spider()
+    resumed_jobdir = await JobDir.create(settings)
+    resumed_jobdir.restore_stats(resumed_spider)
+    assert resumed_spider.stats.get_value('downloaded', spider=resumed_spider) == 2
+    assert [request.url for request in resumed_jobdir.pending_requests(resumed_spider, resumed_scraper)] == [request.url for request in requests[2:]]
+    assert all(resumed_jobdir.seen(request) for request in requests)
+    resumed_jobdir.close()
+
+@pytest.mark.asyncio
+async def test_jobdir_truncate_torn_record(tmp_path):
+    settings = {'JOBDIR': str(tmp_path)}
+    spider, scraper = create_spider()
+    jobdir = await JobDir.create(settings)
+    requests = [create_request(num, spider, scraper) for num in range(2)]
+    for request in requests:
+        jobdir.record_request(request)
+    jobdir.close()
+    with open(jobdir.log_path, 'ab') as log:
+        log.write(b'\x00\x00\x01\x00torn')
+    resumed_jobdir = await JobDir.create(settings)
+    assert resumed_jobdir.pending() == 2
+    resumed_jobdir.record_request(create_request(2, spider, scraper))
+    resumed_jobdir.close()
+    assert (await JobDir.create(settings)).pending() == 3
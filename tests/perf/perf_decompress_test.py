@@ -0,0 +1,82 @@
+import os
+import gzip
+import logging
+import pytest
+import asyncio
+from aiohttp import web
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import Http
+from araneid.network.http import HttpRequest
+
+
+logger = logging.getLogger()
+
+
+test_decompress_group = {
+    "request=200, concurrency=10": pytest.param(*(200, 10), marks=[]), #(request_count, concurrency)
+}
+
+# 约1M的gzip压缩内容, 解码后约2M
+COMPRESSED = gzip.compress(os.urandom(1024*1024).hex().encode(), compresslevel=1)
+
+async def start_server():
+    async def compressed(request):
+        return web.Response(body=COMPRESSED, content_type='text/plain', charset='utf-8', headers={'Content-Encoding': 'gzip'})
+    async def plain(request):
+        return web.Response(text='araneid')
+    app = web.Application()
+    app.router.add_get('/compressed', compressed)
+    app.router.add_get('/plain', plain)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+async def monitor(lags, interval=0.005):
+    loop = asyncio.get_event_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+async def crawl(settings, url, request_count, concurrency):
+    downloader = await Http.create(settings=settings)
+    slot = await Slot.create({})
+    queue = asyncio.Queue()
+    for num in range(request_count):
+        # 混合压缩的大请求响应和小请求响应
+        queue.put_nowait(f'{url}/compressed?num={num}' if num % 2 else f'{url}/plain?num={num}')
+    async def worker():
+        while not queue.empty():
+            request = HttpRequest(url=queue.get_nowait())
+            request.bind(slot)
+            channel = await downloader.download(request)
+            async for _ in channel.read():
+                pass
+    lags = []
+    monitoring = asyncio.ensure_future(monitor(lags))
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    monitoring.cancel()
+    await downloader.close()
+    lags.sort()
+    return lags[int(len(lags)*0.99)], lags[-1]
+
+
+@pytest.mark.parametrize("request_count, concurrency", list(test_decompress_group.values()), ids=list(test_decompress_group.keys()))
+@pytest.mark.asyncio
+async def test_decompress_loop_lag(request_count, concurrency, perf_metrics_collector):
+    set_signalmanager(await SignalManager.create())
+    runner, url = await start_server()
+    try:
+        # 预热会话和连接
+        await crawl({}, url, concurrency, concurrency)
+        inline_p99, inline_max = await crawl({'HTTP_DECOMPRESS_THRESHOLD': 0}, url, request_count, concurrency)
+        offload_p99, offload_max = await crawl({}, url, request_count, concurrency)
+    finally:
+        await runner.cleanup()
+    perf_metrics_collector.collect('decompress', {'requests': request_count, 'inline p99 lag(ms)': inline_p99*1000, 'inline max lag(ms)': inline_max*1000,
+                                                  'executor p99 lag(ms)': offload_p99*1000, 'executor max lag(ms)': offload_max*1000})
+    logger.info(f'Event loop lag while decompressing: p99 {inline_p99*1000:.2f}ms / max {inline_max*1000:.2f}ms inline, p99 {offload_p99*1000:.2f}ms / max {offload_max*1000:.2f}ms in executor')
+    pytest.assume(offload_p99 < inline_p99, f'Decompression in executor does not reduce event loop lag (p99 {offload_p99*1000:.2f}ms vs {inline_p99*1000:.2f}ms).')
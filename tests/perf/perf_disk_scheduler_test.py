@@ -0,0 +1,56 @@
+import logging
+import pytest
+import asyncio
+import time
+import resource
+from araneid.core.schedulemanager import ScheduleManager
+from araneid.network.http import HttpRequest
+
+
+logger = logging.getLogger()
+
+
+test_scheduler_memory_group = {
+    "request=500000, scheduler=DefaultScheduler": pytest.param(*('DefaultScheduler', 500000, {}, None), marks=[]), #(scheduler, request_count, settings, mem_limit(bytes per request))
+    "request=500000, scheduler=DiskScheduler": pytest.param(*('DiskScheduler', 500000, {'SCHEDULER_MEMORY_SIZE': 10000}, 64), marks=[]),
+    "request=1000000, scheduler=DiskScheduler": pytest.param(*('DiskScheduler', 1000000, {'SCHEDULER_MEMORY_SIZE': 10000}, 32), marks=[]),
+}
+
+def resident_memory():
+    # 进程的常驻内存峰值(字节)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@pytest.mark.parametrize("scheduler, request_count, settings, mem_limit", list(test_scheduler_memory_group.values()), ids=list(test_scheduler_memory_group.keys()))
+@pytest.mark.asyncio
+async def test_scheduler_frontier_memory(scheduler, request_count, settings, mem_limit, perf_metrics_collector):
+    manager = await ScheduleManager.create(settings={'SCHEDULERS': [scheduler], **settings})
+    consumable = asyncio.Event()
+    dispatched = 0
+    async def receiver(request):
+        nonlocal dispatched
+        # 下载并发饱和, 调度出的请求积压在调度器中
+        await consumable.wait()
+        dispatched += 1
+    manager.add_channel_receiver(receiver)
+    running = asyncio.ensure_future(manager.start())
+    start_memory = resident_memory()
+    start = time.perf_counter()
+    for num in range(request_count):
+        await manager.add_request(HttpRequest(f'http://mock.spider.com?num={num}'))
+        if num % 10 == 0:
+           await asyncio.sleep(0)
+    push_elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.1)
+    per_request = (resident_memory() - start_memory) / request_count
+    start = time.perf_counter()
+    consumable.set()
+    await manager.wait_idle()
+    pop_elapsed = time.perf_counter() - start
+    await manager.close()
+    await running
+    perf_metrics_collector.collect('scheduler_frontier', {'scheduler': scheduler, 'requests': request_count, 'resident bytes/request': per_request, 'push/sec': request_count/push_elapsed, 'pop/sec': request_count/pop_elapsed})
+    logger.info(f'{scheduler}: {per_request:.2f} resident bytes per queued request, {request_count/push_elapsed:.2f} push/sec, {request_count/pop_elapsed:.2f} pop/sec ({request_count} requests)')
+    pytest.assume(dispatched == request_count, f'{dispatched} of {request_count} requests dispatched.')
+    if mem_limit is not None:
+       pytest.assume(per_request <= mem_limit, f'{per_request:.2f} resident bytes per queued request larger than {mem_limit} bytes.')
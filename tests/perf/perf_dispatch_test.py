@@ -0,0 +1,62 @@
+import logging
+import pytest
+import asyncio
+import re
+import time
+from statistics import mean
+from araneid.runner import AsyncRunner
+from araneid.setting import settings as settings_loader
+from araneid.core import signal
+from .spiders.perf_http_spider import http_spider
+
+
+logger = logging.getLogger()
+
+
+test_dispatch_hop_latency_group = {
+    "request=10000, dispatch=channel": pytest.param(*(10000, {'ENGINE_DISPATCH': 'channel'}, 300), marks=[]), #(request_count, settings, runtime)
+    "request=10000, dispatch=direct": pytest.param(*(10000, {'ENGINE_DISPATCH': 'direct'}, 300), marks=[]),
+}
+
+# (hop name, signal at which the hop starts, signal at which the hop ends)
+HOPS = [
+    ('slot', signal.request_reached_slot, signal.request_left_slot),
+    ('schedule', signal.request_left_slot, signal.request_scheduled),
+    ('download', signal.request_scheduled, signal.request_reached_downloader),
+    ('response', signal.response_downloaded, signal.response_received),
+]
+
+async def timeout(coroutine, wait=30):
+    return await asyncio.wait_for(asyncio.ensure_future(coroutine), timeout=wait)
+
+def timestamp_handler(timestamps):
+    async def handler(sig, source, obj):
+        request = getattr(obj, 'request', obj)
+        timestamps.setdefault(id(request), {})[sig] = time.perf_counter()
+    return handler
+
+
+@pytest.mark.parametrize("request_count, settings, runtime", list(test_dispatch_hop_latency_group.values()), ids=list(test_dispatch_hop_latency_group.keys()))
+@pytest.mark.asyncio
+async def test_dispatch_hop_latency(request_count, settings, runtime, aioresponse, perf_metrics_collector):
+    mock_url = 'http://mock.spider.com'
+    mock_url_regex = re.compile('http:\/\/mock.spider.com.*')
+    spider = http_spider()
+    spider.url = mock_url
+    spider.count = request_count
+    aioresponse.get(mock_url_regex, status=200, payload={'code': 200, 'status':'Success'}, repeat=True)
+    runner = await AsyncRunner.create(settings={**settings_loader._settings, **settings})
+    timestamps = {}
+    for sig in { sig for _, start, end in HOPS for sig in (start, end) }:
+        signal.register(sig, timestamp_handler(timestamps))
+    runner.add_spider(spider)
+    start = time.perf_counter()
+    await timeout(runner.start(), wait=runtime)
+    elapsed = time.perf_counter() - start
+    metrics = {'requests': request_count, 'completed': spider.completed, 'elapsed(s)': elapsed}
+    for hop, hop_start, hop_end in HOPS:
+        latencies = [ ts[hop_end] - ts[hop_start] for ts in timestamps.values() if hop_start in ts and hop_end in ts ]
+        metrics[f'{hop}(ms)'] = mean(latencies)*1000 if latencies else None
+    perf_metrics_collector.collect('dispatch', metrics)
+    logger.info(f'Hop latency ({settings}): {metrics}')
+    assert spider.completed == request_count
@@ -0,0 +1,40 @@
+import logging
+import pytest
+import time
+import tracemalloc
+from araneid.network.http import HttpRequest
+from araneid.dupefilter.exact import ExactDupeFilter
+from araneid.dupefilter.bloom import BloomDupeFilter
+
+
+logger = logging.getLogger()
+
+
+test_dupefilter_memory_group = {
+    "request=1000000, dupefilter=ExactDupeFilter": pytest.param(*(ExactDupeFilter, 1000000, {}, 32), marks=[]), #(dupefilter, request_count, settings, mem_limit(bytes per request))
+    "request=1000000, dupefilter=BloomDupeFilter": pytest.param(*(BloomDupeFilter, 1000000, {'DUPEFILTER_BLOOM_CAPACITY': 1000000, 'DUPEFILTER_BLOOM_ERROR_RATE': 0.001}, 4), marks=[]),
+}
+
+
+@pytest.mark.parametrize("dupefilter_cls, request_count, settings, mem_limit", list(test_dupefilter_memory_group.values()), ids=list(test_dupefilter_memory_group.keys()))
+@pytest.mark.asyncio
+async def test_dupefilter_memory(dupefilter_cls, request_count, settings, mem_limit, perf_metrics_collector):
+    fingerprints = [HttpRequest(f'http://mock.spider.com?num={num}').fingerprint for num in range(request_count)]
+    tracemalloc.start()
+    try:
+        start_memory, _ = tracemalloc.get_traced_memory()
+        dupefilter = await dupefilter_cls.create(settings=settings)
+        start = time.perf_counter()
+        for fingerprint in fingerprints:
+            dupefilter.add(fingerprint)
+        elapsed = time.perf_counter() - start
+        end_memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    duplicated = sum(1 for fingerprint in fingerprints[:10000] if dupefilter.add(fingerprint))
+    dupefilter.close()
+    per_request = (end_memory - start_memory) / request_count
+    perf_metrics_collector.collect('dupefilter_memory', {'dupefilter': dupefilter_cls.__name__, 'requests': request_count, 'bytes/request': per_request, 'MB/million': per_request, 'add/sec': request_count/elapsed, 'filtered': len(dupefilter)})
+    logger.info(f'{dupefilter_cls.__name__}: {per_request:.2f} bytes per request ({per_request:.2f} MB per million requests), {request_count/elapsed:.2f} add/sec, {request_count-len(dupefilter)} false positives ({request_count} requests)')
+    assert duplicated == 0
+    pytest.assume(per_request <= mem_limit, f'{per_request:.2f} bytes per request larger than {mem_limit} bytes.')
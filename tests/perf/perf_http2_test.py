@@ -0,0 +1,80 @@
+import logging
+import pytest
+import asyncio
+import time
+from aiohttp import web
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import Http
+from araneid.downloader.aioh2 import Http2
+from araneid.network.http import HttpRequest
+from ..http2_downloader_test import start_h2_server
+
+
+logger = logging.getLogger()
+
+
+test_http2_group = {
+    "request=2000, concurrency=200": pytest.param(*(2000, 200), marks=[]), #(request_count, concurrency)
+}
+
+# 模拟服务端处理延迟
+DELAY = 0.02
+
+async def handle(method, path, headers, body):
+    await asyncio.sleep(DELAY)
+    return 200, [('content-type', 'text/plain; charset=utf-8')], b'araneid' * 1024
+
+async def start_http1_server(stats):
+    async def sleep(request):
+        await asyncio.sleep(DELAY)
+        return web.Response(body=b'araneid' * 1024, content_type='text/plain', charset='utf-8')
+    async def on_connection(request, response):
+        stats['connections'].add(request.transport)
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', sleep)
+    app.on_response_prepare.append(on_connection)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+async def crawl(downloader, url, request_count, concurrency):
+    slot = await Slot.create({})
+    queue = asyncio.Queue()
+    for num in range(request_count):
+        queue.put_nowait(num)
+    async def worker():
+        while not queue.empty():
+            request = HttpRequest(url=f'{url}/?num={queue.get_nowait()}')
+            request.bind(slot)
+            channel = await downloader.download(request)
+            async for _ in channel.read():
+                pass
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    await downloader.close()
+    return request_count / elapsed
+
+
+@pytest.mark.parametrize("request_count, concurrency", list(test_http2_group.values()), ids=list(test_http2_group.keys()))
+@pytest.mark.asyncio
+async def test_http2_throughput(request_count, concurrency, perf_metrics_collector):
+    set_signalmanager(await SignalManager.create())
+    http1_stats = {'connections': set()}
+    runner, http1_url = await start_http1_server(http1_stats)
+    server, http2_url, http2_stats = await start_h2_server(handler=handle, max_streams=concurrency)
+    try:
+        http1 = await crawl(await Http.create(settings={}), http1_url, request_count, concurrency)
+        http2 = await crawl(await Http2.create(settings={'HTTP2_PRIOR_KNOWLEDGE': True}), http2_url, request_count, concurrency)
+    finally:
+        server.close()
+        await runner.cleanup()
+    http1_connections, http2_connections = len(http1_stats['connections']), http2_stats['connections']
+    perf_metrics_collector.collect('http2', {'requests': request_count, 'Http(requests/s)': http1, 'Http connections': http1_connections,
+                                             'Http2(requests/s)': http2, 'Http2 connections': http2_connections})
+    logger.info(f'Throughput: Http {http1:.1f} requests/s over {http1_connections} connections, Http2 {http2:.1f} requests/s over {http2_connections} connections ({request_count} requests)')
+    pytest.assume(http2_connections == 1, f'Http2 opens {http2_connections} connections to a single origin.')
+    pytest.assume(http2 > http1, f'Http2 is slower than Http ({http2:.1f} requests/s vs {http1:.1f} requests/s).')
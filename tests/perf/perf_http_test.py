@@ -2,6 +2,9 @@ import logging
 import pytest
 import asyncio
 import re
+import time
+from araneid.runner import AsyncRunner
+from araneid.setting import settings as settings_loader
 from .spiders.perf_http_spider import http_spider
 
 
@@ -31,4 +34,26 @@ async def test_request_process(request_time,runtime, aioresponse, async_runner):
     spider.count = request_time
     aioresponse.get(mock_url_regex, status=200, payload={'code': 200, 'status':'Success'}, repeat=True)
     async_runner.add_spider(spider)
-    await timeout(async_runner.start(), wait=runtime)
\ No newline at end of file
+    await timeout(async_runner.start(), wait=runtime)
+
+test_request_throughput_group= {
+    "request=10000, batch=1": pytest.param(*(10000, {'CHANNEL_BATCH_SIZE': 1}, 120), marks=[]), #(request_count, settings, runtime)
+    "request=10000, batch=100": pytest.param(*(10000, {'CHANNEL_BATCH_SIZE': 100}, 120), marks=[]),
+}
+
+@pytest.mark.parametrize("request_count, settings, runtime", list(test_request_throughput_group.values()), ids=list(test_request_throughput_group.keys()))
+@pytest.mark.asyncio
+async def test_request_throughput(request_count, settings, runtime, aioresponse, perf_metrics_collector):
+    mock_url = 'http://mock.spider.com'
+    mock_url_regex = re.compile('http:\/\/mock.spider.com.*')
+    spider = http_spider()
+    spider.url = mock_url
+    spider.count = request_count
+    aioresponse.get(mock_url_regex, status=200, payload={'code': 200, 'status':'Success'}, repeat=True)
+    runner = await AsyncRunner.create(settings={**settings_loader._settings, **settings})
+    runner.add_spider(spider)
+    start = time.perf_counter()
+    await timeout(runner.start(), wait=runtime)
+    elapsed = time.perf_counter() - start
+    perf_metrics_collector.collect('throughput', {'requests': request_count, 'elapsed(s)': elapsed, 'requests/sec': request_count/elapsed})
+    logger.info(f'{request_count} requests in {elapsed:.2f}s ({request_count/elapsed:.2f} requests/sec, settings: {settings})')
@@ -0,0 +1,68 @@
+import logging
+import pytest
+import asyncio
+import time
+from aiohttp import web
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import Http
+from araneid.extension.downloadermiddleware.httpcache import HttpCacheMiddleware
+from araneid.network.http import HttpRequest, HttpResponse
+
+
+logger = logging.getLogger()
+
+
+test_httpcache_group = {
+    "request=1000, storage=filesystem": pytest.param(*(1000, 'filesystem'), marks=[]), #(request_count, storage)
+    "request=1000, storage=sqlite": pytest.param(*(1000, 'sqlite'), marks=[]),
+}
+
+async def start_server():
+    async def handle(request):
+        # 模拟服务器的处理时间
+        await asyncio.sleep(0.001)
+        return web.Response(text='araneid '*1024)
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+async def crawl(cache, downloader, url, request_count):
+    slot = await Slot.create({})
+    hits = 0
+    start = time.perf_counter()
+    for num in range(request_count):
+        request = HttpRequest(url=f'{url}/?num={num}')
+        request.bind(slot)
+        result = await cache.process_request(request, None)
+        if isinstance(result, HttpResponse):
+           hits += 1
+           continue
+        channel = await downloader.download(request)
+        async for response in channel.read():
+            await cache.process_response(response, request, None)
+    return time.perf_counter() - start, hits
+
+
+@pytest.mark.parametrize("request_count, storage", list(test_httpcache_group.values()), ids=list(test_httpcache_group.keys()))
+@pytest.mark.asyncio
+async def test_httpcache_hit(request_count, storage, tmp_path, perf_metrics_collector):
+    set_signalmanager(await SignalManager.create())
+    runner, url = await start_server()
+    downloader = await Http.create(settings={})
+    cache = await HttpCacheMiddleware.create({'HTTPCACHE_ENABLED': True, 'HTTPCACHE_DIR': str(tmp_path), 'HTTPCACHE_STORAGE': storage})
+    try:
+        miss_elapsed, _ = await crawl(cache, downloader, url, request_count)
+        hit_elapsed, hits = await crawl(cache, downloader, url, request_count)
+    finally:
+        cache.close()
+        await downloader.close()
+        await runner.cleanup()
+    perf_metrics_collector.collect('httpcache', {'requests': request_count, 'storage': storage, 'miss(requests/sec)': request_count/miss_elapsed, 'hit(requests/sec)': request_count/hit_elapsed})
+    logger.info(f'HttpCache({storage}): {request_count/miss_elapsed:.2f} requests/sec downloaded, {request_count/hit_elapsed:.2f} requests/sec served from cache ({request_count} requests)')
+    pytest.assume(hits == request_count, f'Only {hits} of {request_count} requests hit the cache.')
+    pytest.assume(hit_elapsed < miss_elapsed, f'Cache hits ({hit_elapsed:.4f}s) are not faster than downloads ({miss_elapsed:.4f}s).')
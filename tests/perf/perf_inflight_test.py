@@ -0,0 +1,48 @@
+import logging
+import pytest
+import asyncio
+import time
+from araneid.core.inflight import InFlightTasks
+
+
+logger = logging.getLogger()
+
+
+test_inflight_tasks_group = {
+    "pipelines=50000": pytest.param(*(50000, 5000, 2), marks=[]), #(concurrent_pipelines, list_pipelines, runtime(sec))
+}
+
+async def track_list(pipelines, event):
+    running = []
+    for _ in range(pipelines):
+        running.append(asyncio.ensure_future(event.wait()))
+        running = [task for task in running if not task.done()]
+    return running
+
+async def track_set(pipelines, event):
+    running = InFlightTasks()
+    for _ in range(pipelines):
+        running.add(event.wait())
+    return running
+
+async def measure(track, pipelines):
+    event = asyncio.Event()
+    start = time.perf_counter()
+    running = await track(pipelines, event)
+    elapsed = time.perf_counter() - start
+    assert len(running) == pipelines
+    event.set()
+    await asyncio.gather(*running)
+    return elapsed
+
+
+@pytest.mark.parametrize("pipelines, list_pipelines, runtime", list(test_inflight_tasks_group.values()), ids=list(test_inflight_tasks_group.keys()))
+@pytest.mark.asyncio
+async def test_inflight_tasks_add(pipelines, list_pipelines, runtime, perf_metrics_collector):
+    # the list rebuild is O(n²), so it is measured with fewer pipelines and scaled quadratically
+    set_elapsed = await measure(track_set, pipelines)
+    list_elapsed = await measure(track_list, list_pipelines) * (pipelines / list_pipelines) ** 2
+    perf_metrics_collector.collect('inflight_tasks', {'pipelines': pipelines, 'set(sec)': set_elapsed, 'list(sec, estimated)': list_elapsed})
+    logger.info(f'In-flight tasks: {pipelines} concurrent pipelines tracked in {set_elapsed:.3f}s with InFlightTasks, about {list_elapsed:.3f}s with list rebuild')
+    pytest.assume(set_elapsed <= runtime, f'Tracking {pipelines} pipelines took {set_elapsed:.3f}s, longer than {runtime}s.')
+    pytest.assume(set_elapsed < list_elapsed, f'InFlightTasks ({set_elapsed:.3f}s) is not faster than list rebuild ({list_elapsed:.3f}s).')
@@ -0,0 +1,68 @@
+import logging
+import pytest
+import asyncio
+import time
+from aiohttp import web
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import Http
+from araneid.network.http import HttpRequest
+
+
+logger = logging.getLogger()
+
+
+test_proxy_pool_group = {
+    "request=2000, concurrency=50": pytest.param(*(2000, 50), marks=[]), #(request_count, concurrency)
+}
+
+async def start_proxy():
+    """代理替身, 直接响应收到的(绝对地址形式的)请求"""
+    connections = set()
+    async def handle(request):
+        connections.add(request.transport.get_extra_info('peername'))
+        return web.Response(text='ok')
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}', connections
+
+async def download(settings, proxy, request_count, concurrency):
+    downloader = await Http.create(settings=settings)
+    slot = await Slot.create({})
+    semaphore = asyncio.Semaphore(concurrency)
+    async def fetch(num):
+        async with semaphore:
+            request = HttpRequest(url=f'http://mock.spider.com/?num={num}', proxy={'http': proxy})
+            request.bind(slot)
+            channel = await downloader.download(request)
+            async for _ in channel.read():
+                pass
+    start = time.perf_counter()
+    await asyncio.gather(*[fetch(num) for num in range(request_count)])
+    elapsed = time.perf_counter() - start
+    await downloader.close()
+    return elapsed
+
+
+@pytest.mark.parametrize("request_count, concurrency", list(test_proxy_pool_group.values()), ids=list(test_proxy_pool_group.keys()))
+@pytest.mark.asyncio
+async def test_proxy_pool_throughput(request_count, concurrency, perf_metrics_collector):
+    set_signalmanager(await SignalManager.create())
+    runner, proxy, connections = await start_proxy()
+    try:
+        results = {}
+        for name, settings in (('pooled', {}), ('unpooled', {'HTTP_PROXY_POOL_SIZE': 0})):
+            connections.clear()
+            elapsed = await download(settings, proxy, request_count, concurrency)
+            results[name] = (request_count/elapsed, len(connections))
+    finally:
+        await runner.cleanup()
+    perf_metrics_collector.collect('proxy_pool', {'requests': request_count, 'pooled(requests/sec)': results['pooled'][0], 'unpooled(requests/sec)': results['unpooled'][0], 'pooled(connections)': results['pooled'][1], 'unpooled(connections)': results['unpooled'][1]})
+    logger.info(f'Proxy session pool: {results["pooled"][0]:.2f} requests/sec over {results["pooled"][1]} connections pooled, {results["unpooled"][0]:.2f} requests/sec over {results["unpooled"][1]} connections unpooled ({request_count} requests)')
+    pytest.assume(results['pooled'][1] <= concurrency, f'Pooled sessions opened {results["pooled"][1]} proxy connections, more than {concurrency}.')
+    pytest.assume(results['pooled'][0] > results['unpooled'][0], f'Pooled sessions ({results["pooled"][0]:.2f} requests/sec) are not faster than unpooled sessions ({results["unpooled"][0]:.2f} requests/sec).')
@@ -0,0 +1,79 @@
+import logging
+import pytest
+import asyncio
+import time
+from aiohttp import web
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import Http
+from araneid.downloader.replay import Replay
+from araneid.extension.downloadermiddleware.record import RecordMiddleware
+from araneid.network.http import HttpRequest
+
+
+logger = logging.getLogger()
+
+
+test_replay_group = {
+    "request=2000, concurrency=100": pytest.param(*(2000, 100), marks=[]), #(request_count, concurrency)
+}
+
+# 模拟服务端处理延迟
+DELAY = 0.02
+
+async def start_server():
+    async def sleep(request):
+        await asyncio.sleep(DELAY)
+        return web.Response(body=b'araneid' * 1024 * int(request.query.get('size', 1)), content_type='text/plain', charset='utf-8')
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', sleep)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+async def crawl(downloader, url, request_count, concurrency, recorder=None):
+    slot = await Slot.create({})
+    queue = asyncio.Queue()
+    for num in range(request_count):
+        queue.put_nowait(num)
+    digests = {}
+    async def worker():
+        while not queue.empty():
+            num = queue.get_nowait()
+            request = HttpRequest(url=f'{url}/?num={num}&size={num % 16 + 1}')
+            request.bind(slot)
+            if recorder is not None:
+               recorder.process_request(request, None)
+            channel = await downloader.download(request)
+            async for response in channel.read():
+                if recorder is not None:
+                   await recorder.process_response(response, request, None)
+                digests[num] = (response.status, hash(response.body))
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    await downloader.close()
+    return request_count / elapsed, digests
+
+
+@pytest.mark.parametrize("request_count, concurrency", list(test_replay_group.values()), ids=list(test_replay_group.keys()))
+@pytest.mark.asyncio
+async def test_replay_throughput(request_count, concurrency, tmp_path, perf_metrics_collector):
+    set_signalmanager(await SignalManager.create())
+    runner, url = await start_server()
+    settings = {'REPLAY_RECORD': True, 'REPLAY_ARCHIVE': str(tmp_path)}
+    try:
+        recorder = await RecordMiddleware.create(settings)
+        live, recorded = await crawl(await Http.create(settings={}), url, request_count, concurrency, recorder=recorder)
+        recorder.close()
+    finally:
+        await runner.cleanup()
+    # 回放时服务端已经关闭
+    replay, replayed = await crawl(await Replay.create(settings), url, request_count, concurrency)
+    _, again = await crawl(await Replay.create({**settings, 'DOWNLOAD_BODY': 'memoryview'}), url, request_count, concurrency)
+    perf_metrics_collector.collect('replay', {'requests': request_count, 'Http(requests/s)': live, 'Replay(requests/s)': replay})
+    logger.info(f'Throughput: Http {live:.1f} requests/s, Replay {replay:.1f} requests/s ({request_count} requests)')
+    pytest.assume(replayed == recorded and again == recorded, 'Replayed responses differ from the recorded responses.')
+    pytest.assume(replay > live, f'Replay is slower than Http ({replay:.1f} requests/s vs {live:.1f} requests/s).')
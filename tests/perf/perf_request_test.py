@@ -0,0 +1,41 @@
+import logging
+import pytest
+import asyncio
+import tracemalloc
+from araneid.core.stream import Stream
+from araneid.core.context import RequestContext
+from araneid.network.http import HttpRequest
+
+
+logger = logging.getLogger()
+
+
+test_request_memory_group = {
+    "request=100000": pytest.param(*(100000, 1024), marks=[]), #(request_count, mem_limit(bytes per request))
+    "request=1000000": pytest.param(*(1000000, 1024), marks=[]),
+}
+
+def parse(response):
+    pass
+
+
+@pytest.mark.parametrize("request_count, mem_limit", list(test_request_memory_group.values()), ids=list(test_request_memory_group.keys()))
+@pytest.mark.asyncio
+async def test_request_memory(request_count, mem_limit, perf_metrics_collector):
+    channel = await Stream.create(name='spider_request', confirm_ack=True)
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for num in range(request_count):
+            request = HttpRequest(f'http://mock.spider.com?num={num}', callback=parse)
+            request.context = RequestContext()
+            request.set_state(request.States.slot)
+            await channel.write(request)
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # the url string is accounted too, as it is owned by the queued request
+    per_request = (end - start) / request_count
+    perf_metrics_collector.collect('request_memory', {'requests': request_count, 'bytes/request': per_request})
+    logger.info(f'{per_request:.2f} bytes per queued HttpRequest ({request_count} requests)')
+    pytest.assume(per_request <= mem_limit, f'{per_request:.2f} bytes per queued HttpRequest larger than {mem_limit} bytes.')
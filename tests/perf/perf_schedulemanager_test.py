@@ -0,0 +1,62 @@
+import logging
+import pytest
+import time
+from collections import defaultdict
+from araneid.core import plugin as plugins
+from araneid.core.schedulemanager import ScheduleManager, request_host
+from araneid.network.http import HttpRequest
+from araneid.scheduler.default import DefaultScheduler
+
+
+logger = logging.getLogger()
+
+
+class HostScheduler0(DefaultScheduler):
+    pass
+
+class HostScheduler1(DefaultScheduler):
+    pass
+
+class HostScheduler2(DefaultScheduler):
+    pass
+
+class HostScheduler3(DefaultScheduler):
+    pass
+
+
+test_schedulemanager_select_group = {
+    "host=10000, scheduler=4, selector=hash": pytest.param(*('hash', 10000, 10), marks=[]), #(selector, host_count, request_per_host)
+    "host=10000, scheduler=4, selector=random": pytest.param(*('random', 10000, 10), marks=[]),
+}
+
+
+@pytest.mark.parametrize("selector, host_count, request_per_host", list(test_schedulemanager_select_group.values()), ids=list(test_schedulemanager_select_group.keys()))
+@pytest.mark.asyncio
+async def test_schedulemanager_select(selector, host_count, request_per_host, perf_metrics_collector):
+    scheduler_classes = [HostScheduler0, HostScheduler1, HostScheduler2, HostScheduler3]
+    for scheduler_cls in scheduler_classes:
+        plugins.register(plugins.PluginType.SCHEDULER, scheduler_cls)
+    try:
+        manager = await ScheduleManager.create(settings={'SCHEDULERS': [scheduler_cls.__name__ for scheduler_cls in scheduler_classes], 'SCHEDULER_SELECTOR': selector})
+    finally:
+        plugins.clear()
+    requests = [HttpRequest(f'http://host{num % host_count}.mock.spider.com/?num={num}') for num in range(host_count * request_per_host)]
+    start = time.perf_counter()
+    for request in requests:
+        await manager.add_request(request)
+    elapsed = time.perf_counter() - start
+    owners = defaultdict(set)
+    loads = defaultdict(int)
+    for request in requests:
+        scheduler = manager.__select__(request)
+        owners[request_host(request)].add(id(scheduler))
+        loads[id(scheduler)] += 1
+    await manager.close()
+    request_count = len(requests)
+    schedulers_per_host = sum(len(scheduler_ids) for scheduler_ids in owners.values()) / host_count
+    imbalance = max(loads.values()) / (request_count / len(scheduler_classes))
+    perf_metrics_collector.collect('schedulemanager_select', {'selector': selector, 'hosts': host_count, 'requests': request_count, 'add/sec': request_count/elapsed, 'schedulers/host': schedulers_per_host, 'max load/mean load': imbalance})
+    logger.info(f'{selector}: {request_count/elapsed:.2f} add/sec, {schedulers_per_host:.2f} schedulers per host, max load {imbalance:.3f} of mean ({host_count} hosts, {request_count} requests)')
+    if selector == 'hash':
+       assert schedulers_per_host == 1
+       pytest.assume(imbalance <= 1.15, f'max scheduler load {imbalance:.3f} of mean larger than 1.15.')
@@ -0,0 +1,37 @@
+import logging
+import pytest
+import asyncio
+import time
+from random import randint
+from araneid.network.http import HttpRequest
+from araneid.scheduler.default import DefaultScheduler
+from araneid.scheduler.priority import PriorityScheduler
+from araneid.scheduler.disk import DiskScheduler
+
+
+logger = logging.getLogger()
+
+
+test_scheduler_push_pop_group = {
+    "request=1000000, scheduler=DefaultScheduler": pytest.param(*(DefaultScheduler, 1000000, {}), marks=[]), #(scheduler, request_count, settings)
+    "request=1000000, scheduler=PriorityScheduler": pytest.param(*(PriorityScheduler, 1000000, {'SCHEDULERS': ['PriorityScheduler']}), marks=[]),
+    "request=1000000, scheduler=DiskScheduler": pytest.param(*(DiskScheduler, 1000000, {'SCHEDULERS': ['DiskScheduler']}), marks=[]),
+}
+
+
+@pytest.mark.parametrize("scheduler_cls, request_count, settings", list(test_scheduler_push_pop_group.values()), ids=list(test_scheduler_push_pop_group.keys()))
+@pytest.mark.asyncio
+async def test_scheduler_push_pop(scheduler_cls, request_count, settings, perf_metrics_collector):
+    scheduler = await scheduler_cls.create(settings=settings)
+    requests = [ HttpRequest(f'http://mock.spider.com?num={num}', priority=randint(0, 10)) for num in range(request_count) ]
+    start = time.perf_counter()
+    for request in requests:
+        await scheduler.add_request(request)
+    push_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(request_count):
+        await scheduler.get_request()
+    pop_elapsed = time.perf_counter() - start
+    await scheduler.close()
+    perf_metrics_collector.collect('scheduler', {'scheduler': scheduler_cls.__name__, 'requests': request_count, 'push/sec': request_count/push_elapsed, 'pop/sec': request_count/pop_elapsed})
+    logger.info(f'{scheduler_cls.__name__}: {request_count/push_elapsed:.2f} push/sec, {request_count/pop_elapsed:.2f} pop/sec ({request_count} requests)')
@@ -0,0 +1,91 @@
+import logging
+import pytest
+import asyncio
+import re
+import os
+import psutil
+import time
+import tracemalloc
+from araneid.runner import AsyncRunner
+from araneid.setting import settings as settings_loader
+from araneid.core.stream import DelayStream
+from araneid.network.http import HttpRequest
+from .spiders.perf_http_spider import http_spider
+
+
+logger = logging.getLogger()
+
+
+
+test_stream_backpressure_group = {
+    "request=1000000, unbounded": pytest.param(*(1000000, {}, None, 1800), marks=[]), #(request_count, settings, mem_limit(mb), runtime)
+    "request=1000000, bounded": pytest.param(*(1000000, {'STREAM_MAXSIZE': 1000, 'MAX_DOWNLOADER_PROCESSES': 100}, 200, 1800), marks=[]),
+}
+
+async def timeout(coroutine, wait=30):
+    return await asyncio.wait_for(asyncio.ensure_future(coroutine), timeout=wait)
+
+async def sample_memory(peak, interval=0.5):
+    proc = psutil.Process(os.getpid())
+    while True:
+        peak['rss'] = max(peak.get('rss', 0), proc.memory_info().rss/1024/1024)
+        await asyncio.sleep(interval)
+
+
+@pytest.mark.parametrize("request_count, settings, mem_limit, runtime", list(test_stream_backpressure_group.values()), ids=list(test_stream_backpressure_group.keys()))
+@pytest.mark.asyncio
+async def test_stream_backpressure_memory(request_count, settings, mem_limit, runtime, aioresponse, perf_metrics_collector):
+    mock_url = 'http://mock.spider.com'
+    mock_url_regex = re.compile('http:\/\/mock.spider.com.*')
+    spider = http_spider()
+    spider.url = mock_url
+    spider.count = request_count
+    aioresponse.get(mock_url_regex, status=200, payload={'code': 200, 'status':'Success'}, repeat=True)
+    runner = await AsyncRunner.create(settings={**settings_loader._settings, **settings})
+    runner.add_spider(spider)
+    peak = {}
+    sampler = asyncio.ensure_future(sample_memory(peak))
+    try:
+        await timeout(runner.start(), wait=runtime)
+    finally:
+        sampler.cancel()
+    perf_metrics_collector.collect('memory', {'peak_rss(mb)': peak.get('rss', 0), 'requests': request_count, 'completed': spider.completed})
+    logger.info(f'Peak memory: {peak.get("rss", 0):.2f} mb ({request_count} requests, settings: {settings})')
+    if mem_limit:
+       pytest.assume(peak.get('rss', 0) <= mem_limit, f'Peak memory {peak.get("rss", 0):.2f} mb larger than {mem_limit} mb.')
+
+
+test_delay_stream_group = {
+    "delayed=1000000": pytest.param(*(1000000, 256), marks=[]), #(delayed_count, mem_limit(bytes per item))
+}
+
+@pytest.mark.parametrize("delayed_count, mem_limit", list(test_delay_stream_group.values()), ids=list(test_delay_stream_group.keys()))
+@pytest.mark.asyncio
+async def test_delay_stream_pending(delayed_count, mem_limit, perf_metrics_collector):
+    loop = asyncio.get_event_loop()
+    stream = await DelayStream.create()
+    scheduled_timers = len(loop._scheduled)
+    requests = [HttpRequest(f'http://mock.spider.com?num={num}') for num in range(delayed_count)]
+    tracemalloc.start()
+    try:
+        start_memory, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        for num, request in enumerate(requests):
+            await stream.write(request, delay=1+(num % 1000)/1000)
+        write_elapsed = time.perf_counter() - start
+        end_memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    timers = len(loop._scheduled) - scheduled_timers
+    assert stream.pending() == delayed_count and timers <= 1
+    start = time.perf_counter()
+    released = 0
+    async with stream.read() as reader:
+        while released < delayed_count:
+            released += len(await reader.read_batch(max_items=10000))
+    release_elapsed = time.perf_counter() - start
+    await stream.close()
+    per_item = (end_memory - start_memory) / delayed_count
+    perf_metrics_collector.collect('delay_stream', {'delayed': delayed_count, 'bytes/item': per_item, 'write/sec': delayed_count/write_elapsed, 'release(sec)': release_elapsed, 'timers': timers})
+    logger.info(f'DelayStream: {per_item:.2f} bytes per delayed item, {delayed_count/write_elapsed:.2f} write/sec, released in {release_elapsed:.2f}s, {timers} loop timers ({delayed_count} delayed)')
+    pytest.assume(per_item <= mem_limit, f'{per_item:.2f} bytes per delayed item larger than {mem_limit} bytes.')
@@ -0,0 +1,77 @@
+import logging
+import pytest
+import asyncio
+import time
+from aiohttp import web
+from araneid.core.context import RequestContext
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import Http
+from araneid.network.http import HttpRequest
+from araneid.stats import StatsCollector
+
+
+logger = logging.getLogger()
+
+
+test_trace_group = {
+    "request=2000, concurrency=50": pytest.param(*(2000, 50), marks=[]), #(request_count, concurrency)
+}
+
+class TraceSpider(object):
+
+    def __init__(self):
+        self.settings = {}
+        self.stats = StatsCollector({})
+
+async def start_server():
+    async def handle(request):
+        return web.Response(text='araneid')
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+async def crawl(settings, url, request_count, concurrency):
+    downloader = await Http.create(settings=settings)
+    slot = await Slot.create({})
+    spider = TraceSpider()
+    queue = asyncio.Queue()
+    for num in range(request_count):
+        queue.put_nowait(num)
+    async def worker():
+        while not queue.empty():
+            request = HttpRequest(url=f'{url}/?num={queue.get_nowait()}', context=RequestContext(spider=spider))
+            request.bind(slot)
+            channel = await downloader.download(request)
+            async for _ in channel.read():
+                pass
+    start = time.process_time()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.process_time() - start
+    await downloader.close()
+    return elapsed / request_count, spider.stats.get_value('trace/http/total/count', spider=spider, sep='/')
+
+
+@pytest.mark.parametrize("request_count, concurrency", list(test_trace_group.values()), ids=list(test_trace_group.keys()))
+@pytest.mark.asyncio
+async def test_trace_overhead(request_count, concurrency, perf_metrics_collector):
+    set_signalmanager(await SignalManager.create())
+    runner, url = await start_server()
+    try:
+        # 预热连接和代码路径
+        await crawl({}, url, concurrency, concurrency)
+        off, off_traced = await crawl({}, url, request_count, concurrency)
+        on, on_traced = await crawl({'HTTP_TRACE_ENABLED': True}, url, request_count, concurrency)
+        sampled, sampled_traced = await crawl({'HTTP_TRACE_ENABLED': True, 'HTTP_TRACE_SAMPLE_RATE': 0.01}, url, request_count, concurrency)
+    finally:
+        await runner.cleanup()
+    perf_metrics_collector.collect('trace', {'requests': request_count, 'off(us/request)': off*1e6, 'on(us/request)': on*1e6, 'sampled 1%(us/request)': sampled*1e6})
+    logger.info(f'Http tracing CPU time per request: {off*1e6:.1f}us off, {on*1e6:.1f}us on, {sampled*1e6:.1f}us with 1% sampling ({request_count} requests)')
+    pytest.assume(off_traced is None, f'{off_traced} requests are traced while tracing is disabled.')
+    pytest.assume(on_traced == request_count, f'Only {on_traced} of {request_count} requests are traced.')
+    pytest.assume(sampled_traced is None or sampled_traced < request_count // 10, f'{sampled_traced} of {request_count} requests are traced with 1% sampling.')
+    pytest.assume(on < off * 1.25, f'Tracing costs more than 25% CPU time per request ({on*1e6:.1f}us vs {off*1e6:.1f}us).')
@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from araneid.core.exception import NotConfigured
+from araneid.core.request import Meta
+from araneid.core.schedulemanager import ScheduleManager
+from araneid.core.stream import Stream
+from araneid.network.http import HttpRequest, HttpResponse
+from araneid.scheduler.priority import PriorityScheduler
+
+
+settings = {'SCHEDULERS': ['PriorityScheduler']}
+
+async def timeout(coroutine, wait=1):
+    return await asyncio.wait_for(asyncio.ensure_future(coroutine), timeout=wait)
+
+@pytest.mark.asyncio
+async def test_priority_scheduler_not_configured():
+    with pytest.raises(NotConfigured):
+        await PriorityScheduler.create(settings={})
+
+@pytest.mark.asyncio
+async def test_priority_scheduler_order():
+    scheduler = await PriorityScheduler.create(settings=settings)
+    requests = [HttpRequest(url=f'https://github.com/WALL-EEEEEEE?num={num}', priority=priority) for num, priority in enumerate([0, 1, 0, -1, 1])]
+    for request in requests:
+        await scheduler.add_request(request)
+    assert not scheduler.idle()
+    scheduled = [await timeout(scheduler.get_request()) for _ in requests]
+    assert scheduled == [requests[1], requests[4], requests[0], requests[2], requests[3]]
+    assert scheduler.idle()
+    await scheduler.close()
+
+@pytest.mark.asyncio
+async def test_priority_scheduler_run():
+    scheduler = await PriorityScheduler.create(settings=settings)
+    schedule_channel = await Stream.create()
+    running = asyncio.ensure_future(scheduler.run(schedule_channel))
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE')
+    response = HttpResponse(status=200, content=b'')
+    await scheduler.add_request(request)
+    await scheduler.add_response(response)
+    scheduled = [await timeout(schedule_channel.get()), await timeout(schedule_channel.get())]
+    assert request in scheduled and response in scheduled
+    await scheduler.close()
+    await timeout(running)
+    assert scheduler.idle()
+
+@pytest.mark.asyncio
+async def test_priority_scheduler_slow_consumer():
+    manager = await ScheduleManager.create(settings=settings)
+    dispatched = []
+    consumable = asyncio.Event()
+    async def receiver(request):
+        dispatched.append(request.priority)
+        # 下载并发饱和
+        await consumable.wait()
+    manager.add_channel_receiver(receiver)
+    running = asyncio.ensure_future(manager.start())
+    await manager.add_request(HttpRequest(url='https://github.com/WALL-EEEEEEE?num=0', priority=0))
+    await asyncio.sleep(0.05)
+    for num, priority in enumerate([0, 0, 0, 10, 10, 10], start=1):
+        await manager.add_request(HttpRequest(url=f'https://github.com/WALL-EEEEEEE?num={num}', priority=priority))
+        await asyncio.sleep(0.01)
+    assert dispatched == [0]
+    consumable.set()
+    await timeout(manager.wait_idle())
+    assert dispatched == [0, 10, 10, 10, 0, 0, 0]
+    await manager.close()
+    await timeout(running)
+
+@pytest.mark.asyncio
+async def test_priority_scheduler_delay():
+    scheduler = await PriorityScheduler.create(settings=settings)
+    schedule_channel = await Stream.create()
+    running = asyncio.ensure_future(scheduler.run(schedule_channel))
+    delayed = HttpRequest(url='https://github.com/WALL-EEEEEEE?num=0', priority=10, meta=Meta(PriorityScheduler.DELAY_KEY, 0.1))
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE?num=1')
+    await scheduler.add_request(delayed)
+    await scheduler.add_request(request)
+    assert not scheduler.idle()
+    # 延迟中的高优先级请求不会阻塞到期的请求
+    assert await timeout(schedule_channel.get()) is request
+    assert await timeout(schedule_channel.get()) is delayed
+    assert delayed.meta.get(PriorityScheduler.DELAY_KEY) is None
+    await scheduler.close()
+    await timeout(running)
@@ -0,0 +1,145 @@
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from araneid.core.exception import NotConfigured
+from araneid.core.signal import SignalManager, set_signalmanager
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import Http
+from araneid.downloader.replay import Replay, ReplayMissing, ResponseArchive
+from araneid.extension.downloadermiddleware.record import RecordMiddleware
+from araneid.network.http import HttpRequest, HttpResponse
+
+
+BODY = 'araneid '.encode('utf-8') * 32 * 1024
+
+async def start_server():
+    async def sized(request):
+        await asyncio.sleep(0.1)
+        return web.Response(body=BODY, content_type='text/plain', charset='utf-8', headers={'X-Num': request.query.get('num', '')})
+    async def cookie(request):
+        response = web.Response(status=201, text='araneid')
+        response.set_cookie('session', 'araneid')
+        return response
+    app = web.Application()
+    app.router.add_get('/sized', sized)
+    app.router.add_get('/cookie', cookie)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+async def fetch(downloader, url, **kwargs):
+    request = HttpRequest(url=url, **kwargs)
+    request.bind(await Slot.create({}))
+    channel = await downloader.download(request)
+    async with channel.read() as reader:
+        async for response in reader:
+            return response
+
+async def record(recorder, downloader, url):
+    request = HttpRequest(url=url)
+    request.bind(await Slot.create({}))
+    recorder.process_request(request, None)
+    channel = await downloader.download(request)
+    async with channel.read() as reader:
+        async for response in reader:
+            return await recorder.process_response(response, request, None)
+
+@pytest_asyncio.fixture
+async def http_server():
+    set_signalmanager(await SignalManager.create())
+    runner, url = await start_server()
+    yield url
+    await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_record_not_enabled():
+    with pytest.raises(NotConfigured):
+        await RecordMiddleware.create({})
+
+@pytest.mark.asyncio
+async def test_record_replay(http_server, tmp_path):
+    settings = {'REPLAY_RECORD': True, 'REPLAY_ARCHIVE': str(tmp_path)}
+    recorder = await RecordMiddleware.create(settings)
+    downloader = await Http.create(settings={})
+    recorded = [await record(recorder, downloader, f'{http_server}/sized?num={num}') for num in range(3)]
+    recorded.append(await record(recorder, downloader, f'{http_server}/cookie'))
+    recorder.close()
+    await downloader.close()
+    # identical bodies are stored once
+    assert len(ResponseArchive(str(tmp_path)).open()) == 4
+    assert (tmp_path / ResponseArchive.BODIES).stat().st_size == len(BODY) + len(b'araneid')
+    replay = await Replay.create(settings)
+    for num in range(3):
+        response = await fetch(replay, f'{http_server}/sized?num={num}')
+        assert isinstance(response, HttpResponse) and response.status == 200 and response.body == BODY and response.encoding == recorded[num].encoding
+        assert response.headers['X-Num'] == str(num) and response.headers['Content-Type'] == 'text/plain; charset=utf-8'
+    response = await fetch(replay, f'{http_server}/cookie')
+    assert response.status == 201 and response.reason == 'Created' and response.text == 'araneid' and response.cookies == {'session': 'araneid'}
+    with pytest.raises(ReplayMissing):
+        await fetch(replay, f'{http_server}/sized?num=3')
+    await replay.close()
+
+@pytest.mark.asyncio
+async def test_replay_latency(http_server, tmp_path):
+    settings = {'REPLAY_RECORD': True, 'REPLAY_ARCHIVE': str(tmp_path)}
+    recorder = await RecordMiddleware.create(settings)
+    downloader = await Http.create(settings={})
+    await record(recorder, downloader, f'{http_server}/sized')
+    recorder.close()
+    await downloader.close()
+    replay = await Replay.create({**settings, 'DOWNLOAD_BODY': 'memoryview'})
+    start = time.perf_counter()
+    response = await fetch(replay, f'{http_server}/sized')
+    assert time.perf_counter() - start < 0.05
+    assert isinstance(response.content, memoryview) and response.body == BODY
+    await replay.close()
+    replay = await Replay.create({**settings, 'REPLAY_LATENCY_FACTOR': 1, 'REPLAY_MISSING': 'download'})
+    start = time.perf_counter()
+    assert (await fetch(replay, f'{http_server}/sized')).body == BODY
+    assert time.perf_counter() - start >= 0.1
+    # requests missing from the archive are downloaded
+    assert (await fetch(replay, f'{http_server}/cookie')).status == 201
+    await replay.close()
+
+@pytest.mark.asyncio
+async def test_archive_truncated(tmp_path):
+    archive = ResponseArchive(str(tmp_path)).open(writable=True)
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE')
+    request.bind(await Slot.create({}))
+    for body in (b'araneid', b'wall-e'):
+        archive.add(body.decode(), HttpResponse.from_request(request=request, status=200, content=body, headers={'Content-Type': 'text/plain'}))
+    archive.close()
+    # the body of the last record is not written completely
+    with open(tmp_path / ResponseArchive.BODIES, 'r+b') as f:
+        f.truncate(len(b'araneid') + 2)
+    with open(tmp_path / ResponseArchive.INDEX, 'a') as f:
+        f.write('{"key": "incomplete", ')
+    archive = ResponseArchive(str(tmp_path)).open()
+    assert len(archive) == 1 and archive.body(archive.get('araneid')) == b'araneid' and archive.get('wall-e') is None
+    archive.close()
+
+@pytest.mark.asyncio
+async def test_record_concurrent(tmp_path):
+    recorder = await RecordMiddleware.create({'REPLAY_RECORD': True, 'REPLAY_ARCHIVE': str(tmp_path)})
+    slot = await Slot.create({})
+    requests = [HttpRequest(url=f'https://github.com/WALL-EEEEEEE?num={num}') for num in range(200)]
+    for request in requests:
+        request.bind(slot)
+        recorder.process_request(request, None)
+    # start times are kept on the requests, however many are in flight
+    assert all(request.meta[RecordMiddleware.META_KEY] is not None for request in requests)
+    await asyncio.sleep(0.01)
+    responses = [HttpResponse.from_request(request=request, status=200, content=f'araneid {num % 10}'.encode(), headers={}) for num, request in enumerate(requests)]
+    await asyncio.gather(*[recorder.process_response(response, response.request, None) for response in responses])
+    assert all(request.meta.get(RecordMiddleware.META_KEY) is None for request in requests)
+    recorder.close()
+    archive = ResponseArchive(str(tmp_path)).open()
+    assert len(archive) == 200 and (tmp_path / ResponseArchive.BODIES).stat().st_size == len(b'araneid 0') * 10
+    for num, request in enumerate(requests):
+        record = archive.get(request.fingerprint.hex())
+        assert record.elapsed >= 0.01 and archive.body(record) == f'araneid {num % 10}'.encode()
+    archive.close()
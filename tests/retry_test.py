@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from araneid.core.exception import NotConfigured
+from araneid.core.scheduler import Scheduler
+from araneid.core.slot import Slot
+from araneid.downloader.aiohttp import HttpConnectionClose
+from araneid.extension.downloadermiddleware.retry import RetryMiddleware
+from araneid.network.http import HttpRequest, HttpResponse
+
+
+class Stats(object):
+
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1, spider=None, sep='.'):
+        self.values[key] = self.values.get(key, 0) + count
+
+class Spider(object):
+
+    def __init__(self):
+        self.stats = Stats()
+
+@pytest_asyncio.fixture
+async def slot():
+    return await Slot.create({})
+
+def create_request(slot, url='https://github.com/WALL-EEEEEEE', **kwargs):
+    request = HttpRequest(url=url, **kwargs)
+    request.bind(slot)
+    return request
+
+@pytest.mark.asyncio
+async def test_retry_not_enabled():
+    with pytest.raises(NotConfigured):
+        await RetryMiddleware.create({'RETRY_ENABLED': False})
+
+def test_retry_backoff():
+    retry = RetryMiddleware(backoff_base=1, backoff_max=10, backoff_jitter=0)
+    assert [retry.backoff(n) for n in range(1, 7)] == [1, 2, 4, 8, 10, 10]
+    retry.backoff_jitter = 0.5
+    for _ in range(100):
+        assert 2 <= retry.backoff(3) <= 4
+
+@pytest.mark.asyncio
+async def test_retry_exception(slot):
+    retry = await RetryMiddleware.create({'RETRY_BACKOFF_JITTER': 0})
+    spider = Spider()
+    request = create_request(slot, max_retries=2)
+    request.set_state(request.States.schedule)
+    assert retry.process_exception(request, HttpConnectionClose(request), spider) is request
+    assert request.retries == 1 and request.meta[Scheduler.DELAY_KEY] == 1
+    assert not request.in_state(request.States.schedule)
+    assert retry.process_exception(request, asyncio.TimeoutError(), spider) is request
+    assert request.retries == 2 and request.meta[Scheduler.DELAY_KEY] == 2
+    assert retry.process_exception(request, HttpConnectionClose(request), spider) is None
+    assert retry.process_exception(create_request(slot, max_retries=2), ValueError(), spider) is None
+    assert spider.stats.values == {'retry/count': 2, 'retry/reason/HttpConnectionClose': 1, 'retry/reason/TimeoutError': 1, 'retry/max_reached': 1}
+
+@pytest.mark.asyncio
+async def test_retry_http_codes(slot):
+    retry = await RetryMiddleware.create({'RETRY_HTTP_CODES': [503]})
+    spider = Spider()
+    request = create_request(slot, max_retries=1)
+    response = HttpResponse.from_request(request=request, status=503, content=b'', headers={})
+    assert retry.process_response(response, request, spider) is request
+    assert retry.process_response(response, request, spider) is response
+    ok = create_request(slot, max_retries=1)
+    ok_response = HttpResponse.from_request(request=ok, status=500, content=b'', headers={})
+    assert retry.process_response(ok_response, ok, spider) is ok_response and ok.retries == 0
+    dont_retry = create_request(slot, max_retries=1)
+    dont_retry.meta['dont_retry'] = True
+    assert retry.process_exception(dont_retry, HttpConnectionClose(dont_retry), spider) is None
+    assert spider.stats.values == {'retry/count': 1, 'retry/reason/503': 1, 'retry/max_reached': 1}
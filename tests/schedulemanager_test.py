@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from araneid.core import plugin as plugins
+from araneid.core.request import Meta
+from araneid.core.schedulemanager import ScheduleManager, request_host
+from araneid.network.http import HttpRequest, HttpResponse
+from araneid.scheduler.default import DefaultScheduler
+from araneid.util.hashring import HashRing
+
+
+class FirstScheduler(DefaultScheduler):
+    pass
+
+class SecondScheduler(DefaultScheduler):
+    pass
+
+class ThirdScheduler(DefaultScheduler):
+    pass
+
+
+@pytest.fixture
+def schedulers():
+    scheduler_classes = [FirstScheduler, SecondScheduler, ThirdScheduler]
+    for scheduler_cls in scheduler_classes:
+        plugins.register(plugins.PluginType.SCHEDULER, scheduler_cls)
+    yield [scheduler_cls.__name__ for scheduler_cls in scheduler_classes]
+    plugins.clear()
+
+def test_hashring_remap():
+    ring = HashRing(['a', 'b', 'c'], names=['a', 'b', 'c'])
+    keys = [f'host{num}.github.com' for num in range(3000)]
+    owners = {key: ring.get(key) for key in keys}
+    assert set(owners.values()) == {'a', 'b', 'c'}
+    assert all(800 < list(owners.values()).count(node) < 1200 for node in 'abc')
+    ring.remove('c')
+    assert all(ring.get(key) == owner for key, owner in owners.items() if owner != 'c')
+    assert set(ring.get(key) for key in keys) == {'a', 'b'}
+
+def test_request_host():
+    request = HttpRequest(url='https://GitHub.com:8443/WALL-EEEEEEE')
+    assert request_host(request) == 'github.com'
+    response = HttpResponse(status=200, content=b'')
+    setattr(response, '__request__', request)
+    assert request_host(response) == 'github.com'
+    assert request_host(HttpResponse(status=200, content=b'')) is None
+
+@pytest.mark.asyncio
+async def test_schedulemanager_host_affinity(schedulers):
+    manager = await ScheduleManager.create(settings={'SCHEDULERS': schedulers})
+    selected = {}
+    for num in range(300):
+        request = HttpRequest(url=f'https://host{num % 30}.github.com/?num={num}')
+        selected.setdefault(request_host(request), set()).add(manager.__select__(request))
+        await manager.add_request(request)
+    assert all(len(owners) == 1 for owners in selected.values())
+    assert len(set.union(*selected.values())) == 3
+    response = HttpResponse(status=200, content=b'')
+    setattr(response, '__request__', HttpRequest(url='https://host1.github.com/'))
+    assert manager.__select__(response) in selected['host1.github.com']
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_schedulemanager_selector_key(schedulers):
+    manager = await ScheduleManager.create(settings={'SCHEDULERS': schedulers, 'SCHEDULER_SELECTOR_KEY': lambda request: 'github.com'})
+    assert len({manager.__select__(HttpRequest(url=f'https://host{num}.github.com/')) for num in range(100)}) == 1
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_default_scheduler_delay():
+    scheduler = await DefaultScheduler.create()
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE', meta=Meta(DefaultScheduler.DELAY_KEY, 0.05))
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    await scheduler.add_request(request)
+    assert await asyncio.wait_for(scheduler.get_request(), timeout=1) is request
+    assert loop.time() - started >= 0.05
+    # 延迟只生效一次, 同一个请求再次调度时不再延迟
+    assert request.meta.get(DefaultScheduler.DELAY_KEY) is None
+    started = loop.time()
+    await scheduler.add_request(request)
+    assert await asyncio.wait_for(scheduler.get_request(), timeout=1) is request
+    assert loop.time() - started < 0.05
+    await scheduler.close()
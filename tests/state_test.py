@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from araneid.core.request import Request
+from araneid.core.response import Response
+from araneid.core.context import RequestContext
+from araneid.core.request import Meta
+from araneid.network.http import HttpRequest, HttpResponse
+
+
+async def timeout(coroutine, wait=1):
+    return await asyncio.wait_for(asyncio.ensure_future(coroutine), timeout=wait)
+
+def test_request_state():
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE')
+    assert not request.in_state(Request.States.slot)
+    request.set_state(Request.States.slot)
+    request.set_state(Request.States.schedule)
+    assert request.in_state(Request.States.slot) and request.in_state(Request.States.schedule)
+    assert request.in_state(Request.States.slot | Request.States.schedule)
+    assert request.states == Request.States.slot | Request.States.schedule
+    request.reset_state(Request.States.slot)
+    assert not request.in_state(Request.States.slot)
+    request.clear_states()
+    assert not request.in_state(Request.States.schedule)
+
+def test_state_not_support_state():
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE')
+    with pytest.raises(AssertionError):
+        request.set_state(Response.States.slot)
+
+@pytest.mark.asyncio
+async def test_wait_state():
+    request = HttpRequest(url='https://github.com/WALL-EEEEEEE')
+    request.set_state(Request.States.slot)
+    await timeout(request.wait_state(Request.States.slot))
+    waiter = asyncio.ensure_future(request.wait_state(Request.States.complete))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    request.set_state(Request.States.complete)
+    await timeout(waiter)
+    request.reset_state(Request.States.complete)
+    with pytest.raises(asyncio.TimeoutError):
+        await timeout(request.wait_state(Request.States.complete), wait=0.1)
+
+@pytest.mark.parametrize('obj', [HttpRequest(url='https://github.com/WALL-EEEEEEE'), HttpResponse(status=200, content=b''), RequestContext(), Meta()], ids=['HttpRequest', 'HttpResponse', 'RequestContext', 'Meta'])
+def test_no_instance_dict(obj):
+    assert not hasattr(obj, '__dict__')
@@ -4,7 +4,7 @@ from multiprocessing.sharedctypes import Value
 from tokenize import group
 import pytest
 import asyncio
-from araneid.core.stream import Stream
+from araneid.core.stream import Stream, DispatchStream, DelayStream
 
 def data_generate(count=1):
     for v in range(1, count+1):
@@ -486,6 +486,179 @@ async def test_stream_async_with_multi_read():
 
 
 
+@pytest.mark.asyncio
+async def test_stream_bounded_write():
+    async def publisher():
+        for v in data:
+            await stream.write(v)
+            sizes.append(stream.size())
+        await stream.join()
+        await stream.close()
+
+    async def consumer():
+        async with stream.read() as reader:
+            async for v in reader:
+                res.append(v)
+                await asyncio.sleep(0)
+    res = []
+    sizes = []
+    count = 100
+    data = data_generate(count)
+    stream = await Stream.create(maxsize=10, low_watermark=2)
+    await asyncio.gather(publisher(), consumer())
+    assert list(data_generate(count)) == res
+    assert max(sizes) <= 10
+
+@pytest.mark.asyncio
+async def test_stream_bounded_write_suspended():
+    stream = await Stream.create(maxsize=2, low_watermark=0)
+    await stream.write(1)
+    await stream.write(2)
+    assert stream.is_full()
+    writer = asyncio.ensure_future(stream.write(3))
+    await asyncio.sleep(0)
+    assert not writer.done()
+    assert not stream.idle()
+    assert 1 == await stream.get()
+    await asyncio.sleep(0)
+    assert not writer.done()
+    assert 2 == await stream.get()
+    await writer
+    assert 3 == await stream.get()
+
+@pytest.mark.asyncio
+async def test_stream_bounded_write_blocks_at_maxsize():
+    settings = {'STREAM_MAXSIZE': 100, 'STREAM_HIGH_WATERMARK': 50}
+    for stream in (await Stream.create(maxsize=10), await Stream.create(name='bounded', maxsize=10, settings=settings)):
+        await asyncio.wait_for(stream.write_many(range(10)), timeout=1)
+        assert stream.size() == 10 and stream.is_full()
+        writer = asyncio.ensure_future(stream.write(10))
+        await asyncio.sleep(0.01)
+        assert not writer.done() and stream.size() == 10
+        for _ in range(6):
+            await stream.get()
+        await asyncio.wait_for(writer, timeout=1)
+        assert stream.size() == 5
+        await stream.close()
+
+@pytest.mark.asyncio
+async def test_stream_batch_read_write():
+    async def publisher():
+        await stream.write_many(list(data))
+        await stream.join()
+        await stream.close()
+
+    async def consumer():
+        async with stream.read() as reader:
+            while True:
+                batch = await reader.read_batch(max_items=7)
+                if not batch:
+                    break
+                assert len(batch) <= 7
+                res.extend(batch)
+    res = []
+    count = 100
+    data = data_generate(count)
+    stream = await Stream.create()
+    await asyncio.gather(publisher(), consumer())
+    assert list(data_generate(count)) == res
+
+@pytest.mark.asyncio
+async def test_stream_batch_read_wait():
+    async def publisher():
+        for v in data:
+            await stream.write(v)
+            await asyncio.sleep(0.01)
+    res = []
+    data = data_generate(5)
+    stream = await Stream.create()
+    publish = asyncio.ensure_future(publisher())
+    res.extend(await stream.read_batch(max_items=5, max_wait=1))
+    await publish
+    assert list(data_generate(5)) == res
+
+@pytest.mark.asyncio
+async def test_stream_batch_ack():
+    stream = await Stream.create(confirm_ack=True)
+    await stream.write_many([1, 2, 3])
+    batch = await stream.read_batch(max_items=3)
+    assert not stream.idle()
+    stream.ack_many(batch)
+    assert stream.idle()
+
+@pytest.mark.asyncio
+async def test_stream_wait_demand():
+    stream = await Stream.create()
+    assert not stream.has_demand()
+    reader = asyncio.ensure_future(stream.get())
+    await asyncio.sleep(0)
+    await asyncio.wait_for(stream.wait_demand(), timeout=1)
+    await stream.write(1)
+    assert not stream.has_demand()
+    waiter = asyncio.ensure_future(stream.wait_demand())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    assert 1 == await reader
+    reader = asyncio.ensure_future(stream.read_batch())
+    await asyncio.wait_for(waiter, timeout=1)
+    await stream.write(2)
+    assert [2] == await reader
+    await stream.close()
+    assert stream.has_demand()
+
+def test_stream_options_from_settings():
+    settings = {'STREAM_MAXSIZE': 100, 'STREAM_OPTIONS': {'spider_request': {'maxsize': 10, 'low_watermark': 5}}}
+    assert Stream.options_from_settings(settings, name='spider_request') == {'maxsize': 10, 'high_watermark': None, 'low_watermark': 5}
+    assert Stream.options_from_settings(settings, name='schedulemanager') == {'maxsize': 100, 'high_watermark': None, 'low_watermark': None}
+
+@pytest.mark.asyncio
+async def test_dispatch_stream():
+    dispatched = []
+    async def handler(data):
+        assert not stream.idle()
+        dispatched.append(data)
+    stream = await DispatchStream.create(handler)
+    stream.map(lambda x: x*2)
+    await stream.write(1)
+    await stream.write_many([2, 3])
+    assert dispatched == [2, 4, 6]
+    assert stream.idle()
+    await stream.close()
+    await stream.write(4)
+    assert dispatched == [2, 4, 6]
+
+@pytest.mark.asyncio
+async def test_delay_stream():
+    stream = await DelayStream.create()
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    await stream.write('late', delay=0.2)
+    await stream.write_many(['early_1', 'early_2'], delay=0.1)
+    await stream.write('now')
+    assert stream.size() == 4 and stream.pending() == 3 and not stream.idle()
+    assert await stream.get() == 'now'
+    assert await asyncio.wait_for(stream.get(), 1) == 'early_1'
+    assert loop.time() - start >= 0.1
+    assert await asyncio.wait_for(stream.get(), 1) == 'early_2'
+    assert await asyncio.wait_for(stream.get(), 1) == 'late'
+    assert loop.time() - start >= 0.2
+    assert stream.idle()
+    await stream.write('dropped', delay=10)
+    await stream.close()
+    assert stream.pending() == 0 and stream.idle()
+
+@pytest.mark.asyncio
+async def test_delay_stream_release_batch():
+    stream = await DelayStream.create(delay=0.01)
+    stream.RELEASE_BATCH_SIZE = 10
+    await stream.write_many(list(data_generate(100)))
+    res = []
+    while len(res) < 100:
+        res.extend(await asyncio.wait_for(stream.read_batch(max_items=100), 1))
+    assert res == list(data_generate(100))
+    assert stream.idle()
+    await stream.close()
+
 @pytest.mark.parametrize('operator', list(stream_set_exception_group().values()), ids=list(stream_set_exception_group().keys()))
 @pytest.mark.asyncio
 async def test_stream_set_exception(operator):
@@ -0,0 +1,110 @@
+import socket
+import asyncio
+import pytest
+from araneid.core.exception import NotConfigured
+from araneid.network import dns
+from araneid.core.throttle import Throttle, TokenBucket
+from araneid.network.http import HttpRequest
+
+
+async def timeout(coroutine, wait=1):
+    return await asyncio.wait_for(asyncio.ensure_future(coroutine), timeout=wait)
+
+class SlowResolver(object):
+
+    def __init__(self):
+        self.resolvable = asyncio.Event()
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        if host.startswith('slow'):
+           await self.resolvable.wait()
+        return [{'hostname': host, 'host': '10.0.0.1', 'port': port, 'family': family, 'proto': 0, 'flags': 0}]
+
+    async def close(self):
+        pass
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.consume(0) == 0 and bucket.consume(0) == 0
+    assert bucket.consume(0) == pytest.approx(0.5)
+    assert bucket.consume(0.5) == 0
+    assert not bucket.is_full(0.5) and bucket.is_full(1.5)
+    assert TokenBucket(rate=0).consume(0) == 0
+
+@pytest.mark.asyncio
+async def test_throttle_not_configured():
+    with pytest.raises(NotConfigured):
+        await Throttle.create(settings={})
+
+@pytest.mark.asyncio
+async def test_throttle_concurrency_per_domain():
+    throttle = await Throttle.create(settings={'CONCURRENT_REQUESTS_PER_DOMAIN': 2})
+    slow = [HttpRequest(url=f'https://slow.github.com/?num={num}') for num in range(4)]
+    fast = [HttpRequest(url=f'https://fast.github.com/?num={num}') for num in range(2)]
+    for request in slow + fast:
+        await throttle.put(request)
+    assert await timeout(throttle.get_ready()) == slow[:2] + fast
+    assert throttle.parked() == 2 and throttle.active() == 4
+    assert throttle.get_slot('slow.github.com').active == 2
+    throttle.release(slow[0])
+    throttle.release(slow[0])
+    assert await timeout(throttle.get_ready()) == slow[2:3]
+    assert throttle.parked() == 1
+    await throttle.close()
+    assert await timeout(throttle.get_ready()) == []
+
+@pytest.mark.asyncio
+async def test_throttle_download_delay():
+    throttle = await Throttle.create(settings={'DOWNLOAD_DELAY': 0.1, 'DOWNLOAD_SLOTS': {'fast.github.com': {'delay': 0}}})
+    runner = asyncio.ensure_future(throttle.run())
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    slow = [HttpRequest(url=f'https://slow.github.com/?num={num}') for num in range(3)]
+    fast = [HttpRequest(url=f'https://fast.github.com/?num={num}') for num in range(3)]
+    for request in slow + fast:
+        await throttle.put(request)
+    assert await timeout(throttle.get_ready()) == slow[:1] + fast
+    released = []
+    while len(released) < 2:
+        released.extend(await timeout(throttle.get_ready()))
+        released_at = loop.time() - start
+    assert released == slow[1:]
+    assert released_at >= 0.2
+    await throttle.close()
+    await timeout(runner)
+
+@pytest.mark.asyncio
+async def test_throttle_concurrency_per_ip():
+    resolver = SlowResolver()
+    dns.set_dnscache(dns.DNSCache(resolver=resolver))
+    throttle = await Throttle.create(settings={'CONCURRENT_REQUESTS_PER_IP': 1})
+    # a slow lookup doesn't block the requests of other hosts
+    await timeout(throttle.put(HttpRequest(url='https://slow.github.com/')), wait=0.1)
+    fast = [HttpRequest(url=f'https://fast.github.com/?num={num}') for num in range(2)]
+    for request in fast:
+        await throttle.put(request)
+    ready = await throttle.get_ready()
+    assert len(ready) == 2 and ready[1] is fast[0]
+    # requests are slotted by host until the address is resolved
+    assert throttle.get_slot('fast.github.com').requests[0] is fast[1]
+    await asyncio.sleep(0.01)
+    # the host slot is merged into the slot of its address once resolved
+    assert throttle.get_slot('fast.github.com') is None
+    ip_slot = throttle.get_slot('10.0.0.1')
+    assert ip_slot.active == 1 and list(ip_slot.requests) == [fast[1]]
+    resolved = HttpRequest(url='https://fast.github.com/?num=2')
+    await throttle.put(resolved)
+    assert list(ip_slot.requests) == [fast[1], resolved]
+    throttle.release(fast[0])
+    assert await timeout(throttle.get_ready()) == [fast[1]]
+    # hosts sharing an address are merged, requests released before the merge are not revoked
+    resolver.resolvable.set()
+    await asyncio.sleep(0.01)
+    assert throttle.get_slot('slow.github.com') is None
+    assert ip_slot.active == 2 and list(ip_slot.requests) == [resolved]
+    throttle.release(fast[1])
+    assert ip_slot.active == 1 and list(ip_slot.requests) == [resolved]
+    throttle.release(ready[0])
+    assert await timeout(throttle.get_ready()) == [resolved]
+    await throttle.close()
+    dns.set_dnscache(None)